@@ -0,0 +1 @@
+"""Libraries & Utilities für die FastAPI-App"""
@@ -0,0 +1,51 @@
+"""
+Periodische Hintergrund-Tasks für den App-Lifespan
+
+    tasks = PeriodicTasks()
+    tasks.every(5.0, reap_leases, name="queue-reaper")
+    ...
+    await tasks.stop()
+
+Fehler einer Iteration werden geloggt, der Task läuft weiter.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import logging
+from typing import Awaitable, Callable, List
+
+logger = logging.getLogger("moe-api.background")
+
+
+async def _periodic(interval: float, fn: Callable[[], Awaitable[object]], name: str) -> None:
+    while True:
+        try:
+            await fn()
+        except asyncio.CancelledError:
+            raise
+        except Exception as exc:
+            logger.warning("Background task %s failed: %s", name, exc)
+        await asyncio.sleep(interval)
+
+
+class PeriodicTasks:
+    def __init__(self) -> None:
+        self._tasks: List[asyncio.Task] = []
+
+    def every(self, interval: float, fn: Callable[[], Awaitable[object]], *, name: str) -> asyncio.Task:
+        task = asyncio.create_task(_periodic(max(0.01, interval), fn, name), name=name)
+        self._tasks.append(task)
+        return task
+
+    def spawn(self, coro: Awaitable[object], *, name: str) -> asyncio.Task:
+        task = asyncio.ensure_future(coro)
+        task.set_name(name)
+        self._tasks.append(task)
+        return task
+
+    async def stop(self) -> None:
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks.clear()
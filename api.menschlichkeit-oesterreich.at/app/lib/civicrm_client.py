@@ -0,0 +1,425 @@
+"""
+Shared async CiviCRM APIv4 Client
+
+Ein einziger, langlebiger httpx.AsyncClient für alle CiviCRM-Aufrufe
+(app.main, app.routes.privacy, automation/privacy/right_to_erasure.py):
+
+- Keep-Alive Connection Pooling (kein TCP/TLS-Handshake pro Request)
+- Optional HTTP/2 (benötigt das Paket `h2`)
+- Konfigurierbare Pool-Limits via Environment (CIVI_POOL_*)
+- Latenz-Metriken pro Entity/Action und Aufrufgröße (Einzel-Lookups getrennt
+  von Seiten/Bulk-Reads, siehe `stats_key`)
+- Circuit Breaker, Retry-Budget mit Jitter-Backoff (nur idempotente Actions
+  bzw. nicht gesendete Requests) und aus p99 abgeleitete Timeouts; gelernt
+  wird je Statistik-Key, eine Export-Seite erbt also nie das Timeout schneller
+  Einzel-Lookups
+"""
+
+from __future__ import annotations
+
+import asyncio
+import logging
+import math
+import os
+import time
+from collections import deque
+from dataclasses import dataclass, field
+from typing import Any, AsyncIterator, Awaitable, Callable, Deque, Dict, List, Optional
+
+import httpx
+
+from .resilience import CircuitBreaker, RetryBudget, backoff_delay
+
+logger = logging.getLogger("moe-api.civicrm")
+
+try:
+    import h2  # type: ignore  # noqa: F401
+    _HTTP2_AVAILABLE = True
+except Exception:
+    _HTTP2_AVAILABLE = False
+
+# Anzahl der letzten Latenzen pro Entity/Action für Perzentile
+_SAMPLE_WINDOW = 512
+
+# Mindestanzahl erfolgreicher Samples, bevor Timeouts adaptiv werden
+_ADAPTIVE_MIN_SAMPLES = 20
+
+# Zeilen pro Call (limit bzw. Länge einer IN-Liste) → Größenklasse für Statistik und Timeout
+_SIZE_BUCKETS = ((25, ""), (500, "page"))
+_SIZE_BUCKET_LARGEST = "bulk"
+
+# Actions ohne Seiteneffekt – dürfen nach Timeouts/5xx wiederholt werden
+_IDEMPOTENT_ACTIONS = {"get", "getFields", "getActions", "autocomplete", "validate"}
+
+
+def _env_str(name: str, default: str) -> str:
+    raw = os.getenv(name)
+    return raw.strip() if raw is not None and raw.strip() else default
+
+
+def _env_int(name: str, default: int) -> int:
+    raw = os.getenv(name)
+    if raw is None or raw.strip() == "":
+        return default
+    try:
+        return int(raw)
+    except ValueError as exc:
+        raise RuntimeError(f"Environment variable {name} must be an integer") from exc
+
+
+def _env_float(name: str, default: float) -> float:
+    raw = os.getenv(name)
+    if raw is None or raw.strip() == "":
+        return default
+    try:
+        return float(raw)
+    except ValueError as exc:
+        raise RuntimeError(f"Environment variable {name} must be a number") from exc
+
+
+def _env_bool(name: str, default: bool) -> bool:
+    raw = os.getenv(name)
+    if raw is None:
+        return default
+    return raw.strip().lower() in {"1", "true", "t", "yes", "y"}
+
+
+def stats_key(entity: str, action: str, params: Dict[str, Any]) -> str:
+    """`Entity.action`, plus `#page`/`#bulk` for calls that ask for more than a handful of rows."""
+    rows = 0
+    limit = params.get("limit")
+    if isinstance(limit, int) and limit > 0:
+        rows = limit
+    else:
+        for clause in params.get("where") or []:
+            if isinstance(clause, (list, tuple)) and len(clause) >= 3 and clause[1] == "IN":
+                if isinstance(clause[2], (list, tuple)):
+                    rows = max(rows, len(clause[2]))
+    bucket = next((name for bound, name in _SIZE_BUCKETS if rows <= bound), _SIZE_BUCKET_LARGEST)
+    return f"{entity}.{action}#{bucket}" if bucket else f"{entity}.{action}"
+
+
+class CivicrmError(RuntimeError):
+    """CiviCRM-Aufruf fehlgeschlagen.
+
+    `status_code` ist der HTTP-Status, den die API an ihre Clients weitergibt
+    (502 bei Transport-/Upstream-Fehlern, 400 bei `is_error` von CiviCRM).
+    """
+
+    def __init__(self, status_code: int, detail: str, *, transient: bool = False, unsent: bool = False) -> None:
+        super().__init__(detail)
+        self.status_code = status_code
+        self.detail = detail
+        # transient: Upstream-Störung (zählt für den Circuit Breaker, Retry sinnvoll)
+        # unsent: Request hat CiviCRM sicher nicht erreicht (Retry auch für Writes)
+        self.transient = transient
+        self.unsent = unsent
+
+
+@dataclass
+class CivicrmConfig:
+    base_url: str
+    site_key: str
+    api_key: str
+    timeout: float = 30.0
+    connect_timeout: float = 5.0
+    max_connections: int = 50
+    max_keepalive_connections: int = 20
+    keepalive_expiry: float = 30.0
+    http2: bool = False
+    retry_max_attempts: int = 3
+    retry_base_delay: float = 0.2
+    retry_budget_ratio: float = 0.2
+    breaker_failure_threshold: int = 5
+    breaker_reset_timeout: float = 30.0
+    adaptive_timeout: bool = True
+    adaptive_timeout_min: float = 2.0
+    adaptive_timeout_multiplier: float = 3.0
+
+    @classmethod
+    def from_env(cls) -> "CivicrmConfig":
+        return cls(
+            base_url=_env_str("CIVI_BASE_URL", "https://crm.menschlichkeit-oesterreich.at"),
+            site_key=_env_str("CIVI_SITE_KEY", ""),
+            api_key=_env_str("CIVI_API_KEY", ""),
+            timeout=_env_float("CIVI_TIMEOUT_SECONDS", 30.0),
+            connect_timeout=_env_float("CIVI_CONNECT_TIMEOUT_SECONDS", 5.0),
+            max_connections=_env_int("CIVI_POOL_MAX_CONNECTIONS", 50),
+            max_keepalive_connections=_env_int("CIVI_POOL_MAX_KEEPALIVE", 20),
+            keepalive_expiry=_env_float("CIVI_POOL_KEEPALIVE_EXPIRY", 30.0),
+            http2=_env_bool("CIVI_HTTP2", False),
+            retry_max_attempts=max(1, _env_int("CIVI_RETRY_MAX_ATTEMPTS", 3)),
+            retry_base_delay=_env_float("CIVI_RETRY_BASE_DELAY_SECONDS", 0.2),
+            retry_budget_ratio=_env_float("CIVI_RETRY_BUDGET_RATIO", 0.2),
+            breaker_failure_threshold=_env_int("CIVI_BREAKER_FAILURE_THRESHOLD", 5),
+            breaker_reset_timeout=_env_float("CIVI_BREAKER_RESET_SECONDS", 30.0),
+            adaptive_timeout=_env_bool("CIVI_ADAPTIVE_TIMEOUT", True),
+            adaptive_timeout_min=_env_float("CIVI_ADAPTIVE_TIMEOUT_MIN_SECONDS", 2.0),
+            adaptive_timeout_multiplier=_env_float("CIVI_ADAPTIVE_TIMEOUT_MULTIPLIER", 3.0),
+        )
+
+
+@dataclass
+class CallStats:
+    """Latenz-Statistik für eine Entity/Action-Kombination."""
+
+    count: int = 0
+    errors: int = 0
+    total_ms: float = 0.0
+    max_ms: float = 0.0
+    retries: int = 0
+    samples: Deque[float] = field(default_factory=lambda: deque(maxlen=_SAMPLE_WINDOW))
+    # nur erfolgreiche Calls – Basis für adaptive Timeouts
+    ok_samples: Deque[float] = field(default_factory=lambda: deque(maxlen=_SAMPLE_WINDOW))
+
+    def record(self, elapsed_ms: float, ok: bool) -> None:
+        self.count += 1
+        if ok:
+            self.ok_samples.append(elapsed_ms)
+        else:
+            self.errors += 1
+        self.total_ms += elapsed_ms
+        self.max_ms = max(self.max_ms, elapsed_ms)
+        self.samples.append(elapsed_ms)
+
+    def percentile(self, q: float, *, ok_only: bool = False) -> Optional[float]:
+        """Nearest-rank Perzentil (q in 0..100) über das Sample-Fenster."""
+        samples = self.ok_samples if ok_only else self.samples
+        if not samples:
+            return None
+        ordered = sorted(samples)
+        rank = max(1, math.ceil(q / 100.0 * len(ordered)))
+        return ordered[min(rank, len(ordered)) - 1]
+
+    def snapshot(self) -> Dict[str, Any]:
+        def _round(value: Optional[float]) -> Optional[float]:
+            return round(value, 2) if value is not None else None
+
+        return {
+            "count": self.count,
+            "errors": self.errors,
+            "retries": self.retries,
+            "avg_ms": _round(self.total_ms / self.count) if self.count else None,
+            "p50_ms": _round(self.percentile(50)),
+            "p95_ms": _round(self.percentile(95)),
+            "p99_ms": _round(self.percentile(99)),
+            "max_ms": _round(self.max_ms) if self.count else None,
+        }
+
+
+class CivicrmClient:
+    """Gepoolter async Client für die CiviCRM APIv4 (`/civicrm/ajax/api4/{entity}/{action}`)."""
+
+    def __init__(self, config: CivicrmConfig, *, transport: Optional[httpx.AsyncBaseTransport] = None) -> None:
+        self.config = config
+        self._transport = transport
+        self._http: Optional[httpx.AsyncClient] = None
+        self._stats: Dict[str, CallStats] = {}
+        self.breaker = CircuitBreaker(config.breaker_failure_threshold, config.breaker_reset_timeout)
+        self.retry_budget = RetryBudget(ratio=config.retry_budget_ratio)
+
+    async def __aenter__(self) -> "CivicrmClient":
+        return self
+
+    async def __aexit__(self, *exc_info: Any) -> None:
+        await self.aclose()
+
+    @property
+    def http(self) -> httpx.AsyncClient:
+        if self._http is None or self._http.is_closed:
+            self._http = self._build_http()
+        return self._http
+
+    def _build_http(self) -> httpx.AsyncClient:
+        use_http2 = self.config.http2 and _HTTP2_AVAILABLE
+        if self.config.http2 and not _HTTP2_AVAILABLE:
+            logger.warning("CIVI_HTTP2 requested but package 'h2' is not installed; using HTTP/1.1")
+        limits = httpx.Limits(
+            max_connections=self.config.max_connections,
+            max_keepalive_connections=self.config.max_keepalive_connections,
+            keepalive_expiry=self.config.keepalive_expiry,
+        )
+        timeout = httpx.Timeout(self.config.timeout, connect=self.config.connect_timeout)
+        logger.debug(
+            "Creating CiviCRM HTTP pool (base=%s, max_connections=%s, keepalive=%s, http2=%s)",
+            self.config.base_url, limits.max_connections, limits.max_keepalive_connections, use_http2,
+        )
+        return httpx.AsyncClient(
+            base_url=self.config.base_url.rstrip("/"),
+            limits=limits,
+            timeout=timeout,
+            http2=use_http2,
+            transport=self._transport,
+        )
+
+    async def aclose(self) -> None:
+        if self._http is not None:
+            await self._http.aclose()
+            self._http = None
+
+    def timeout_for(self, key: str) -> float:
+        """Per-call timeout: p99 of recent successful calls × multiplier, clamped to [min, timeout]."""
+        if not self.config.adaptive_timeout:
+            return self.config.timeout
+        stats = self._stats.get(key)
+        if stats is None or len(stats.ok_samples) < _ADAPTIVE_MIN_SAMPLES:
+            return self.config.timeout
+        p99_ms = stats.percentile(99, ok_only=True) or 0.0
+        derived = p99_ms / 1000.0 * self.config.adaptive_timeout_multiplier
+        return min(self.config.timeout, max(self.config.adaptive_timeout_min, derived))
+
+    async def call(self, entity: str, action: str, params: Dict[str, Any]) -> Dict[str, Any]:
+        """Make authenticated call to CiviCRM APIv4 (breaker, retries, adaptive timeout)."""
+        payload = {
+            "params": params,
+            "_authx": {
+                "api_key": self.config.api_key,
+                "key": self.config.site_key,
+            },
+        }
+        key = stats_key(entity, action, params)
+        idempotent = action in _IDEMPOTENT_ACTIONS
+        self.retry_budget.record_request()
+        attempt = 1
+        while True:
+            if not self.breaker.allow():
+                raise CivicrmError(503, "CiviCRM temporarily unavailable (circuit open)")
+            try:
+                data = await self._send(entity, action, payload, key)
+            except CivicrmError as exc:
+                if exc.transient:
+                    self.breaker.record_failure()
+                else:
+                    self.breaker.record_success()
+                retry = (
+                    exc.transient
+                    and (idempotent or exc.unsent)
+                    and attempt < self.config.retry_max_attempts
+                    and self.retry_budget.try_spend()
+                )
+                if not retry:
+                    raise
+                delay = backoff_delay(attempt, base=self.config.retry_base_delay)
+                logger.info("Retrying CiviCRM %s after %.2fs (attempt %s): %s", key, delay, attempt + 1, exc.detail)
+                self._stats[key].retries += 1
+                attempt += 1
+                await asyncio.sleep(delay)
+                continue
+            except BaseException:
+                self.breaker.release()
+                raise
+            self.breaker.record_success()
+            return data
+
+    async def _send(self, entity: str, action: str, payload: Dict[str, Any], key: str) -> Dict[str, Any]:
+        timeout = self.timeout_for(key)
+        started = time.perf_counter()
+        ok = False
+        try:
+            try:
+                response = await self.http.post(
+                    f"/civicrm/ajax/api4/{entity}/{action}",
+                    json=payload,
+                    timeout=httpx.Timeout(timeout, connect=min(timeout, self.config.connect_timeout)),
+                )
+            except (httpx.ConnectError, httpx.ConnectTimeout, httpx.PoolTimeout) as exc:
+                raise CivicrmError(502, "CiviCRM API unavailable", transient=True, unsent=True) from exc
+            except httpx.TimeoutException as exc:
+                raise CivicrmError(504, "CiviCRM API timeout", transient=True) from exc
+            except httpx.HTTPError as exc:
+                raise CivicrmError(502, "CiviCRM API unavailable", transient=True) from exc
+
+            if response.status_code != 200:
+                transient = response.status_code >= 500 or response.status_code == 429
+                raise CivicrmError(502, "CiviCRM API unavailable", transient=transient)
+
+            try:
+                data = response.json()
+            except Exception as exc:
+                raise CivicrmError(502, "Invalid response from CiviCRM") from exc
+
+            if isinstance(data, dict) and data.get("is_error"):
+                raise CivicrmError(400, data.get("error_message", "CiviCRM error"))
+
+            ok = True
+            return data
+        finally:
+            elapsed_ms = (time.perf_counter() - started) * 1000
+            self._stats.setdefault(key, CallStats()).record(elapsed_ms, ok)
+
+    def metrics(self) -> Dict[str, Any]:
+        """Snapshot der Latenz-Metriken, gruppiert nach stats_key (`Entity.action[#page|#bulk]`)."""
+        return {key: stats.snapshot() for key, stats in sorted(self._stats.items())}
+
+    def resilience_snapshot(self) -> Dict[str, Any]:
+        return {
+            "circuit": self.breaker.snapshot(),
+            "retry_budget": self.retry_budget.snapshot(),
+            "timeouts": {key: round(self.timeout_for(key), 2) for key in sorted(self._stats)},
+        }
+
+
+ApiCall = Callable[[str, str, Dict[str, Any]], Awaitable[Any]]
+
+
+async def iter_keyset_pages(
+    call: ApiCall,
+    entity: str,
+    params: Dict[str, Any],
+    *,
+    page_size: int = 500,
+    after_id: int = 0,
+) -> AsyncIterator[List[Dict[str, Any]]]:
+    """Walk an entity by ``id > cursor`` (keyset) instead of limit/offset.
+
+    Die nächste Seite wird bereits angefordert, während der Aufrufer die
+    aktuelle verarbeitet; es liegen nie mehr als zwei Seiten im Speicher.
+    `params` darf eigene `where`-Bedingungen enthalten, `orderBy`/`limit`
+    werden überschrieben.
+    """
+    base_where = list(params.get("where") or [])
+
+    async def fetch(cursor: int) -> List[Dict[str, Any]]:
+        page_params = {
+            **params,
+            "where": [*base_where, ["id", ">", cursor]],
+            "orderBy": {"id": "ASC"},
+            "limit": page_size,
+        }
+        data = await call(entity, "get", page_params)
+        values = data.get("values") if isinstance(data, dict) else None
+        return list(values) if isinstance(values, list) else []
+
+    page = await fetch(after_id)
+    pending: Optional["asyncio.Task[List[Dict[str, Any]]]"] = None
+    try:
+        while page:
+            pending = None
+            if len(page) >= page_size:
+                pending = asyncio.ensure_future(fetch(int(page[-1]["id"])))
+            yield page
+            if pending is None:
+                break
+            page = await pending
+    finally:
+        if pending is not None and not pending.done():
+            pending.cancel()
+
+
+# Prozessweiter Client; wird im FastAPI-Lifespan angelegt und geschlossen,
+# entsteht aber auch lazy (z.B. im TestClient ohne Lifespan).
+_shared_client: Optional[CivicrmClient] = None
+
+
+def get_civicrm_client() -> CivicrmClient:
+    global _shared_client
+    if _shared_client is None:
+        _shared_client = CivicrmClient(CivicrmConfig.from_env())
+    return _shared_client
+
+
+async def close_civicrm_client() -> None:
+    global _shared_client
+    if _shared_client is not None:
+        await _shared_client.aclose()
+        _shared_client = None
@@ -0,0 +1,332 @@
+"""
+Read-through Cache für CiviCRM-Kontakte
+
+- Schlüssel: Contact-ID und normalisierte E-Mail (lowercase, getrimmt)
+- Begrenzt (LRU) mit TTL; Backend in-process oder Redis (CONTACT_CACHE_BACKEND)
+- Single-Flight: parallele Misses auf denselben Schlüssel lösen genau einen
+  Upstream-Call aus
+- Invalidierung bei Schreibzugriffen; ein laufender Load, der während einer
+  Invalidierung startet, schreibt sein (evtl. veraltetes) Ergebnis nicht zurück.
+  Der Generationszähler liegt im Backend (Redis: eigener Key, geprüft und
+  geschrieben in einem Lua-Script) und gilt damit über alle API-Worker
+- Memory-Backend liefert Kopien; Aufrufer können das Ergebnis verändern, ohne
+  den Cache-Eintrag zu verändern
+"""
+
+from __future__ import annotations
+
+import asyncio
+import copy
+import json
+import logging
+import os
+import time
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Dict, Iterable, Optional, Protocol, Tuple
+
+logger = logging.getLogger("moe-api.contact-cache")
+
+try:
+    import redis.asyncio as _redis_async  # type: ignore
+except Exception:
+    _redis_async = None  # type: ignore
+
+Contact = Dict[str, Any]
+
+
+class CacheBackend(Protocol):
+    async def get(self, key: str) -> Optional[Contact]: ...
+
+    async def set(self, key: str, value: Contact, ttl_seconds: int) -> None: ...
+
+    async def delete(self, *keys: str) -> None: ...
+
+    async def generation(self) -> int: ...
+
+    async def set_if_generation(
+        self, keys: Iterable[str], value: Contact, ttl_seconds: int, generation: int
+    ) -> bool: ...
+
+    async def invalidate(self, *keys: str) -> None: ...
+
+    async def aclose(self) -> None: ...
+
+
+class MemoryCacheBackend:
+    """Bounded in-process LRU with per-entry expiry."""
+
+    def __init__(self, max_entries: int = 10000, clock: Callable[[], float] = time.monotonic) -> None:
+        self.max_entries = max(1, max_entries)
+        self._clock = clock
+        self._entries: "OrderedDict[str, Tuple[float, Contact]]" = OrderedDict()
+        self._generation = 0
+
+    async def get(self, key: str) -> Optional[Contact]:
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        expires_at, value = entry
+        if expires_at <= self._clock():
+            del self._entries[key]
+            return None
+        self._entries.move_to_end(key)
+        return copy.deepcopy(value)
+
+    async def set(self, key: str, value: Contact, ttl_seconds: int) -> None:
+        self._entries[key] = (self._clock() + ttl_seconds, copy.deepcopy(value))
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    async def delete(self, *keys: str) -> None:
+        for key in keys:
+            self._entries.pop(key, None)
+
+    async def generation(self) -> int:
+        return self._generation
+
+    async def set_if_generation(
+        self, keys: Iterable[str], value: Contact, ttl_seconds: int, generation: int
+    ) -> bool:
+        if generation != self._generation:
+            return False
+        for key in keys:
+            await self.set(key, value, ttl_seconds)
+        return True
+
+    async def invalidate(self, *keys: str) -> None:
+        self._generation += 1
+        await self.delete(*keys)
+
+    async def aclose(self) -> None:
+        self._entries.clear()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+
+# KEYS[1] = generation key, KEYS[2..] = entries; ARGV = expected generation, value, ttl
+_SET_IF_GENERATION_LUA = """
+if tonumber(redis.call('GET', KEYS[1]) or '0') ~= tonumber(ARGV[1]) then
+  return 0
+end
+for i = 2, #KEYS do
+  redis.call('SET', KEYS[i], ARGV[2], 'EX', ARGV[3])
+end
+return 1
+"""
+
+
+class RedisCacheBackend:
+    """Shared cache across API workers; entries expire via SET EX, the generation key never does."""
+
+    def __init__(self, url: str = "", prefix: str = "moe:cache:contact:", client: Any = None) -> None:
+        if client is None:
+            if _redis_async is None:
+                raise RuntimeError("redis package not installed")
+            client = _redis_async.from_url(url, decode_responses=True)
+        self._client = client
+        self._prefix = prefix
+        self._key_generation = f"{prefix}generation"
+        self._set_if_generation = client.register_script(_SET_IF_GENERATION_LUA)
+
+    async def get(self, key: str) -> Optional[Contact]:
+        raw = await self._client.get(self._prefix + key)
+        if raw is None:
+            return None
+        try:
+            return json.loads(raw)
+        except ValueError:
+            return None
+
+    async def set(self, key: str, value: Contact, ttl_seconds: int) -> None:
+        await self._client.setex(self._prefix + key, ttl_seconds, json.dumps(value, default=str))
+
+    async def delete(self, *keys: str) -> None:
+        if keys:
+            await self._client.unlink(*(self._prefix + key for key in keys))
+
+    async def generation(self) -> int:
+        return int(await self._client.get(self._key_generation) or 0)
+
+    async def set_if_generation(
+        self, keys: Iterable[str], value: Contact, ttl_seconds: int, generation: int
+    ) -> bool:
+        entries = [self._prefix + key for key in keys]
+        stored = await self._set_if_generation(
+            keys=[self._key_generation, *entries], args=[generation, json.dumps(value, default=str), ttl_seconds]
+        )
+        return bool(stored)
+
+    async def invalidate(self, *keys: str) -> None:
+        # bump first: a load that read the old generation can no longer write, then drop what it already wrote
+        async with self._client.pipeline(transaction=True) as pipe:
+            pipe.incr(self._key_generation)
+            if keys:
+                pipe.unlink(*(self._prefix + key for key in keys))
+            await pipe.execute()
+
+    async def aclose(self) -> None:
+        await self._client.aclose()
+
+
+class ContactCache:
+    def __init__(self, backend: Optional[CacheBackend], ttl_seconds: int = 60) -> None:
+        self.backend = backend
+        self.ttl_seconds = ttl_seconds
+        self._inflight: Dict[str, "asyncio.Future[Contact]"] = {}
+        self._generation = 0  # this worker's invalidations, known without a round-trip
+        self.stats = {"hits": 0, "misses": 0, "coalesced": 0, "invalidations": 0, "stale_loads": 0, "errors": 0}
+
+    @classmethod
+    def from_env(cls) -> "ContactCache":
+        kind = os.getenv("CONTACT_CACHE_BACKEND", "memory").strip().lower()
+        ttl = int(os.getenv("CONTACT_CACHE_TTL_SECONDS", "60").strip() or 60)
+        max_entries = int(os.getenv("CONTACT_CACHE_MAX_ENTRIES", "10000").strip() or 10000)
+        backend: Optional[CacheBackend]
+        if kind in {"off", "none", "disabled"} or ttl <= 0:
+            backend = None
+        elif kind == "redis":
+            redis_url = os.getenv("REDIS_URL", "").strip()
+            try:
+                backend = RedisCacheBackend(redis_url) if redis_url else None
+            except Exception as exc:
+                logger.warning("Redis contact cache unavailable (%s); falling back to memory", exc)
+                backend = None
+            if backend is None:
+                backend = MemoryCacheBackend(max_entries)
+        else:
+            backend = MemoryCacheBackend(max_entries)
+        return cls(backend, ttl_seconds=ttl)
+
+    @staticmethod
+    def key_for_id(contact_id: Any) -> str:
+        return f"id:{int(contact_id)}"
+
+    @staticmethod
+    def key_for_email(email: str) -> str:
+        return f"email:{email.strip().lower()}"
+
+    def _keys_for(self, contact: Contact) -> Iterable[str]:
+        if contact.get("id") is not None:
+            try:
+                yield self.key_for_id(contact["id"])
+            except (TypeError, ValueError):
+                pass
+        email = contact.get("email") or contact.get("email_primary")
+        if isinstance(email, str) and email.strip():
+            yield self.key_for_email(email)
+
+    async def get_or_load(self, key: str, loader: Callable[[], Awaitable[Contact]]) -> Contact:
+        if self.backend is None:
+            return await loader()
+        try:
+            cached = await self.backend.get(key)
+        except Exception as exc:
+            self.stats["errors"] += 1
+            logger.warning("Contact cache read failed: %s", exc)
+            cached = None
+        if cached is not None:
+            self.stats["hits"] += 1
+            return cached
+
+        future = self._inflight.get(key)
+        if future is None:
+            self.stats["misses"] += 1
+            future = asyncio.ensure_future(self._load(self.backend, key, loader, self._generation))
+            self._inflight[key] = future
+            future.add_done_callback(lambda f, k=key: self._forget_inflight(k, f))
+        else:
+            self.stats["coalesced"] += 1
+        # shield: one cancelled waiter must not cancel the shared load
+        return await asyncio.shield(future)
+
+    def _forget_inflight(self, key: str, future: "asyncio.Future[Contact]") -> None:
+        if self._inflight.get(key) is future:
+            del self._inflight[key]
+
+    async def _load(
+        self, backend: CacheBackend, key: str, loader: Callable[[], Awaitable[Contact]], local_generation: int
+    ) -> Contact:
+        try:
+            generation: Optional[int] = await backend.generation()
+        except Exception as exc:
+            self.stats["errors"] += 1
+            logger.warning("Contact cache generation read failed: %s", exc)
+            generation = None
+        value = await loader()
+        if generation is None:
+            return value
+        if local_generation != self._generation:
+            self.stats["stale_loads"] += 1
+            return value
+        try:
+            # written only if no invalidation (in any worker) happened since the load started
+            if not await backend.set_if_generation(
+                {key, *self._keys_for(value)}, value, self.ttl_seconds, generation
+            ):
+                self.stats["stale_loads"] += 1
+        except Exception as exc:
+            self.stats["errors"] += 1
+            logger.warning("Contact cache write failed: %s", exc)
+        return value
+
+    async def peek(self, key: str) -> Optional[Contact]:
+        """Cached value without loading (None on miss or when disabled)."""
+        if self.backend is None:
+            return None
+        try:
+            return await self.backend.get(key)
+        except Exception:
+            return None
+
+    async def invalidate(self, *, contact_id: Any = None, emails: Iterable[Optional[str]] = ()) -> None:
+        self._generation += 1
+        self.stats["invalidations"] += 1
+        if self.backend is None:
+            return
+        keys = {self.key_for_email(e) for e in emails if isinstance(e, str) and e.strip()}
+        if contact_id is not None:
+            id_key = self.key_for_id(contact_id)
+            keys.add(id_key)
+            # also drop the email alias of the previously cached record
+            previous = await self.peek(id_key)
+            if previous:
+                keys.update(self._keys_for(previous))
+        # later callers must not join a load that started before this write
+        for key in keys:
+            self._inflight.pop(key, None)
+        try:
+            await self.backend.invalidate(*keys)
+        except Exception as exc:
+            self.stats["errors"] += 1
+            logger.warning("Contact cache invalidation failed: %s", exc)
+
+    def snapshot(self) -> Dict[str, Any]:
+        return {
+            "backend": type(self.backend).__name__ if self.backend is not None else None,
+            "ttl_seconds": self.ttl_seconds,
+            "inflight": len(self._inflight),
+            **self.stats,
+        }
+
+    async def aclose(self) -> None:
+        if self.backend is not None:
+            await self.backend.aclose()
+
+
+_shared_cache: Optional[ContactCache] = None
+
+
+def get_contact_cache() -> ContactCache:
+    global _shared_cache
+    if _shared_cache is None:
+        _shared_cache = ContactCache.from_env()
+    return _shared_cache
+
+
+async def close_contact_cache() -> None:
+    global _shared_cache
+    if _shared_cache is not None:
+        await _shared_cache.aclose()
+        _shared_cache = None
@@ -0,0 +1,37 @@
+"""
+ETag-Hilfen für bedingte GET-Requests (RFC 9110 §8.8.3 / §13.1.2)
+
+- strong_etag: starker Validator aus `modified_date` und kanonisch
+  serialisiertem Inhalt (sortierte Keys, kompakte Separatoren)
+- not_modified: Vergleich gegen einen If-None-Match-Header; laut RFC
+  schwacher Vergleich, d.h. `W/"x"` matcht `"x"`, `*` matcht immer
+"""
+
+from __future__ import annotations
+
+import hashlib
+import json
+from typing import Any, Optional
+
+
+def strong_etag(payload: Any, modified: Optional[str] = None) -> str:
+    body = json.dumps(payload, sort_keys=True, separators=(",", ":"), ensure_ascii=False, default=str)
+    digest = hashlib.sha256(f"{modified or ''}\n{body}".encode("utf-8")).hexdigest()
+    return f'"{digest[:32]}"'
+
+
+def _opaque(tag: str) -> str:
+    tag = tag.strip()
+    if tag[:2] in ("W/", "w/"):
+        tag = tag[2:]
+    return tag
+
+
+def not_modified(header: Optional[str], etag: str) -> bool:
+    """True if the client's cached representation is still current (→ 304)."""
+    if not header:
+        return False
+    if header.strip() == "*":
+        return True
+    current = _opaque(etag)
+    return any(_opaque(candidate) == current for candidate in header.split(",") if candidate.strip())
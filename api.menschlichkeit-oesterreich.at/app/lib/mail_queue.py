@@ -0,0 +1,299 @@
+"""
+Persistente Mail-Queue: jeder ausgehende Versand (Alerts, Spendenbelege)
+
+- Die Endpoints legen nur eine Message auf die Queue `mail` (gleiche
+  Infrastruktur wie die Webhooks: lists/streams/sqlite, Lease, Reaper, DLQ)
+  und antworten sofort; SMTP-Latenz und PDF-Rendering liegen nicht mehr im
+  Request
+- Payload (JSON): to, subject, text; optional `receipt` (Felder für
+  ReceiptRenderer.render, das PDF wird erst beim Versand gerendert) und
+  `activity` (wird nach erfolgreichem Versand an on_sent übergeben, z.B. für
+  die CiviCRM-Aktivität)
+- MailSender: Fetch-Loop wie der WebhookDispatcher (max. `concurrency`
+  gleichzeitige Sendungen), zusätzlich ein Token Bucket für das Provider-Limit
+  (`rate_per_second`, `burst`; 0 = unbegrenzt). Der Bucket liegt im
+  Queue-Backend (rate_take: Redis-Hash bzw. SQLite-Zeile) und gilt damit
+  gemeinsam für alle sendenden Prozesse. Tokens werden vor dem Lease genommen,
+  eine geleaste Mail wird sofort versendet und der Lease nie mit Warten auf das
+  Rate-Limit verbraucht.
+- Erfolg → ack; temporäre Fehler (4xx, Verbindung, Rendering) → fail mit dem
+  bestehenden exponentiellen Backoff, nach max_attempts DLQ; permanente
+  SMTP-Fehler (5xx auf Empfänger/Inhalt) und unbrauchbare Payloads → sofort in
+  die DLQ (fail(permanent=True)), ohne die restlichen Versuche zu verbrauchen
+"""
+
+from __future__ import annotations
+
+import asyncio
+import logging
+import time
+from email.message import EmailMessage
+from email.utils import formatdate
+from typing import Any, Awaitable, Callable, Dict, Optional, Set, Tuple
+
+from .smtp_pool import SmtpSendError
+
+logger = logging.getLogger("moe-api.mail-queue")
+
+MAIL_QUEUE = "mail"
+
+IDLE_MIN_SECONDS = 0.05
+IDLE_MAX_SECONDS = 1.0
+ERROR_CHARS = 300
+MIN_RATE_WAIT_SECONDS = 0.01
+
+
+class InvalidMailPayload(ValueError):
+    pass
+
+
+def mail_payload(
+    *,
+    to: str,
+    subject: str,
+    text: str,
+    receipt: Optional[Dict[str, Any]] = None,
+    activity: Optional[Dict[str, Any]] = None,
+) -> Dict[str, Any]:
+    payload: Dict[str, Any] = {"to": to, "subject": subject, "text": text}
+    if receipt is not None:
+        payload["receipt"] = receipt
+    if activity is not None:
+        payload["activity"] = activity
+    return payload
+
+
+class TokenBucket:
+    """`rate` tokens per second, at most `burst` saved up; state lives in the queue backend (shared)."""
+
+    def __init__(self, queue: Callable[[], Any], rate: float, burst: int) -> None:
+        self._queue = queue
+        self.rate = float(rate)
+        self.burst = max(1, int(burst))
+
+    async def take(self, count: int) -> Tuple[int, float]:
+        """Take up to `count` tokens without waiting; returns (taken, tokens left)."""
+        return await self._queue().rate_take(count, rate=self.rate, burst=self.burst)
+
+    async def refund(self, count: int) -> None:
+        if count > 0:
+            await self._queue().rate_take(-count, rate=self.rate, burst=self.burst)
+
+    async def acquire(self) -> float:
+        """Wait for one token; returns the seconds waited."""
+        waited = 0.0
+        while True:
+            taken, left = await self.take(1)
+            if taken:
+                return waited
+            delay = max(MIN_RATE_WAIT_SECONDS, (1 - left) / self.rate)
+            await asyncio.sleep(delay)
+            waited += delay
+
+
+class MailSender:
+    def __init__(
+        self,
+        queue: Callable[[], Any],
+        send: Callable[[EmailMessage], Awaitable[None]],
+        *,
+        sender: str,
+        render: Optional[Callable[..., Awaitable[bytes]]] = None,
+        on_sent: Optional[Callable[[Dict[str, Any]], Awaitable[None]]] = None,
+        rate_per_second: float = 0,
+        burst: int = 1,
+        concurrency: int = 2,
+        visibility_timeout: int = 120,
+        max_inflight: int = 0,
+    ) -> None:
+        self._queue = queue
+        self._send = send
+        self.sender = sender
+        self._render = render
+        self._on_sent = on_sent
+        self.bucket = TokenBucket(queue, rate_per_second, burst) if rate_per_second > 0 else None
+        self.concurrency = max(1, int(concurrency))
+        self.visibility_timeout = max(1, int(visibility_timeout))
+        self.max_inflight = max(0, int(max_inflight))
+        self._slots = asyncio.Semaphore(self.concurrency)
+        self._fetcher: Optional[asyncio.Task] = None
+        self._deliveries: Set[asyncio.Task] = set()
+        self._started_at: Optional[float] = None
+        self._counters: Dict[str, int] = {
+            "sent": 0, "retried": 0, "dead_lettered": 0, "permanent": 0,
+            "hook_errors": 0, "ack_errors": 0, "fetch_errors": 0,
+        }
+        self._throttled_seconds = 0.0
+        self._send_ms = {"count": 0, "total": 0.0, "max": 0.0}
+
+    # --- Lifecycle -----------------------------------------------------------------
+
+    def start(self) -> None:
+        if self._fetcher is None:
+            self._started_at = time.time()
+            self._fetcher = asyncio.create_task(self._fetch_loop(), name="mail-sender")
+
+    async def stop(self, grace_seconds: float = 10.0) -> None:
+        """Stop fetching, give running sends `grace_seconds`, then cancel them (leases expire → redelivery)."""
+        if self._fetcher is not None:
+            self._fetcher.cancel()
+            await asyncio.gather(self._fetcher, return_exceptions=True)
+            self._fetcher = None
+        if self._deliveries:
+            _, pending = await asyncio.wait(set(self._deliveries), timeout=max(0.0, grace_seconds))
+            for task in pending:
+                task.cancel()
+            await asyncio.gather(*pending, return_exceptions=True)
+
+    # --- Fetch + send ------------------------------------------------------------------
+
+    async def _take_slots(self) -> int:
+        await self._slots.acquire()
+        if self.bucket is not None:
+            try:
+                self._throttled_seconds += await self.bucket.acquire()
+            except BaseException:
+                self._slots.release()
+                raise
+        free = 1
+        while not self._slots.locked():
+            await self._slots.acquire()
+            free += 1
+        if self.bucket is not None and free > 1:
+            try:
+                taken, _ = await self.bucket.take(free - 1)
+            except Exception:
+                taken = 0  # backend hiccup: send the one mail we already have a token for
+            for _ in range(free - 1 - taken):
+                self._slots.release()
+            free = 1 + taken
+        return free
+
+    async def _fetch_loop(self) -> None:
+        idle = IDLE_MIN_SECONDS
+        while True:
+            try:
+                free = await self._take_slots()
+            except Exception as exc:  # shared rate bucket lives in the backend (e.g. Redis down)
+                self._counters["fetch_errors"] += 1
+                logger.warning("Mail sender could not take rate tokens: %s", exc)
+                await asyncio.sleep(IDLE_MAX_SECONDS)
+                continue
+            try:
+                items = await self._queue().pop(
+                    free, visibility_timeout=self.visibility_timeout, max_inflight=self.max_inflight
+                )
+            except Exception as exc:
+                self._counters["fetch_errors"] += 1
+                logger.warning("Mail sender could not lease messages: %s", exc)
+                items = []
+                idle = IDLE_MAX_SECONDS
+            unused = free - len(items)
+            for _ in range(unused):
+                self._slots.release()
+            if self.bucket is not None and unused:
+                try:
+                    await self.bucket.refund(unused)
+                except Exception as exc:
+                    logger.warning("Mail sender could not return %s rate tokens: %s", unused, exc)
+            if not items:
+                await asyncio.sleep(idle)
+                idle = min(IDLE_MAX_SECONDS, idle * 2)
+                continue
+            idle = IDLE_MIN_SECONDS
+            for item in items:
+                task = asyncio.create_task(self._deliver(item))
+                self._deliveries.add(task)
+                task.add_done_callback(self._deliveries.discard)
+
+    async def build_message(self, payload: Dict[str, Any]) -> EmailMessage:
+        """EmailMessage for a queued payload; renders the receipt PDF if one is attached."""
+        if not isinstance(payload, dict) or not all(payload.get(k) for k in ("to", "subject")):
+            raise InvalidMailPayload("payload needs 'to' and 'subject'")
+        msg = EmailMessage()
+        msg["From"] = self.sender
+        msg["To"] = str(payload["to"])
+        msg["Date"] = formatdate(localtime=True)
+        msg["Subject"] = str(payload["subject"])
+        msg.set_content(str(payload.get("text") or ""))
+        receipt = payload.get("receipt")
+        if receipt is not None:
+            if self._render is None or not isinstance(receipt, dict) or not receipt.get("receipt_number"):
+                raise InvalidMailPayload("receipt mail without renderer or receipt_number")
+            pdf = await self._render(**receipt)
+            msg.add_attachment(
+                pdf, maintype="application", subtype="pdf", filename=f"beleg_{receipt['receipt_number']}.pdf"
+            )
+        return msg
+
+    async def _deliver(self, item: Dict[str, Any]) -> None:
+        payload = item.get("payload") or {}
+        permanent = False
+        try:
+            try:
+                msg = await self.build_message(payload)
+                started = time.perf_counter()
+                await self._send(msg)
+                self._record(started)
+                error = None
+            except InvalidMailPayload as exc:
+                error, permanent = str(exc), True
+            except SmtpSendError as exc:
+                error, permanent = str(exc), exc.permanent
+            except Exception as exc:  # e.g. ReceiptRenderError: retry with backoff
+                error = f"{type(exc).__name__}: {exc}"
+            queue = self._queue()
+            if error is None:
+                await queue.ack(item["id"])
+                self._counters["sent"] += 1
+                await self._run_hook(item)
+                return
+            outcome = await queue.fail(item["id"], error[:ERROR_CHARS], permanent=permanent)
+            if outcome and outcome["dlq"]:
+                self._counters["dead_lettered"] += 1
+                self._counters["permanent"] += 1 if permanent else 0
+                logger.warning("Mail %s moved to DLQ after %s attempts: %s", item["id"], item["attempts"] + 1, error)
+            elif outcome:
+                self._counters["retried"] += 1
+                logger.info("Mail %s retried in %ss: %s", item["id"], outcome["delay"], error)
+        except asyncio.CancelledError:
+            raise
+        except Exception as exc:
+            # ack/fail not recorded (e.g. Redis down): the lease expires and the reaper redelivers
+            self._counters["ack_errors"] += 1
+            logger.warning("Mail %s: could not ack/fail: %s", item["id"], exc)
+        finally:
+            self._slots.release()
+
+    async def _run_hook(self, item: Dict[str, Any]) -> None:
+        if self._on_sent is None:
+            return
+        try:
+            await self._on_sent(item["payload"])
+        except Exception as exc:
+            # The mail is out; never resend it because bookkeeping failed
+            self._counters["hook_errors"] += 1
+            logger.warning("Mail %s sent, post-send hook failed: %s", item["id"], exc)
+
+    # --- Metrics -----------------------------------------------------------------------
+
+    def _record(self, started: float) -> None:
+        elapsed_ms = (time.perf_counter() - started) * 1000
+        self._send_ms["count"] += 1
+        self._send_ms["total"] += elapsed_ms
+        self._send_ms["max"] = max(self._send_ms["max"], elapsed_ms)
+
+    def snapshot(self) -> Dict[str, Any]:
+        count = self._send_ms["count"]
+        return {
+            "running": self._fetcher is not None and not self._fetcher.done(),
+            "started_at": int(self._started_at) if self._started_at else None,
+            "concurrency": self.concurrency,
+            "rate_per_second": self.bucket.rate if self.bucket else None,
+            "burst": self.bucket.burst if self.bucket else None,
+            "in_flight": len(self._deliveries),
+            **self._counters,
+            "throttled_seconds": round(self._throttled_seconds, 2),
+            "send_avg_ms": round(self._send_ms["total"] / count, 2) if count else 0.0,
+            "send_max_ms": round(self._send_ms["max"], 2),
+        }
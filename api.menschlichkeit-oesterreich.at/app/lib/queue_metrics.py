@@ -0,0 +1,252 @@
+"""
+Queue-Metriken (in-process): Durchsatz, Wartezeit, Bearbeitungszeit
+
+- Pro Queue Zähler (enqueued, duplicates, popped, acked, retried, dead_lettered,
+  leases_expired) und zwei Histogramme:
+    wait_seconds        enqueue → erster pop (nur attempts == 0; enthält
+                        bewusste delay_seconds; Auflösung 1 s wie enqueued_at)
+    processing_seconds  pop → ack (nur wenn pop und ack in diesem Prozess liefen)
+- Raten über ein 60-s-Fenster (Sekunden-Slots): enqueue vs. ack zeigt, ob die
+  Consumer mithalten, bevor die DLQ wächst
+- MeteredQueue umhüllt jedes Backend (lists/streams/sqlite); alle übrigen
+  Methoden werden durchgereicht
+- Werte gelten pro Prozess: bei mehreren Workern pro Instanz scrapen bzw.
+  summieren (Prometheus: sum by (queue))
+"""
+
+from __future__ import annotations
+
+import bisect
+import time
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+WAIT_BUCKETS: Tuple[float, ...] = (1, 2, 5, 10, 30, 60, 120, 300, 900, 3600)
+PROCESSING_BUCKETS: Tuple[float, ...] = (0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60)
+RATE_WINDOW_SECONDS = 60
+MAX_TRACKED_LEASES = 100_000  # id → pop-Zeitpunkt für processing_seconds
+LEASE_TRACK_SECONDS = 3600
+
+COUNTERS = ("enqueued", "duplicates", "popped", "acked", "retried", "dead_lettered", "leases_expired")
+_COUNTER_HELP = {
+    "enqueued": "Messages accepted by push (idempotent duplicates excluded)",
+    "duplicates": "Pushes answered from the idempotency key",
+    "popped": "Messages leased by pop",
+    "acked": "Messages acknowledged",
+    "retried": "Messages scheduled for another attempt (fail or expired lease)",
+    "dead_lettered": "Messages moved to the DLQ",
+    "leases_expired": "Leases that ran out before ack/fail",
+}
+
+
+class Histogram:
+    def __init__(self, buckets: Iterable[float]) -> None:
+        self.bounds: Tuple[float, ...] = tuple(sorted(buckets))
+        self.counts: List[int] = [0] * (len(self.bounds) + 1)  # letzter Slot = +Inf
+        self.count = 0
+        self.sum = 0.0
+
+    def observe(self, value: float) -> None:
+        value = max(0.0, value)
+        self.counts[bisect.bisect_left(self.bounds, value)] += 1
+        self.count += 1
+        self.sum += value
+
+    def quantile(self, q: float) -> Optional[float]:
+        """Bucket-based estimate (linear within the bucket, like histogram_quantile)."""
+        if not self.count:
+            return None
+        rank = q * self.count
+        seen = 0
+        for i, n in enumerate(self.counts):
+            if seen + n >= rank and n:
+                if i == len(self.bounds):
+                    return self.bounds[-1]
+                lower = self.bounds[i - 1] if i else 0.0
+                return round(lower + (self.bounds[i] - lower) * (rank - seen) / n, 3)
+            seen += n
+        return self.bounds[-1]
+
+    def snapshot(self) -> Dict[str, Any]:
+        return {
+            "count": self.count,
+            "avg": round(self.sum / self.count, 3) if self.count else None,
+            "p50": self.quantile(0.5),
+            "p95": self.quantile(0.95),
+            "p99": self.quantile(0.99),
+        }
+
+
+class RateWindow:
+    """Events per second over the last RATE_WINDOW_SECONDS (one slot per second)."""
+
+    def __init__(self, seconds: int = RATE_WINDOW_SECONDS) -> None:
+        self.seconds = seconds
+        self._slots = [0] * seconds
+        self._stamps = [0] * seconds
+
+    def add(self, n: int = 1, now: Optional[float] = None) -> None:
+        second = int(now if now is not None else time.time())
+        i = second % self.seconds
+        if self._stamps[i] != second:
+            self._stamps[i] = second
+            self._slots[i] = 0
+        self._slots[i] += n
+
+    def per_second(self, now: Optional[float] = None) -> float:
+        second = int(now if now is not None else time.time())
+        total = sum(n for n, stamp in zip(self._slots, self._stamps) if second - stamp < self.seconds)
+        return round(total / self.seconds, 3)
+
+
+class QueueMetrics:
+    def __init__(self, name: str) -> None:
+        self.name = name
+        self.counters: Dict[str, int] = dict.fromkeys(COUNTERS, 0)
+        self.wait = Histogram(WAIT_BUCKETS)
+        self.processing = Histogram(PROCESSING_BUCKETS)
+        self.enqueue_rate = RateWindow()
+        self.ack_rate = RateWindow()
+        self._leased_at: Dict[str, float] = {}
+
+    def pushed(self, duplicate: bool) -> None:
+        if duplicate:
+            self.counters["duplicates"] += 1
+            return
+        self.counters["enqueued"] += 1
+        self.enqueue_rate.add()
+
+    def popped(self, items: List[Dict[str, Any]]) -> None:
+        if not items:
+            return
+        now, started = time.time(), time.monotonic()
+        self.counters["popped"] += len(items)
+        for item in items:
+            if not item.get("attempts") and item.get("enqueued_at"):
+                self.wait.observe(now - item["enqueued_at"])
+            self._leased_at.pop(item["id"], None)  # re-lease: move to the newest end
+            self._leased_at[item["id"]] = started
+        while len(self._leased_at) > MAX_TRACKED_LEASES:
+            del self._leased_at[next(iter(self._leased_at))]
+
+    def acked(self, msg_ids: Iterable[str], acked: int) -> None:
+        now = time.monotonic()
+        for msg_id in msg_ids:
+            started = self._leased_at.pop(msg_id, None)
+            if started is not None:
+                self.processing.observe(now - started)
+        self.counters["acked"] += acked
+        self.ack_rate.add(acked)
+
+    def failed(self, msg_id: str, outcome: Optional[Dict[str, Any]]) -> None:
+        self._leased_at.pop(msg_id, None)
+        if outcome is not None:
+            self.counters["dead_lettered" if outcome["dlq"] else "retried"] += 1
+
+    def reaped(self, outcome: Dict[str, int]) -> None:
+        self.counters["retried"] += outcome["requeued"]
+        self.counters["dead_lettered"] += outcome["dlq"]
+        self.counters["leases_expired"] += outcome["requeued"] + outcome["dlq"]
+        # Insertion order ≈ pop order: drop stale entries (acked elsewhere or expired) from the old end
+        horizon = time.monotonic() - LEASE_TRACK_SECONDS
+        while self._leased_at:
+            msg_id = next(iter(self._leased_at))
+            if self._leased_at[msg_id] >= horizon:
+                break
+            del self._leased_at[msg_id]
+
+    def snapshot(self) -> Dict[str, Any]:
+        return {
+            **self.counters,
+            "enqueue_rate_per_second": self.enqueue_rate.per_second(),
+            "ack_rate_per_second": self.ack_rate.per_second(),
+            "wait_seconds": self.wait.snapshot(),
+            "processing_seconds": self.processing.snapshot(),
+        }
+
+
+class MeteredQueue:
+    """Records push/pop/ack/fail/reap on `metrics`; everything else goes to the wrapped backend."""
+
+    def __init__(self, queue: Any, metrics: QueueMetrics) -> None:
+        self.queue = queue
+        self.metrics = metrics
+
+    def __getattr__(self, name: str) -> Any:
+        return getattr(self.queue, name)
+
+    async def push(self, *args: Any, **kwargs: Any) -> Tuple[str, bool]:
+        msg_id, duplicate = await self.queue.push(*args, **kwargs)
+        self.metrics.pushed(duplicate)
+        return msg_id, duplicate
+
+    async def pop(self, *args: Any, **kwargs: Any) -> List[Dict[str, Any]]:
+        items = await self.queue.pop(*args, **kwargs)
+        self.metrics.popped(items)
+        return items
+
+    async def pop_wait(self, *args: Any, **kwargs: Any) -> List[Dict[str, Any]]:
+        items = await self.queue.pop_wait(*args, **kwargs)
+        self.metrics.popped(items)
+        return items
+
+    async def ack(self, *msg_ids: str) -> int:
+        acked = await self.queue.ack(*msg_ids)
+        self.metrics.acked(msg_ids, acked)
+        return acked
+
+    async def fail(self, msg_id: str, error: Optional[str] = None, **kwargs: Any) -> Optional[Dict[str, Any]]:
+        outcome = await self.queue.fail(msg_id, error, **kwargs)
+        self.metrics.failed(msg_id, outcome)
+        return outcome
+
+    async def reap_expired(self, *args: Any, **kwargs: Any) -> Dict[str, int]:
+        outcome = await self.queue.reap_expired(*args, **kwargs)
+        self.metrics.reaped(outcome)
+        return outcome
+
+
+# --- Prometheus text format (0.0.4) ---------------------------------------------------
+
+
+def _le(bound: float) -> str:
+    return "+Inf" if bound == float("inf") else f"{bound:g}"
+
+
+def _histogram_lines(metric: str, queue: str, histogram: Histogram) -> List[str]:
+    lines = []
+    cumulative = 0
+    for bound, n in zip(list(histogram.bounds) + [float("inf")], histogram.counts):
+        cumulative += n
+        lines.append(f'{metric}_bucket{{queue="{queue}",le="{_le(bound)}"}} {cumulative}')
+    lines.append(f'{metric}_sum{{queue="{queue}"}} {histogram.sum!r}')
+    lines.append(f'{metric}_count{{queue="{queue}"}} {histogram.count}')
+    return lines
+
+
+def render_prometheus(metrics: Iterable[QueueMetrics], sizes: Optional[Dict[str, Dict[str, Any]]] = None) -> str:
+    """Counters, histograms and (optional) queue sizes from `stats()` as Prometheus exposition text."""
+    metrics = list(metrics)
+    lines: List[str] = []
+    for counter in COUNTERS:
+        name = f"moe_queue_{counter}_total"
+        lines += [f"# HELP {name} {_COUNTER_HELP[counter]}", f"# TYPE {name} counter"]
+        lines += [f'{name}{{queue="{m.name}"}} {m.counters[counter]}' for m in metrics]
+    for attr, help_text in (
+        ("wait", "Seconds from enqueue to first pop"),
+        ("processing", "Seconds from pop to ack"),
+    ):
+        name = f"moe_queue_{attr}_seconds"
+        lines += [f"# HELP {name} {help_text}", f"# TYPE {name} histogram"]
+        for m in metrics:
+            lines += _histogram_lines(name, m.name, getattr(m, attr))
+    if sizes:
+        for part in ("main", "delayed", "inflight", "dlq"):
+            name = f"moe_queue_{part}_size"
+            lines += [f"# HELP {name} Messages currently in {part}", f"# TYPE {name} gauge"]
+            lines += [f'{name}{{queue="{queue}"}} {stats[part]["size"]}' for queue, stats in sizes.items()]
+        name = "moe_queue_oldest_age_seconds"
+        lines += [f"# HELP {name} Age of the oldest ready message", f"# TYPE {name} gauge"]
+        lines += [
+            f'{name}{{queue="{queue}"}} {stats["main"]["oldest_age_seconds"] or 0}' for queue, stats in sizes.items()
+        ]
+    return "\n".join(lines) + "\n"
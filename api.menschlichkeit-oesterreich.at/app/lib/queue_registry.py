@@ -0,0 +1,91 @@
+"""
+Benannte Queues mit Priorität und In-Flight-Limit
+
+    QUEUE_NAMES="webhooks,payments:high,erasure:high,sync:low:20"
+
+- Format je Eintrag `name[:priority[:max_inflight]]`; priority high|normal|low
+  (Default normal), max_inflight 0 = unbegrenzt
+- Jede Queue ist ein eigener Namespace `moe:queue:<name>` auf demselben
+  Backend (lists/streams/sqlite). `webhooks` ist der bisherige Namespace und
+  immer vorhanden; die `/queue/*`-Routen ohne Namen zeigen darauf.
+- pop_by_priority füllt einen Batch strikt nach Priorität: Payments und
+  Löschanträge warten nie hinter Bulk-Syncs. Das In-Flight-Limit wird atomar
+  im pop-Skript geprüft und hält niedrig priorisierte Queues davon ab, alle
+  Consumer zu belegen.
+"""
+
+from __future__ import annotations
+
+import re
+from dataclasses import dataclass
+from typing import Any, Dict, Iterable, List, Sequence, Tuple
+
+NAMESPACE_PREFIX = "moe:queue"
+DEFAULT_QUEUE = "webhooks"
+PRIORITIES = {"high": 0, "normal": 1, "low": 2}
+
+_NAME_RE = re.compile(r"^[a-z0-9][a-z0-9_-]{0,31}$")
+
+
+@dataclass(frozen=True)
+class QueueSpec:
+    name: str
+    priority: str = "normal"
+    max_inflight: int = 0  # 0 = unbegrenzt
+
+    @property
+    def namespace(self) -> str:
+        return f"{NAMESPACE_PREFIX}:{self.name}"
+
+    @property
+    def rank(self) -> int:
+        return PRIORITIES[self.priority]
+
+
+def parse_queue_specs(raw: str) -> Dict[str, QueueSpec]:
+    """Parse QUEUE_NAMES; raises ValueError on malformed entries. Always contains DEFAULT_QUEUE."""
+    specs: Dict[str, QueueSpec] = {}
+    for entry in (part.strip() for part in (raw or "").split(",")):
+        if not entry:
+            continue
+        name, *rest = [p.strip() for p in entry.split(":")]
+        if not _NAME_RE.match(name) or len(rest) > 2:
+            raise ValueError(f"Invalid queue spec {entry!r} (expected name[:priority[:max_inflight]])")
+        priority = (rest[0] if rest else "") or "normal"
+        if priority not in PRIORITIES:
+            raise ValueError(f"Invalid priority {priority!r} for queue {name!r}")
+        try:
+            max_inflight = int(rest[1]) if len(rest) > 1 and rest[1] else 0
+        except ValueError:
+            raise ValueError(f"Invalid max_inflight for queue {name!r}") from None
+        specs[name] = QueueSpec(name, priority, max(0, max_inflight))
+    specs.setdefault(DEFAULT_QUEUE, QueueSpec(DEFAULT_QUEUE))
+    return specs
+
+
+def by_priority(specs: Iterable[QueueSpec]) -> List[QueueSpec]:
+    """High before normal before low; configuration order within a priority."""
+    return sorted(specs, key=lambda spec: spec.rank)
+
+
+async def pop_by_priority(
+    queues: Sequence[Tuple[QueueSpec, Any]],
+    max_items: int,
+    *,
+    visibility_timeout: int,
+) -> List[Dict[str, Any]]:
+    """Lease up to `max_items` across queues, draining higher priorities first.
+
+    Each item carries its `queue` name so the consumer acks/fails on the right queue.
+    """
+    items: List[Dict[str, Any]] = []
+    for spec, queue in sorted(queues, key=lambda pair: pair[0].rank):
+        if len(items) >= max_items:
+            break
+        leased = await queue.pop(
+            max_items - len(items), visibility_timeout=visibility_timeout, max_inflight=spec.max_inflight
+        )
+        for item in leased:
+            item["queue"] = spec.name
+        items.extend(leased)
+    return items
@@ -0,0 +1,416 @@
+"""
+Belegläufe (z.B. Jahres-Spendenbestätigungen): CiviCRM → PDFs → ZIP, fortsetzbar
+
+- Ein Lauf umfasst abgeschlossene Zuwendungen (contribution_status_id = 1) mit
+  receive_date in [date_from, date_to]; run_id = "receipts-<von>-<bis>", ein
+  erneuter Start mit demselben Zeitraum setzt den Lauf fort
+- CiviCRM wird per Keyset (iter_keyset_pages, id > cursor) seitenweise gelesen,
+  E-Mail-Adressen kommen mit einem Contact.get pro Seite (kein N+1)
+- Jede Seite wird parallel gerendert (ReceiptRenderer, Backpressure über dessen
+  max_pending) und in Reihenfolge in ein eigenes ZIP-Volume geschrieben
+  (part-00001.zip: PDFs + manifest/part-00001.csv; erst .tmp, dann rename).
+  Höchstens RENDER_AHEAD PDFs sind gleichzeitig angefordert oder fertig und
+  ungeschrieben im Speicher, unabhängig von der Seitengröße.
+- Nach jedem Volume: Checkpoint (state.json, atomar ersetzt) mit der letzten
+  Contribution-ID; nach Abbruch/Neustart geht es dort weiter, halbe Volumes
+  werden verworfen
+- Belegnummern sind stabil (MOE-<Jahr>-C<Contribution-ID>): ein wiederholter
+  Lauf erzeugt dieselben Dateien, der Zähler für Einzelbelege bleibt unberührt
+- Pro Lauf-Verzeichnis hält höchstens ein Prozess einen flock (mehrere
+  API-Worker auf demselben Host starten denselben Lauf nicht doppelt)
+- stream_zip() liefert alle Volumes als ein ZIP (Einträge unverändert, STORED)
+"""
+
+from __future__ import annotations
+
+import asyncio
+import csv
+import fcntl
+import io
+import json
+import logging
+import os
+import re
+import time
+import zipfile
+from collections import deque
+from datetime import date
+from typing import Any, Awaitable, Callable, Deque, Dict, Iterator, List, Optional, Tuple
+
+from app.lib.civicrm_client import ApiCall, iter_keyset_pages
+
+logger = logging.getLogger("moe-api.receipt-batch")
+
+RenderCall = Callable[..., Awaitable[bytes]]
+
+RENDER_AHEAD = 16
+
+CONTRIBUTION_FIELDS = [
+    "id", "contact_id", "total_amount", "currency", "receive_date", "trxn_id", "source", "payment_instrument_id",
+]
+MANIFEST_FIELDS = [
+    "receipt_number", "file", "contribution_id", "contact_id", "email", "amount", "currency", "receive_date",
+]
+_RUN_ID = re.compile(r"^receipts-\d{4}-\d{2}-\d{2}-\d{4}-\d{2}-\d{2}$")
+
+
+def batch_range(
+    year: Optional[int] = None, date_from: Optional[date] = None, date_to: Optional[date] = None
+) -> Tuple[date, date]:
+    """Resolve `year` or an explicit date range; raises ValueError on inconsistent input."""
+    if year is not None:
+        if date_from is not None or date_to is not None:
+            raise ValueError("Either year or date_from/date_to, not both")
+        if not 1900 <= year <= 9999:
+            raise ValueError("year out of range")
+        return date(year, 1, 1), date(year, 12, 31)
+    if date_from is None or date_to is None:
+        raise ValueError("year or date_from and date_to required")
+    if date_from > date_to:
+        raise ValueError("date_from must not be after date_to")
+    return date_from, date_to
+
+
+def run_id_for(date_from: date, date_to: date) -> str:
+    return f"receipts-{date_from.isoformat()}-{date_to.isoformat()}"
+
+
+def receipt_number_for(contribution: Dict[str, Any]) -> str:
+    year = str(contribution.get("receive_date") or "")[:4] or time.strftime("%Y")
+    return f"MOE-{year}-C{int(contribution['id']):06d}"
+
+
+def _write_json(path: str, data: Dict[str, Any]) -> None:
+    tmp = f"{path}.tmp"
+    with open(tmp, "w", encoding="utf-8") as fh:
+        json.dump(data, fh, ensure_ascii=False, indent=2)
+        fh.flush()
+        os.fsync(fh.fileno())
+    os.replace(tmp, path)
+
+
+class ReceiptBatchRun:
+    """One date range: pages → rendered volumes → checkpoint, resumable from state.json."""
+
+    def __init__(
+        self,
+        base_dir: str,
+        date_from: date,
+        date_to: date,
+        *,
+        call: ApiCall,
+        render: RenderCall,
+        instrument_names: Optional[Dict[int, str]] = None,
+        page_size: int = 500,
+        render_ahead: int = RENDER_AHEAD,
+    ) -> None:
+        self.date_from = date_from
+        self.date_to = date_to
+        self.run_id = run_id_for(date_from, date_to)
+        self.dir = os.path.join(base_dir, self.run_id)
+        self.call = call
+        self.render = render
+        self.instrument_names = instrument_names or {}
+        self.page_size = max(1, int(page_size))
+        self.render_ahead = max(1, int(render_ahead))
+        self._lock_fh: Optional[Any] = None
+
+    @property
+    def state_path(self) -> str:
+        return os.path.join(self.dir, "state.json")
+
+    def part_path(self, part: int) -> str:
+        return os.path.join(self.dir, f"part-{part:05d}.zip")
+
+    def load_state(self) -> Dict[str, Any]:
+        try:
+            with open(self.state_path, encoding="utf-8") as fh:
+                return json.load(fh)
+        except FileNotFoundError:
+            return {
+                "run_id": self.run_id,
+                "date_from": self.date_from.isoformat(),
+                "date_to": self.date_to.isoformat(),
+                "status": "pending",
+                "cursor": 0,
+                "receipts": 0,
+                "parts": 0,
+                "amount_total": 0.0,
+                "started_at": None,
+                "updated_at": None,
+                "finished_at": None,
+                "error": None,
+            }
+
+    def try_lock(self) -> bool:
+        """Take the per-run flock (non-blocking); False if another process runs this range."""
+        os.makedirs(self.dir, exist_ok=True)
+        fh = open(os.path.join(self.dir, ".lock"), "a")
+        try:
+            fcntl.flock(fh, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except OSError:
+            fh.close()
+            return False
+        self._lock_fh = fh
+        return True
+
+    def unlock(self) -> None:
+        if self._lock_fh is not None:
+            fh, self._lock_fh = self._lock_fh, None
+            fcntl.flock(fh, fcntl.LOCK_UN)
+            fh.close()
+
+    async def run(self) -> Dict[str, Any]:
+        """Process all remaining pages; callers sharing `base_dir` take try_lock() first."""
+        state = await asyncio.to_thread(self.load_state)
+        if state["status"] == "completed":
+            return state
+        state.update(status="running", error=None, started_at=state["started_at"] or int(time.time()))
+        await asyncio.to_thread(self._discard_partial, state["parts"])
+        await asyncio.to_thread(_write_json, self.state_path, state)
+        params = {
+            "select": CONTRIBUTION_FIELDS,
+            "where": [
+                ["contribution_status_id", "=", 1],
+                ["receive_date", ">=", f"{self.date_from.isoformat()} 00:00:00"],
+                ["receive_date", "<=", f"{self.date_to.isoformat()} 23:59:59"],
+            ],
+        }
+        try:
+            async for page in iter_keyset_pages(
+                self.call, "Contribution", params, page_size=self.page_size, after_id=int(state["cursor"])
+            ):
+                part = state["parts"] + 1
+                written, amount = await self._write_part(part, page)
+                state.update(
+                    cursor=int(page[-1]["id"]),
+                    parts=part,
+                    receipts=state["receipts"] + written,
+                    amount_total=round(state["amount_total"] + amount, 2),
+                    updated_at=int(time.time()),
+                )
+                await asyncio.to_thread(_write_json, self.state_path, state)
+                logger.info("Receipt batch %s: part %s done (%s receipts)", self.run_id, part, state["receipts"])
+        except asyncio.CancelledError:
+            state.update(status="interrupted", updated_at=int(time.time()))
+            await asyncio.shield(asyncio.to_thread(_write_json, self.state_path, state))
+            raise
+        except Exception as exc:
+            logger.error("Receipt batch %s failed after %s receipts: %s", self.run_id, state["receipts"], exc)
+            state.update(status="failed", error=str(exc)[:500], updated_at=int(time.time()))
+            await asyncio.to_thread(_write_json, self.state_path, state)
+            return state
+        state.update(status="completed", finished_at=int(time.time()), updated_at=int(time.time()))
+        await asyncio.to_thread(_write_json, self.state_path, state)
+        return state
+
+    def _discard_partial(self, parts: int) -> None:
+        """Remove volumes that were started but never checkpointed (blocking; runs in a thread)."""
+        os.makedirs(self.dir, exist_ok=True)
+        for name in os.listdir(self.dir):
+            match = re.match(r"^part-(\d{5})\.zip(\.tmp)?$", name)
+            if match and (match.group(2) or int(match.group(1)) > parts):
+                os.remove(os.path.join(self.dir, name))
+
+    async def _emails(self, page: List[Dict[str, Any]]) -> Dict[int, str]:
+        contact_ids = sorted({int(c["contact_id"]) for c in page if c.get("contact_id") is not None})
+        if not contact_ids:
+            return {}
+        data = await self.call("Contact", "get", {
+            "select": ["id", "email"], "where": [["id", "IN", contact_ids]], "limit": len(contact_ids),
+        })
+        values = data.get("values") if isinstance(data, dict) else None
+        return {int(c["id"]): c.get("email") or "" for c in values or [] if c.get("id") is not None}
+
+    async def _write_part(self, part: int, page: List[Dict[str, Any]]) -> Tuple[int, float]:
+        emails = await self._emails(page)
+        rows = []
+        for contribution in page:
+            contact_id = contribution.get("contact_id")
+            email = emails.get(int(contact_id)) if contact_id is not None else None
+            fields = {
+                "amount": float(contribution.get("total_amount") or 0),
+                "currency": contribution.get("currency") or "EUR",
+                "purpose": contribution.get("source"),
+                "provider": self.instrument_names.get(int(contribution.get("payment_instrument_id") or 0)),
+                "trxn_id": contribution.get("trxn_id"),
+                "email": email or None,
+                "receipt_number": receipt_number_for(contribution),
+                "issued_at": str(contribution.get("receive_date") or ""),
+            }
+            rows.append((contribution, fields))
+
+        # At most render_ahead PDFs rendered or waiting to be written; each is dropped once written
+        pending: Deque[Tuple[Dict[str, Any], Dict[str, Any], "asyncio.Future[bytes]"]] = deque()
+        upcoming = iter(rows)
+
+        def schedule() -> None:
+            while len(pending) < self.render_ahead:
+                row = next(upcoming, None)
+                if row is None:
+                    return
+                pending.append((*row, asyncio.ensure_future(self.render(**row[1]))))
+
+        tmp_path = f"{self.part_path(part)}.tmp"
+        archive = await asyncio.to_thread(zipfile.ZipFile, tmp_path, "w", compression=zipfile.ZIP_STORED)
+        manifest = io.StringIO()
+        writer = csv.DictWriter(manifest, fieldnames=MANIFEST_FIELDS)
+        writer.writeheader()
+        amount = 0.0
+        try:
+            # In page order: each PDF is written as soon as it and its predecessors are done
+            schedule()
+            while pending:
+                contribution, fields, job = pending.popleft()
+                pdf = await job
+                schedule()
+                name = f"beleg_{fields['receipt_number']}.pdf"
+                await asyncio.to_thread(archive.writestr, name, pdf)
+                amount += fields["amount"]
+                writer.writerow({
+                    "receipt_number": fields["receipt_number"], "file": name, "contribution_id": contribution["id"],
+                    "contact_id": contribution.get("contact_id"), "email": fields["email"] or "",
+                    "amount": f"{fields['amount']:.2f}", "currency": fields["currency"],
+                    "receive_date": fields["issued_at"],
+                })
+            await asyncio.to_thread(archive.writestr, f"manifest/part-{part:05d}.csv", manifest.getvalue())
+        except BaseException:
+            for _, _, job in pending:
+                job.cancel()
+            await asyncio.shield(asyncio.to_thread(self._abandon, archive, tmp_path))
+            raise
+        await asyncio.to_thread(self._seal, archive, tmp_path, self.part_path(part))
+        return len(rows), amount
+
+    @staticmethod
+    def _abandon(archive: zipfile.ZipFile, tmp_path: str) -> None:
+        archive.close()
+        os.remove(tmp_path)
+
+    @staticmethod
+    def _seal(archive: zipfile.ZipFile, tmp_path: str, path: str) -> None:
+        archive.close()
+        with open(tmp_path, "rb") as fh:
+            os.fsync(fh.fileno())
+        os.replace(tmp_path, path)
+
+
+class _Sink(io.RawIOBase):
+    """Write-only, non-seekable buffer that zipfile streams into; drained between entries."""
+
+    def __init__(self) -> None:
+        self.chunks: List[bytes] = []
+        self.offset = 0
+
+    def writable(self) -> bool:
+        return True
+
+    def write(self, data: Any) -> int:
+        data = bytes(data)
+        self.chunks.append(data)
+        self.offset += len(data)
+        return len(data)
+
+    def tell(self) -> int:
+        return self.offset
+
+    def drain(self) -> bytes:
+        out, self.chunks = b"".join(self.chunks), []
+        return out
+
+
+class ReceiptBatchManager:
+    """Starts runs as background tasks in this process and serves their state and ZIP."""
+
+    def __init__(
+        self,
+        base_dir: str,
+        *,
+        call: ApiCall,
+        render: RenderCall,
+        instrument_names: Optional[Dict[int, str]] = None,
+        page_size: int = 500,
+        render_ahead: int = RENDER_AHEAD,
+    ) -> None:
+        self.base_dir = base_dir
+        self.call = call
+        self.render = render
+        self.instrument_names = instrument_names or {}
+        self.page_size = page_size
+        self.render_ahead = render_ahead
+        self._tasks: Dict[str, "asyncio.Task[Dict[str, Any]]"] = {}
+
+    def _run(self, date_from: date, date_to: date) -> ReceiptBatchRun:
+        return ReceiptBatchRun(
+            self.base_dir, date_from, date_to, call=self.call, render=self.render,
+            instrument_names=self.instrument_names, page_size=self.page_size, render_ahead=self.render_ahead,
+        )
+
+    def _run_for_id(self, run_id: str) -> Optional[ReceiptBatchRun]:
+        if not _RUN_ID.match(run_id):
+            return None
+        date_from, date_to = date.fromisoformat(run_id[9:19]), date.fromisoformat(run_id[20:30])
+        return self._run(date_from, date_to)
+
+    async def start(self, date_from: date, date_to: date) -> Tuple[Dict[str, Any], bool]:
+        """Start or resume a run; returns (state, started). Not started if completed or running elsewhere."""
+        run = self._run(date_from, date_to)
+        task = self._tasks.get(run.run_id)
+        if task is not None and not task.done():
+            return await asyncio.to_thread(self._current_state, run), False
+        state = await asyncio.to_thread(run.load_state)
+        if state["status"] == "completed" or not await asyncio.to_thread(run.try_lock):
+            return await asyncio.to_thread(self._current_state, run, state), False
+
+        async def _task() -> Dict[str, Any]:
+            try:
+                return await run.run()
+            finally:
+                await asyncio.shield(asyncio.to_thread(run.unlock))
+
+        self._tasks[run.run_id] = asyncio.create_task(_task(), name=f"receipt-batch:{run.run_id}")
+        return state, True
+
+    def _current_state(self, run: ReceiptBatchRun, loaded: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+        return self.status(run.run_id) or loaded or run.load_state()
+
+    def status(self, run_id: str) -> Optional[Dict[str, Any]]:
+        """State of a run (blocking file access and flock probe; call via asyncio.to_thread)."""
+        run = self._run_for_id(run_id)
+        if run is None or not os.path.exists(run.state_path):
+            return None
+        state = run.load_state()
+        if state["status"] == "running":
+            task = self._tasks.get(run_id)
+            if (task is None or task.done()) and run.try_lock():
+                run.unlock()  # nobody holds the lock: the process died mid-run
+                state["status"] = "interrupted"
+        return state
+
+    def list_runs(self) -> List[Dict[str, Any]]:
+        if not os.path.isdir(self.base_dir):
+            return []
+        runs = (self.status(name) for name in sorted(os.listdir(self.base_dir)))
+        return [state for state in runs if state is not None]
+
+    def stream_zip(self, run_id: str) -> Iterator[bytes]:
+        """All checkpointed volumes of a run as one ZIP (blocking iterator, run it in a thread)."""
+        run = self._run_for_id(run_id)
+        if run is None:
+            return
+        state = run.load_state()
+        sink = _Sink()
+        with zipfile.ZipFile(sink, "w", compression=zipfile.ZIP_STORED) as out:
+            for part in range(1, int(state["parts"]) + 1):
+                with zipfile.ZipFile(run.part_path(part)) as volume:
+                    for info in volume.infolist():
+                        out.writestr(info, volume.read(info))
+                        yield sink.drain()
+        yield sink.drain()
+
+    async def close(self) -> None:
+        tasks = [task for task in self._tasks.values() if not task.done()]
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        self._tasks.clear()
@@ -0,0 +1,339 @@
+"""
+Beleg-PDFs im Prozess-Pool (reportlab außerhalb des Event Loops)
+
+- Ein begrenzter ProcessPoolExecutor (RECEIPT_RENDER_WORKERS Prozesse, Start
+  per "spawn" – kein fork eines laufenden Event Loops mit Threads)
+- Jeder Worker importiert reportlab und kompiliert beim Start einmal das
+  ReceiptTemplate: Name, Überschrift, Adresse und Logo (ORG_LOGO_PATH, einmal
+  gelesen und kodiert) als Form-XObject; pro Beleg werden nur Nummer, Betrag,
+  Zweck, Zahlungsart, Transaktions-ID, E-Mail und Datum gestempelt
+- start() wärmt alle Worker vor dem ersten Request auf
+- Handler warten per `await renderer.render(...)`; höchstens
+  RECEIPT_RENDER_MAX_PENDING Aufträge sind gleichzeitig unterwegs, weitere
+  warten (Backpressure statt unbegrenzter Warteschlange)
+- Stirbt ein Worker (BrokenProcessPool), wird der Pool neu aufgebaut und der
+  Auftrag einmal wiederholt
+- RECEIPT_RENDER_WORKERS=0: Rendern in einem Thread (Tests, Einzelprozess)
+"""
+
+from __future__ import annotations
+
+import asyncio
+import copy
+import io
+import logging
+import multiprocessing
+import os
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from dataclasses import asdict, dataclass
+from datetime import datetime
+from typing import Any, Dict, List, Optional, Tuple
+
+logger = logging.getLogger("moe-api.receipts")
+
+
+def _env_str(name: str, default: str = "") -> str:
+    raw = os.getenv(name)
+    return raw.strip() if raw is not None else default
+
+
+def _env_int(name: str, default: int) -> int:
+    raw = os.getenv(name)
+    if raw is None or raw.strip() == "":
+        return default
+    try:
+        return int(raw)
+    except ValueError as exc:
+        raise RuntimeError(f"Environment variable {name} must be an integer") from exc
+
+
+class ReceiptRenderError(RuntimeError):
+    """PDF konnte nicht erzeugt werden (z.B. reportlab fehlt im Worker)."""
+
+
+@dataclass(frozen=True)
+class ReceiptOrg:
+    name: str = "Menschlichkeit Österreich"
+    address_line1: str = ""
+    address_line2: str = ""
+    address_zip: str = ""
+    address_city: str = ""
+    address_country: str = ""
+    logo_path: str = ""
+
+    @classmethod
+    def from_env(cls) -> "ReceiptOrg":
+        return cls(
+            name=_env_str("ORG_NAME", cls.name) or cls.name,
+            address_line1=_env_str("ORG_ADDRESS_LINE1"),
+            address_line2=_env_str("ORG_ADDRESS_LINE2"),
+            address_zip=_env_str("ORG_ADDRESS_ZIP"),
+            address_city=_env_str("ORG_ADDRESS_CITY"),
+            address_country=_env_str("ORG_ADDRESS_COUNTRY"),
+            logo_path=_env_str("ORG_LOGO_PATH"),
+        )
+
+    @property
+    def address_lines(self) -> List[str]:
+        lines = [
+            self.address_line1,
+            self.address_line2,
+            " ".join([self.address_zip, self.address_city]).strip(),
+            self.address_country,
+        ]
+        return [line for line in lines if line]
+
+
+# --- Worker-Seite (läuft im Pool-Prozess) ----------------------------------------------
+
+_worker: Dict[str, Any] = {}
+
+
+class ReceiptTemplate:
+    """Static receipt layer (name, heading, logo, address) compiled once into a form XObject.
+
+    `stamp()` clones the compiled objects into each new document and only draws the
+    per-receipt fields; the logo is read and encoded once per process.
+    """
+
+    FORM_NAME = "moeReceiptStatic"
+
+    def __init__(self, org: ReceiptOrg, logo_path: Optional[str] = None) -> None:
+        from reportlab.lib.pagesizes import A4
+        from reportlab.lib.units import mm
+        from reportlab.pdfbase.pdfdoc import PDFFormXObject, PDFImageXObject
+        from reportlab.pdfgen import canvas
+
+        self.org = org
+        self.width, self.height = A4
+        self._mm = mm
+        scratch = canvas.Canvas(io.BytesIO(), pagesize=A4)
+        scratch.beginForm(self.FORM_NAME)
+        self.body_top = self._draw_static(scratch, logo_path)
+        scratch.endForm()
+        doc = scratch._doc
+        self.fonts: List[str] = list(doc.fontMapping)  # registration order fixes /F1, /F2, ...
+        self._font_names = dict(doc.fontMapping)
+        self._objects: List[Tuple[str, Any]] = []
+        for name, obj in doc.idToObject.items():
+            if isinstance(obj, (PDFFormXObject, PDFImageXObject)):
+                clone = copy.copy(obj)
+                clone.__dict__.pop("__InternalName__", None)
+                if isinstance(clone, PDFImageXObject):
+                    self._freeze_image(clone)
+                else:
+                    clone.compression = 0  # ~300 Byte Text: Flate+A85 pro Beleg kostet mehr als es spart
+                self._objects.append((name, clone))
+        self.has_logo = any(isinstance(obj, PDFImageXObject) for _, obj in self._objects)
+
+    @staticmethod
+    def _freeze_image(image: Any) -> None:
+        """Store the image stream as final binary bytes (no ASCII85, no re-encoding per document)."""
+        from reportlab.lib.rl_accel import asciiBase85Decode
+        from reportlab.pdfbase.pdfdoc import pdfdocEnc
+
+        content = image.streamContent
+        if image._filters and image._filters[0] == "ASCII85Decode":
+            content = asciiBase85Decode(content)
+            image._filters = tuple(image._filters[1:])
+        image.streamContent = pdfdocEnc(content)
+
+    def _draw_static(self, c: Any, logo_path: Optional[str]) -> float:
+        mm = self._mm
+        y = self.height - 30 * mm
+        c.setFont("Helvetica-Bold", 16)
+        c.drawString(20 * mm, y, self.org.name)
+        y -= 10 * mm
+        # Header block
+        c.setFont("Helvetica", 11)
+        c.drawString(20 * mm, y, "Spenden-/Zahlungsbeleg")
+        if logo_path:
+            try:
+                c.drawImage(logo_path, self.width - 60 * mm, self.height - 40 * mm, width=40 * mm,
+                            preserveAspectRatio=True, mask="auto")
+            except Exception as exc:
+                logger.warning("Receipt logo %s unreadable: %s", logo_path, exc)
+        y -= 12 * mm
+        # Organization address
+        c.setFont("Helvetica", 9)
+        for line in self.org.address_lines:
+            c.drawString(20 * mm, y, line)
+            y -= 6 * mm
+        return y - 2 * mm
+
+    def stamp(self, fields: Dict[str, Any]) -> bytes:
+        """Render one receipt: reference the static form, draw only the dynamic fields."""
+        from reportlab.pdfgen import canvas
+
+        mm = self._mm
+        buf = io.BytesIO()
+        c = canvas.Canvas(buf, pagesize=(self.width, self.height))
+        c.setTitle(f"Spendenbeleg - {self.org.name}")
+        doc = c._doc
+        for font in self.fonts:
+            doc.getInternalFontName(font)
+        if doc.fontMapping != self._font_names:
+            raise ReceiptRenderError("Receipt template font mapping diverged")
+        for name, obj in self._objects:
+            doc.Reference(copy.copy(obj), name)
+        c.doForm(self.FORM_NAME)
+        y = self.body_top
+        c.setFont("Helvetica", 10)
+        c.drawString(20 * mm, y, f"Belegnummer: {fields['receipt_number']}")
+        y -= 8 * mm
+        c.drawString(20 * mm, y, f"Betrag: {fields['amount']:.2f} {fields['currency'].upper()}")
+        y -= 7 * mm
+        c.drawString(20 * mm, y, f"Zweck: {fields.get('purpose') or 'Allgemein'}")
+        y -= 7 * mm
+        c.drawString(20 * mm, y, f"Zahlungsart: {fields.get('provider') or 'unbekannt'}")
+        y -= 7 * mm
+        if fields.get("trxn_id"):
+            c.drawString(20 * mm, y, f"Transaktions-ID: {fields['trxn_id']}")
+            y -= 7 * mm
+        if fields.get("email"):
+            c.drawString(20 * mm, y, f"E-Mail: {fields['email']}")
+            y -= 7 * mm
+        c.drawString(20 * mm, y, f"Datum: {fields['issued_at']}")
+        y -= 14 * mm
+        c.setFont("Helvetica-Oblique", 9)
+        c.drawString(20 * mm, y, "Hinweis: Dieser Beleg wurde automatisch erstellt.")
+        c.showPage()
+        c.save()
+        return buf.getvalue()
+
+
+def _init_worker(org: Dict[str, str]) -> None:
+    """Pool initializer: import reportlab and compile the receipt template once per process."""
+    _worker.clear()
+    _worker["org"] = ReceiptOrg(**org)
+    try:
+        from reportlab.pdfgen import canvas  # noqa: F401
+    except Exception as exc:
+        _worker["error"] = f"PDF generator not available: {exc}"
+        return
+    logo_path = _worker["org"].logo_path
+    if logo_path and not os.path.exists(logo_path):
+        logger.warning("Receipt logo %s not found", logo_path)
+        logo_path = ""
+    _worker["template"] = ReceiptTemplate(_worker["org"], logo_path or None)
+
+
+def _warm() -> int:
+    return os.getpid()
+
+
+def render_receipt(fields: Dict[str, Any]) -> bytes:
+    """Stamp one receipt; `fields` as accepted by ReceiptRenderer.render."""
+    if "org" not in _worker:
+        _init_worker(asdict(ReceiptOrg.from_env()))
+    if "error" in _worker:
+        raise ReceiptRenderError(_worker["error"])
+    return _worker["template"].stamp(fields)
+
+
+# --- API-Seite -----------------------------------------------------------------------
+
+
+class ReceiptRenderer:
+    def __init__(self, org: ReceiptOrg, *, workers: int = 2, max_pending: Optional[int] = None) -> None:
+        self.org = org
+        self.workers = max(0, int(workers))
+        self.max_pending = max(1, int(max_pending or max(1, self.workers) * 4))
+        self._pool: Optional[ProcessPoolExecutor] = None
+        self._slots: Optional[asyncio.Semaphore] = None
+        self._rendered = 0
+        self._restarts = 0
+
+    def _new_pool(self) -> ProcessPoolExecutor:
+        return ProcessPoolExecutor(
+            max_workers=self.workers,
+            mp_context=multiprocessing.get_context("spawn"),
+            initializer=_init_worker,
+            initargs=(asdict(self.org),),
+        )
+
+    async def start(self) -> None:
+        """Spawn and warm all workers (reportlab import, logo) before the first request."""
+        if self.workers == 0 or self._pool is not None:
+            return
+        self._pool = self._new_pool()
+        loop = asyncio.get_running_loop()
+        pids = await asyncio.gather(*(loop.run_in_executor(self._pool, _warm) for _ in range(self.workers)))
+        logger.info("Receipt render pool ready (%s workers: %s)", self.workers, sorted(set(pids)))
+
+    async def render(
+        self,
+        *,
+        amount: float,
+        currency: str,
+        purpose: Optional[str],
+        provider: Optional[str],
+        trxn_id: Optional[str],
+        email: Optional[str],
+        receipt_number: str,
+        issued_at: Optional[str] = None,
+    ) -> bytes:
+        fields = {
+            "amount": float(amount),
+            "currency": currency or "EUR",
+            "purpose": purpose,
+            "provider": provider,
+            "trxn_id": trxn_id,
+            "email": email,
+            "receipt_number": receipt_number,
+            "issued_at": issued_at or datetime.utcnow().strftime("%Y-%m-%d %H:%M:%SZ"),
+        }
+        if self._slots is None:
+            self._slots = asyncio.Semaphore(self.max_pending)
+        async with self._slots:
+            pdf = await self._submit(fields)
+        self._rendered += 1
+        return pdf
+
+    async def _submit(self, fields: Dict[str, Any]) -> bytes:
+        if self.workers == 0:
+            if "org" not in _worker:
+                _init_worker(asdict(self.org))
+            return await asyncio.to_thread(render_receipt, fields)
+        loop = asyncio.get_running_loop()
+        if self._pool is None:
+            self._pool = self._new_pool()
+        pool = self._pool
+        try:
+            return await loop.run_in_executor(pool, render_receipt, fields)
+        except BrokenProcessPool:
+            logger.warning("Receipt render pool broken; restarting")
+            if self._pool is pool:
+                self._restarts += 1
+                self._pool = self._new_pool()
+                pool.shutdown(wait=False, cancel_futures=True)
+            return await loop.run_in_executor(self._pool, render_receipt, fields)
+
+    def snapshot(self) -> Dict[str, Any]:
+        return {"workers": self.workers, "max_pending": self.max_pending, "rendered": self._rendered,
+                "pool_restarts": self._restarts}
+
+    async def close(self) -> None:
+        if self._pool is not None:
+            pool, self._pool = self._pool, None
+            await asyncio.to_thread(pool.shutdown, wait=True, cancel_futures=True)
+
+
+_shared_renderer: Optional[ReceiptRenderer] = None
+
+
+def get_receipt_renderer() -> ReceiptRenderer:
+    global _shared_renderer
+    if _shared_renderer is None:
+        workers = _env_int("RECEIPT_RENDER_WORKERS", min(2, os.cpu_count() or 1))
+        max_pending = _env_int("RECEIPT_RENDER_MAX_PENDING", 0) or None
+        _shared_renderer = ReceiptRenderer(ReceiptOrg.from_env(), workers=workers, max_pending=max_pending)
+    return _shared_renderer
+
+
+async def close_receipt_renderer() -> None:
+    global _shared_renderer
+    if _shared_renderer is not None:
+        await _shared_renderer.close()
+        _shared_renderer = None
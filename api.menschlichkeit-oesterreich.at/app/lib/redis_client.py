@@ -0,0 +1,79 @@
+"""
+Gemeinsamer asynchroner Redis-Client (redis.asyncio)
+
+- Ein BlockingConnectionPool pro Prozess (REDIS_MAX_CONNECTIONS); bei
+  ausgeschöpftem Pool wartet ein Befehl bis REDIS_POOL_TIMEOUT_SECONDS statt
+  sofort zu scheitern
+- Geöffnet und geschlossen im App-Lifespan; Ping einmalig beim Start statt
+  lazy pro Request. Fällt Redis später aus, schlagen einzelne Befehle fehl und
+  der Pool verbindet sich beim nächsten Befehl neu.
+- Ohne REDIS_URL oder ohne das Paket `redis` liefert get_redis() None
+"""
+
+from __future__ import annotations
+
+import logging
+import os
+from typing import Any, Optional
+
+logger = logging.getLogger("moe-api.redis")
+
+try:
+    import redis.asyncio as _redis_async  # type: ignore
+except Exception:
+    _redis_async = None  # type: ignore
+
+_client: Optional[Any] = None
+
+
+def _env_int(name: str, default: int) -> int:
+    try:
+        return int(os.getenv(name, "").strip() or default)
+    except ValueError:
+        return default
+
+
+def _env_float(name: str, default: float) -> float:
+    try:
+        return float(os.getenv(name, "").strip() or default)
+    except ValueError:
+        return default
+
+
+def get_redis() -> Optional[Any]:
+    global _client
+    if _client is not None:
+        return _client
+    url = os.getenv("REDIS_URL", "").strip()
+    if not url or _redis_async is None:
+        return None
+    pool = _redis_async.BlockingConnectionPool.from_url(
+        url,
+        decode_responses=True,
+        max_connections=_env_int("REDIS_MAX_CONNECTIONS", 50),
+        timeout=_env_float("REDIS_POOL_TIMEOUT_SECONDS", 5.0),
+        socket_connect_timeout=_env_float("REDIS_CONNECT_TIMEOUT_SECONDS", 2.0),
+        health_check_interval=30,
+    )
+    _client = _redis_async.Redis.from_pool(pool)
+    return _client
+
+
+async def init_redis() -> bool:
+    """Create the shared client and ping once; False if Redis is not configured or not reachable."""
+    client = get_redis()
+    if client is None:
+        return False
+    try:
+        await client.ping()
+        return True
+    except Exception as exc:
+        logger.warning("Redis not reachable at startup: %s", exc)
+        return False
+
+
+async def close_redis() -> None:
+    global _client
+    if _client is not None:
+        await _client.aclose()
+        _client = None
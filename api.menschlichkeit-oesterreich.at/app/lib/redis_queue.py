@@ -0,0 +1,561 @@
+"""
+Redis-basierte Webhook-Queue mit atomaren Lua-Skripten
+
+Datenmodell:
+
+- `<ns>:main`     Liste mit fälligen Message-IDs (LPUSH / RPOP)
+- `<ns>:delayed`  Sorted Set ID → Fälligkeit (Unix-Sekunden)
+- `<ns>:dlq`      Liste mit endgültig fehlgeschlagenen IDs
+- `<ns>:leases`   Sorted Set ID → Ablauf der Visibility-Timeout-Lease
+  (ausgelieferte, noch nicht bestätigte Messages)
+- `<ns>:msg:<id>` Hash mit payload, attempts, max_attempts, enqueued_at,
+  updated_at, last_error
+- `<ns>:idemp:<sha256>` Idempotency-Key → ID (24h TTL)
+- `<ns>:rate`     Hash tokens/ts: Token Bucket für Consumer mit Rate-Limit
+  (rate_take, z.B. der Mail-Sender), von allen Prozessen geteilt
+
+pop liefert bis zu N Messages und least sie; ack/fail beenden die Lease,
+reap_expired stellt abgelaufene Leases (abgestürzter Consumer) zurück an den
+Anfang der Main-Liste bzw. nach max_attempts in die DLQ.
+
+pop_wait (Long-Polling) blockiert per `BLMOVE main main RIGHT RIGHT`, bis die
+Main-Liste nicht leer ist – das Element bleibt dabei an Ort und Stelle, geleast
+wird danach regulär per pop-Skript. Ein abgebrochener Wartevorgang verliert
+also nichts. Gewartet wird in Scheiben von höchstens WAIT_SLICE_SECONDS.
+
+Fällige Delayed-Messages verschiebt nicht pop, sondern ein Hintergrund-Task
+(promote_due_batches, begrenzte Chunks); dessen LPUSH weckt Long-Poller.
+
+Die DLQ wird seitenweise per Skript gelistet, per UNLINK in Chunks geleert
+und kann per Filter (Fehlertext, Alter, Versuche) serverseitig in Chunks neu
+eingestellt werden (dlq_requeue_matching).
+
+push, pop, ack, fail, reap_expired, promote_due und dlq_requeue laufen
+jeweils als ein einziges Lua-Skript (EVALSHA, bei NOSCRIPT automatisches
+Nachladen durch redis-py): ein Round Trip, keine Races zwischen parallelen
+Workern. Die Skripte greifen auf `<ns>:msg:<id>`-Keys zu, deren IDs erst
+serverseitig bekannt sind – das ist auf einer Single-Instance/Sentinel-
+Topologie erlaubt, nicht aber in Redis Cluster.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import hashlib
+import json
+import time
+from typing import Any, Dict, List, Optional, Tuple
+
+DEFAULT_NAMESPACE = "moe:queue:webhooks"
+IDEMPOTENCY_TTL_SECONDS = 24 * 3600
+MAX_BACKOFF_SECONDS = 300
+DEFAULT_VISIBILITY_TIMEOUT_SECONDS = 60
+WAIT_SLICE_SECONDS = 1.0
+CAP_WAIT_SLICE_SECONDS = 0.25
+PROMOTE_CHUNK_SIZE = 500
+DLQ_CHUNK_SIZE = 500
+
+# KEYS: main, delayed, msg, [idemp]
+# ARGV: id, payload, max_attempts, now, delay_seconds, idemp_ttl
+_PUSH_LUA = """
+if #KEYS >= 4 then
+  local existing = redis.call('GET', KEYS[4])
+  if existing then return {existing, 1} end
+end
+redis.call('HSET', KEYS[3], 'payload', ARGV[2], 'attempts', '0', 'max_attempts', ARGV[3],
+           'enqueued_at', ARGV[4], 'updated_at', ARGV[4])
+local delay = tonumber(ARGV[5])
+if delay > 0 then
+  redis.call('ZADD', KEYS[2], tonumber(ARGV[4]) + delay, ARGV[1])
+else
+  redis.call('LPUSH', KEYS[1], ARGV[1])
+end
+if #KEYS >= 4 then
+  redis.call('SET', KEYS[4], ARGV[1], 'EX', ARGV[6])
+end
+return {ARGV[1], 0}
+"""
+
+# KEYS: delayed, main
+# ARGV: now, limit
+_PROMOTE_LUA = """
+local due = redis.call('ZRANGEBYSCORE', KEYS[1], '-inf', ARGV[1], 'LIMIT', 0, ARGV[2])
+for _, id in ipairs(due) do
+  redis.call('ZREM', KEYS[1], id)
+  redis.call('LPUSH', KEYS[2], id)
+end
+return #due
+"""
+
+# KEYS: main, leases
+# ARGV: msg_prefix, now, max, lease_deadline, max_inflight (0 = unbegrenzt)
+# Überspringt verwaiste IDs (Hash bereits gelöscht), statt sie auszuliefern.
+_POP_LUA = """
+local items = {}
+local wanted = tonumber(ARGV[3])
+if tonumber(ARGV[5]) > 0 then
+  wanted = math.min(wanted, tonumber(ARGV[5]) - redis.call('ZCARD', KEYS[2]))
+end
+while #items < wanted do
+  local id = redis.call('RPOP', KEYS[1])
+  if not id then break end
+  local key = ARGV[1] .. id
+  if redis.call('EXISTS', key) == 1 then
+    redis.call('HSET', key, 'updated_at', ARGV[2])
+    redis.call('ZADD', KEYS[2], ARGV[4], id)
+    local fields = redis.call('HGETALL', key)
+    table.insert(fields, 1, id)
+    table.insert(items, fields)
+  end
+end
+return items
+"""
+
+# KEYS: leases
+# ARGV: msg_prefix, id...
+_ACK_LUA = """
+local acked = 0
+for i = 2, #ARGV do
+  redis.call('ZREM', KEYS[1], ARGV[i])
+  acked = acked + redis.call('DEL', ARGV[1] .. ARGV[i])
+end
+return acked
+"""
+
+# KEYS: leases, main, dlq
+# ARGV: msg_prefix, now, limit
+# Abgelaufene Lease zählt als Fehlversuch; zurück an das RPOP-Ende der Main-Liste.
+_REAP_LUA = """
+local expired = redis.call('ZRANGEBYSCORE', KEYS[1], '-inf', ARGV[2], 'LIMIT', 0, ARGV[3])
+local requeued, dead = 0, 0
+for _, id in ipairs(expired) do
+  redis.call('ZREM', KEYS[1], id)
+  local key = ARGV[1] .. id
+  if redis.call('EXISTS', key) == 1 then
+    local attempts = redis.call('HINCRBY', key, 'attempts', 1)
+    local max_attempts = tonumber(redis.call('HGET', key, 'max_attempts') or '5')
+    redis.call('HSET', key, 'updated_at', ARGV[2], 'last_error', 'lease expired')
+    if attempts >= max_attempts then
+      redis.call('LPUSH', KEYS[3], id)
+      dead = dead + 1
+    else
+      redis.call('RPUSH', KEYS[2], id)
+      requeued = requeued + 1
+    end
+  end
+end
+return {requeued, dead}
+"""
+
+# KEYS: msg, dlq, delayed, leases
+# ARGV: id, now, error, max_backoff, permanent ('1' = sofort in die DLQ)
+# Rückgabe: -2 unbekannte ID, -1 in DLQ verschoben, sonst Backoff in Sekunden
+_FAIL_LUA = """
+redis.call('ZREM', KEYS[4], ARGV[1])
+if redis.call('EXISTS', KEYS[1]) == 0 then return -2 end
+local attempts = redis.call('HINCRBY', KEYS[1], 'attempts', 1)
+local max_attempts = tonumber(redis.call('HGET', KEYS[1], 'max_attempts') or '5')
+redis.call('HSET', KEYS[1], 'updated_at', ARGV[2], 'last_error', ARGV[3])
+if attempts >= max_attempts or ARGV[5] == '1' then
+  redis.call('LPUSH', KEYS[2], ARGV[1])
+  return -1
+end
+local delay = math.min(tonumber(ARGV[4]), 2 ^ attempts)
+redis.call('ZADD', KEYS[3], tonumber(ARGV[2]) + delay, ARGV[1])
+return math.floor(delay)
+"""
+
+# KEYS: dlq
+# ARGV: msg_prefix, start, stop
+# Rückgabe: {llen, {id, field, value, ...}, ...} – ein Round Trip für die ganze Seite
+_DLQ_LIST_LUA = """
+local out = {redis.call('LLEN', KEYS[1])}
+for _, id in ipairs(redis.call('LRANGE', KEYS[1], ARGV[2], ARGV[3])) do
+  local h = redis.call('HGETALL', ARGV[1] .. id)
+  table.insert(h, 1, id)
+  table.insert(out, h)
+end
+return out
+"""
+
+# KEYS: dlq
+# ARGV: msg_prefix, chunk
+# Löscht die ältesten `chunk` DLQ-Einträge (RPOP-Ende) samt Hashes per UNLINK.
+_DLQ_PURGE_LUA = """
+local ids = redis.call('LRANGE', KEYS[1], -tonumber(ARGV[2]), -1)
+if #ids == 0 then return 0 end
+local keys = {}
+for i, id in ipairs(ids) do keys[i] = ARGV[1] .. id end
+redis.call('UNLINK', unpack(keys))
+redis.call('LTRIM', KEYS[1], 0, -(#ids + 1))
+return #ids
+"""
+
+# Gemeinsamer Teil der Requeue-by-Filter-Skripte.
+# KEYS[1]: dlq
+# ARGV: msg_prefix, now, cursor, chunk, budget (-1 = unbegrenzt), dry_run,
+#       error_contains (lowercase, '' = egal), min_age, max_age, min_attempts, max_attempts (-1 = egal)
+# Prüft LRANGE cursor..cursor+chunk-1; Treffer werden per LSET durch einen Tombstone ersetzt und am
+# Ende mit einem LREM entfernt (statt LREM pro ID). Alter = now - updated_at (Zeitpunkt des letzten Fehlers).
+# Das backendspezifische Suffix stellt `selected` wieder ein und liefert {matched, scanned}.
+_DLQ_SELECT_LUA = """
+local now, cursor = tonumber(ARGV[2]), tonumber(ARGV[3])
+local budget, dry = tonumber(ARGV[5]), ARGV[6] == '1'
+local min_age, max_age = tonumber(ARGV[8]), tonumber(ARGV[9])
+local min_att, max_att = tonumber(ARGV[10]), tonumber(ARGV[11])
+local ids = redis.call('LRANGE', KEYS[1], cursor, cursor + tonumber(ARGV[4]) - 1)
+local selected, scanned = {}, 0
+for i, id in ipairs(ids) do
+  if budget >= 0 and #selected >= budget then break end
+  scanned = i
+  local h = redis.call('HMGET', ARGV[1] .. id, 'last_error', 'updated_at', 'attempts')
+  local ok = h[2] ~= false
+  if ok and ARGV[7] ~= '' then
+    ok = string.find(string.lower(h[1] or ''), ARGV[7], 1, true) ~= nil
+  end
+  if ok then
+    local age = now - tonumber(h[2])
+    local attempts = tonumber(h[3] or '0')
+    ok = (min_age < 0 or age >= min_age) and (max_age < 0 or age <= max_age)
+      and (min_att < 0 or attempts >= min_att) and (max_att < 0 or attempts <= max_att)
+  end
+  if ok then
+    table.insert(selected, id)
+    if not dry then redis.call('LSET', KEYS[1], cursor + i - 1, '\0requeued') end
+  end
+end
+if dry then return {#selected, scanned} end
+if #selected > 0 then redis.call('LREM', KEYS[1], 0, '\0requeued') end
+"""
+
+# KEYS: dlq, main, delayed, msg
+# ARGV: id, now, delay_seconds
+# Nur eine Message, die LREM tatsächlich aus der DLQ entfernt hat, wird neu eingestellt
+# (bereits requeued, vertippte ID oder paralleles dlq_requeue_matching → 0).
+_DLQ_REQUEUE_ONE_LUA = """
+if redis.call('LREM', KEYS[1], 1, ARGV[1]) == 0 then return 0 end
+if redis.call('EXISTS', KEYS[4]) == 0 then return 0 end
+local now, delay = tonumber(ARGV[2]), tonumber(ARGV[3])
+redis.call('HSET', KEYS[4], 'updated_at', now)
+if delay > 0 then
+  redis.call('ZADD', KEYS[3], now + delay, ARGV[1])
+else
+  redis.call('LPUSH', KEYS[2], ARGV[1])
+end
+return 1
+"""
+
+# KEYS: dlq, main, delayed; ARGV wie _DLQ_SELECT_LUA, ARGV[12]: delay_seconds
+_DLQ_REQUEUE_LUA = _DLQ_SELECT_LUA + """
+local delay = tonumber(ARGV[12])
+for _, id in ipairs(selected) do
+  redis.call('HSET', ARGV[1] .. id, 'updated_at', now)
+  if delay > 0 then
+    redis.call('ZADD', KEYS[3], now + delay, id)
+  else
+    redis.call('LPUSH', KEYS[2], id)
+  end
+end
+return {#selected, scanned}
+"""
+
+
+# KEYS: rate
+# ARGV: count (< 0 = zurückgeben), rate/s, burst, now (Sekunden, float)
+# Rückgabe: {genommen, verbleibende Tokens als String}
+_RATE_TAKE_LUA = """
+local count, rate, burst, now = tonumber(ARGV[1]), tonumber(ARGV[2]), tonumber(ARGV[3]), tonumber(ARGV[4])
+local state = redis.call('HMGET', KEYS[1], 'tokens', 'ts')
+local tokens = tonumber(state[1]) or burst
+local ts = tonumber(state[2]) or now
+tokens = math.min(burst, tokens + math.max(0, now - ts) * rate)
+local taken = 0
+if count < 0 then
+  tokens = math.min(burst, tokens - count)
+else
+  taken = math.min(count, math.floor(tokens))
+  tokens = tokens - taken
+end
+redis.call('HSET', KEYS[1], 'tokens', tostring(tokens), 'ts', ARGV[4])
+redis.call('EXPIRE', KEYS[1], math.ceil(burst / rate) + 60)
+return {taken, tostring(tokens)}
+"""
+
+
+def _now() -> int:
+    return int(time.time())
+
+
+def _decode_item(msg_id: str, fields: Dict[str, str]) -> Dict[str, Any]:
+    try:
+        payload = json.loads(fields.get("payload") or "{}")
+    except Exception:
+        payload = {}
+    return {
+        "id": msg_id,
+        "payload": payload,
+        "attempts": int(fields.get("attempts") or 0),
+        "max_attempts": int(fields.get("max_attempts") or 5),
+        "enqueued_at": int(fields.get("enqueued_at") or 0),
+        "updated_at": int(fields.get("updated_at") or 0),
+        "last_error": fields.get("last_error") or None,
+    }
+
+
+class RedisQueue:
+    """Queue-Operationen auf einem `redis.asyncio` Client mit `decode_responses=True`."""
+
+    def __init__(self, client: Any, namespace: str = DEFAULT_NAMESPACE) -> None:
+        self.client = client
+        self.namespace = namespace
+        self.key_main = f"{namespace}:main"
+        self.key_dlq = f"{namespace}:dlq"
+        self.key_delayed = f"{namespace}:delayed"
+        self.key_leases = f"{namespace}:leases"
+        self.msg_prefix = f"{namespace}:msg:"
+        self.key_rate = f"{namespace}:rate"
+        self._push = client.register_script(_PUSH_LUA)
+        self._promote = client.register_script(_PROMOTE_LUA)
+        self._pop = client.register_script(_POP_LUA)
+        self._fail = client.register_script(_FAIL_LUA)
+        self._ack = client.register_script(_ACK_LUA)
+        self._reap = client.register_script(_REAP_LUA)
+        self._dlq_list = client.register_script(_DLQ_LIST_LUA)
+        self._dlq_purge = client.register_script(_DLQ_PURGE_LUA)
+        self._dlq_requeue = client.register_script(_DLQ_REQUEUE_LUA)
+        self._dlq_requeue_one = client.register_script(_DLQ_REQUEUE_ONE_LUA)
+        self._rate_take = client.register_script(_RATE_TAKE_LUA)
+
+    def key_msg(self, msg_id: str) -> str:
+        return f"{self.msg_prefix}{msg_id}"
+
+    def key_idempotency(self, idempotency_key: str) -> str:
+        return f"{self.namespace}:idemp:{hashlib.sha256(idempotency_key.encode('utf-8')).hexdigest()}"
+
+    async def push(
+        self,
+        msg_id: str,
+        payload: Dict[str, Any],
+        *,
+        max_attempts: int = 5,
+        delay_seconds: int = 0,
+        idempotency_key: Optional[str] = None,
+    ) -> Tuple[str, bool]:
+        """Enqueue; returns (id, duplicate) – duplicate=True if the idempotency key was already used."""
+        keys = [self.key_main, self.key_delayed, self.key_msg(msg_id)]
+        if idempotency_key:
+            keys.append(self.key_idempotency(idempotency_key))
+        args = [msg_id, json.dumps(payload), int(max_attempts), _now(), max(0, int(delay_seconds)), IDEMPOTENCY_TTL_SECONDS]
+        stored_id, duplicate = await self._push(keys=keys, args=args)
+        return stored_id, bool(int(duplicate))
+
+    async def promote_due(self, limit: int = PROMOTE_CHUNK_SIZE) -> int:
+        """Move at most `limit` due delayed messages to the ready side; returns how many moved."""
+        return int(await self._promote(keys=[self.key_delayed, self.key_main], args=[_now(), max(1, int(limit))]))
+
+    async def promote_due_batches(self, chunk_size: int = PROMOTE_CHUNK_SIZE, max_chunks: int = 100) -> int:
+        """Drain due messages chunk by chunk, yielding to the event loop between chunks.
+
+        Each script call stays short, so a large backlog after an outage never blocks
+        Redis (or pop) for long; whatever exceeds `max_chunks` is left for the next tick.
+        """
+        total = 0
+        for _ in range(max(1, max_chunks)):
+            moved = await self.promote_due(chunk_size)
+            total += moved
+            if moved < chunk_size:
+                break
+            await asyncio.sleep(0)
+        return total
+
+    async def pop(
+        self,
+        max_items: int = 1,
+        *,
+        visibility_timeout: int = DEFAULT_VISIBILITY_TIMEOUT_SECONDS,
+        max_inflight: int = 0,
+    ) -> List[Dict[str, Any]]:
+        """Lease up to `max_items` messages; each must be acked/failed before the lease expires.
+
+        With `max_inflight` > 0 the batch is cut (atomically) so that no more than that many
+        messages of this queue are leased at once.
+        """
+        now = _now()
+        lease_expires_at = now + max(1, int(visibility_timeout))
+        rows = await self._pop(
+            keys=[self.key_main, self.key_leases],
+            args=[self.msg_prefix, now, max(1, int(max_items)), lease_expires_at, max(0, int(max_inflight))],
+        )
+        items = []
+        for row in rows or []:
+            item = _decode_item(row[0], dict(zip(row[1::2], row[2::2])))
+            item["lease_expires_at"] = lease_expires_at
+            items.append(item)
+        return items
+
+    async def pop_wait(
+        self,
+        max_items: int = 1,
+        *,
+        visibility_timeout: int = DEFAULT_VISIBILITY_TIMEOUT_SECONDS,
+        wait_seconds: float = 0.0,
+        max_inflight: int = 0,
+    ) -> List[Dict[str, Any]]:
+        """Like pop, but hold on for up to `wait_seconds` until at least one message is available."""
+        deadline = time.monotonic() + max(0.0, wait_seconds)
+        while True:
+            items = await self.pop(max_items, visibility_timeout=visibility_timeout, max_inflight=max_inflight)
+            remaining = deadline - time.monotonic()
+            if items or remaining <= 0:
+                return items
+            allowed = max_items
+            if max_inflight > 0:
+                allowed = min(max_items, max_inflight - await self.inflight())
+                if allowed <= 0:
+                    # at the cap: a blocking read would wake at once for messages we may not take
+                    await asyncio.sleep(min(remaining, CAP_WAIT_SLICE_SECONDS))
+                    continue
+            items = await self._wait_and_pop(min(remaining, WAIT_SLICE_SECONDS), allowed, visibility_timeout)
+            if items:
+                return items
+
+    async def _wait_and_pop(self, timeout: float, max_items: int, visibility_timeout: int) -> List[Dict[str, Any]]:
+        # Blocks server-side without removing anything; the caller's loop leases via pop()
+        await self.client.blmove(self.key_main, self.key_main, max(0.01, timeout), "RIGHT", "RIGHT")
+        return []
+
+    async def inflight(self) -> int:
+        """Number of leased, not yet acked/failed messages."""
+        return int(await self.client.zcard(self.key_leases))
+
+    async def ack(self, *msg_ids: str) -> int:
+        if not msg_ids:
+            return 0
+        return int(await self._ack(keys=[self.key_leases], args=[self.msg_prefix, *msg_ids]))
+
+    async def reap_expired(self, limit: int = 1000) -> Dict[str, int]:
+        """Requeue messages whose lease ran out (consumer crashed or too slow)."""
+        requeued, dead = await self._reap(
+            keys=[self.key_leases, self.key_main, self.key_dlq],
+            args=[self.msg_prefix, _now(), int(limit)],
+        )
+        return {"requeued": int(requeued), "dlq": int(dead)}
+
+    async def fail(
+        self, msg_id: str, error: Optional[str] = None, *, permanent: bool = False
+    ) -> Optional[Dict[str, Any]]:
+        """None for unknown ids, else {"dlq": bool, "delay": seconds | None}; permanent=True skips the retries."""
+        result = int(await self._fail(
+            keys=[self.key_msg(msg_id), self.key_dlq, self.key_delayed, self.key_leases],
+            args=[msg_id, _now(), error or "", MAX_BACKOFF_SECONDS, "1" if permanent else "0"],
+        ))
+        if result == -2:
+            return None
+        if result == -1:
+            return {"dlq": True, "delay": None}
+        return {"dlq": False, "delay": result}
+
+    async def _count_due(self) -> int:
+        # Fällig, aber vom Promoter noch nicht verschoben: > 0 über mehrere Ticks = Promoter hängt
+        return int(await self.client.zcount(self.key_delayed, "-inf", _now()))
+
+    async def rate_take(self, count: int, *, rate: float, burst: int) -> Tuple[int, float]:
+        """Take up to `count` tokens from the queue's shared bucket (negative: give back); returns (taken, left)."""
+        taken, left = await self._rate_take(
+            keys=[self.key_rate], args=[int(count), float(rate), max(1, int(burst)), f"{time.time():.6f}"]
+        )
+        return int(taken), float(left)
+
+    async def stats(self) -> Dict[str, Any]:
+        size_main = int(await self.client.llen(self.key_main))
+        size_delayed = int(await self.client.zcard(self.key_delayed))
+        size_dlq = int(await self.client.llen(self.key_dlq))
+        size_inflight = int(await self.client.zcard(self.key_leases))
+        oldest_age = None
+        oldest_main_id = await self.client.lindex(self.key_main, -1)
+        if oldest_main_id:
+            enq = int(await self.client.hget(self.key_msg(oldest_main_id), "enqueued_at") or 0)
+            if enq:
+                oldest_age = _now() - enq
+        return {
+            "backend": "lists",
+            "main": {"size": size_main, "oldest_age_seconds": oldest_age},
+            "delayed": {"size": size_delayed, "due": await self._count_due()},
+            "inflight": {"size": size_inflight},
+            "dlq": {"size": size_dlq},
+        }
+
+    async def dlq_list(self, limit: int = 50, offset: int = 0) -> Dict[str, Any]:
+        offset = max(0, int(offset))
+        if limit <= 0:
+            return {"total": int(await self.client.llen(self.key_dlq)), "items": []}
+        total, *rows = await self._dlq_list(keys=[self.key_dlq], args=[self.msg_prefix, offset, offset + int(limit) - 1])
+        items = [_decode_item(row[0], dict(zip(row[1::2], row[2::2]))) for row in rows]
+        return {"total": int(total), "items": items}
+
+    async def dlq_requeue(self, msg_id: str, delay_seconds: int = 0) -> bool:
+        """Move one message from the DLQ back to the queue; False if it is not (or no longer) in the DLQ."""
+        moved = await self._dlq_requeue_one(
+            keys=[self.key_dlq, self.key_main, self.key_delayed, self.key_msg(msg_id)],
+            args=[msg_id, _now(), max(0, int(delay_seconds))],
+        )
+        return bool(int(moved))
+
+    async def dlq_purge(self, msg_id: Optional[str] = None) -> int:
+        if msg_id:
+            removed = int(await self.client.lrem(self.key_dlq, 1, msg_id))
+            await self.client.unlink(self.key_msg(msg_id))
+            return removed
+        purged = 0
+        while True:
+            removed = int(await self._dlq_purge(keys=[self.key_dlq], args=[self.msg_prefix, DLQ_CHUNK_SIZE]))
+            purged += removed
+            if removed < DLQ_CHUNK_SIZE:
+                return purged
+            await asyncio.sleep(0)
+
+    async def _dlq_requeue_chunk(self, args: List[Any]) -> Tuple[int, int]:
+        matched, scanned = await self._dlq_requeue(keys=[self.key_dlq, self.key_main, self.key_delayed], args=args)
+        return int(matched), int(scanned)
+
+    async def dlq_requeue_matching(
+        self,
+        *,
+        error_contains: Optional[str] = None,
+        min_age_seconds: Optional[int] = None,
+        max_age_seconds: Optional[int] = None,
+        min_attempts: Optional[int] = None,
+        max_attempts: Optional[int] = None,
+        delay_seconds: int = 0,
+        limit: Optional[int] = None,
+        dry_run: bool = False,
+        chunk_size: int = DLQ_CHUNK_SIZE,
+    ) -> Dict[str, int]:
+        """Requeue every DLQ message matching all given filters; returns {"matched", "scanned"}.
+
+        Runs server-side in chunks of `chunk_size` ids per script call. Age is measured from
+        the last failure (updated_at); error_contains is a case-insensitive substring match.
+        With dry_run nothing is moved, only counted.
+        """
+        def opt(value: Optional[int]) -> int:
+            return -1 if value is None else max(0, int(value))
+
+        chunk_size = max(1, int(chunk_size))
+        filters = [
+            (error_contains or "").lower(),
+            opt(min_age_seconds), opt(max_age_seconds), opt(min_attempts), opt(max_attempts),
+            max(0, int(delay_seconds)),
+        ]
+        matched = scanned = cursor = 0
+        while limit is None or matched < limit:
+            budget = -1 if limit is None else limit - matched
+            args = [self.msg_prefix, _now(), cursor, chunk_size, budget, "1" if dry_run else "0", *filters]
+            got, seen = await self._dlq_requeue_chunk(args)
+            matched += got
+            scanned += seen
+            # Treffer sind (außer bei dry_run) aus der Liste entfernt, der Rest rückt nach
+            cursor += seen if dry_run else seen - got
+            if seen < chunk_size:
+                break
+            await asyncio.sleep(0)
+        return {"matched": matched, "scanned": scanned}
@@ -0,0 +1,136 @@
+"""
+Resilience-Bausteine für Upstream-Aufrufe
+
+- CircuitBreaker: closed → open nach N aufeinanderfolgenden Fehlern,
+  nach `reset_timeout` half-open mit genau einem Probe-Request
+- RetryBudget: Retries dürfen nur einen Anteil der Requests ausmachen
+  (Token-Bucket), damit Retries bei Ausfällen keine Lastspitze erzeugen
+- backoff_delay: exponentielles Backoff mit Full Jitter
+"""
+
+from __future__ import annotations
+
+import random
+import time
+from typing import Any, Callable, Dict
+
+CLOSED = "closed"
+OPEN = "open"
+HALF_OPEN = "half_open"
+
+
+class CircuitBreaker:
+    def __init__(
+        self,
+        failure_threshold: int = 5,
+        reset_timeout: float = 30.0,
+        clock: Callable[[], float] = time.monotonic,
+    ) -> None:
+        self.failure_threshold = max(1, failure_threshold)
+        self.reset_timeout = reset_timeout
+        self._clock = clock
+        self._state = CLOSED
+        self._failures = 0
+        self._opened_at = 0.0
+        self._probe_in_flight = False
+        self.rejected = 0
+        self.opened_count = 0
+
+    @property
+    def state(self) -> str:
+        if self._state == OPEN and self._clock() - self._opened_at >= self.reset_timeout:
+            self._state = HALF_OPEN
+            self._probe_in_flight = False
+        return self._state
+
+    def allow(self) -> bool:
+        """True if a call may proceed; in half-open only one probe is let through."""
+        state = self.state
+        if state == CLOSED:
+            return True
+        if state == HALF_OPEN and not self._probe_in_flight:
+            self._probe_in_flight = True
+            return True
+        self.rejected += 1
+        return False
+
+    def record_success(self) -> None:
+        self._state = CLOSED
+        self._failures = 0
+        self._probe_in_flight = False
+
+    def record_failure(self) -> None:
+        if self._state == HALF_OPEN:
+            self._trip()
+            return
+        self._failures += 1
+        if self._state == CLOSED and self._failures >= self.failure_threshold:
+            self._trip()
+
+    def release(self) -> None:
+        """Give the half-open probe slot back when a call ended without a verdict."""
+        self._probe_in_flight = False
+
+    def _trip(self) -> None:
+        self._state = OPEN
+        self._opened_at = self._clock()
+        self._probe_in_flight = False
+        self.opened_count += 1
+
+    def snapshot(self) -> Dict[str, Any]:
+        return {
+            "state": self.state,
+            "consecutive_failures": self._failures,
+            "rejected": self.rejected,
+            "opened_count": self.opened_count,
+        }
+
+
+class RetryBudget:
+    """Token bucket: each request deposits `ratio` tokens, each retry costs one.
+
+    `min_per_second` keeps a small trickle of retries available at low traffic.
+    """
+
+    def __init__(
+        self,
+        ratio: float = 0.2,
+        min_per_second: float = 1.0,
+        max_tokens: float = 10.0,
+        clock: Callable[[], float] = time.monotonic,
+    ) -> None:
+        self.ratio = ratio
+        self.min_per_second = min_per_second
+        self.max_tokens = max_tokens
+        self._clock = clock
+        self._tokens = max_tokens
+        self._last = clock()
+        self.spent = 0
+        self.denied = 0
+
+    def _refill(self) -> None:
+        now = self._clock()
+        self._tokens = min(self.max_tokens, self._tokens + (now - self._last) * self.min_per_second)
+        self._last = now
+
+    def record_request(self) -> None:
+        self._refill()
+        self._tokens = min(self.max_tokens, self._tokens + self.ratio)
+
+    def try_spend(self) -> bool:
+        self._refill()
+        if self._tokens >= 1.0:
+            self._tokens -= 1.0
+            self.spent += 1
+            return True
+        self.denied += 1
+        return False
+
+    def snapshot(self) -> Dict[str, Any]:
+        self._refill()
+        return {"tokens": round(self._tokens, 2), "spent": self.spent, "denied": self.denied}
+
+
+def backoff_delay(attempt: int, base: float = 0.2, cap: float = 5.0) -> float:
+    """Full-jitter exponential backoff for retry number `attempt` (1-based)."""
+    return random.uniform(0.0, min(cap, base * (2 ** max(0, attempt - 1))))
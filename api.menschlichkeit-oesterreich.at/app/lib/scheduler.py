@@ -0,0 +1,322 @@
+"""
+Wiederkehrende Jobs (Cron) auf Basis der Delayed-Queue
+
+    SCHEDULED_JOBS='[{"name": "civicrm-nightly-sync", "cron": "0 2 * * *",
+                      "queue": "sync", "payload": {"webhook": "sync"},
+                      "jitter_seconds": 600, "misfire": "once"}]'
+
+- Jeder Job erzeugt pro Termin genau eine Queue-Message (payload + `job`,
+  `scheduled_for`); ausgeführt wird sie vom Webhook-Dispatcher bzw. den
+  Consumern der Ziel-Queue – mit deren Retry/DLQ
+- Ein Tick (alle SCHEDULER_TICK_SECONDS, in jedem API-Worker) stellt den
+  nächsten Termin ein, sobald er innerhalb von `lookahead_seconds` liegt:
+  push mit delay_seconds = Termin − jetzt + Jitter, also ein ZADD in die
+  Delayed-Zset (O(log n)); den genauen Zeitpunkt übernimmt der Promoter
+- Einmaliges Auslösen über mehrere Worker: Idempotency-Key
+  `scheduler:<job>:<termin>` beim push, dazu ein Cursor je Job (letzter
+  eingestellter Termin), der nur vorwärts gesetzt wird (Redis: Lua-Skript,
+  SQLite: MAX() in der counters-Tabelle)
+- Jitter ist deterministisch je Job und Termin: alle Worker rechnen denselben
+  Zeitpunkt; Jobs mit gleichem Cron-Ausdruck treffen das CRM nicht mehr in
+  derselben Minute
+- Misfire (Termin länger als misfire_grace_seconds verpasst, z.B. Deploy oder
+  Ausfall): `skip` lässt verpasste Termine aus, `once` holt genau einen nach
+- Cron-Ausdrücke: 5 Felder (Minute Stunde Tag Monat Wochentag) mit `*`, Listen,
+  Bereichen, Schritten, JAN–DEC / SUN–SAT sowie @hourly/@daily/@weekly/
+  @monthly/@yearly; ausgewertet in SCHEDULER_TIMEZONE (Wanduhrzeit, DST-fest).
+  Ein geänderter Ausdruck startet den Job neu (kein rückwirkendes Auslösen).
+"""
+
+from __future__ import annotations
+
+import hashlib
+import json
+import logging
+import time
+import uuid
+from dataclasses import dataclass, field
+from datetime import datetime, timedelta, timezone, tzinfo
+from typing import Any, Callable, Dict, FrozenSet, Iterable, List, Optional, Tuple
+
+logger = logging.getLogger("moe-api.scheduler")
+
+CURSOR_KEY = "moe:scheduler:cursors"
+CURSOR_PREFIX = "scheduler:"  # SQLite: Zeilen in der counters-Tabelle
+MISFIRE_POLICIES = ("skip", "once")
+MAX_SEARCH_STEPS = 5000  # Tage/Stunden/Minuten-Sprünge; reicht für jeden gültigen Ausdruck
+
+_MACROS = {
+    "@yearly": "0 0 1 1 *",
+    "@annually": "0 0 1 1 *",
+    "@monthly": "0 0 1 * *",
+    "@weekly": "0 0 * * 0",
+    "@daily": "0 0 * * *",
+    "@midnight": "0 0 * * *",
+    "@hourly": "0 * * * *",
+}
+_MONTHS = {name: i for i, name in enumerate(
+    ["JAN", "FEB", "MAR", "APR", "MAY", "JUN", "JUL", "AUG", "SEP", "OCT", "NOV", "DEC"], start=1)}
+_DAYS = {name: i for i, name in enumerate(["SUN", "MON", "TUE", "WED", "THU", "FRI", "SAT"])}
+
+
+def _parse_field(raw: str, low: int, high: int, names: Dict[str, int]) -> FrozenSet[int]:
+    values = set()
+    for part in raw.upper().split(","):
+        rng, _, step_raw = part.partition("/")
+        step = int(step_raw) if step_raw else 1
+        if rng == "*":
+            start, end = low, high
+        else:
+            first, _, last = rng.partition("-")
+            start = names[first] if first in names else int(first)
+            end = (names[last] if last in names else int(last)) if last else (high if step_raw else start)
+        if step < 1 or not low <= start <= end <= high:
+            raise ValueError(f"Cron field {raw!r} out of range {low}-{high}")
+        values.update(range(start, end + 1, step))
+    return frozenset(values)
+
+
+class CronExpr:
+    def __init__(self, expr: str) -> None:
+        self.expr = expr.strip()
+        fields = _MACROS.get(self.expr.lower(), self.expr).split()
+        if len(fields) != 5:
+            raise ValueError(f"Cron expression {expr!r} must have 5 fields")
+        try:
+            self.minutes = sorted(_parse_field(fields[0], 0, 59, {}))
+            self.hours = sorted(_parse_field(fields[1], 0, 23, {}))
+            self.days = _parse_field(fields[2], 1, 31, {})
+            self.months = _parse_field(fields[3], 1, 12, _MONTHS)
+            self.weekdays = frozenset(d % 7 for d in _parse_field(fields[4], 0, 7, _DAYS))  # 7 = Sonntag
+        except (KeyError, ValueError) as exc:
+            raise ValueError(f"Invalid cron expression {expr!r}: {exc}") from None
+        # Cron-Semantik: sind Tag und Wochentag beide eingeschränkt, genügt einer von beiden
+        self._dom_any = fields[2] == "*"
+        self._dow_any = fields[4] == "*"
+
+    def _day_matches(self, day: datetime) -> bool:
+        dom = day.day in self.days
+        dow = (day.weekday() + 1) % 7 in self.weekdays
+        if self._dom_any or self._dow_any:
+            return dom and dow
+        return dom or dow
+
+    def next_after(self, ts: int, tz: tzinfo) -> int:
+        """First matching minute strictly after `ts` (Unix seconds), evaluated as wall-clock time in `tz`."""
+        local = datetime.fromtimestamp(ts, tz).replace(tzinfo=None, second=0, microsecond=0)
+        candidate = local + timedelta(minutes=1)
+        for _ in range(MAX_SEARCH_STEPS):
+            if candidate.month not in self.months or not self._day_matches(candidate):
+                candidate = candidate.replace(hour=0, minute=0) + timedelta(days=1)
+                continue
+            hour = next((h for h in self.hours if h >= candidate.hour), None)
+            if hour is None:
+                candidate = candidate.replace(hour=0, minute=0) + timedelta(days=1)
+                continue
+            if hour != candidate.hour:
+                candidate = candidate.replace(hour=hour, minute=0)
+            minute = next((m for m in self.minutes if m >= candidate.minute), None)
+            if minute is None:
+                candidate = candidate.replace(minute=0) + timedelta(hours=1)
+                continue
+            candidate = candidate.replace(minute=minute)
+            at = int(candidate.replace(tzinfo=tz).timestamp())
+            if at > ts:  # DST: eine Wanduhrzeit der doppelten Stunde kann vor ts liegen
+                return at
+            candidate += timedelta(minutes=1)
+        raise ValueError(f"Cron expression {self.expr!r} never matches")
+
+
+@dataclass(frozen=True)
+class ScheduledJob:
+    name: str
+    cron: CronExpr
+    queue: str = "webhooks"
+    payload: Dict[str, Any] = field(default_factory=dict)
+    jitter_seconds: int = 0
+    misfire: str = "skip"
+    misfire_grace_seconds: int = 300
+    max_attempts: int = 5
+
+    @property
+    def cursor_name(self) -> str:
+        # Fingerprint des Ausdrucks: ein geänderter Cron startet mit frischem Cursor
+        return f"{self.name}:{hashlib.sha1(self.cron.expr.encode('utf-8')).hexdigest()[:8]}"
+
+    def jitter(self, at: int) -> int:
+        if self.jitter_seconds <= 0:
+            return 0
+        digest = hashlib.sha256(f"{self.name}:{at}".encode("utf-8")).hexdigest()
+        return int(digest, 16) % (self.jitter_seconds + 1)
+
+
+def parse_jobs(raw: str) -> Dict[str, ScheduledJob]:
+    """Parse SCHEDULED_JOBS (JSON list); raises ValueError on malformed entries."""
+    try:
+        entries = json.loads(raw or "[]")
+    except json.JSONDecodeError as exc:
+        raise ValueError(f"not valid JSON: {exc}") from None
+    if not isinstance(entries, list):
+        raise ValueError("expected a JSON list of jobs")
+    jobs: Dict[str, ScheduledJob] = {}
+    for entry in entries:
+        if not isinstance(entry, dict) or not entry.get("name") or not entry.get("cron"):
+            raise ValueError(f"job needs name and cron: {entry!r}")
+        name = str(entry["name"])
+        misfire = str(entry.get("misfire", "skip"))
+        if misfire not in MISFIRE_POLICIES:
+            raise ValueError(f"misfire for {name!r} must be one of {', '.join(MISFIRE_POLICIES)}")
+        if name in jobs:
+            raise ValueError(f"duplicate job {name!r}")
+        cron = CronExpr(str(entry["cron"]))
+        cron.next_after(0, timezone.utc)  # e.g. "0 0 30 2 *" never matches
+        jobs[name] = ScheduledJob(
+            name=name,
+            cron=cron,
+            queue=str(entry.get("queue", "webhooks")),
+            payload=dict(entry.get("payload") or {}),
+            jitter_seconds=max(0, int(entry.get("jitter_seconds", 0))),
+            misfire=misfire,
+            misfire_grace_seconds=max(0, int(entry.get("misfire_grace_seconds", 300))),
+            max_attempts=max(1, int(entry.get("max_attempts", 5))),
+        )
+    return jobs
+
+
+# --- Cursor-Speicher -------------------------------------------------------------------
+
+_ADVANCE_LUA = """
+local current = redis.call('HGET', KEYS[1], ARGV[1])
+if not current or tonumber(current) < tonumber(ARGV[2]) then
+  redis.call('HSET', KEYS[1], ARGV[1], ARGV[2])
+  return 1
+end
+return 0
+"""
+
+
+class RedisCursorStore:
+    def __init__(self, client: Any, key: str = CURSOR_KEY) -> None:
+        self.client = client
+        self.key = key
+        self._advance = client.register_script(_ADVANCE_LUA)
+
+    async def get(self, names: Iterable[str]) -> Dict[str, Optional[int]]:
+        names = list(names)
+        if not names:
+            return {}
+        values = await self.client.hmget(self.key, names)
+        return {name: int(value) if value is not None else None for name, value in zip(names, values)}
+
+    async def advance(self, name: str, value: int) -> None:
+        await self._advance(keys=[self.key], args=[name, int(value)])
+
+
+class SqliteCursorStore:
+    def __init__(self, store: Any) -> None:
+        self.store = store
+
+    async def get(self, names: Iterable[str]) -> Dict[str, Optional[int]]:
+        names = list(names)
+
+        def op(conn: Any) -> Dict[str, Optional[int]]:
+            rows = conn.execute(
+                f"SELECT name, value FROM counters WHERE name IN ({','.join('?' * len(names))})",
+                [CURSOR_PREFIX + name for name in names],
+            ).fetchall()
+            found = {row["name"][len(CURSOR_PREFIX):]: int(row["value"]) for row in rows}
+            return {name: found.get(name) for name in names}
+
+        return await self.store.read(op) if names else {}
+
+    async def advance(self, name: str, value: int) -> None:
+        def op(conn: Any) -> None:
+            conn.execute(
+                "INSERT INTO counters (name, value) VALUES (?, ?)"
+                " ON CONFLICT(name) DO UPDATE SET value = MAX(value, excluded.value)",
+                (CURSOR_PREFIX + name, int(value)),
+            )
+
+        await self.store.write(op)
+
+
+# --- Scheduler -----------------------------------------------------------------------
+
+
+class RecurringScheduler:
+    def __init__(
+        self,
+        jobs: Dict[str, ScheduledJob],
+        queue_for: Callable[[str], Any],
+        cursors: Callable[[], Any],
+        *,
+        tz: tzinfo,
+        lookahead_seconds: int = 300,
+    ) -> None:
+        self.jobs = jobs
+        self._queue_for = queue_for
+        self._cursors = cursors
+        self.tz = tz
+        self.lookahead_seconds = max(0, int(lookahead_seconds))
+
+    async def tick(self, now: Optional[int] = None) -> List[Tuple[str, int]]:
+        """Enqueue every occurrence due within the lookahead; returns (job, scheduled_for) newly enqueued."""
+        now = int(now if now is not None else time.time())
+        cursors = self._cursors()
+        state = await cursors.get(job.cursor_name for job in self.jobs.values())
+        fired: List[Tuple[str, int]] = []
+        for job in self.jobs.values():
+            cursor = state.get(job.cursor_name)
+            at = job.cron.next_after(cursor if cursor is not None else now, self.tz)
+            if cursor is not None and at < now - job.misfire_grace_seconds:
+                await cursors.advance(job.cursor_name, now)
+                if job.misfire == "once":
+                    logger.warning("Job %s missed %s; running once now", job.name, at)
+                    if await self._enqueue(job, at, now, delay_seconds=0):
+                        fired.append((job.name, at))
+                    continue
+                logger.warning("Job %s missed runs since %s; skipping to the next one", job.name, at)
+                at = job.cron.next_after(now, self.tz)
+            if at - now > self.lookahead_seconds:
+                continue
+            if await self._enqueue(job, at, now, delay_seconds=max(0, at - now) + job.jitter(at)):
+                fired.append((job.name, at))
+            await cursors.advance(job.cursor_name, at)
+        return fired
+
+    async def _enqueue(self, job: ScheduledJob, at: int, now: int, *, delay_seconds: int) -> bool:
+        payload = {**job.payload, "job": job.name, "scheduled_for": at}
+        msg_id, duplicate = await self._queue_for(job.queue).push(
+            str(uuid.uuid4()),
+            payload,
+            max_attempts=job.max_attempts,
+            delay_seconds=delay_seconds,
+            idempotency_key=f"scheduler:{job.name}:{at}",
+        )
+        if not duplicate:
+            logger.info("Job %s scheduled for %s as %s (runs in %ss)", job.name, at, msg_id, delay_seconds)
+        return not duplicate
+
+    async def run_now(self, name: str) -> str:
+        """Enqueue an extra, immediate run outside the schedule; returns the message id."""
+        job = self.jobs[name]
+        payload = {**job.payload, "job": job.name, "scheduled_for": int(time.time()), "manual": True}
+        msg_id, _ = await self._queue_for(job.queue).push(str(uuid.uuid4()), payload, max_attempts=job.max_attempts)
+        return msg_id
+
+    async def describe(self, now: Optional[int] = None) -> List[Dict[str, Any]]:
+        now = int(now if now is not None else time.time())
+        state = await self._cursors().get(job.cursor_name for job in self.jobs.values())
+        described = []
+        for job in self.jobs.values():
+            cursor = state.get(job.cursor_name)
+            described.append({
+                "name": job.name,
+                "cron": job.cron.expr,
+                "queue": job.queue,
+                "jitter_seconds": job.jitter_seconds,
+                "misfire": job.misfire,
+                "last_scheduled_for": cursor,
+                "next_run": job.cron.next_after(max(cursor or 0, now), self.tz),
+            })
+        return described
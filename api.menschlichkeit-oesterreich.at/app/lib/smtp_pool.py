@@ -0,0 +1,265 @@
+"""
+Gepoolter SMTP-Versand mit persistenten, authentifizierten Verbindungen
+
+- Bis zu SMTP_POOL_SIZE Verbindungen, bei Bedarf geöffnet: connect → EHLO →
+  STARTTLS (SMTP_USE_TLS) bzw. implizites TLS (SMTP_SSL) → LOGIN, einmal pro
+  Verbindung statt einmal pro Mail
+- smtplib blockiert: jede SMTP-Operation läuft per asyncio.to_thread, der Event
+  Loop wartet nur auf `await pool.send(msg)`; eine Verbindung gehört während
+  eines Versands genau einem Task
+- Nach SMTP_MAX_MESSAGES_PER_CONNECTION Mails wird die Verbindung per QUIT
+  geschlossen und neu aufgebaut (Provider-Limits pro Session)
+- Lag eine Verbindung länger als SMTP_IDLE_SECONDS still, prüft ein NOOP sie vor
+  dem nächsten Versand; tote Verbindungen werden verworfen
+- Verbindungsfehler während des Versands (Server hat getrennt, Timeout, 421):
+  einmal auf einer frischen Verbindung wiederholen
+- SmtpSendError.permanent: True bei 5xx auf Absender/Empfänger/Inhalt (Retry
+  zwecklos), sonst False (temporär, später erneut versuchen)
+"""
+
+from __future__ import annotations
+
+import asyncio
+import logging
+import os
+import smtplib
+import ssl
+import time
+from dataclasses import dataclass
+from email.message import EmailMessage
+from typing import Any, Dict, List, Optional
+
+logger = logging.getLogger("moe-api.smtp")
+
+
+def _env_str(name: str, default: str = "") -> str:
+    raw = os.getenv(name)
+    return raw.strip() if raw is not None else default
+
+
+def _env_int(name: str, default: int) -> int:
+    raw = os.getenv(name)
+    if raw is None or raw.strip() == "":
+        return default
+    try:
+        return int(raw)
+    except ValueError as exc:
+        raise RuntimeError(f"Environment variable {name} must be an integer") from exc
+
+
+def _env_bool(name: str, default: bool) -> bool:
+    raw = os.getenv(name)
+    if raw is None or raw.strip() == "":
+        return default
+    return raw.strip().lower() in {"1", "true", "yes", "y", "on"}
+
+
+class SmtpSendError(RuntimeError):
+    def __init__(self, detail: str, *, permanent: bool = False, code: Optional[int] = None) -> None:
+        super().__init__(detail)
+        self.permanent = permanent
+        self.code = code
+
+
+@dataclass(frozen=True)
+class SmtpConfig:
+    host: str = ""
+    port: int = 587
+    user: str = ""
+    password: str = ""
+    use_tls: bool = True
+    use_ssl: bool = False
+    timeout: float = 20.0
+    pool_size: int = 2
+    max_messages_per_connection: int = 100
+    idle_seconds: float = 30.0
+
+    @classmethod
+    def from_env(cls) -> "SmtpConfig":
+        use_ssl = _env_bool("SMTP_SSL", False)
+        return cls(
+            host=_env_str("SMTP_HOST"),
+            port=_env_int("SMTP_PORT", 465 if use_ssl else 587),
+            user=_env_str("SMTP_USER"),
+            password=_env_str("SMTP_PASSWORD"),
+            use_tls=_env_bool("SMTP_USE_TLS", True) and not use_ssl,
+            use_ssl=use_ssl,
+            timeout=float(_env_int("SMTP_TIMEOUT_SECONDS", 20)),
+            pool_size=max(1, _env_int("SMTP_POOL_SIZE", 2)),
+            max_messages_per_connection=max(1, _env_int("SMTP_MAX_MESSAGES_PER_CONNECTION", 100)),
+            idle_seconds=float(max(0, _env_int("SMTP_IDLE_SECONDS", 30))),
+        )
+
+
+class _Connection:
+    def __init__(self, smtp: smtplib.SMTP) -> None:
+        self.smtp = smtp
+        self.sent = 0
+        self.last_used = time.monotonic()
+
+
+def _is_permanent(exc: Exception) -> bool:
+    if isinstance(exc, smtplib.SMTPRecipientsRefused):
+        return all(code >= 500 for code, _ in exc.recipients.values())
+    if isinstance(exc, smtplib.SMTPNotSupportedError):
+        return True  # e.g. SMTPUTF8 address on a server without support
+    if isinstance(exc, (smtplib.SMTPSenderRefused, smtplib.SMTPDataError)):
+        return exc.smtp_code >= 500
+    return False  # auth errors included: a configuration problem, not a property of the message
+
+
+def _is_connection_error(exc: Exception) -> bool:
+    if isinstance(exc, (smtplib.SMTPServerDisconnected, smtplib.SMTPConnectError)):
+        return True
+    if isinstance(exc, smtplib.SMTPResponseException):
+        return exc.smtp_code == 421
+    # smtplib.SMTPException derives from OSError; only socket/TLS errors count here
+    return isinstance(exc, OSError) and not isinstance(exc, smtplib.SMTPException)
+
+
+class SmtpPool:
+    def __init__(self, config: SmtpConfig) -> None:
+        self.config = config
+        self._idle: List[_Connection] = []
+        self._slots: Optional[asyncio.Semaphore] = None
+        self._closed = False
+        self._counters: Dict[str, int] = dict.fromkeys(
+            ("sent", "connects", "reconnects", "recycled", "stale", "failed"), 0
+        )
+
+    @property
+    def configured(self) -> bool:
+        return bool(self.config.host)
+
+    def _open(self) -> _Connection:
+        """Connect, secure and authenticate one connection (blocking; runs in a thread)."""
+        cfg = self.config
+        if cfg.use_ssl:
+            smtp = smtplib.SMTP_SSL(cfg.host, cfg.port, timeout=cfg.timeout, context=ssl.create_default_context())
+        else:
+            smtp = smtplib.SMTP(cfg.host, cfg.port, timeout=cfg.timeout)
+        try:
+            smtp.ehlo()
+            if cfg.use_tls:
+                smtp.starttls(context=ssl.create_default_context())
+                smtp.ehlo()
+            if cfg.user:
+                smtp.login(cfg.user, cfg.password)
+        except Exception:
+            self._discard_sync(smtp)
+            raise
+        self._counters["connects"] += 1
+        return _Connection(smtp)
+
+    @staticmethod
+    def _discard_sync(smtp: smtplib.SMTP) -> None:
+        try:
+            smtp.quit()
+        except Exception:
+            try:
+                smtp.close()
+            except Exception:
+                pass
+
+    def _alive(self, conn: _Connection) -> bool:
+        try:
+            return conn.smtp.noop()[0] == 250
+        except Exception:
+            return False
+
+    def _checkout_sync(self, conn: Optional[_Connection]) -> _Connection:
+        if conn is not None and time.monotonic() - conn.last_used > self.config.idle_seconds:
+            if not self._alive(conn):
+                self._counters["stale"] += 1
+                self._discard_sync(conn.smtp)
+                conn = None
+        return conn if conn is not None else self._open()
+
+    def _send_sync(self, conn: _Connection, msg: EmailMessage) -> None:
+        conn.smtp.send_message(msg)
+        conn.sent += 1
+        conn.last_used = time.monotonic()
+
+    async def send(self, msg: EmailMessage) -> None:
+        """Deliver one message over a pooled connection; raises SmtpSendError."""
+        if not self.configured:
+            raise SmtpSendError("SMTP not configured")
+        if self._closed:
+            raise SmtpSendError("SMTP pool closed")
+        if self._slots is None:
+            self._slots = asyncio.Semaphore(self.config.pool_size)
+        async with self._slots:
+            conn = self._idle.pop() if self._idle else None
+            fresh = conn is None
+            try:
+                conn = await asyncio.to_thread(self._checkout_sync, conn)
+            except Exception as exc:
+                self._counters["failed"] += 1
+                raise SmtpSendError(f"SMTP connect failed: {exc}", permanent=False) from exc
+            try:
+                await asyncio.to_thread(self._send_sync, conn, msg)
+            except Exception as exc:
+                if not _is_connection_error(exc) or fresh:
+                    raise await self._failure(conn, exc) from exc
+                # Reused connection went away under us: one retry on a fresh one
+                logger.info("SMTP connection lost after %s messages, reconnecting: %s", conn.sent, exc)
+                self._counters["reconnects"] += 1
+                await asyncio.to_thread(self._discard_sync, conn.smtp)
+                conn = None
+                try:
+                    conn = await asyncio.to_thread(self._open)
+                    await asyncio.to_thread(self._send_sync, conn, msg)
+                except Exception as retry_exc:
+                    raise await self._failure(conn, retry_exc) from retry_exc
+            self._counters["sent"] += 1
+            await self._checkin(conn)
+
+    async def _failure(self, conn: Optional[_Connection], exc: Exception) -> SmtpSendError:
+        self._counters["failed"] += 1
+        if conn is not None:
+            if _is_connection_error(exc):
+                await asyncio.to_thread(self._discard_sync, conn.smtp)
+            else:
+                await self._checkin(conn)  # session is still usable (smtplib sent RSET)
+        return SmtpSendError(
+            f"SMTP send failed: {exc}", permanent=_is_permanent(exc), code=getattr(exc, "smtp_code", None)
+        )
+
+    async def _checkin(self, conn: _Connection) -> None:
+        if self._closed or conn.sent >= self.config.max_messages_per_connection:
+            if not self._closed:
+                self._counters["recycled"] += 1
+            await asyncio.to_thread(self._discard_sync, conn.smtp)
+            return
+        self._idle.append(conn)
+
+    def snapshot(self) -> Dict[str, Any]:
+        return {
+            **self._counters,
+            "pool_size": self.config.pool_size,
+            "idle_connections": len(self._idle),
+            "max_messages_per_connection": self.config.max_messages_per_connection,
+        }
+
+    async def close(self) -> None:
+        self._closed = True
+        idle, self._idle = self._idle, []
+        for conn in idle:
+            await asyncio.to_thread(self._discard_sync, conn.smtp)
+
+
+_shared_pool: Optional[SmtpPool] = None
+
+
+def get_smtp_pool() -> SmtpPool:
+    global _shared_pool
+    if _shared_pool is None:
+        _shared_pool = SmtpPool(SmtpConfig.from_env())
+    return _shared_pool
+
+
+async def close_smtp_pool() -> None:
+    global _shared_pool
+    if _shared_pool is not None:
+        await _shared_pool.close()
+        _shared_pool = None
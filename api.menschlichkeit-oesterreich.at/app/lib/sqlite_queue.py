@@ -0,0 +1,590 @@
+"""
+Eingebettetes SQLite-Backend (WAL) für die Webhook-Queue (QUEUE_BACKEND=sqlite)
+
+Für kleine Deployments und CI ohne Redis: gleiche Methoden und Rückgabeformen
+wie RedisQueue (push/pop/ack/fail/reap_expired, DLQ, Delayed, Idempotency)
+plus ein persistenter Zähler für Belegnummern (incr) und ein geteilter Token
+Bucket pro Queue (rate_take, Tabelle `rate_limits`).
+
+Datenmodell – eine Zeile pro Message in `queue_messages`, Zustand in `state`:
+
+- `ready`   wartet; `due_at` = frühester Auslieferungszeitpunkt. Delayed- und
+  Retry-Messages sind ebenfalls `ready`, nur mit `due_at` in der Zukunft –
+  der Index (queue, state, due_at) macht ein separates Promote überflüssig.
+- `leased`  ausgeliefert; `due_at` = Ablauf der Visibility-Timeout-Lease
+- `dead`    DLQ; `due_at` = Zeitpunkt des endgültigen Fehlschlags
+
+Alle Zugriffe laufen über eine Verbindung in einem eigenen Thread
+(SqliteStore, von allen benannten Queues einer Datei geteilt). Schreibende
+Operationen, die gleichzeitig eintreffen, werden gesammelt und gemeinsam in
+einer Transaktion (BEGIN IMMEDIATE … COMMIT) ausgeführt – jede in einem eigenen
+SAVEPOINT, sodass ein Fehler nur die eigene Operation zurückrollt. Mehrere
+Prozesse dürfen dieselbe Datei nutzen (WAL, busy_timeout).
+
+pop_wait pollt in kurzen Intervallen; ein push im selben Prozess weckt
+Wartende sofort.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import hashlib
+import json
+import logging
+import os
+import sqlite3
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, List, Optional, Tuple, Union
+
+from .redis_queue import (
+    DEFAULT_NAMESPACE,
+    DEFAULT_VISIBILITY_TIMEOUT_SECONDS,
+    DLQ_CHUNK_SIZE,
+    IDEMPOTENCY_TTL_SECONDS,
+    MAX_BACKOFF_SECONDS,
+    PROMOTE_CHUNK_SIZE,
+)
+
+logger = logging.getLogger("moe-api.sqlite-queue")
+
+DEFAULT_PATH = "queue.sqlite3"
+MAX_WRITE_BATCH = 256
+POLL_INTERVAL_SECONDS = 0.25
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS queue_messages (
+    queue        TEXT    NOT NULL,
+    id           TEXT    NOT NULL,
+    payload      TEXT    NOT NULL,
+    attempts     INTEGER NOT NULL DEFAULT 0,
+    max_attempts INTEGER NOT NULL,
+    enqueued_at  INTEGER NOT NULL,
+    updated_at   INTEGER NOT NULL,
+    last_error   TEXT,
+    state        TEXT    NOT NULL,
+    due_at       INTEGER NOT NULL,
+    PRIMARY KEY (queue, id)
+);
+CREATE INDEX IF NOT EXISTS queue_messages_due ON queue_messages (queue, state, due_at);
+CREATE TABLE IF NOT EXISTS queue_idempotency (
+    queue      TEXT    NOT NULL,
+    key_hash   TEXT    NOT NULL,
+    id         TEXT    NOT NULL,
+    expires_at INTEGER NOT NULL,
+    PRIMARY KEY (queue, key_hash)
+);
+CREATE INDEX IF NOT EXISTS queue_idempotency_expiry ON queue_idempotency (expires_at);
+CREATE TABLE IF NOT EXISTS counters (
+    name  TEXT PRIMARY KEY,
+    value INTEGER NOT NULL
+);
+CREATE TABLE IF NOT EXISTS rate_limits (
+    name       TEXT PRIMARY KEY,
+    tokens     REAL NOT NULL,
+    updated_at REAL NOT NULL
+);
+"""
+
+_COLUMNS = "id, payload, attempts, max_attempts, enqueued_at, updated_at, last_error"
+
+
+def _now() -> int:
+    return int(time.time())
+
+
+def _decode_row(row: sqlite3.Row) -> Dict[str, Any]:
+    try:
+        payload = json.loads(row["payload"] or "{}")
+    except Exception:
+        payload = {}
+    return {
+        "id": row["id"],
+        "payload": payload,
+        "attempts": int(row["attempts"]),
+        "max_attempts": int(row["max_attempts"]),
+        "enqueued_at": int(row["enqueued_at"]),
+        "updated_at": int(row["updated_at"]),
+        "last_error": row["last_error"] or None,
+    }
+
+
+def _connect(path: str) -> sqlite3.Connection:
+    if path != ":memory:" and os.path.dirname(path):
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+    # isolation_level=None: Transaktionen werden explizit gesteuert (BEGIN IMMEDIATE / SAVEPOINT)
+    conn = sqlite3.connect(path, isolation_level=None, check_same_thread=False)
+    conn.row_factory = sqlite3.Row
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.execute("PRAGMA synchronous=NORMAL")
+    conn.execute("PRAGMA busy_timeout=5000")
+    conn.executescript(_SCHEMA)
+    return conn
+
+
+class SqliteStore:
+    """Eine SQLite-Datei: Verbindung, Schreib-Thread und Group Commit; von allen Queues geteilt."""
+
+    def __init__(self, path: str = DEFAULT_PATH) -> None:
+        self.path = path
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="sqlite-queue")
+        self._conn: Optional[sqlite3.Connection] = None
+        self._pending: List[Tuple[Callable[[sqlite3.Connection], Any], asyncio.Future]] = []
+        self._flusher: Optional[asyncio.Task] = None
+
+    def _connection(self) -> sqlite3.Connection:
+        if self._conn is None:
+            self._conn = _connect(self.path)
+        return self._conn
+
+    async def read(self, fn: Callable[[sqlite3.Connection], Any]) -> Any:
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self._executor, lambda: fn(self._connection()))
+
+    async def write(self, fn: Callable[[sqlite3.Connection], Any]) -> Any:
+        """Queue `fn` for the next group commit and wait for its result."""
+        future = asyncio.get_running_loop().create_future()
+        self._pending.append((fn, future))
+        if self._flusher is None or self._flusher.done():
+            self._flusher = asyncio.create_task(self._flush())
+        return await future
+
+    async def _flush(self) -> None:
+        loop = asyncio.get_running_loop()
+        while self._pending:
+            batch, self._pending = self._pending[:MAX_WRITE_BATCH], self._pending[MAX_WRITE_BATCH:]
+            try:
+                results = await loop.run_in_executor(self._executor, self._run_batch, [fn for fn, _ in batch])
+            except Exception as exc:  # BEGIN/COMMIT selbst gescheitert (z.B. database is locked)
+                results = [exc] * len(batch)
+            for (_, future), result in zip(batch, results):
+                if future.done():
+                    continue
+                if isinstance(result, Exception):
+                    future.set_exception(result)
+                else:
+                    future.set_result(result)
+
+    def _run_batch(self, fns: List[Callable[[sqlite3.Connection], Any]]) -> List[Any]:
+        conn = self._connection()
+        results: List[Any] = []
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            for fn in fns:
+                conn.execute("SAVEPOINT op")
+                try:
+                    results.append(fn(conn))
+                    conn.execute("RELEASE op")
+                except Exception as exc:
+                    conn.execute("ROLLBACK TO op")
+                    conn.execute("RELEASE op")
+                    results.append(exc)
+            conn.execute("COMMIT")
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+        return results
+
+    async def incr(self, name: str) -> int:
+        """Atomically increment a persistent counter (receipt numbers) and return the new value."""
+
+        def op(conn: sqlite3.Connection) -> int:
+            return int(conn.execute(
+                "INSERT INTO counters (name, value) VALUES (?, 1)"
+                " ON CONFLICT(name) DO UPDATE SET value = value + 1 RETURNING value",
+                (name,),
+            ).fetchone()[0])
+
+        return await self.write(op)
+
+    async def close(self) -> None:
+        if self._flusher is not None:
+            await asyncio.gather(self._flusher, return_exceptions=True)
+        if self._conn is not None:
+            await asyncio.get_running_loop().run_in_executor(self._executor, self._conn.close)
+            self._conn = None
+        self._executor.shutdown(wait=False)
+
+
+class SqliteQueue:
+    """Queue-Operationen auf einer SQLite-Datei (Pfad oder geteilter SqliteStore)."""
+
+    def __init__(self, store: Union[str, SqliteStore] = DEFAULT_PATH, namespace: str = DEFAULT_NAMESPACE) -> None:
+        self._owns_store = not isinstance(store, SqliteStore)
+        self.store = SqliteStore(store) if isinstance(store, str) else store
+        self.namespace = namespace
+        self._pushed = asyncio.Event()
+
+    async def _read(self, fn: Callable[[sqlite3.Connection], Any]) -> Any:
+        return await self.store.read(fn)
+
+    async def _write(self, fn: Callable[[sqlite3.Connection], Any]) -> Any:
+        return await self.store.write(fn)
+
+    async def close(self) -> None:
+        if self._owns_store:
+            await self.store.close()
+
+    async def incr(self, name: str) -> int:
+        return await self.store.incr(name)
+
+    def _idempotency_hash(self, idempotency_key: str) -> str:
+        return hashlib.sha256(idempotency_key.encode("utf-8")).hexdigest()
+
+    # --- Queue-API (wie RedisQueue) ----------------------------------------------
+
+    async def push(
+        self,
+        msg_id: str,
+        payload: Dict[str, Any],
+        *,
+        max_attempts: int = 5,
+        delay_seconds: int = 0,
+        idempotency_key: Optional[str] = None,
+    ) -> Tuple[str, bool]:
+        """Enqueue; returns (id, duplicate) – duplicate=True if the idempotency key was already used."""
+        body = json.dumps(payload)
+        key_hash = self._idempotency_hash(idempotency_key) if idempotency_key else None
+
+        def op(conn: sqlite3.Connection) -> Tuple[str, bool]:
+            now = _now()
+            if key_hash:
+                row = conn.execute(
+                    "SELECT id FROM queue_idempotency WHERE queue = ? AND key_hash = ? AND expires_at > ?",
+                    (self.namespace, key_hash, now),
+                ).fetchone()
+                if row:
+                    return row["id"], True
+            conn.execute(
+                "INSERT OR REPLACE INTO queue_messages"
+                " (queue, id, payload, attempts, max_attempts, enqueued_at, updated_at, last_error, state, due_at)"
+                " VALUES (?, ?, ?, 0, ?, ?, ?, NULL, 'ready', ?)",
+                (self.namespace, msg_id, body, int(max_attempts), now, now, now + max(0, int(delay_seconds))),
+            )
+            if key_hash:
+                conn.execute(
+                    "INSERT OR REPLACE INTO queue_idempotency (queue, key_hash, id, expires_at) VALUES (?, ?, ?, ?)",
+                    (self.namespace, key_hash, msg_id, now + IDEMPOTENCY_TTL_SECONDS),
+                )
+            return msg_id, False
+
+        result = await self._write(op)
+        if not result[1]:
+            self._pushed.set()
+            self._pushed = asyncio.Event()
+        return result
+
+    async def promote_due(self, limit: int = PROMOTE_CHUNK_SIZE) -> int:
+        """No-op: due messages are selected by index, nothing has to be moved."""
+        return 0
+
+    async def promote_due_batches(self, chunk_size: int = PROMOTE_CHUNK_SIZE, max_chunks: int = 100) -> int:
+        return 0
+
+    async def pop(
+        self,
+        max_items: int = 1,
+        *,
+        visibility_timeout: int = DEFAULT_VISIBILITY_TIMEOUT_SECONDS,
+        max_inflight: int = 0,
+    ) -> List[Dict[str, Any]]:
+        """Lease up to `max_items` due messages, oldest due_at first, at most `max_inflight` leased at once."""
+        lease = max(1, int(visibility_timeout))
+
+        def op(conn: sqlite3.Connection) -> List[Dict[str, Any]]:
+            now = _now()
+            count = max(1, int(max_items))
+            if max_inflight > 0:
+                count = min(count, max_inflight - self._count_leased(conn))
+                if count <= 0:
+                    return []
+            rows = conn.execute(
+                f"SELECT {_COLUMNS} FROM queue_messages"
+                " WHERE queue = ? AND state = 'ready' AND due_at <= ? ORDER BY due_at, rowid LIMIT ?",
+                (self.namespace, now, count),
+            ).fetchall()
+            if not rows:
+                return []
+            conn.executemany(
+                "UPDATE queue_messages SET state = 'leased', due_at = ?, updated_at = ? WHERE queue = ? AND id = ?",
+                [(now + lease, now, self.namespace, row["id"]) for row in rows],
+            )
+            items = []
+            for row in rows:
+                item = _decode_row(row)
+                item["updated_at"] = now
+                item["lease_expires_at"] = now + lease
+                items.append(item)
+            return items
+
+        return await self._write(op)
+
+    async def pop_wait(
+        self,
+        max_items: int = 1,
+        *,
+        visibility_timeout: int = DEFAULT_VISIBILITY_TIMEOUT_SECONDS,
+        wait_seconds: float = 0,
+        max_inflight: int = 0,
+    ) -> List[Dict[str, Any]]:
+        """Like pop, but wait up to `wait_seconds` for a message to become available."""
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + max(0.0, wait_seconds)
+        while True:
+            items = await self.pop(max_items, visibility_timeout=visibility_timeout, max_inflight=max_inflight)
+            remaining = deadline - loop.time()
+            if items or remaining <= 0:
+                return items
+            try:
+                await asyncio.wait_for(self._pushed.wait(), timeout=min(remaining, POLL_INTERVAL_SECONDS))
+            except asyncio.TimeoutError:
+                pass
+
+    def _count_leased(self, conn: sqlite3.Connection) -> int:
+        return int(conn.execute(
+            "SELECT COUNT(*) FROM queue_messages WHERE queue = ? AND state = 'leased'", (self.namespace,)
+        ).fetchone()[0])
+
+    async def inflight(self) -> int:
+        return await self._read(self._count_leased)
+
+    async def ack(self, *msg_ids: str) -> int:
+        if not msg_ids:
+            return 0
+
+        def op(conn: sqlite3.Connection) -> int:
+            marks = ",".join("?" * len(msg_ids))
+            cur = conn.execute(
+                f"DELETE FROM queue_messages WHERE queue = ? AND id IN ({marks})", (self.namespace, *msg_ids)
+            )
+            return cur.rowcount
+
+        return int(await self._write(op))
+
+    async def reap_expired(self, limit: int = 1000) -> Dict[str, int]:
+        """Requeue messages whose lease expired (counted as a failed attempt), or dead-letter them."""
+
+        def op(conn: sqlite3.Connection) -> Dict[str, int]:
+            now = _now()
+            rows = conn.execute(
+                "SELECT id, attempts, max_attempts FROM queue_messages"
+                " WHERE queue = ? AND state = 'leased' AND due_at <= ? ORDER BY due_at LIMIT ?",
+                (self.namespace, now, int(limit)),
+            ).fetchall()
+            requeued = dead = 0
+            for row in rows:
+                attempts = int(row["attempts"]) + 1
+                if attempts >= int(row["max_attempts"]):
+                    state, due_at, dead = "dead", now, dead + 1
+                else:
+                    # due_at 0: vor allen wartenden Messages, wie RPUSH an das Pop-Ende der Liste
+                    state, due_at, requeued = "ready", 0, requeued + 1
+                conn.execute(
+                    "UPDATE queue_messages SET attempts = ?, state = ?, due_at = ?, updated_at = ?,"
+                    " last_error = 'lease expired' WHERE queue = ? AND id = ?",
+                    (attempts, state, due_at, now, self.namespace, row["id"]),
+                )
+            conn.execute("DELETE FROM queue_idempotency WHERE expires_at <= ?", (now,))
+            return {"requeued": requeued, "dlq": dead}
+
+        return await self._write(op)
+
+    async def fail(
+        self, msg_id: str, error: Optional[str] = None, *, permanent: bool = False
+    ) -> Optional[Dict[str, Any]]:
+        """Count a failed attempt: back off exponentially, or move to the DLQ after max_attempts (or if permanent)."""
+
+        def op(conn: sqlite3.Connection) -> Optional[Dict[str, Any]]:
+            now = _now()
+            row = conn.execute(
+                "SELECT attempts, max_attempts FROM queue_messages WHERE queue = ? AND id = ?",
+                (self.namespace, msg_id),
+            ).fetchone()
+            if row is None:
+                return None
+            attempts = int(row["attempts"]) + 1
+            if permanent or attempts >= int(row["max_attempts"]):
+                state, due_at, delay = "dead", now, None
+            else:
+                delay = int(min(MAX_BACKOFF_SECONDS, 2 ** attempts))
+                state, due_at = "ready", now + delay
+            conn.execute(
+                "UPDATE queue_messages SET attempts = ?, state = ?, due_at = ?, updated_at = ?, last_error = ?"
+                " WHERE queue = ? AND id = ?",
+                (attempts, state, due_at, now, error or "", self.namespace, msg_id),
+            )
+            return {"dlq": delay is None, "delay": delay}
+
+        return await self._write(op)
+
+    async def stats(self) -> Dict[str, Any]:
+        def op(conn: sqlite3.Connection) -> Dict[str, Any]:
+            now = _now()
+            row = conn.execute(
+                "SELECT"
+                " SUM(state = 'ready' AND due_at <= ?) AS ready,"
+                " MIN(CASE WHEN state = 'ready' AND due_at <= ? THEN enqueued_at END) AS oldest,"
+                " SUM(state = 'ready' AND due_at > ?) AS delayed,"
+                " SUM(state = 'leased') AS leased,"
+                " SUM(state = 'dead') AS dead"
+                " FROM queue_messages WHERE queue = ?",
+                (now, now, now, self.namespace),
+            ).fetchone()
+            return {
+                "backend": "sqlite",
+                "main": {
+                    "size": int(row["ready"] or 0),
+                    "oldest_age_seconds": now - int(row["oldest"]) if row["oldest"] is not None else None,
+                },
+                "delayed": {"size": int(row["delayed"] or 0), "due": 0},
+                "inflight": {"size": int(row["leased"] or 0)},
+                "dlq": {"size": int(row["dead"] or 0)},
+            }
+
+        return await self._read(op)
+
+    async def rate_take(self, count: int, *, rate: float, burst: int) -> Tuple[int, float]:
+        """Take up to `count` tokens from the queue's shared bucket (negative: give back); returns (taken, left)."""
+        burst = max(1, int(burst))
+
+        def op(conn: sqlite3.Connection) -> Tuple[int, float]:
+            now = time.time()
+            row = conn.execute("SELECT tokens, updated_at FROM rate_limits WHERE name = ?", (self.namespace,)).fetchone()
+            tokens = float(row["tokens"]) if row else float(burst)
+            if row:
+                tokens = min(burst, tokens + max(0.0, now - float(row["updated_at"])) * rate)
+            taken = 0
+            if count < 0:
+                tokens = min(burst, tokens - count)
+            else:
+                taken = min(int(count), int(tokens))
+                tokens -= taken
+            conn.execute(
+                "INSERT INTO rate_limits (name, tokens, updated_at) VALUES (?, ?, ?)"
+                " ON CONFLICT(name) DO UPDATE SET tokens = excluded.tokens, updated_at = excluded.updated_at",
+                (self.namespace, tokens, now),
+            )
+            return taken, tokens
+
+        return await self._write(op)
+
+    # --- DLQ -----------------------------------------------------------------
+
+    async def dlq_list(self, limit: int = 50, offset: int = 0) -> Dict[str, Any]:
+        def op(conn: sqlite3.Connection) -> Dict[str, Any]:
+            total = conn.execute(
+                "SELECT COUNT(*) FROM queue_messages WHERE queue = ? AND state = 'dead'", (self.namespace,)
+            ).fetchone()[0]
+            rows = conn.execute(
+                f"SELECT {_COLUMNS} FROM queue_messages WHERE queue = ? AND state = 'dead'"
+                " ORDER BY due_at DESC, rowid DESC LIMIT ? OFFSET ?",
+                (self.namespace, max(0, int(limit)), max(0, int(offset))),
+            ).fetchall()
+            return {"total": int(total), "items": [_decode_row(row) for row in rows]}
+
+        return await self._read(op)
+
+    async def dlq_requeue(self, msg_id: str, delay_seconds: int = 0) -> bool:
+        def op(conn: sqlite3.Connection) -> bool:
+            now = _now()
+            cur = conn.execute(
+                "UPDATE queue_messages SET state = 'ready', due_at = ?, updated_at = ?"
+                " WHERE queue = ? AND id = ? AND state = 'dead'",
+                (now + max(0, int(delay_seconds)), now, self.namespace, msg_id),
+            )
+            return cur.rowcount > 0
+
+        moved = await self._write(op)
+        if moved:
+            self._pushed.set()
+            self._pushed = asyncio.Event()
+        return moved
+
+    async def dlq_requeue_matching(
+        self,
+        *,
+        error_contains: Optional[str] = None,
+        min_age_seconds: Optional[int] = None,
+        max_age_seconds: Optional[int] = None,
+        min_attempts: Optional[int] = None,
+        max_attempts: Optional[int] = None,
+        delay_seconds: int = 0,
+        limit: Optional[int] = None,
+        dry_run: bool = False,
+        chunk_size: int = DLQ_CHUNK_SIZE,
+    ) -> Dict[str, int]:
+        """Requeue every DLQ message matching all given filters; returns {"matched", "scanned"}."""
+        now = _now()
+        where = ["queue = ?", "state = 'dead'"]
+        params: List[Any] = [self.namespace]
+        if error_contains:
+            where.append("instr(lower(coalesce(last_error, '')), ?) > 0")
+            params.append(error_contains.lower())
+        if min_age_seconds is not None:
+            where.append("updated_at <= ?")
+            params.append(now - int(min_age_seconds))
+        if max_age_seconds is not None:
+            where.append("updated_at >= ?")
+            params.append(now - int(max_age_seconds))
+        if min_attempts is not None:
+            where.append("attempts >= ?")
+            params.append(int(min_attempts))
+        if max_attempts is not None:
+            where.append("attempts <= ?")
+            params.append(int(max_attempts))
+        condition = " AND ".join(where)
+        chunk_size = max(1, int(chunk_size))
+
+        def count(conn: sqlite3.Connection) -> Tuple[int, int]:
+            scanned = conn.execute(
+                "SELECT COUNT(*) FROM queue_messages WHERE queue = ? AND state = 'dead'", (self.namespace,)
+            ).fetchone()[0]
+            matched = conn.execute(f"SELECT COUNT(*) FROM queue_messages WHERE {condition}", params).fetchone()[0]
+            return int(scanned), int(matched)
+
+        scanned, matching = await self._read(count)
+        if dry_run:
+            return {"matched": matching if limit is None else min(matching, limit), "scanned": scanned}
+
+        def requeue_chunk(size: int) -> Callable[[sqlite3.Connection], int]:
+            def op(conn: sqlite3.Connection) -> int:
+                cur = conn.execute(
+                    f"UPDATE queue_messages SET state = 'ready', due_at = ?, updated_at = ?"
+                    f" WHERE rowid IN (SELECT rowid FROM queue_messages WHERE {condition} LIMIT ?)",
+                    (now + max(0, int(delay_seconds)), now, *params, size),
+                )
+                return cur.rowcount
+
+            return op
+
+        matched = 0
+        while limit is None or matched < limit:
+            size = chunk_size if limit is None else min(chunk_size, limit - matched)
+            moved = int(await self._write(requeue_chunk(size)))
+            matched += moved
+            if moved < size:
+                break
+        if matched:
+            self._pushed.set()
+            self._pushed = asyncio.Event()
+        return {"matched": matched, "scanned": scanned}
+
+    async def dlq_purge(self, msg_id: Optional[str] = None) -> int:
+        if msg_id:
+            return int(await self._write(lambda conn: conn.execute(
+                "DELETE FROM queue_messages WHERE queue = ? AND id = ? AND state = 'dead'", (self.namespace, msg_id)
+            ).rowcount))
+
+        def op(conn: sqlite3.Connection) -> int:
+            return conn.execute(
+                "DELETE FROM queue_messages WHERE rowid IN"
+                " (SELECT rowid FROM queue_messages WHERE queue = ? AND state = 'dead' LIMIT ?)",
+                (self.namespace, DLQ_CHUNK_SIZE),
+            ).rowcount
+
+        purged = 0
+        while True:
+            removed = int(await self._write(op))
+            purged += removed
+            if removed < DLQ_CHUNK_SIZE:
+                return purged
@@ -0,0 +1,452 @@
+"""
+Redis-Streams-Backend für die Webhook-Queue (QUEUE_BACKEND=streams)
+
+Gleiche Semantik und gleiche `/queue/*`-API wie RedisQueue, aber statt
+Main-Liste + Lease-Zset ein Stream mit Consumer Group:
+
+- `<ns>:stream`   XADD → XREADGROUP (jeder API-Worker ist ein eigener
+  Consumer, Name `<host>-<pid>`) → XACK + XDEL bei ack/fail
+- `<ns>:stream:entries` Hash Stream-Entry-ID → Message-ID für alle Entries im
+  Stream; damit findet der Reaper die Message auch dann, wenn der Entry selbst
+  fehlt (z.B. von einem früheren MAXLEN oder manuell getrimmt)
+- Pending Entries List der Group = ausgelieferte, unbestätigte Messages;
+  reap_expired prüft sie per XPENDING IDLE und stellt abgelaufene Leases neu
+  ans Stream-Ende (bzw. nach max_attempts in die DLQ)
+- `<ns>:msg:<id>`, `<ns>:delayed`, `<ns>:dlq`, `<ns>:idemp:*` wie RedisQueue;
+  der Hash merkt sich zusätzlich die aktuelle Stream-Entry-ID (`entry`)
+
+Long-Polling (pop_wait) nutzt XREADGROUP BLOCK direkt; die so zugestellten
+Entries werden anschließend per Skript geleast. Das max_inflight-Limit gilt
+in pop atomar; parallel blockierende Leser können es knapp überschreiten. Stirbt der Prozess dazwischen,
+hängen sie ohne `lease_until` in der PEL und der Reaper stellt sie neu ein.
+
+Da ack/fail ihre Entries löschen, enthält der Stream nur lebende Messages; er
+wird deshalb nie getrimmt. Stattdessen lehnt push ab (QueueFull → 503), sobald
+Stream und Delayed-Set zusammen QUEUE_STREAM_MAXLEN Messages halten. Promote,
+Reaper und DLQ-Requeue stellen bereits angenommene Messages immer ein.
+Ein Wechsel des Backends übernimmt keine Messages aus der Main-Liste.
+"""
+
+from __future__ import annotations
+
+import json
+import os
+import socket
+import time
+from typing import Any, Dict, List, Optional, Tuple
+
+from .redis_queue import (
+    DEFAULT_NAMESPACE,
+    DEFAULT_VISIBILITY_TIMEOUT_SECONDS,
+    IDEMPOTENCY_TTL_SECONDS,
+    MAX_BACKOFF_SECONDS,
+    PROMOTE_CHUNK_SIZE,
+    RedisQueue,
+    _DLQ_SELECT_LUA,
+    _decode_item,
+)
+
+DEFAULT_GROUP = "workers"
+DEFAULT_MAXLEN = 100_000
+
+
+class QueueFull(RuntimeError):
+    """push rejected: the stream already holds `maxlen` live messages."""
+
+
+# KEYS: stream, delayed, msg, entries, [idemp]
+# ARGV: id, payload, max_attempts, now, delay_seconds, idemp_ttl, maxlen
+_STREAM_PUSH_LUA = """
+if #KEYS >= 5 then
+  local existing = redis.call('GET', KEYS[5])
+  if existing then return {existing, 1} end
+end
+if redis.call('XLEN', KEYS[1]) + redis.call('ZCARD', KEYS[2]) >= tonumber(ARGV[7]) then
+  return {ARGV[1], 2}
+end
+redis.call('HSET', KEYS[3], 'payload', ARGV[2], 'attempts', '0', 'max_attempts', ARGV[3],
+           'enqueued_at', ARGV[4], 'updated_at', ARGV[4])
+local delay = tonumber(ARGV[5])
+if delay > 0 then
+  redis.call('ZADD', KEYS[2], tonumber(ARGV[4]) + delay, ARGV[1])
+else
+  local entry = redis.call('XADD', KEYS[1], '*', 'id', ARGV[1])
+  redis.call('HSET', KEYS[3], 'entry', entry)
+  redis.call('HSET', KEYS[4], entry, ARGV[1])
+end
+if #KEYS >= 5 then
+  redis.call('SET', KEYS[5], ARGV[1], 'EX', ARGV[6])
+end
+return {ARGV[1], 0}
+"""
+
+# KEYS: delayed, stream, entries
+# ARGV: now, limit, msg_prefix
+_STREAM_PROMOTE_LUA = """
+local due = redis.call('ZRANGEBYSCORE', KEYS[1], '-inf', ARGV[1], 'LIMIT', 0, ARGV[2])
+for _, id in ipairs(due) do
+  redis.call('ZREM', KEYS[1], id)
+  local entry = redis.call('XADD', KEYS[2], '*', 'id', id)
+  redis.call('HSET', ARGV[3] .. id, 'entry', entry)
+  redis.call('HSET', KEYS[3], entry, id)
+end
+return #due
+"""
+
+# KEYS: stream, entries
+# ARGV: msg_prefix, now, count, lease_deadline, group, consumer, max_inflight (0 = unbegrenzt)
+_STREAM_POP_LUA = """
+local items = {}
+local count = tonumber(ARGV[3])
+if tonumber(ARGV[7]) > 0 then
+  count = math.min(count, tonumber(ARGV[7]) - redis.call('XPENDING', KEYS[1], ARGV[5])[1])
+  if count <= 0 then return items end
+end
+local res = redis.call('XREADGROUP', 'GROUP', ARGV[5], ARGV[6], 'COUNT', count, 'STREAMS', KEYS[1], '>')
+if not res then return items end
+for _, row in ipairs(res[1][2]) do
+  local entry, fields = row[1], row[2]
+  local key = ARGV[1] .. fields[2]
+  if redis.call('EXISTS', key) == 1 then
+    redis.call('HSET', key, 'updated_at', ARGV[2], 'lease_until', ARGV[4], 'entry', entry)
+    local h = redis.call('HGETALL', key)
+    table.insert(h, 1, fields[2])
+    table.insert(items, h)
+  else
+    redis.call('XACK', KEYS[1], ARGV[5], entry)
+    redis.call('XDEL', KEYS[1], entry)
+    redis.call('HDEL', KEYS[2], entry)
+  end
+end
+return items
+"""
+
+# KEYS: stream, entries
+# ARGV: msg_prefix, now, lease_deadline, group, (entry, id)...
+# Least per XREADGROUP BLOCK zugestellte Entries (wie der zweite Teil von _STREAM_POP_LUA).
+_STREAM_LEASE_LUA = """
+local items = {}
+for i = 5, #ARGV, 2 do
+  local entry, id = ARGV[i], ARGV[i + 1]
+  local key = ARGV[1] .. id
+  if redis.call('EXISTS', key) == 1 then
+    redis.call('HSET', key, 'updated_at', ARGV[2], 'lease_until', ARGV[3], 'entry', entry)
+    local h = redis.call('HGETALL', key)
+    table.insert(h, 1, id)
+    table.insert(items, h)
+  else
+    redis.call('XACK', KEYS[1], ARGV[4], entry)
+    redis.call('XDEL', KEYS[1], entry)
+    redis.call('HDEL', KEYS[2], entry)
+  end
+end
+return items
+"""
+
+# KEYS: stream, entries
+# ARGV: msg_prefix, group, id...
+_STREAM_ACK_LUA = """
+local acked = 0
+for i = 3, #ARGV do
+  local key = ARGV[1] .. ARGV[i]
+  local entry = redis.call('HGET', key, 'entry')
+  if entry then
+    redis.call('XACK', KEYS[1], ARGV[2], entry)
+    redis.call('XDEL', KEYS[1], entry)
+    redis.call('HDEL', KEYS[2], entry)
+  end
+  acked = acked + redis.call('DEL', key)
+end
+return acked
+"""
+
+# KEYS: msg, dlq, delayed, stream, entries
+# ARGV: id, now, error, max_backoff, group, permanent
+_STREAM_FAIL_LUA = """
+if redis.call('EXISTS', KEYS[1]) == 0 then return -2 end
+local entry = redis.call('HGET', KEYS[1], 'entry')
+if entry then
+  redis.call('XACK', KEYS[4], ARGV[5], entry)
+  redis.call('XDEL', KEYS[4], entry)
+  redis.call('HDEL', KEYS[5], entry)
+  redis.call('HDEL', KEYS[1], 'entry', 'lease_until')
+end
+local attempts = redis.call('HINCRBY', KEYS[1], 'attempts', 1)
+local max_attempts = tonumber(redis.call('HGET', KEYS[1], 'max_attempts') or '5')
+redis.call('HSET', KEYS[1], 'updated_at', ARGV[2], 'last_error', ARGV[3])
+if attempts >= max_attempts or ARGV[6] == '1' then
+  redis.call('LPUSH', KEYS[2], ARGV[1])
+  return -1
+end
+local delay = math.min(tonumber(ARGV[4]), 2 ^ attempts)
+redis.call('ZADD', KEYS[3], tonumber(ARGV[2]) + delay, ARGV[1])
+return math.floor(delay)
+"""
+
+# KEYS: stream, dlq, entries
+# ARGV: msg_prefix, now, group, limit, min_idle_ms
+# Ein Entry, der nicht mehr im Stream steht, wird über den entries-Index aufgelöst
+# und wie eine abgelaufene Lease behandelt (neu einstellen bzw. DLQ), nie verworfen.
+_STREAM_REAP_LUA = """
+local pending = redis.call('XPENDING', KEYS[1], ARGV[3], 'IDLE', ARGV[5], '-', '+', ARGV[4])
+local requeued, dead = 0, 0
+for _, p in ipairs(pending) do
+  local entry = p[1]
+  local rows = redis.call('XRANGE', KEYS[1], entry, entry)
+  local id = (rows[1] and rows[1][2][2]) or redis.call('HGET', KEYS[3], entry)
+  local key = id and (ARGV[1] .. id)
+  if not key or redis.call('EXISTS', key) == 0 then
+    redis.call('XACK', KEYS[1], ARGV[3], entry)
+    redis.call('XDEL', KEYS[1], entry)
+    redis.call('HDEL', KEYS[3], entry)
+  elseif tonumber(redis.call('HGET', key, 'lease_until') or '0') <= tonumber(ARGV[2]) then
+    redis.call('XACK', KEYS[1], ARGV[3], entry)
+    redis.call('XDEL', KEYS[1], entry)
+    redis.call('HDEL', KEYS[3], entry)
+    local attempts = redis.call('HINCRBY', key, 'attempts', 1)
+    local max_attempts = tonumber(redis.call('HGET', key, 'max_attempts') or '5')
+    redis.call('HSET', key, 'updated_at', ARGV[2], 'last_error', 'lease expired')
+    redis.call('HDEL', key, 'lease_until', 'entry')
+    if attempts >= max_attempts then
+      redis.call('LPUSH', KEYS[2], id)
+      dead = dead + 1
+    else
+      local new_entry = redis.call('XADD', KEYS[1], '*', 'id', id)
+      redis.call('HSET', key, 'entry', new_entry)
+      redis.call('HSET', KEYS[3], new_entry, id)
+      requeued = requeued + 1
+    end
+  end
+end
+return {requeued, dead}
+"""
+
+# KEYS: dlq, stream, delayed, msg, entries
+# ARGV: id, now, delay_seconds
+_STREAM_DLQ_REQUEUE_ONE_LUA = """
+if redis.call('LREM', KEYS[1], 1, ARGV[1]) == 0 then return 0 end
+if redis.call('EXISTS', KEYS[4]) == 0 then return 0 end
+local now, delay = tonumber(ARGV[2]), tonumber(ARGV[3])
+redis.call('HSET', KEYS[4], 'updated_at', now)
+if delay > 0 then
+  redis.call('ZADD', KEYS[3], now + delay, ARGV[1])
+else
+  local entry = redis.call('XADD', KEYS[2], '*', 'id', ARGV[1])
+  redis.call('HSET', KEYS[4], 'entry', entry)
+  redis.call('HSET', KEYS[5], entry, ARGV[1])
+end
+return 1
+"""
+
+# KEYS: dlq, stream, delayed, entries; ARGV wie _DLQ_SELECT_LUA, ARGV[12]: delay_seconds
+_STREAM_DLQ_REQUEUE_LUA = _DLQ_SELECT_LUA + """
+local delay = tonumber(ARGV[12])
+for _, id in ipairs(selected) do
+  local key = ARGV[1] .. id
+  redis.call('HSET', key, 'updated_at', now)
+  if delay > 0 then
+    redis.call('ZADD', KEYS[3], now + delay, id)
+  else
+    local entry = redis.call('XADD', KEYS[2], '*', 'id', id)
+    redis.call('HSET', key, 'entry', entry)
+    redis.call('HSET', KEYS[4], entry, id)
+  end
+end
+return {#selected, scanned}
+"""
+
+
+def _now() -> int:
+    return int(time.time())
+
+
+def default_consumer_name() -> str:
+    return f"{socket.gethostname()}-{os.getpid()}"
+
+
+class StreamQueue(RedisQueue):
+    """Streams-Variante von RedisQueue; gleiche Methoden und Rückgabeformen."""
+
+    def __init__(
+        self,
+        client: Any,
+        namespace: str = DEFAULT_NAMESPACE,
+        *,
+        group: str = DEFAULT_GROUP,
+        consumer: Optional[str] = None,
+        maxlen: int = DEFAULT_MAXLEN,
+    ) -> None:
+        super().__init__(client, namespace)
+        self.key_stream = f"{namespace}:stream"
+        self.key_entries = f"{namespace}:stream:entries"
+        self.group = group
+        self.consumer = consumer or default_consumer_name()
+        self.maxlen = max(1, int(maxlen))
+        self._group_ready = False
+        self._push = client.register_script(_STREAM_PUSH_LUA)
+        self._promote = client.register_script(_STREAM_PROMOTE_LUA)
+        self._pop = client.register_script(_STREAM_POP_LUA)
+        self._ack = client.register_script(_STREAM_ACK_LUA)
+        self._fail = client.register_script(_STREAM_FAIL_LUA)
+        self._reap = client.register_script(_STREAM_REAP_LUA)
+        self._lease = client.register_script(_STREAM_LEASE_LUA)
+        self._dlq_requeue = client.register_script(_STREAM_DLQ_REQUEUE_LUA)
+        self._dlq_requeue_one = client.register_script(_STREAM_DLQ_REQUEUE_ONE_LUA)
+
+    async def _ensure_group(self) -> None:
+        if self._group_ready:
+            return
+        try:
+            await self.client.xgroup_create(self.key_stream, self.group, id="0", mkstream=True)
+        except Exception as exc:
+            if "BUSYGROUP" not in str(exc):
+                raise
+        self._group_ready = True
+
+    async def push(
+        self,
+        msg_id: str,
+        payload: Dict[str, Any],
+        *,
+        max_attempts: int = 5,
+        delay_seconds: int = 0,
+        idempotency_key: Optional[str] = None,
+    ):
+        keys = [self.key_stream, self.key_delayed, self.key_msg(msg_id), self.key_entries]
+        if idempotency_key:
+            keys.append(self.key_idempotency(idempotency_key))
+        args = [
+            msg_id, json.dumps(payload), int(max_attempts), _now(),
+            max(0, int(delay_seconds)), IDEMPOTENCY_TTL_SECONDS, self.maxlen,
+        ]
+        stored_id, outcome = await self._push(keys=keys, args=args)
+        if int(outcome) == 2:
+            raise QueueFull(f"{self.namespace} holds {self.maxlen} messages")
+        return stored_id, bool(int(outcome))
+
+    async def promote_due(self, limit: int = PROMOTE_CHUNK_SIZE) -> int:
+        return int(await self._promote(
+            keys=[self.key_delayed, self.key_stream, self.key_entries],
+            args=[_now(), max(1, int(limit)), self.msg_prefix],
+        ))
+
+    async def pop(
+        self,
+        max_items: int = 1,
+        *,
+        visibility_timeout: int = DEFAULT_VISIBILITY_TIMEOUT_SECONDS,
+        max_inflight: int = 0,
+    ) -> List[Dict[str, Any]]:
+        await self._ensure_group()
+        now = _now()
+        lease_expires_at = now + max(1, int(visibility_timeout))
+        args = [
+            self.msg_prefix, now, max(1, int(max_items)), lease_expires_at,
+            self.group, self.consumer, max(0, int(max_inflight)),
+        ]
+        try:
+            rows = await self._pop(keys=[self.key_stream, self.key_entries], args=args)
+        except Exception as exc:
+            if "NOGROUP" not in str(exc):
+                raise
+            # stream/group was removed underneath us (FLUSHDB, manual DEL) → recreate once
+            self._group_ready = False
+            await self._ensure_group()
+            rows = await self._pop(keys=[self.key_stream, self.key_entries], args=args)
+        return self._decode_rows(rows, lease_expires_at)
+
+    async def _wait_and_pop(self, timeout: float, max_items: int, visibility_timeout: int) -> List[Dict[str, Any]]:
+        await self._ensure_group()
+        response = await self.client.xreadgroup(
+            self.group, self.consumer, {self.key_stream: ">"},
+            count=max(1, int(max_items)), block=max(10, int(timeout * 1000)),
+        )
+        entries = response[0][1] if response else []
+        if not entries:
+            return []
+        now = _now()
+        lease_expires_at = now + max(1, int(visibility_timeout))
+        args: List[Any] = [self.msg_prefix, now, lease_expires_at, self.group]
+        for entry, fields in entries:
+            args.extend([entry, fields.get("id", "")])
+        rows = await self._lease(keys=[self.key_stream, self.key_entries], args=args)
+        return self._decode_rows(rows, lease_expires_at)
+
+    async def inflight(self) -> int:
+        await self._ensure_group()
+        return int((await self.client.xpending(self.key_stream, self.group))["pending"])
+
+    @staticmethod
+    def _decode_rows(rows: Any, lease_expires_at: int) -> List[Dict[str, Any]]:
+        items = []
+        for row in rows or []:
+            item = _decode_item(row[0], dict(zip(row[1::2], row[2::2])))
+            item["lease_expires_at"] = lease_expires_at
+            items.append(item)
+        return items
+
+    async def ack(self, *msg_ids: str) -> int:
+        if not msg_ids:
+            return 0
+        return int(await self._ack(
+            keys=[self.key_stream, self.key_entries], args=[self.msg_prefix, self.group, *msg_ids]
+        ))
+
+    async def fail(
+        self, msg_id: str, error: Optional[str] = None, *, permanent: bool = False
+    ) -> Optional[Dict[str, Any]]:
+        result = int(await self._fail(
+            keys=[self.key_msg(msg_id), self.key_dlq, self.key_delayed, self.key_stream, self.key_entries],
+            args=[msg_id, _now(), error or "", MAX_BACKOFF_SECONDS, self.group, "1" if permanent else "0"],
+        ))
+        if result == -2:
+            return None
+        if result == -1:
+            return {"dlq": True, "delay": None}
+        return {"dlq": False, "delay": result}
+
+    async def reap_expired(self, limit: int = 1000) -> Dict[str, int]:
+        await self._ensure_group()
+        requeued, dead = await self._reap(
+            keys=[self.key_stream, self.key_dlq, self.key_entries],
+            args=[self.msg_prefix, _now(), self.group, int(limit), 1000],
+        )
+        return {"requeued": int(requeued), "dlq": int(dead)}
+
+    async def stats(self) -> Dict[str, Any]:
+        await self._ensure_group()
+        length = int(await self.client.xlen(self.key_stream))
+        groups = {g["name"]: g for g in await self.client.xinfo_groups(self.key_stream)}
+        group = groups.get(self.group) or {}
+        pending = int(group.get("pending") or 0)
+        consumers = [
+            {"name": c["name"], "pending": int(c["pending"]), "idle_ms": int(c["idle"])}
+            for c in await self.client.xinfo_consumers(self.key_stream, self.group)
+        ]
+        oldest_age = None
+        last_delivered = group.get("last-delivered-id") or "0-0"
+        undelivered = await self.client.xrange(self.key_stream, min=f"({last_delivered}", count=1)
+        if undelivered:
+            oldest_age = max(0, _now() - int(undelivered[0][0].split("-")[0]) // 1000)
+        return {
+            "backend": "streams",
+            "main": {"size": max(0, length - pending), "oldest_age_seconds": oldest_age},
+            "delayed": {"size": int(await self.client.zcard(self.key_delayed)), "due": await self._count_due()},
+            "inflight": {"size": pending, "consumers": consumers},
+            "dlq": {"size": int(await self.client.llen(self.key_dlq))},
+            "stream": {"length": length, "maxlen": self.maxlen},
+        }
+
+    async def _dlq_requeue_chunk(self, args: List[Any]) -> Tuple[int, int]:
+        await self._ensure_group()
+        matched, scanned = await self._dlq_requeue(
+            keys=[self.key_dlq, self.key_stream, self.key_delayed, self.key_entries], args=args
+        )
+        return int(matched), int(scanned)
+
+    async def dlq_requeue(self, msg_id: str, delay_seconds: int = 0) -> bool:
+        moved = await self._dlq_requeue_one(
+            keys=[self.key_dlq, self.key_stream, self.key_delayed, self.key_msg(msg_id), self.key_entries],
+            args=[msg_id, _now(), max(0, int(delay_seconds))],
+        )
+        return bool(int(moved))
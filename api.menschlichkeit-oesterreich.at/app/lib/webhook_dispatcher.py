@@ -0,0 +1,217 @@
+"""
+In-Process-Dispatcher: Webhook-Queue → n8n
+
+Ersetzt den externen Poller (POST /queue/pop + eigener n8n-Call):
+
+- Ein Fetch-Loop least Messages nur für freie Worker-Slots (max. `concurrency`
+  gleichzeitig), über alle konfigurierten Queues strikt nach Priorität und mit
+  deren max_inflight (pop_by_priority)
+- Zustellung per POST an `N8N_BASE_URL + WEBHOOK_PATHS[ziel]` über einen
+  gepoolten httpx.AsyncClient; Body = payload als kompaktes JSON, signiert wie
+  im n8n-Client (X-Webhook-Signature = HMAC-SHA256)
+- Ziel: `payload["webhook"]` (z.B. "payment"), sonst der Default der Queue
+  (payments → payment, erasure → erasure, sync → sync), sonst "api"
+- 2xx → ack; alles andere → fail (bestehender Backoff, nach max_attempts DLQ).
+  Stirbt der Prozess mitten in der Zustellung, stellt der Lease-Reaper neu zu
+  (at-least-once; n8n kann per X-Queue-Message-Id deduplizieren).
+- Leerlauf: exponentielles Warten von IDLE_MIN_SECONDS bis IDLE_MAX_SECONDS
+"""
+
+from __future__ import annotations
+
+import asyncio
+import hashlib
+import hmac
+import json
+import logging
+import time
+from typing import Any, Callable, Dict, List, Optional, Sequence, Set, Tuple
+
+import httpx
+
+from .queue_registry import QueueSpec, pop_by_priority
+
+logger = logging.getLogger("moe-api.webhook-dispatcher")
+
+# Gleiche Pfade wie automation/n8n/webhook-client-optimized.py
+DEFAULT_WEBHOOK_PATHS: Dict[str, str] = {
+    "api": "/webhook/api-event",
+    "auth": "/webhook/auth-event",
+    "member": "/webhook/member-event",
+    "payment": "/webhook/payment-event",
+    "sync": "/webhook/contact-sync",
+    "erasure": "/webhook/right-to-erasure",
+    "error": "/webhook/error-alert",
+}
+QUEUE_DEFAULT_TARGETS: Dict[str, str] = {"payments": "payment", "erasure": "erasure", "sync": "sync"}
+FALLBACK_TARGET = "api"
+
+IDLE_MIN_SECONDS = 0.05
+IDLE_MAX_SECONDS = 1.0
+ERROR_BODY_CHARS = 200
+
+
+def sign_body(secret: str, body: bytes) -> str:
+    return hmac.new(secret.encode("utf-8"), body, hashlib.sha256).hexdigest()
+
+
+class WebhookDispatcher:
+    def __init__(
+        self,
+        queues: Callable[[], Sequence[Tuple[QueueSpec, Any]]],
+        client: httpx.AsyncClient,
+        *,
+        paths: Optional[Dict[str, str]] = None,
+        concurrency: int = 8,
+        visibility_timeout: int = 60,
+        secret: Optional[str] = None,
+    ) -> None:
+        self._queues = queues
+        self.client = client
+        self.paths = dict(paths or DEFAULT_WEBHOOK_PATHS)
+        self.concurrency = max(1, int(concurrency))
+        self.visibility_timeout = max(1, int(visibility_timeout))
+        self.secret = secret or None
+        self._slots = asyncio.Semaphore(self.concurrency)
+        self._fetcher: Optional[asyncio.Task] = None
+        self._deliveries: Set[asyncio.Task] = set()
+        self._started_at: Optional[float] = None
+        self._counters: Dict[str, int] = {
+            "delivered": 0, "failed": 0, "dead_lettered": 0, "ack_errors": 0, "fetch_errors": 0,
+        }
+        self._targets: Dict[str, Dict[str, float]] = {}
+
+    # --- Lifecycle -----------------------------------------------------------------
+
+    def start(self) -> None:
+        if self._fetcher is None:
+            self._started_at = time.time()
+            self._fetcher = asyncio.create_task(self._fetch_loop(), name="webhook-dispatcher")
+
+    async def stop(self, grace_seconds: float = 5.0) -> None:
+        """Stop fetching, give running deliveries `grace_seconds`, then cancel them (leases expire → redelivery)."""
+        if self._fetcher is not None:
+            self._fetcher.cancel()
+            await asyncio.gather(self._fetcher, return_exceptions=True)
+            self._fetcher = None
+        if self._deliveries:
+            _, pending = await asyncio.wait(set(self._deliveries), timeout=max(0.0, grace_seconds))
+            for task in pending:
+                task.cancel()
+            await asyncio.gather(*pending, return_exceptions=True)
+
+    # --- Fetch + deliver -------------------------------------------------------------
+
+    async def _fetch_loop(self) -> None:
+        idle = IDLE_MIN_SECONDS
+        while True:
+            await self._slots.acquire()
+            free = 1
+            while not self._slots.locked():
+                await self._slots.acquire()
+                free += 1
+            try:
+                items = await pop_by_priority(self._queues(), free, visibility_timeout=self.visibility_timeout)
+            except Exception as exc:
+                self._counters["fetch_errors"] += 1
+                logger.warning("Webhook dispatcher could not lease messages: %s", exc)
+                items = []
+                idle = IDLE_MAX_SECONDS
+            for _ in range(free - len(items)):
+                self._slots.release()
+            if not items:
+                await asyncio.sleep(idle)
+                idle = min(IDLE_MAX_SECONDS, idle * 2)
+                continue
+            idle = IDLE_MIN_SECONDS
+            for item in items:
+                task = asyncio.create_task(self._deliver(item))
+                self._deliveries.add(task)
+                task.add_done_callback(self._deliveries.discard)
+
+    def target_for(self, item: Dict[str, Any]) -> str:
+        payload = item.get("payload") or {}
+        target = payload.get("webhook") if isinstance(payload, dict) else None
+        return str(target or QUEUE_DEFAULT_TARGETS.get(item.get("queue") or "", FALLBACK_TARGET))
+
+    async def _deliver(self, item: Dict[str, Any]) -> None:
+        target = self.target_for(item)
+        started = time.perf_counter()
+        try:
+            queue = self._queue_named(item["queue"])
+            error = await self._post(target, item)
+            self._record(target, started, error is None)
+            if error is None:
+                await queue.ack(item["id"])
+                self._counters["delivered"] += 1
+                return
+            outcome = await queue.fail(item["id"], error)
+            self._counters["failed"] += 1
+            if outcome and outcome["dlq"]:
+                self._counters["dead_lettered"] += 1
+                logger.warning("Webhook %s (%s) moved to DLQ after %s attempts: %s",
+                               item["id"], target, item["attempts"] + 1, error)
+        except asyncio.CancelledError:
+            raise
+        except Exception as exc:
+            # ack/fail not recorded (e.g. Redis down): the lease expires and the reaper redelivers
+            self._counters["ack_errors"] += 1
+            logger.warning("Webhook %s: could not ack/fail: %s", item["id"], exc)
+        finally:
+            self._slots.release()
+
+    async def _post(self, target: str, item: Dict[str, Any]) -> Optional[str]:
+        """Deliver one message; None on success, else the error recorded on the message."""
+        path = self.paths.get(target)
+        if path is None:
+            return f"no webhook path for target {target!r}"
+        body = json.dumps(item["payload"], separators=(",", ":")).encode("utf-8")
+        headers = {
+            "Content-Type": "application/json",
+            "X-Queue-Message-Id": item["id"],
+            "X-Queue-Attempt": str(item["attempts"] + 1),
+        }
+        if self.secret:
+            headers["X-Webhook-Signature"] = sign_body(self.secret, body)
+        try:
+            response = await self.client.post(path, content=body, headers=headers)
+        except httpx.HTTPError as exc:
+            return f"{type(exc).__name__}: {exc}"[:ERROR_BODY_CHARS]
+        if 200 <= response.status_code < 300:
+            return None
+        return f"HTTP {response.status_code}: {response.text[:ERROR_BODY_CHARS]}"
+
+    def _queue_named(self, name: str) -> Any:
+        for spec, queue in self._queues():
+            if spec.name == name:
+                return queue
+        raise KeyError(name)
+
+    # --- Metrics -----------------------------------------------------------------------
+
+    def _record(self, target: str, started: float, ok: bool) -> None:
+        elapsed_ms = (time.perf_counter() - started) * 1000
+        stats = self._targets.setdefault(target, {"count": 0, "errors": 0, "total_ms": 0.0, "max_ms": 0.0})
+        stats["count"] += 1
+        stats["errors"] += 0 if ok else 1
+        stats["total_ms"] += elapsed_ms
+        stats["max_ms"] = max(stats["max_ms"], elapsed_ms)
+
+    def snapshot(self) -> Dict[str, Any]:
+        targets: List[Dict[str, Any]] = []
+        for name, stats in sorted(self._targets.items()):
+            targets.append({
+                "target": name,
+                "count": int(stats["count"]),
+                "errors": int(stats["errors"]),
+                "avg_ms": round(stats["total_ms"] / stats["count"], 2) if stats["count"] else 0.0,
+                "max_ms": round(stats["max_ms"], 2),
+            })
+        return {
+            "running": self._fetcher is not None and not self._fetcher.done(),
+            "started_at": int(self._started_at) if self._started_at else None,
+            "concurrency": self.concurrency,
+            "in_flight": len(self._deliveries),
+            **self._counters,
+            "targets": targets,
+        }
@@ -1,24 +1,42 @@
-from fastapi import FastAPI, HTTPException, Depends, Header, Body, Path, Request
-from fastapi.responses import Response
+from fastapi import FastAPI, HTTPException, Depends, Header, Body, Path, Query, Request
+from fastapi.responses import JSONResponse, Response, StreamingResponse
 from fastapi.middleware.cors import CORSMiddleware
 from pydantic import BaseModel, EmailStr
 import httpx
 import os
 import jwt
-from typing import Optional, List, Dict, Any
+from typing import Optional, List, Dict, Any, Tuple, Union
 import json
 import uuid
 import asyncio
 import time
 import logging
-import smtplib
-from email.message import EmailMessage
-from email.utils import formatdate
+import sqlite3
 import io
+import csv
 import hashlib
+from contextlib import asynccontextmanager
+from datetime import date
+from zoneinfo import ZoneInfo, ZoneInfoNotFoundError
 
 # Import shared utilities
 from app.shared import ApiResponse, verify_jwt_token
+from app.lib.background import PeriodicTasks
+from app.lib.civicrm_client import CivicrmError, close_civicrm_client, get_civicrm_client, iter_keyset_pages
+from app.lib.contact_cache import close_contact_cache, get_contact_cache
+from app.lib.etag import not_modified, strong_etag
+from app.lib.mail_queue import MAIL_QUEUE, MailSender, mail_payload
+from app.lib.redis_client import close_redis, get_redis, init_redis
+from app.lib.redis_queue import RedisQueue
+from app.lib.receipt_batch import ReceiptBatchManager, batch_range, run_id_for
+from app.lib.receipt_renderer import ReceiptRenderError, close_receipt_renderer, get_receipt_renderer
+from app.lib.queue_metrics import MeteredQueue, QueueMetrics, render_prometheus
+from app.lib.queue_registry import DEFAULT_QUEUE, QueueSpec, by_priority, parse_queue_specs, pop_by_priority
+from app.lib.scheduler import RecurringScheduler, RedisCursorStore, SqliteCursorStore, parse_jobs
+from app.lib.smtp_pool import close_smtp_pool, get_smtp_pool
+from app.lib.sqlite_queue import SqliteQueue, SqliteStore
+from app.lib.stream_queue import QueueFull, StreamQueue
+from app.lib.webhook_dispatcher import DEFAULT_WEBHOOK_PATHS, WebhookDispatcher
 
 
 # Environment Configuration
@@ -98,17 +116,54 @@ allow_headers = _split_csv("CORS_ALLOW_HEADERS", "Authorization,Content-Type,Acc
     "Accept",
 ]
 
-expose_headers = _split_csv("CORS_EXPOSE_HEADERS", "")
+expose_headers = _split_csv("CORS_EXPOSE_HEADERS", "ETag")
 allow_credentials = _parse_bool("CORS_ALLOW_CREDENTIALS", True)
 cors_max_age = _parse_int("CORS_MAX_AGE_SECONDS", 600)
 
 logger.debug("Loaded CORS configuration (env=%s, origins=%s, allow_credentials=%s, max_age=%s)", APP_ENV, allow_origins, allow_credentials, cors_max_age)
 
 
+@asynccontextmanager
+async def lifespan(_app: FastAPI):
+    # Shared CiviCRM connection pool (keep-alive, optional HTTP/2)
+    get_civicrm_client()
+    get_contact_cache()
+    # Warm receipt PDF workers (reportlab imported once per process)
+    await get_receipt_renderer().start()
+    # Shared async Redis pool (queue, idempotency, receipt counter); ping once here
+    if await init_redis():
+        logger.info("Redis connected")
+    background = PeriodicTasks()
+    if QUEUE_BACKEND == "sqlite" or get_redis() is not None:
+        background.every(QUEUE_REAPER_INTERVAL_SECONDS, _reap_queue_leases, name="queue-lease-reaper")
+    if QUEUE_BACKEND != "sqlite" and get_redis() is not None:
+        background.every(QUEUE_PROMOTER_INTERVAL_MS / 1000, _promote_queue_due, name="queue-promoter")
+    if SCHEDULED_JOBS and (QUEUE_BACKEND == "sqlite" or get_redis() is not None):
+        background.every(SCHEDULER_TICK_SECONDS, _scheduler.tick, name="recurring-scheduler")
+    if WEBHOOK_DISPATCHER_ENABLED and (QUEUE_BACKEND == "sqlite" or get_redis() is not None):
+        _start_webhook_dispatcher()
+    if MAIL_SENDER_ENABLED and (QUEUE_BACKEND == "sqlite" or get_redis() is not None):
+        _start_mail_sender()
+    try:
+        yield
+    finally:
+        await _stop_webhook_dispatcher()
+        await _stop_mail_sender()
+        await _receipt_batches.close()
+        await background.stop()
+        await _close_sqlite_queue()
+        await close_redis()
+        await close_contact_cache()
+        await close_receipt_renderer()
+        await close_smtp_pool()
+        await close_civicrm_client()
+
+
 app = FastAPI(
     title="Menschlichkeit Oesterreich API",
     description="CRM Integration API with JWT Authentication & GDPR Compliance",
-    version="1.0.0"
+    version="1.0.0",
+    lifespan=lifespan,
 )
 
 app.add_middleware(
@@ -129,8 +184,13 @@ app.include_router(metrics.router)
 try:
     from app.middleware.security import RateLimitMiddleware, SecurityHeadersMiddleware
     
-    # Rate limiting: 10 req/s for general endpoints, 5 req/min for auth
-    app.add_middleware(RateLimitMiddleware, requests_per_second=10, auth_requests_per_minute=5)
+    # Rate limiting: 10 req/s for general endpoints, 5 req/min for auth (env-tunable, e.g. for load tests)
+    if _parse_bool("RATE_LIMIT_ENABLED", True):
+        app.add_middleware(
+            RateLimitMiddleware,
+            requests_per_second=_parse_int("RATE_LIMIT_REQUESTS_PER_SECOND", 10),
+            auth_requests_per_minute=_parse_int("RATE_LIMIT_AUTH_REQUESTS_PER_MINUTE", 5),
+        )
     
     # Security headers: CSP, HSTS, X-Frame-Options, etc.
     app.add_middleware(SecurityHeadersMiddleware)
@@ -223,6 +283,12 @@ class ReceiptTriggerRequest(BaseModel):
     trxn_id: Optional[str] = None
 
 
+class ReceiptBatchRequest(BaseModel):
+    year: Optional[int] = None
+    date_from: Optional[date] = None
+    date_to: Optional[date] = None
+
+
 # --- Queue models ---
 class QueuePushRequest(BaseModel):
     payload: Dict[str, Any]
@@ -237,16 +303,35 @@ class QueueItem(BaseModel):
     max_attempts: int
     enqueued_at: int
     updated_at: int
+    lease_expires_at: Optional[int] = None
+    queue: Optional[str] = None
 
 
 class QueueAckRequest(BaseModel):
     id: str
     error: Optional[str] = None
+    permanent: bool = False  # fail only: move to the DLQ without further retries
+
+
+class QueueBulkAckRequest(BaseModel):
+    id: Optional[str] = None
+    ids: List[str] = []
+
+
+class DlqFilter(BaseModel):
+    error_contains: Optional[str] = None  # case-insensitive substring of last_error
+    min_age_seconds: Optional[int] = None  # age = seconds since the last failure
+    max_age_seconds: Optional[int] = None
+    min_attempts: Optional[int] = None
+    max_attempts: Optional[int] = None
 
 
 class DlqRequeueRequest(BaseModel):
-    id: str
+    id: Optional[str] = None
+    filter: Optional[DlqFilter] = None  # exactly one of id / filter; {} matches every DLQ entry
     delay_seconds: Optional[int] = 60
+    limit: Optional[int] = None  # filter only: stop after this many requeues
+    dry_run: bool = False  # filter only: count matches without moving them
 
 
 class DlqPurgeRequest(BaseModel):
@@ -353,10 +438,9 @@ _refresh_store = RefreshStore()
 
 def _serialize_contact(contact: Dict[str, Any]) -> ContactResponse:
     email_value = contact.get('email') or contact.get('email_primary') or contact.get('emailId')
-    email_parsed = EmailStr(str(email_value)) if email_value else None
     return ContactResponse(
         id=int(contact.get('id')),
-        email=email_parsed,
+        email=str(email_value) if email_value else None,
         first_name=contact.get('first_name'),
         last_name=contact.get('last_name'),
         communication_style_id=contact.get('communication_style_id'),
@@ -377,7 +461,36 @@ def _serialize_membership(membership: Dict[str, Any]) -> MembershipResponse:
     )
 
 
+def _conditional_response(
+    data: Dict[str, Any],
+    message: str,
+    *,
+    response: Response,
+    if_none_match: Optional[str],
+    modified: Optional[str] = None,
+):
+    """ApiResponse with a strong ETag; 304 without body if If-None-Match still matches."""
+    etag = strong_etag(data, modified)
+    headers = {"ETag": etag, "Cache-Control": "private, no-cache"}
+    if not_modified(if_none_match, etag):
+        return Response(status_code=304, headers=headers)
+    response.headers.update(headers)
+    return ApiResponse(success=True, data=data, message=message)
+
+
 async def _civicrm_contact_get(*, contact_id: Optional[int] = None, email: Optional[str] = None) -> Dict[str, Any]:
+    """Contact lookup through the read-through contact cache (single lookup key only)."""
+    cache = get_contact_cache()
+    if contact_id is not None and email is None:
+        key = cache.key_for_id(contact_id)
+    elif email is not None and contact_id is None:
+        key = cache.key_for_email(email)
+    else:
+        return await _civicrm_contact_fetch(contact_id=contact_id, email=email)
+    return await cache.get_or_load(key, lambda: _civicrm_contact_fetch(contact_id=contact_id, email=email))
+
+
+async def _civicrm_contact_fetch(*, contact_id: Optional[int] = None, email: Optional[str] = None) -> Dict[str, Any]:
     params: Dict[str, Any] = {"limit": 1}
     if contact_id is not None:
         params['id'] = contact_id
@@ -390,9 +503,14 @@ async def _civicrm_contact_get(*, contact_id: Optional[int] = None, email: Optio
     return contact
 
 
-async def _civicrm_contact_create_or_update(payload: Dict[str, Any]) -> Dict[str, Any]:
+async def _civicrm_contact_create_or_update(payload: Dict[str, Any], *, previous_email: Optional[str] = None) -> Dict[str, Any]:
     data = await civicrm_api_call("Contact", "create", payload)
-    return _extract_first_value(data) or data
+    contact = _extract_first_value(data) or data
+    await get_contact_cache().invalidate(
+        contact_id=payload.get("id") or contact.get("id"),
+        emails=[previous_email, payload.get("email"), contact.get("email")],
+    )
+    return contact
 
 
 async def _civicrm_memberships_get(contact_id: int) -> List[Dict[str, Any]]:
@@ -403,6 +521,26 @@ async def _civicrm_memberships_get(contact_id: int) -> List[Dict[str, Any]]:
     return []
 
 
+async def _civicrm_memberships_get_many(contact_ids: List[int]) -> Dict[int, List[Dict[str, Any]]]:
+    """Fetch memberships for many contacts with one ``IN`` query, grouped by contact id."""
+    grouped: Dict[int, List[Dict[str, Any]]] = {int(cid): [] for cid in contact_ids}
+    if not grouped:
+        return grouped
+    data = await civicrm_api_call("Membership", "get", {
+        "where": [["contact_id", "IN", list(grouped)]],
+        "limit": 0,
+    })
+    values = (data.get('values') or []) if isinstance(data, dict) else []
+    for membership in values:
+        try:
+            cid = int(membership.get('contact_id'))
+        except (TypeError, ValueError):
+            continue
+        if cid in grouped:
+            grouped[cid].append(membership)
+    return grouped
+
+
 async def _civicrm_membership_update(membership_id: int, payload: Dict[str, Any]) -> Dict[str, Any]:
     params = {"id": membership_id, **payload}
     data = await civicrm_api_call("Membership", "create", params)
@@ -417,32 +555,11 @@ async def health_check():
 
 # CiviCRM Integration Helper
 async def civicrm_api_call(entity: str, action: str, params: dict):
-    """Make authenticated call to CiviCRM APIv4"""
-    payload = {
-        "params": params,
-        "_authx": {
-            "api_key": CIVI_API_KEY,
-            "key": CIVI_SITE_KEY
-        }
-    }
-    
-    url = f"{CIVI_BASE_URL}/civicrm/ajax/api4/{entity}/{action}"
-    
-    async with httpx.AsyncClient(timeout=30) as client:
-        response = await client.post(url, json=payload)
-        
-    if response.status_code != 200:
-        raise HTTPException(status_code=502, detail="CiviCRM API unavailable")
-    
+    """Make authenticated call to CiviCRM APIv4 via the shared connection pool"""
     try:
-        data = response.json()
-    except Exception:
-        raise HTTPException(status_code=502, detail="Invalid response from CiviCRM")
-    
-    if isinstance(data, dict) and data.get("is_error"):
-        raise HTTPException(status_code=400, detail=data.get("error_message", "CiviCRM error"))
-    
-    return data
+        return await get_civicrm_client().call(entity, action, params)
+    except CivicrmError as exc:
+        raise HTTPException(status_code=exc.status_code, detail=exc.detail) from exc
 
 # API Endpoints
 
@@ -571,13 +688,24 @@ async def refresh_token(req: RefreshRequest) -> ApiResponse:
     return ApiResponse(success=True, data=data, message="Tokens refreshed")
 
 @app.get("/user/profile", response_model=ApiResponse)
-async def get_user_profile(payload: Dict[str, Any] = Depends(verify_jwt_token)) -> ApiResponse:
+async def get_user_profile(
+    response: Response,
+    payload: Dict[str, Any] = Depends(verify_jwt_token),
+    if_none_match: Optional[str] = Header(None, alias="If-None-Match"),
+):
     email = payload.get("sub")
     if not email:
         raise HTTPException(status_code=401, detail="Invalid token subject")
 
+    # Served from the contact cache when warm, so revalidation costs no CiviCRM call
     contact_record = await _civicrm_contact_get(email=email)
-    return ApiResponse(success=True, data=_serialize_contact(contact_record).model_dump(), message="Profile fetched")
+    return _conditional_response(
+        _serialize_contact(contact_record).model_dump(),
+        "Profile fetched",
+        response=response,
+        if_none_match=if_none_match,
+        modified=contact_record.get("modified_date"),
+    )
 
 @app.put("/user/profile", response_model=ApiResponse)
 async def update_user_profile(update: ContactUpdate, payload: Dict[str, Any] = Depends(verify_jwt_token)) -> ApiResponse:
@@ -597,7 +725,7 @@ async def update_user_profile(update: ContactUpdate, payload: Dict[str, Any] = D
     if update.last_name is not None:
         params["last_name"] = update.last_name
 
-    updated_contact = await _civicrm_contact_create_or_update(params)
+    updated_contact = await _civicrm_contact_create_or_update(params, previous_email=email)
     return ApiResponse(success=True, data=_serialize_contact(updated_contact).model_dump(), message="Profile updated")
 
 @app.post("/contacts/create", response_model=ApiResponse)
@@ -640,11 +768,14 @@ async def search_all_contacts(_: Dict[str, Any] = Depends(verify_jwt_token), lim
         contacts_data = await civicrm_api_call("Contact", "get", params)
         contacts = contacts_data.get("values", [])
         
-        # Get memberships for each contact
+        # Get memberships for the whole page in one call (no N+1)
+        memberships_by_contact = await _civicrm_memberships_get_many(
+            [int(c["id"]) for c in contacts if c.get("id") is not None]
+        )
         enriched_contacts = []
         for contact in contacts:
             contact_id = contact.get("id")
-            memberships = await _civicrm_memberships_get(contact_id)
+            memberships = memberships_by_contact.get(int(contact_id), []) if contact_id is not None else []
             
             # Get active membership if exists
             active_membership = None
@@ -680,10 +811,102 @@ async def search_all_contacts(_: Dict[str, Any] = Depends(verify_jwt_token), lim
         logger.error(f"Error fetching contacts: {e}")
         raise HTTPException(status_code=500, detail="Failed to fetch contacts")
 
+_CONTACT_EXPORT_FIELDS = [
+    "id",
+    "first_name",
+    "last_name",
+    "email",
+    "phone",
+    "birth_date",
+    "street_address",
+    "city",
+    "postal_code",
+    "modified_date",
+]
+
+
+@app.get("/contacts/export")
+async def export_contacts(
+    _: Dict[str, Any] = Depends(verify_jwt_token),
+    format: str = "ndjson",
+    page_size: int = 500,
+    after_id: int = 0,
+    modified_since: Optional[str] = None,
+):
+    """Stream all contacts as NDJSON or CSV, walking CiviCRM by id cursor (DSGVO-compliant field set)."""
+    fmt = format.lower()
+    if fmt not in {"ndjson", "csv"}:
+        raise HTTPException(status_code=400, detail="format must be 'ndjson' or 'csv'")
+    if not 1 <= page_size <= 5000:
+        raise HTTPException(status_code=400, detail="page_size must be between 1 and 5000")
+
+    params: Dict[str, Any] = {"select": _CONTACT_EXPORT_FIELDS}
+    if modified_since:
+        params["where"] = [["modified_date", ">=", modified_since]]
+    pages = iter_keyset_pages(civicrm_api_call, "Contact", params, page_size=page_size, after_id=after_id)
+    # Fetch the first page eagerly so upstream errors still map to a proper status code
+    try:
+        first_page = await pages.__anext__()
+    except StopAsyncIteration:
+        first_page = []
+
+    async def _rows():
+        yield first_page
+        async for page in pages:
+            yield page
+
+    # A failure after the first page can no longer change the status code: abort the chunked
+    # response (no terminating chunk) so clients never mistake a truncated export for a complete one
+    async def _ndjson():
+        try:
+            async for page in _rows():
+                yield "".join(
+                    json.dumps({k: c.get(k) for k in _CONTACT_EXPORT_FIELDS}, ensure_ascii=False, default=str) + "\n"
+                    for c in page
+                )
+        except Exception as e:
+            logger.error(f"Contact export aborted: {e}")
+            yield json.dumps({"error": "export aborted", "detail": str(getattr(e, "detail", e))}) + "\n"
+            raise
+
+    async def _csv():
+        buf = io.StringIO()
+        writer = csv.DictWriter(buf, fieldnames=_CONTACT_EXPORT_FIELDS, extrasaction="ignore")
+        writer.writeheader()
+        try:
+            async for page in _rows():
+                writer.writerows(page)
+                yield buf.getvalue()
+                buf.seek(0)
+                buf.truncate(0)
+        except Exception as e:
+            logger.error(f"Contact export aborted: {e}")
+            raise
+
+    if fmt == "csv":
+        return StreamingResponse(
+            _csv(),
+            media_type="text/csv; charset=utf-8",
+            headers={"Content-Disposition": "attachment; filename=contacts.csv"},
+        )
+    return StreamingResponse(_ndjson(), media_type="application/x-ndjson")
+
+
 @app.get("/contacts/{contact_id}", response_model=ApiResponse)
-async def get_contact(contact_id: int = Path(..., gt=0), _: Dict[str, Any] = Depends(verify_jwt_token)) -> ApiResponse:
+async def get_contact(
+    response: Response,
+    contact_id: int = Path(..., gt=0),
+    _: Dict[str, Any] = Depends(verify_jwt_token),
+    if_none_match: Optional[str] = Header(None, alias="If-None-Match"),
+):
     contact_record = await _civicrm_contact_get(contact_id=contact_id)
-    return ApiResponse(success=True, data=_serialize_contact(contact_record).model_dump(), message="Contact fetched")
+    return _conditional_response(
+        _serialize_contact(contact_record).model_dump(),
+        "Contact fetched",
+        response=response,
+        if_none_match=if_none_match,
+        modified=contact_record.get("modified_date"),
+    )
 
 @app.put("/contacts/{contact_id}", response_model=ApiResponse)
 async def update_contact(contact_id: int, update: ContactUpdate, _: Dict[str, Any] = Depends(verify_jwt_token)) -> ApiResponse:
@@ -739,9 +962,22 @@ async def create_membership(membership: MembershipCreate, _: Dict[str, Any] = De
 
 
 @app.get("/memberships/contact/{contact_id}", response_model=ApiResponse)
-async def get_memberships_for_contact(contact_id: int, _: Dict[str, Any] = Depends(verify_jwt_token)) -> ApiResponse:
-    memberships = [_serialize_membership(entry).model_dump() for entry in await _civicrm_memberships_get(contact_id)]
-    return ApiResponse(success=True, data={"memberships": memberships}, message="Memberships fetched")
+async def get_memberships_for_contact(
+    contact_id: int,
+    response: Response,
+    _: Dict[str, Any] = Depends(verify_jwt_token),
+    if_none_match: Optional[str] = Header(None, alias="If-None-Match"),
+):
+    entries = await _civicrm_memberships_get(contact_id)
+    memberships = [_serialize_membership(entry).model_dump() for entry in entries]
+    modified = max((str(entry.get("modified_date") or "") for entry in entries), default="") or None
+    return _conditional_response(
+        {"memberships": memberships},
+        "Memberships fetched",
+        response=response,
+        if_none_match=if_none_match,
+        modified=modified,
+    )
 
 
 @app.put("/memberships/{membership_id}", response_model=ApiResponse)
@@ -808,44 +1044,11 @@ PAYPAL_CLIENT_ID = os.getenv("PAYPAL_CLIENT_ID", "").strip()
 PAYPAL_CLIENT_SECRET = os.getenv("PAYPAL_CLIENT_SECRET", "").strip()
 PAYPAL_API_BASE = os.getenv("PAYPAL_API_BASE", "https://api-m.sandbox.paypal.com").strip()
 ORG_NAME = os.getenv("ORG_NAME", "Menschlichkeit Österreich").strip()
-ORG_ADDRESS_LINE1 = os.getenv("ORG_ADDRESS_LINE1", "").strip()
-ORG_ADDRESS_LINE2 = os.getenv("ORG_ADDRESS_LINE2", "").strip()
-ORG_ADDRESS_ZIP = os.getenv("ORG_ADDRESS_ZIP", "").strip()
-ORG_ADDRESS_CITY = os.getenv("ORG_ADDRESS_CITY", "").strip()
-ORG_ADDRESS_COUNTRY = os.getenv("ORG_ADDRESS_COUNTRY", "").strip()
-ORG_LOGO_PATH = os.getenv("ORG_LOGO_PATH", "").strip()
-
-# SMTP for receipts
+# Address, logo etc. for receipts: ReceiptOrg.from_env in app/lib/receipt_renderer.py
+
+# SMTP for receipts (connection settings: SmtpConfig.from_env in app/lib/smtp_pool.py)
 SMTP_HOST = os.getenv("SMTP_HOST", "").strip()
-SMTP_PORT = int(os.getenv("SMTP_PORT", "587").strip() or 587)
-SMTP_USER = os.getenv("SMTP_USER", "").strip()
-SMTP_PASSWORD = os.getenv("SMTP_PASSWORD", "").strip()
 SMTP_FROM = os.getenv("SMTP_FROM", "noreply@menschlichkeit-oesterreich.at").strip()
-SMTP_USE_TLS = os.getenv("SMTP_USE_TLS", "true").strip().lower() in {"1", "true", "yes", "y"}
-
-# Optional Redis for receipt counters
-REDIS_URL = os.getenv("REDIS_URL", "").strip()
-try:
-    import redis as _redis_lib  # type: ignore
-except Exception:
-    _redis_lib = None  # type: ignore
-
-_redis_client = None
-
-def _get_redis():
-    global _redis_client
-    if _redis_client is not None:
-        return _redis_client
-    if not REDIS_URL or not _redis_lib:
-        return None
-    try:
-        _redis_client = _redis_lib.from_url(REDIS_URL, decode_responses=True)
-        # ping to verify
-        _ = _redis_client.ping()
-        return _redis_client
-    except Exception:
-        return None
-
 
 def _amount_to_minor(amount: float, currency: str) -> int:
     cur = currency.upper()
@@ -913,7 +1116,7 @@ async def _paypal_capture(order_id: str) -> Dict[str, Any]:
         raise HTTPException(status_code=502, detail="Invalid response from PayPal")
 
 
-def _generate_receipt_pdf_bytes(
+async def _generate_receipt_pdf_bytes(
     *,
     amount: float,
     currency: str,
@@ -923,77 +1126,34 @@ def _generate_receipt_pdf_bytes(
     email: str | None,
     receipt_number: str,
 ) -> bytes:
+    # Rendered in the warm process pool (app/lib/receipt_renderer.py); the event loop keeps serving
     try:
-        from reportlab.lib.pagesizes import A4
-        from reportlab.lib.units import mm
-        from reportlab.pdfgen import canvas
-    except Exception as e:
-        raise HTTPException(status_code=500, detail=f"PDF generator not available: {e}")
-
-    buf = io.BytesIO()
-    c = canvas.Canvas(buf, pagesize=A4)
-    width, height = A4
-    y = height - 30 * mm
-    c.setTitle(f"Spendenbeleg - {ORG_NAME}")
-    c.setFont("Helvetica-Bold", 16)
-    c.drawString(20 * mm, y, ORG_NAME)
-    y -= 10 * mm
-    # Header block
-    c.setFont("Helvetica", 11)
-    c.drawString(20 * mm, y, "Spenden-/Zahlungsbeleg")
-    if ORG_LOGO_PATH and os.path.exists(ORG_LOGO_PATH):
-        try:
-            c.drawImage(ORG_LOGO_PATH, width - 60 * mm, height - 40 * mm, width=40 * mm, preserveAspectRatio=True, mask='auto')
-        except Exception:
-            pass
-    y -= 12 * mm
-    # Organization address
-    c.setFont("Helvetica", 9)
-    addr_lines = [
-        ORG_ADDRESS_LINE1,
-        ORG_ADDRESS_LINE2,
-        " ".join([ORG_ADDRESS_ZIP, ORG_ADDRESS_CITY]).strip(),
-        ORG_ADDRESS_COUNTRY,
-    ]
-    for line in [l for l in addr_lines if l]:
-        c.drawString(20 * mm, y, line)
-        y -= 6 * mm
-    if addr_lines:
-        y -= 2 * mm
-    c.setFont("Helvetica", 10)
-    c.drawString(20 * mm, y, f"Belegnummer: {receipt_number}")
-    y -= 8 * mm
-    c.setFont("Helvetica", 10)
-    c.drawString(20 * mm, y, f"Betrag: {amount:.2f} {currency.upper()}")
-    y -= 7 * mm
-    c.drawString(20 * mm, y, f"Zweck: {purpose or 'Allgemein'}")
-    y -= 7 * mm
-    c.drawString(20 * mm, y, f"Zahlungsart: {provider or 'unbekannt'}")
-    y -= 7 * mm
-    if trxn_id:
-        c.drawString(20 * mm, y, f"Transaktions-ID: {trxn_id}")
-        y -= 7 * mm
-    if email:
-        c.drawString(20 * mm, y, f"E-Mail: {email}")
-        y -= 7 * mm
-    from datetime import datetime
-    c.drawString(20 * mm, y, f"Datum: {datetime.utcnow().strftime('%Y-%m-%d %H:%M:%SZ')}")
-    y -= 14 * mm
-    c.setFont("Helvetica-Oblique", 9)
-    c.drawString(20 * mm, y, "Hinweis: Dieser Beleg wurde automatisch erstellt.")
-    c.showPage()
-    c.save()
-    buf.seek(0)
-    return buf.read()
+        return await get_receipt_renderer().render(
+            amount=amount,
+            currency=currency,
+            purpose=purpose,
+            provider=provider,
+            trxn_id=trxn_id,
+            email=email,
+            receipt_number=receipt_number,
+        )
+    except ReceiptRenderError as e:
+        raise HTTPException(status_code=500, detail=str(e))
 
 
-def _next_receipt_number() -> str:
+async def _next_receipt_number() -> str:
     from datetime import datetime
     year = datetime.utcnow().strftime('%Y')
-    client = _get_redis()
+    client = get_redis()
     if client is not None:
         try:
-            seq = int(client.incr(f"receipts:{year}"))
+            seq = int(await client.incr(f"receipts:{year}"))
+            return f"MOE-{year}-{seq:06d}"
+        except Exception:
+            pass
+    elif QUEUE_BACKEND == "sqlite":
+        try:
+            seq = await _get_sqlite_store().incr(f"receipts:{year}")
             return f"MOE-{year}-{seq:06d}"
         except Exception:
             pass
@@ -1001,230 +1161,580 @@ def _next_receipt_number() -> str:
     return f"MOE-{year}-{int(time.time())}"
 
 
-# --- Simple Redis-backed queue for webhooks ---
-_Q_NS = "moe:queue:webhooks"
-_Q_MAIN = f"{_Q_NS}:main"
-_Q_DLQ = f"{_Q_NS}:dlq"
-_Q_DELAYED = f"{_Q_NS}:delayed"
-_Q_MSG = f"{_Q_NS}:msg"
+# --- Bulk receipt runs (app/lib/receipt_batch.py): CiviCRM pages → process pool → checkpointed ZIP volumes ---
+RECEIPT_BATCH_DIR = os.getenv("RECEIPT_BATCH_DIR", "receipt-batches").strip() or "receipt-batches"
+RECEIPT_BATCH_PAGE_SIZE = _parse_int("RECEIPT_BATCH_PAGE_SIZE", 500)
+if not 1 <= RECEIPT_BATCH_PAGE_SIZE <= 5000:
+    raise RuntimeError("RECEIPT_BATCH_PAGE_SIZE must be between 1 and 5000")
+
+
+async def _render_batch_receipt(**fields: Any) -> bytes:
+    return await get_receipt_renderer().render(**fields)
+
+
+_receipt_batches = ReceiptBatchManager(
+    RECEIPT_BATCH_DIR,
+    call=civicrm_api_call,
+    render=_render_batch_receipt,
+    instrument_names={v: k for k, v in _PAYMENT_INSTRUMENT_MAP.items()},
+    page_size=RECEIPT_BATCH_PAGE_SIZE,
+)
+
+
+# --- Redis-backed queue for webhooks (atomic Lua scripts, see app/lib/redis_queue.py) ---
+QUEUE_VISIBILITY_TIMEOUT_SECONDS = max(1, _parse_int("QUEUE_VISIBILITY_TIMEOUT_SECONDS", 60))
+QUEUE_POP_MAX_BATCH = max(1, _parse_int("QUEUE_POP_MAX_BATCH", 100))
+QUEUE_REAPER_INTERVAL_SECONDS = max(1, _parse_int("QUEUE_REAPER_INTERVAL_SECONDS", 5))
+# Delayed/retry messages are moved to the ready side by a background task, never inline in pop
+QUEUE_PROMOTER_INTERVAL_MS = max(50, _parse_int("QUEUE_PROMOTER_INTERVAL_MS", 500))
+QUEUE_PROMOTE_CHUNK = max(1, _parse_int("QUEUE_PROMOTE_CHUNK", 500))
+QUEUE_PROMOTE_MAX_CHUNKS_PER_TICK = max(1, _parse_int("QUEUE_PROMOTE_MAX_CHUNKS_PER_TICK", 20))
+# Long-poll waiters each hold one Redis connection; keep well below REDIS_MAX_CONNECTIONS
+QUEUE_LONG_POLL_MAX_SECONDS = max(0, _parse_int("QUEUE_LONG_POLL_MAX_SECONDS", 30))
+QUEUE_LONG_POLL_MAX_WAITERS = max(1, _parse_int("QUEUE_LONG_POLL_MAX_WAITERS", 20))
+_queue_long_poll_slots = asyncio.Semaphore(QUEUE_LONG_POLL_MAX_WAITERS)
+
+# lists: list + lease zset | streams: Redis Streams consumer group | sqlite: embedded file (no Redis)
+# Unset: lists when REDIS_URL is configured, otherwise sqlite
+QUEUE_BACKEND = (os.getenv("QUEUE_BACKEND", "").strip().lower()
+                 or ("lists" if os.getenv("REDIS_URL", "").strip() else "sqlite"))
+QUEUE_STREAM_MAXLEN = max(1, _parse_int("QUEUE_STREAM_MAXLEN", 100_000))
+QUEUE_SQLITE_PATH = os.getenv("QUEUE_SQLITE_PATH", "queue.sqlite3").strip() or "queue.sqlite3"
+if QUEUE_BACKEND not in {"lists", "streams", "sqlite"}:
+    raise RuntimeError("QUEUE_BACKEND must be 'lists', 'streams' or 'sqlite'")
+
+# Named queues: name[:high|normal|low[:max_inflight]]; "webhooks" (the /queue/* routes) always exists
+try:
+    QUEUE_SPECS = parse_queue_specs(os.getenv("QUEUE_NAMES", "webhooks,payments:high,erasure:high,sync:low:20"))
+except ValueError as exc:
+    raise RuntimeError(f"QUEUE_NAMES: {exc}") from None
+# All outbound mail goes through "mail" (app/lib/mail_queue.py); list it in QUEUE_NAMES to change its priority
+QUEUE_SPECS.setdefault(MAIL_QUEUE, QueueSpec(MAIL_QUEUE))
+
+_queues: Dict[str, MeteredQueue] = {}
+# Per process, survives backend re-creation (Redis reconnect); exposed on /queues/metrics
+_queue_metrics: Dict[str, QueueMetrics] = {name: QueueMetrics(name) for name in QUEUE_SPECS}
+_sqlite_store: Optional[SqliteStore] = None
+
+
+def _get_sqlite_store() -> SqliteStore:
+    global _sqlite_store
+    if _sqlite_store is None:
+        _sqlite_store = SqliteStore(QUEUE_SQLITE_PATH)
+    return _sqlite_store
+
+
+async def _close_sqlite_queue() -> None:
+    global _sqlite_store
+    if _sqlite_store is not None:
+        await _sqlite_store.close()
+        _sqlite_store = None
+        _queues.clear()
+
+
+def _get_queue(name: str = DEFAULT_QUEUE) -> MeteredQueue:
+    spec = QUEUE_SPECS.get(name)
+    if spec is None:
+        raise HTTPException(status_code=404, detail="Unknown queue")
+    queue = _queues.get(name)
+    if QUEUE_BACKEND == "sqlite":
+        if queue is None:
+            backend = SqliteQueue(_get_sqlite_store(), namespace=spec.namespace)
+            queue = _queues[name] = MeteredQueue(backend, _queue_metrics[name])
+        return queue
+    r = get_redis()
+    if r is None:
+        raise HTTPException(status_code=503, detail="Queue unavailable")
+    if queue is None or queue.client is not r:
+        if QUEUE_BACKEND == "streams":
+            backend = StreamQueue(r, namespace=spec.namespace, maxlen=QUEUE_STREAM_MAXLEN)
+        else:
+            backend = RedisQueue(r, namespace=spec.namespace)
+        queue = _queues[name] = MeteredQueue(backend, _queue_metrics[name])
+    return queue
+
+
+# --- In-process webhook dispatcher (app/lib/webhook_dispatcher.py); off: external consumers use /queue/pop ---
+WEBHOOK_DISPATCHER_ENABLED = _parse_bool("WEBHOOK_DISPATCHER_ENABLED", False)
+WEBHOOK_DISPATCHER_CONCURRENCY = max(1, _parse_int("WEBHOOK_DISPATCHER_CONCURRENCY", 8))
+WEBHOOK_DISPATCHER_TIMEOUT_SECONDS = max(1, _parse_int("WEBHOOK_DISPATCHER_TIMEOUT_SECONDS", 10))
+WEBHOOK_DISPATCHER_QUEUES = _split_csv("WEBHOOK_DISPATCHER_QUEUES") or [n for n in QUEUE_SPECS if n != MAIL_QUEUE]
+if any(name not in QUEUE_SPECS or name == MAIL_QUEUE for name in WEBHOOK_DISPATCHER_QUEUES):
+    raise RuntimeError("WEBHOOK_DISPATCHER_QUEUES must only name queues from QUEUE_NAMES (not the mail queue)")
+N8N_BASE_URL = os.getenv("N8N_BASE_URL", "http://localhost:5678").strip().rstrip("/")
+N8N_WEBHOOK_SECRET = os.getenv("N8N_WEBHOOK_SECRET", "")
+# Overrides as target=/path pairs, e.g. WEBHOOK_PATHS="payment=/webhook/payment-v2"
+WEBHOOK_PATHS = {
+    **DEFAULT_WEBHOOK_PATHS,
+    **dict(entry.split("=", 1) for entry in _split_csv("WEBHOOK_PATHS") if "=" in entry),
+}
+
+_webhook_dispatcher: Optional[WebhookDispatcher] = None
+
+
+def _dispatcher_queues() -> List[Tuple[QueueSpec, MeteredQueue]]:
+    return [(QUEUE_SPECS[name], _get_queue(name)) for name in WEBHOOK_DISPATCHER_QUEUES]
+
+
+def _start_webhook_dispatcher() -> None:
+    global _webhook_dispatcher
+    # One keep-alive pool sized to the worker count; pool timeout covers bursts above it
+    client = httpx.AsyncClient(
+        base_url=N8N_BASE_URL,
+        timeout=httpx.Timeout(WEBHOOK_DISPATCHER_TIMEOUT_SECONDS, connect=5.0),
+        limits=httpx.Limits(
+            max_connections=WEBHOOK_DISPATCHER_CONCURRENCY, max_keepalive_connections=WEBHOOK_DISPATCHER_CONCURRENCY
+        ),
+        headers={"User-Agent": "MOE-API-Automation/1.0"},
+    )
+    _webhook_dispatcher = WebhookDispatcher(
+        _dispatcher_queues,
+        client,
+        paths=WEBHOOK_PATHS,
+        concurrency=WEBHOOK_DISPATCHER_CONCURRENCY,
+        visibility_timeout=max(QUEUE_VISIBILITY_TIMEOUT_SECONDS, WEBHOOK_DISPATCHER_TIMEOUT_SECONDS * 2),
+        secret=N8N_WEBHOOK_SECRET,
+    )
+    _webhook_dispatcher.start()
+    logger.info(
+        "Webhook dispatcher started (%s workers, queues=%s)",
+        WEBHOOK_DISPATCHER_CONCURRENCY, ",".join(WEBHOOK_DISPATCHER_QUEUES),
+    )
+
+
+async def _stop_webhook_dispatcher() -> None:
+    global _webhook_dispatcher
+    if _webhook_dispatcher is not None:
+        await _webhook_dispatcher.stop()
+        await _webhook_dispatcher.client.aclose()
+        _webhook_dispatcher = None
+
+
+# --- Mail queue sender (app/lib/mail_queue.py): endpoints enqueue, this sends over the SMTP pool ---
+# MAIL_RATE_PER_MINUTE is shared by all sending workers (token bucket in the queue backend, see rate_take)
+MAIL_SENDER_ENABLED = _parse_bool("MAIL_SENDER_ENABLED", True)
+MAIL_RATE_PER_MINUTE = max(0, _parse_int("MAIL_RATE_PER_MINUTE", 0))
+MAIL_RATE_BURST = max(1, _parse_int("MAIL_RATE_BURST", 5))
+MAIL_SENDER_CONCURRENCY = _parse_int("MAIL_SENDER_CONCURRENCY", 0)  # 0 = SMTP_POOL_SIZE
+MAIL_MAX_ATTEMPTS = _parse_int("MAIL_MAX_ATTEMPTS", 8)
+if not 1 <= MAIL_MAX_ATTEMPTS <= 20:
+    raise RuntimeError("MAIL_MAX_ATTEMPTS must be between 1 and 20")
+
+_mail_sender: Optional[MailSender] = None
+
+
+def _start_mail_sender() -> None:
+    global _mail_sender
+    smtp = get_smtp_pool()
+    _mail_sender = MailSender(
+        lambda: _get_queue(MAIL_QUEUE),
+        smtp.send,
+        sender=SMTP_FROM,
+        render=get_receipt_renderer().render,
+        on_sent=_record_mail_activity,
+        rate_per_second=MAIL_RATE_PER_MINUTE / 60,
+        burst=MAIL_RATE_BURST,
+        concurrency=MAIL_SENDER_CONCURRENCY or smtp.config.pool_size,
+        # connect + send, plus one reconnect and resend on a dropped connection
+        visibility_timeout=max(QUEUE_VISIBILITY_TIMEOUT_SECONDS, int(smtp.config.timeout) * 4),
+        max_inflight=QUEUE_SPECS[MAIL_QUEUE].max_inflight,
+    )
+    _mail_sender.start()
+    logger.info(
+        "Mail sender started (%s workers, %s mails/min)", _mail_sender.concurrency, MAIL_RATE_PER_MINUTE or "unlimited"
+    )
+
+
+async def _stop_mail_sender() -> None:
+    global _mail_sender
+    if _mail_sender is not None:
+        await _mail_sender.stop()
+        _mail_sender = None
+
+
+async def _enqueue_mail(payload: Dict[str, Any]) -> str:
+    if not (SMTP_HOST and SMTP_FROM):
+        raise HTTPException(status_code=503, detail="SMTP not configured")
+    msg_id, _ = await _get_queue(MAIL_QUEUE).push(str(uuid.uuid4()), payload, max_attempts=MAIL_MAX_ATTEMPTS)
+    return msg_id
+
+
+async def _record_mail_activity(payload: Dict[str, Any]) -> None:
+    # Runs after a successful send; failures are counted by the sender, the mail is never resent for them
+    activity = payload.get("activity")
+    if not activity:
+        return
+    cid = await _ensure_contact_id(payload.get("to"), activity.get("contact_id"))
+    await civicrm_api_call("Activity", "create", {
+        "source_contact_id": cid,
+        "activity_type_id": "Email",
+        "subject": activity.get("subject") or payload.get("subject"),
+        "details": activity.get("details") or "",
+        "status_id": "Completed",
+    })
+
+
+# --- Recurring jobs (app/lib/scheduler.py): one message per cron run on the job's queue, single fire across workers ---
+try:
+    SCHEDULED_JOBS = parse_jobs(os.getenv("SCHEDULED_JOBS", "[]"))
+except ValueError as exc:
+    raise RuntimeError(f"SCHEDULED_JOBS: {exc}") from None
+if any(job.queue not in QUEUE_SPECS or job.queue == MAIL_QUEUE for job in SCHEDULED_JOBS.values()):
+    raise RuntimeError("SCHEDULED_JOBS: queue must be one of QUEUE_NAMES (not the mail queue)")
+SCHEDULER_TICK_SECONDS = max(1, _parse_int("SCHEDULER_TICK_SECONDS", 10))
+SCHEDULER_LOOKAHEAD_SECONDS = max(0, _parse_int("SCHEDULER_LOOKAHEAD_SECONDS", 300))
+try:
+    SCHEDULER_TIMEZONE = ZoneInfo(os.getenv("SCHEDULER_TIMEZONE", "Europe/Vienna").strip())
+except (ZoneInfoNotFoundError, ValueError):
+    raise RuntimeError("SCHEDULER_TIMEZONE must be an IANA time zone, e.g. Europe/Vienna") from None
+
+_scheduler_cursor_store: Optional[Union[RedisCursorStore, SqliteCursorStore]] = None
+
+
+def _scheduler_cursors() -> Union[RedisCursorStore, SqliteCursorStore]:
+    global _scheduler_cursor_store
+    cursors = _scheduler_cursor_store
+    if QUEUE_BACKEND == "sqlite":
+        store = _get_sqlite_store()
+        if not isinstance(cursors, SqliteCursorStore) or cursors.store is not store:
+            cursors = _scheduler_cursor_store = SqliteCursorStore(store)
+        return cursors
+    r = get_redis()
+    if r is None:
+        raise HTTPException(status_code=503, detail="Scheduler unavailable")
+    if not isinstance(cursors, RedisCursorStore) or cursors.client is not r:
+        cursors = _scheduler_cursor_store = RedisCursorStore(r)
+    return cursors
+
+
+_scheduler = RecurringScheduler(
+    SCHEDULED_JOBS,
+    _get_queue,
+    _scheduler_cursors,
+    tz=SCHEDULER_TIMEZONE,
+    lookahead_seconds=SCHEDULER_LOOKAHEAD_SECONDS,
+)
+
+
+# The named routes share their handlers with /queue/*; `name` is read from path_params, so document it here
+_QUEUE_NAME_PARAM = {"parameters": [{"name": "name", "in": "path", "required": True, "schema": {"type": "string"}}]}
+
+
+def _queue_name(request: Request) -> str:
+    """`/queue/{name}/...` → name; the unnamed `/queue/...` routes address the default queue."""
+    return request.path_params.get("name", DEFAULT_QUEUE)
+
+
+def _consumer_queue_name(request: Request) -> str:
+    """Like _queue_name for push/pop/ack/fail: the mail queue belongs to the in-process sender only."""
+    name = _queue_name(request)
+    if name == MAIL_QUEUE:
+        raise HTTPException(status_code=404, detail="Unknown queue")
+    return name
+
+
+try:
+    from redis.exceptions import ConnectionError as _RedisConnectionError, TimeoutError as _RedisTimeoutError  # type: ignore
+except Exception:
+    _RedisConnectionError = _RedisTimeoutError = None  # type: ignore
+
+if _RedisConnectionError is not None:
+    async def _redis_unavailable(_request: Request, exc: Exception) -> JSONResponse:
+        logger.warning("Redis command failed: %s", exc)
+        return JSONResponse(status_code=503, content={"detail": "Queue unavailable"})
+
+    app.add_exception_handler(_RedisConnectionError, _redis_unavailable)
+    app.add_exception_handler(_RedisTimeoutError, _redis_unavailable)
+
+
+async def _sqlite_queue_unavailable(_request: Request, exc: Exception) -> JSONResponse:
+    # e.g. "database is locked" after busy_timeout, disk full, unreadable file
+    logger.warning("SQLite queue command failed: %s", exc)
+    return JSONResponse(status_code=503, content={"detail": "Queue unavailable"})
 
 
-def _queue_now() -> int:
-    return int(time.time())
+app.add_exception_handler(sqlite3.OperationalError, _sqlite_queue_unavailable)
 
 
-def _queue_key_msg(msg_id: str) -> str:
-    return f"{_Q_MSG}:{msg_id}"
+async def _queue_full(_request: Request, exc: Exception) -> JSONResponse:
+    # streams backend at QUEUE_STREAM_MAXLEN: back-pressure instead of trimming live messages
+    logger.warning("Queue push rejected: %s", exc)
+    return JSONResponse(status_code=503, content={"detail": "Queue full"})
+
+
+app.add_exception_handler(QueueFull, _queue_full)
+
+
+def _check_pop_max(max_items: Optional[int]) -> None:
+    if max_items is not None and not 1 <= max_items <= QUEUE_POP_MAX_BATCH:
+        raise HTTPException(status_code=422, detail=f"max must be between 1 and {QUEUE_POP_MAX_BATCH}")
+
+
+def _lease_seconds(visibility_timeout: Optional[int]) -> int:
+    lease = QUEUE_VISIBILITY_TIMEOUT_SECONDS if visibility_timeout is None else visibility_timeout
+    if not 1 <= lease <= 3600:
+        raise HTTPException(status_code=422, detail="visibility_timeout must be between 1 and 3600 seconds")
+    return lease
+
+
+def _queue_item(item: Dict[str, Any], queue_name: str) -> Dict[str, Any]:
+    fields = {k: v for k, v in item.items() if k not in ("last_error", "queue")}
+    return QueueItem(**fields, queue=queue_name).model_dump()
 
 
 @app.post("/queue/push", response_model=ApiResponse)
+@app.post("/queue/{name}/push", response_model=ApiResponse, openapi_extra=_QUEUE_NAME_PARAM)
 async def queue_push(
     req: QueuePushRequest,
     _: Dict[str, Any] = Depends(verify_jwt_token),
     idempotency_key: Optional[str] = Header(None, alias="Idempotency-Key"),
+    name: str = Depends(_consumer_queue_name),
 ) -> ApiResponse:
-    r = _get_redis()
-    if r is None:
-        raise HTTPException(status_code=503, detail="Queue unavailable")
-    # Idempotency: return existing id for provided key within TTL
-    if idempotency_key:
-        key_hash = hashlib.sha256(idempotency_key.encode("utf-8")).hexdigest()
-        idemp_key = f"{_Q_NS}:idemp:{key_hash}"
-        existing = r.get(idemp_key)
-        if existing:
-            return ApiResponse(success=True, data={"id": existing}, message="Enqueued (idempotent)")
-    msg_id = str(uuid.uuid4())
-    now = _queue_now()
-    record = {
-        "id": msg_id,
-        "payload": req.payload,
-        "attempts": 0,
-        "max_attempts": int(req.max_attempts or 5),
-        "enqueued_at": now,
-        "updated_at": now,
-    }
-    r.hset(_queue_key_msg(msg_id), mapping={
-        "payload": json.dumps(req.payload),
-        "attempts": "0",
-        "max_attempts": str(int(req.max_attempts or 5)),
-        "enqueued_at": str(now),
-        "updated_at": str(now),
-    })
-    if int(req.delay_seconds or 0) > 0:
-        r.zadd(_Q_DELAYED, {msg_id: now + int(req.delay_seconds or 0)})
-    else:
-        r.lpush(_Q_MAIN, msg_id)
-    if idempotency_key:
-        # store mapping for 24h
-        r.setex(idemp_key, 24 * 3600, msg_id)
+    q = _get_queue(name)
+    msg_id, duplicate = await q.push(
+        str(uuid.uuid4()),
+        req.payload,
+        max_attempts=int(req.max_attempts or 5),
+        delay_seconds=int(req.delay_seconds or 0),
+        idempotency_key=idempotency_key,
+    )
+    if duplicate:
+        return ApiResponse(success=True, data={"id": msg_id}, message="Enqueued (idempotent)")
     return ApiResponse(success=True, data={"id": msg_id}, message="Enqueued")
 
 
-def _promote_due(r) -> None:
-    now = _queue_now()
-    due = r.zrangebyscore(_Q_DELAYED, "-inf", now)
-    if due:
-        # move to main and remove from delayed
-        for msg_id in due:
-            r.lpush(_Q_MAIN, msg_id)
-        r.zremrangebyscore(_Q_DELAYED, "-inf", now)
-
-
 @app.post("/queue/pop", response_model=ApiResponse)
-async def queue_pop(_: Dict[str, Any] = Depends(verify_jwt_token)) -> ApiResponse:
-    r = _get_redis()
-    if r is None:
-        raise HTTPException(status_code=503, detail="Queue unavailable")
-    _promote_due(r)
-    msg_id = r.rpop(_Q_MAIN)
-    if not msg_id:
+@app.post("/queue/{name}/pop", response_model=ApiResponse, openapi_extra=_QUEUE_NAME_PARAM)
+async def queue_pop(
+    _: Dict[str, Any] = Depends(verify_jwt_token),
+    max_items: Optional[int] = Query(None, alias="max"),
+    visibility_timeout: Optional[int] = None,
+    wait_seconds: float = 0,
+    name: str = Depends(_consumer_queue_name),
+) -> ApiResponse:
+    """Lease messages. Without `max` the legacy single-item shape is returned, with `max` a list.
+
+    `wait_seconds` long-polls until a message arrives; once all long-poll slots are taken,
+    further callers get an immediate (possibly empty) answer instead of queueing up.
+    Never leases more than the queue's max_inflight at once.
+    """
+    _check_pop_max(max_items)
+    lease = _lease_seconds(visibility_timeout)
+    if not 0 <= wait_seconds <= QUEUE_LONG_POLL_MAX_SECONDS:
+        raise HTTPException(status_code=422, detail=f"wait_seconds must be between 0 and {QUEUE_LONG_POLL_MAX_SECONDS}")
+    q = _get_queue(name)
+    cap = QUEUE_SPECS[name].max_inflight
+    if wait_seconds > 0 and not _queue_long_poll_slots.locked():
+        async with _queue_long_poll_slots:
+            leased = await q.pop_wait(max_items or 1, visibility_timeout=lease, wait_seconds=wait_seconds, max_inflight=cap)
+    else:
+        leased = await q.pop(max_items or 1, visibility_timeout=lease, max_inflight=cap)
+    items = [_queue_item(item, name) for item in leased]
+    if max_items is not None:
+        return ApiResponse(success=True, data={"items": items, "visibility_timeout": lease}, message=f"Popped {len(items)}")
+    if not items:
         return ApiResponse(success=True, data=None, message="Empty queue")
-    h = r.hgetall(_queue_key_msg(msg_id))
-    if not h:
-        return ApiResponse(success=True, data=None, message="Missing message payload")
-    try:
-        payload = json.loads(h.get("payload") or "{}")
-    except Exception:
-        payload = {}
-    item = QueueItem(
-        id=msg_id,
-        payload=payload,
-        attempts=int(h.get("attempts") or 0),
-        max_attempts=int(h.get("max_attempts") or 5),
-        enqueued_at=int(h.get("enqueued_at") or _queue_now()),
-        updated_at=_queue_now(),
-    )
-    r.hset(_queue_key_msg(msg_id), mapping={"updated_at": str(item.updated_at)})
-    return ApiResponse(success=True, data=item.model_dump(), message="Popped")
+    return ApiResponse(success=True, data=items[0], message="Popped")
 
 
 @app.post("/queue/ack", response_model=ApiResponse)
-async def queue_ack(req: QueueAckRequest, _: Dict[str, Any] = Depends(verify_jwt_token)) -> ApiResponse:
-    r = _get_redis()
-    if r is None:
-        raise HTTPException(status_code=503, detail="Queue unavailable")
-    r.delete(_queue_key_msg(req.id))
-    return ApiResponse(success=True, message="Acked")
+@app.post("/queue/{name}/ack", response_model=ApiResponse, openapi_extra=_QUEUE_NAME_PARAM)
+async def queue_ack(
+    req: QueueBulkAckRequest,
+    _: Dict[str, Any] = Depends(verify_jwt_token),
+    name: str = Depends(_consumer_queue_name),
+) -> ApiResponse:
+    ids = list(dict.fromkeys(([req.id] if req.id else []) + req.ids))
+    if not ids:
+        raise HTTPException(status_code=422, detail="id or ids required")
+    if len(ids) > QUEUE_POP_MAX_BATCH:
+        raise HTTPException(status_code=422, detail=f"At most {QUEUE_POP_MAX_BATCH} ids per ack")
+    acked = await _get_queue(name).ack(*ids)
+    return ApiResponse(success=True, data={"acked": acked, "requested": len(ids)}, message="Acked")
+
+
+async def _reap_queue_leases() -> None:
+    for name in QUEUE_SPECS:
+        outcome = await _get_queue(name).reap_expired()
+        if outcome["requeued"] or outcome["dlq"]:
+            logger.info(
+                "Queue %s leases expired: %s requeued, %s moved to DLQ", name, outcome["requeued"], outcome["dlq"]
+            )
+
+
+async def _promote_queue_due() -> None:
+    # Highest priority first, so a sync backlog never delays promotion of payment retries
+    for spec in by_priority(QUEUE_SPECS.values()):
+        moved = await _get_queue(spec.name).promote_due_batches(QUEUE_PROMOTE_CHUNK, QUEUE_PROMOTE_MAX_CHUNKS_PER_TICK)
+        if moved >= QUEUE_PROMOTE_CHUNK * QUEUE_PROMOTE_MAX_CHUNKS_PER_TICK:
+            logger.info("Queue %s promoter moved %s due messages; backlog continues next tick", spec.name, moved)
 
 
 @app.post("/queue/fail", response_model=ApiResponse)
-async def queue_fail(req: QueueAckRequest, _: Dict[str, Any] = Depends(verify_jwt_token)) -> ApiResponse:
-    r = _get_redis()
-    if r is None:
-        raise HTTPException(status_code=503, detail="Queue unavailable")
-    h = r.hgetall(_queue_key_msg(req.id))
-    if not h:
+@app.post("/queue/{name}/fail", response_model=ApiResponse, openapi_extra=_QUEUE_NAME_PARAM)
+async def queue_fail(
+    req: QueueAckRequest, _: Dict[str, Any] = Depends(verify_jwt_token), name: str = Depends(_consumer_queue_name)
+) -> ApiResponse:
+    outcome = await _get_queue(name).fail(req.id, req.error, permanent=req.permanent)
+    if outcome is None:
         return ApiResponse(success=False, message="Unknown message id")
-    attempts = int(h.get("attempts") or 0) + 1
-    max_attempts = int(h.get("max_attempts") or 5)
-    r.hset(_queue_key_msg(req.id), mapping={
-        "attempts": str(attempts),
-        "updated_at": str(_queue_now()),
-        "last_error": req.error or "",
-    })
-    if attempts >= max_attempts:
-        r.lpush(_Q_DLQ, req.id)
+    if outcome["dlq"]:
         return ApiResponse(success=True, message="Moved to DLQ")
-    # exponential backoff with cap 300s
-    delay = min(300, 2 ** attempts)
-    r.zadd(_Q_DELAYED, {req.id: _queue_now() + delay})
-    return ApiResponse(success=True, data={"delay": delay}, message="Rescheduled")
+    return ApiResponse(success=True, data={"delay": outcome["delay"]}, message="Rescheduled")
 
 
 @app.get("/queue/stats", response_model=ApiResponse)
-async def queue_stats(_: Dict[str, Any] = Depends(verify_jwt_token)) -> ApiResponse:
-    r = _get_redis()
-    if r is None:
-        raise HTTPException(status_code=503, detail="Queue unavailable")
-    _promote_due(r)
+@app.get("/queue/{name}/stats", response_model=ApiResponse, openapi_extra=_QUEUE_NAME_PARAM)
+async def queue_stats(_: Dict[str, Any] = Depends(verify_jwt_token), name: str = Depends(_queue_name)) -> ApiResponse:
+    q = _get_queue(name)
     try:
-        size_main = int(r.llen(_Q_MAIN))
-        size_delayed = int(r.zcard(_Q_DELAYED))
-        size_dlq = int(r.llen(_Q_DLQ))
-        oldest_main_id = r.lindex(_Q_MAIN, -1)
-        oldest_age = None
-        if oldest_main_id:
-            h = r.hgetall(_queue_key_msg(oldest_main_id))
-            enq = int(h.get("enqueued_at") or 0)
-            if enq:
-                oldest_age = _queue_now() - enq
-        payload = {
-            "main": {"size": size_main, "oldest_age_seconds": oldest_age},
-            "delayed": {"size": size_delayed},
-            "dlq": {"size": size_dlq},
-        }
-        return ApiResponse(success=True, data=payload, message="Queue stats")
+        return ApiResponse(success=True, data=await q.stats(), message="Queue stats")
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Failed to fetch stats: {e}")
 
 
 @app.get("/queue/dlq/list", response_model=ApiResponse)
-async def queue_dlq_list(limit: int = 50, offset: int = 0, _: Dict[str, Any] = Depends(verify_jwt_token)) -> ApiResponse:
-    r = _get_redis()
-    if r is None:
-        raise HTTPException(status_code=503, detail="Queue unavailable")
+@app.get("/queue/{name}/dlq/list", response_model=ApiResponse, openapi_extra=_QUEUE_NAME_PARAM)
+async def queue_dlq_list(
+    limit: int = 50,
+    offset: int = 0,
+    _: Dict[str, Any] = Depends(verify_jwt_token),
+    name: str = Depends(_queue_name),
+) -> ApiResponse:
+    q = _get_queue(name)
     try:
-        start = offset
-        end = offset + max(0, limit) - 1
-        ids = r.lrange(_Q_DLQ, start, end)
-        items = []
-        for msg_id in ids:
-            h = r.hgetall(_queue_key_msg(msg_id)) or {}
-            try:
-                payload = json.loads(h.get("payload") or "{}")
-            except Exception:
-                payload = {}
-            items.append({
-                "id": msg_id,
-                "attempts": int(h.get("attempts") or 0),
-                "max_attempts": int(h.get("max_attempts") or 0),
-                "enqueued_at": int(h.get("enqueued_at") or 0),
-                "updated_at": int(h.get("updated_at") or 0),
-                "last_error": h.get("last_error") or None,
-                "payload": payload,
-            })
-        total = int(r.llen(_Q_DLQ))
-        return ApiResponse(success=True, data={"total": total, "items": items}, message="DLQ list")
+        return ApiResponse(success=True, data=await q.dlq_list(limit=limit, offset=offset), message="DLQ list")
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Failed to list DLQ: {e}")
 
 
 @app.post("/queue/dlq/requeue", response_model=ApiResponse)
-async def queue_dlq_requeue(req: DlqRequeueRequest, _: Dict[str, Any] = Depends(verify_jwt_token)) -> ApiResponse:
-    r = _get_redis()
-    if r is None:
-        raise HTTPException(status_code=503, detail="Queue unavailable")
-    # remove one occurrence of id from DLQ
-    r.lrem(_Q_DLQ, 1, req.id)
-    delay = int(req.delay_seconds or 0)
-    when = _queue_now() + delay if delay > 0 else None
-    if when is None:
-        r.lpush(_Q_MAIN, req.id)
-    else:
-        r.zadd(_Q_DELAYED, {req.id: when})
-    r.hset(_queue_key_msg(req.id), mapping={"updated_at": str(_queue_now())})
-    return ApiResponse(success=True, data={"id": req.id, "delay_seconds": delay}, message="Requeued from DLQ")
+@app.post("/queue/{name}/dlq/requeue", response_model=ApiResponse, openapi_extra=_QUEUE_NAME_PARAM)
+async def queue_dlq_requeue(
+    req: DlqRequeueRequest, _: Dict[str, Any] = Depends(verify_jwt_token), name: str = Depends(_queue_name)
+) -> ApiResponse:
+    if (req.id is None) == (req.filter is None):
+        raise HTTPException(status_code=422, detail="Provide either id or filter")
+    delay = max(0, int(req.delay_seconds or 0))
+    if req.id is not None:
+        if not await _get_queue(name).dlq_requeue(req.id, delay):
+            raise HTTPException(status_code=404, detail="Message not in DLQ")
+        return ApiResponse(success=True, data={"id": req.id, "delay_seconds": delay}, message="Requeued from DLQ")
+    if req.limit is not None and req.limit < 1:
+        raise HTTPException(status_code=422, detail="limit must be >= 1")
+    outcome = await _get_queue(name).dlq_requeue_matching(
+        **req.filter.model_dump(), delay_seconds=delay, limit=req.limit, dry_run=req.dry_run
+    )
+    logger.info(
+        "DLQ requeue by filter on %s%s: %s matched, %s scanned",
+        name, " (dry run)" if req.dry_run else "", outcome["matched"], outcome["scanned"],
+    )
+    message = "DLQ matches counted" if req.dry_run else "Requeued from DLQ"
+    return ApiResponse(success=True, data={**outcome, "delay_seconds": delay, "dry_run": req.dry_run}, message=message)
 
 
 @app.post("/queue/dlq/purge", response_model=ApiResponse)
-async def queue_dlq_purge(req: DlqPurgeRequest, _: Dict[str, Any] = Depends(verify_jwt_token)) -> ApiResponse:
-    r = _get_redis()
-    if r is None:
-        raise HTTPException(status_code=503, detail="Queue unavailable")
-    purged = 0
-    if req.id:
-        r.lrem(_Q_DLQ, 1, req.id)
-        r.delete(_queue_key_msg(req.id))
-        purged = 1
-    else:
-        ids = r.lrange(_Q_DLQ, 0, -1) or []
-        for mid in ids:
-            r.delete(_queue_key_msg(mid))
-        r.ltrim(_Q_DLQ, 1, 0)  # clear list
-        purged = len(ids)
+@app.post("/queue/{name}/dlq/purge", response_model=ApiResponse, openapi_extra=_QUEUE_NAME_PARAM)
+async def queue_dlq_purge(
+    req: DlqPurgeRequest, _: Dict[str, Any] = Depends(verify_jwt_token), name: str = Depends(_queue_name)
+) -> ApiResponse:
+    purged = await _get_queue(name).dlq_purge(req.id)
     return ApiResponse(success=True, data={"purged": purged}, message="DLQ purged")
 
 
+@app.post("/queues/pop", response_model=ApiResponse)
+async def queues_pop(
+    _: Dict[str, Any] = Depends(verify_jwt_token),
+    names: Optional[str] = None,
+    max_items: int = Query(10, alias="max"),
+    visibility_timeout: Optional[int] = None,
+) -> ApiResponse:
+    """Lease across several queues (default: all but mail), strictly by priority and within each max_inflight.
+
+    Items carry their `queue`; ack/fail them on `/queue/{name}/...`.
+    """
+    _check_pop_max(max_items)
+    lease = _lease_seconds(visibility_timeout)
+    if names:
+        selected = [n.strip() for n in names.split(",") if n.strip()]
+    else:
+        selected = [n for n in QUEUE_SPECS if n != MAIL_QUEUE]
+    if any(n not in QUEUE_SPECS or n == MAIL_QUEUE for n in selected):
+        raise HTTPException(status_code=404, detail="Unknown queue")
+    queues = [(QUEUE_SPECS[n], _get_queue(n)) for n in dict.fromkeys(selected)]
+    leased = await pop_by_priority(queues, max_items, visibility_timeout=lease)
+    items = [_queue_item(item, item["queue"]) for item in leased]
+    return ApiResponse(success=True, data={"items": items, "visibility_timeout": lease}, message=f"Popped {len(items)}")
+
+
+@app.get("/queues/stats", response_model=ApiResponse)
+async def queues_stats(_: Dict[str, Any] = Depends(verify_jwt_token)) -> ApiResponse:
+    """Stats for every configured queue, highest priority first."""
+    queues = []
+    for spec in by_priority(QUEUE_SPECS.values()):
+        stats = await _get_queue(spec.name).stats()
+        queues.append({"name": spec.name, "priority": spec.priority, "max_inflight": spec.max_inflight, **stats})
+    return ApiResponse(success=True, data={"queues": queues}, message="Queue stats")
+
+
+@app.get("/queues/dispatcher", response_model=ApiResponse)
+async def queues_dispatcher(_: Dict[str, Any] = Depends(verify_jwt_token)) -> ApiResponse:
+    """Delivery counters and per-target latency of the in-process webhook dispatcher."""
+    if _webhook_dispatcher is None:
+        return ApiResponse(success=True, data={"enabled": False}, message="Webhook dispatcher disabled")
+    data = {"enabled": True, "queues": WEBHOOK_DISPATCHER_QUEUES, **_webhook_dispatcher.snapshot()}
+    return ApiResponse(success=True, data=data, message="Webhook dispatcher metrics")
+
+
+@app.get("/queues/mail", response_model=ApiResponse)
+async def queues_mail(_: Dict[str, Any] = Depends(verify_jwt_token)) -> ApiResponse:
+    """Send counters, rate limit and SMTP latency of the mail queue sender (DLQ via /queue/mail/dlq/list)."""
+    if _mail_sender is None:
+        return ApiResponse(success=True, data={"enabled": False}, message="Mail sender disabled")
+    data = {"enabled": True, "queue": MAIL_QUEUE, **_mail_sender.snapshot(), "smtp": get_smtp_pool().snapshot()}
+    return ApiResponse(success=True, data=data, message="Mail sender metrics")
+
+
+@app.get("/queues/metrics", response_model=ApiResponse)
+async def queues_metrics(_: Dict[str, Any] = Depends(verify_jwt_token)) -> ApiResponse:
+    """Per-queue throughput, enqueue→pop wait and pop→ack processing time (this process)."""
+    queues = [
+        {"name": spec.name, "priority": spec.priority, **_queue_metrics[spec.name].snapshot()}
+        for spec in by_priority(QUEUE_SPECS.values())
+    ]
+    return ApiResponse(success=True, data={"queues": queues}, message="Queue metrics")
+
+
+@app.get("/queues/metrics/prometheus", response_class=Response)
+async def queues_metrics_prometheus(_: Dict[str, Any] = Depends(verify_jwt_token)) -> Response:
+    """Same metrics plus queue sizes in Prometheus text format (scrape with a bearer token)."""
+    sizes: Optional[Dict[str, Dict[str, Any]]] = {}
+    try:
+        for name in QUEUE_SPECS:
+            sizes[name] = await _get_queue(name).stats()
+    except Exception as exc:  # backend down: counters are still worth scraping
+        logger.warning("Queue sizes unavailable for metrics scrape: %s", exc)
+        sizes = None
+    body = render_prometheus(_queue_metrics.values(), sizes)
+    return Response(content=body, media_type="text/plain; version=0.0.4; charset=utf-8")
+
+
+@app.get("/scheduler/jobs", response_model=ApiResponse)
+async def scheduler_jobs(_: Dict[str, Any] = Depends(verify_jwt_token)) -> ApiResponse:
+    """Registered recurring jobs with their last scheduled and next run (Unix seconds)."""
+    jobs = await _scheduler.describe()
+    return ApiResponse(success=True, data={"jobs": jobs, "timezone": str(SCHEDULER_TIMEZONE)}, message="Scheduled jobs")
+
+
+@app.post("/scheduler/jobs/{name}/run", response_model=ApiResponse)
+async def scheduler_run_job(name: str, _: Dict[str, Any] = Depends(verify_jwt_token)) -> ApiResponse:
+    """Enqueue one extra run now; the regular schedule is unaffected."""
+    if name not in SCHEDULED_JOBS:
+        raise HTTPException(status_code=404, detail="Unknown job")
+    msg_id = await _scheduler.run_now(name)
+    return ApiResponse(success=True, data={"id": msg_id, "queue": SCHEDULED_JOBS[name].queue}, message="Job enqueued")
+
+
 # --- CiviCRM passthrough (controlled) ---
 class CivicrmRequest(BaseModel):
     entity: str
@@ -1241,17 +1751,40 @@ _CIVIC_ALLOWED: Dict[str, set[str]] = {
 }
 
 
-@app.post("/civicrm", response_model=ApiResponse)
-async def civicrm_passthrough(req: CivicrmRequest, _: Dict[str, Any] = Depends(verify_jwt_token)) -> ApiResponse:
-    entity = str(req.entity or "").strip()
-    action = str(req.action or "").strip()
+CIVICRM_BATCH_MAX_ITEMS = _parse_int("CIVICRM_BATCH_MAX_ITEMS", 100)
+CIVICRM_BATCH_CONCURRENCY = max(1, _parse_int("CIVICRM_BATCH_CONCURRENCY", 8))
+
+
+class CivicrmBatchRequest(BaseModel):
+    calls: List[CivicrmRequest]
+
+
+def _civicrm_check_allowed(entity: str, action: str) -> None:
     if not entity or not action:
         raise HTTPException(status_code=400, detail="entity and action required")
     allowed_actions = _CIVIC_ALLOWED.get(entity)
     if not allowed_actions or action not in allowed_actions:
         raise HTTPException(status_code=403, detail="Entity/action not allowed")
+
+
+async def _civicrm_passthrough_call(entity: str, action: str, params: Dict[str, Any]) -> Dict[str, Any]:
+    res = await civicrm_api_call(entity, action, params)
+    if entity == "Contact" and action == "create":
+        contact = _extract_first_value(res) or {}
+        await get_contact_cache().invalidate(
+            contact_id=params.get("id") or contact.get("id"),
+            emails=[params.get("email"), contact.get("email")],
+        )
+    return res
+
+
+@app.post("/civicrm", response_model=ApiResponse)
+async def civicrm_passthrough(req: CivicrmRequest, _: Dict[str, Any] = Depends(verify_jwt_token)) -> ApiResponse:
+    entity = str(req.entity or "").strip()
+    action = str(req.action or "").strip()
+    _civicrm_check_allowed(entity, action)
     try:
-        res = await civicrm_api_call(entity, action, req.params or {})
+        res = await _civicrm_passthrough_call(entity, action, req.params or {})
         return ApiResponse(success=True, data=res, message=f"{entity}.{action} ok")
     except HTTPException as e:
         raise e
@@ -1259,6 +1792,52 @@ async def civicrm_passthrough(req: CivicrmRequest, _: Dict[str, Any] = Depends(v
         raise HTTPException(status_code=500, detail="CiviCRM passthrough failed")
 
 
+@app.post("/civicrm/batch", response_model=ApiResponse)
+async def civicrm_batch(req: CivicrmBatchRequest, _: Dict[str, Any] = Depends(verify_jwt_token)) -> ApiResponse:
+    """Run many allowlisted calls concurrently; results are returned per item, in request order."""
+    if not req.calls:
+        raise HTTPException(status_code=400, detail="calls must not be empty")
+    if len(req.calls) > CIVICRM_BATCH_MAX_ITEMS:
+        raise HTTPException(status_code=413, detail=f"At most {CIVICRM_BATCH_MAX_ITEMS} calls per batch")
+
+    semaphore = asyncio.Semaphore(CIVICRM_BATCH_CONCURRENCY)
+
+    async def _run(index: int, call: CivicrmRequest) -> Dict[str, Any]:
+        entity = str(call.entity or "").strip()
+        action = str(call.action or "").strip()
+        item: Dict[str, Any] = {"index": index, "entity": entity, "action": action}
+        try:
+            _civicrm_check_allowed(entity, action)
+            async with semaphore:
+                res = await _civicrm_passthrough_call(entity, action, call.params or {})
+            return {**item, "success": True, "data": res}
+        except HTTPException as e:
+            return {**item, "success": False, "status_code": e.status_code, "error": e.detail}
+        except Exception:
+            logger.exception("CiviCRM batch item %s failed", index)
+            return {**item, "success": False, "status_code": 500, "error": "CiviCRM passthrough failed"}
+
+    results = await asyncio.gather(*(_run(i, call) for i, call in enumerate(req.calls)))
+    failed = sum(1 for r in results if not r["success"])
+    return ApiResponse(
+        success=True,
+        data={"results": results, "total": len(results), "failed": failed},
+        message=f"Batch executed ({len(results) - failed} ok, {failed} failed)",
+    )
+
+
+@app.get("/civicrm/metrics", response_model=ApiResponse)
+async def civicrm_metrics(_: Dict[str, Any] = Depends(verify_jwt_token)) -> ApiResponse:
+    """Per entity/action latency of calls through the shared CiviCRM client."""
+    client = get_civicrm_client()
+    data = {
+        "calls": client.metrics(),
+        "resilience": client.resilience_snapshot(),
+        "contact_cache": get_contact_cache().snapshot(),
+    }
+    return ApiResponse(success=True, data=data, message="CiviCRM metrics")
+
+
 # Alerts: simple email send
 class EmailAlertRequest(BaseModel):
     to: EmailStr
@@ -1268,59 +1847,9 @@ class EmailAlertRequest(BaseModel):
 
 @app.post("/alerts/email", response_model=ApiResponse)
 async def send_alert_email(req: EmailAlertRequest, _: Dict[str, Any] = Depends(verify_jwt_token)) -> ApiResponse:
-    _send_email_plain(to_email=str(req.to), subject=req.subject, text=req.text)
-    return ApiResponse(success=True, message="Alert email sent")
-
-
-def _send_email_with_attachment(*, to_email: str, subject: str, text: str, attachment_name: str, attachment_bytes: bytes):
-    if not (SMTP_HOST and SMTP_FROM):
-        raise HTTPException(status_code=503, detail="SMTP not configured")
-    msg = EmailMessage()
-    msg['From'] = SMTP_FROM
-    msg['To'] = to_email
-    msg['Date'] = formatdate(localtime=True)
-    msg['Subject'] = subject
-    msg.set_content(text)
-    msg.add_attachment(attachment_bytes, maintype='application', subtype='pdf', filename=attachment_name)
-    try:
-        if SMTP_USE_TLS:
-            with smtplib.SMTP(SMTP_HOST, SMTP_PORT, timeout=20) as s:
-                s.starttls()
-                if SMTP_USER:
-                    s.login(SMTP_USER, SMTP_PASSWORD)
-                s.send_message(msg)
-        else:
-            with smtplib.SMTP(SMTP_HOST, SMTP_PORT, timeout=20) as s:
-                if SMTP_USER:
-                    s.login(SMTP_USER, SMTP_PASSWORD)
-                s.send_message(msg)
-    except Exception as e:
-        raise HTTPException(status_code=502, detail=f"SMTP send failed: {e}")
-
-
-def _send_email_plain(*, to_email: str, subject: str, text: str):
-    if not (SMTP_HOST and SMTP_FROM):
-        raise HTTPException(status_code=503, detail="SMTP not configured")
-    msg = EmailMessage()
-    msg['From'] = SMTP_FROM
-    msg['To'] = to_email
-    msg['Date'] = formatdate(localtime=True)
-    msg['Subject'] = subject
-    msg.set_content(text)
-    try:
-        if SMTP_USE_TLS:
-            with smtplib.SMTP(SMTP_HOST, SMTP_PORT, timeout=20) as s:
-                s.starttls()
-                if SMTP_USER:
-                    s.login(SMTP_USER, SMTP_PASSWORD)
-                s.send_message(msg)
-        else:
-            with smtplib.SMTP(SMTP_HOST, SMTP_PORT, timeout=20) as s:
-                if SMTP_USER:
-                    s.login(SMTP_USER, SMTP_PASSWORD)
-                s.send_message(msg)
-    except Exception as e:
-        raise HTTPException(status_code=502, detail=f"SMTP send failed: {e}")
+    # Sent by the mail queue sender (rate limit, retries, DLQ); status via GET /queues/mail
+    mail_id = await _enqueue_mail(mail_payload(to=str(req.to), subject=req.subject, text=req.text))
+    return ApiResponse(success=True, data={"mail_id": mail_id}, message="Alert email queued")
 
 
 async def _ensure_contact_id(email: Optional[str], contact_id: Optional[int]) -> int:
@@ -1597,44 +2126,44 @@ async def paypal_capture(req: PayPalCaptureRequest, _: Dict[str, Any] = Depends(
 async def trigger_receipt(req: ReceiptTriggerRequest, _: Dict[str, Any] = Depends(verify_jwt_token)) -> ApiResponse:
     logger.info("Receipt requested: email=%s, amount=%s %s, purpose=%s, provider=%s, trxn=%s",
                 req.email, req.amount, req.currency, req.purpose, req.provider, req.trxn_id)
-    receipt_no = _next_receipt_number()
-    pdf_bytes = _generate_receipt_pdf_bytes(
-        amount=req.amount,
-        currency=req.currency or "EUR",
-        purpose=req.purpose,
-        provider=req.provider,
-        trxn_id=req.trxn_id,
-        email=req.email,
-        receipt_number=receipt_no,
-    )
-    # Email if possible
+    from datetime import datetime
+    receipt_no = await _next_receipt_number()
+    activity = {
+        "contact_id": req.contact_id,
+        "subject": f"Receipt sent: {receipt_no} – {req.amount} {req.currency}",
+        "details": f"Purpose: {req.purpose or ''} | Provider: {req.provider or ''} | Trxn: {req.trxn_id or ''}",
+    }
     if req.email:
-        _send_email_with_attachment(
-            to_email=req.email,
+        # PDF rendering, SMTP and the CiviCRM activity all happen in the mail queue sender
+        mail_id = await _enqueue_mail(mail_payload(
+            to=req.email,
             subject=f"{ORG_NAME} – Spendenbeleg {receipt_no}",
             text=f"Vielen Dank für Ihre Unterstützung! Im Anhang finden Sie den Beleg über {req.amount:.2f} {str(req.currency or 'EUR').upper()}.",
-            attachment_name=f"beleg_{receipt_no}.pdf",
-            attachment_bytes=pdf_bytes,
-        )
-    # Store activity (best-effort)
+            receipt={
+                "amount": req.amount,
+                "currency": req.currency or "EUR",
+                "purpose": req.purpose,
+                "provider": req.provider,
+                "trxn_id": req.trxn_id,
+                "email": req.email,
+                "receipt_number": receipt_no,
+                "issued_at": datetime.utcnow().strftime("%Y-%m-%d %H:%M:%SZ"),  # retries keep the request date
+            },
+            activity=activity,
+        ))
+        return ApiResponse(success=True, data={"receipt_number": receipt_no, "mail_id": mail_id}, message="Receipt queued for email")
+    # No address: nothing to send, only store the activity (best-effort)
     try:
-        cid = await _ensure_contact_id(req.email, req.contact_id)
-        await civicrm_api_call("Activity", "create", {
-            "source_contact_id": cid,
-            "activity_type_id": "Email",
-            "subject": f"Receipt sent: {receipt_no} – {req.amount} {req.currency}",
-            "details": f"Purpose: {req.purpose or ''} | Provider: {req.provider or ''} | Trxn: {req.trxn_id or ''}",
-            "status_id": "Completed",
-        })
+        await _record_mail_activity({"activity": activity})
     except Exception:
         pass
-    return ApiResponse(success=True, data={"receipt_number": receipt_no}, message="Receipt generated and email sent (if address provided)")
+    return ApiResponse(success=True, data={"receipt_number": receipt_no}, message="Receipt number assigned (no email address provided)")
 
 
 @app.post("/receipts/generate")
 async def generate_receipt_pdf(req: ReceiptTriggerRequest, _: Dict[str, Any] = Depends(verify_jwt_token)):
-    receipt_no = _next_receipt_number()
-    pdf = _generate_receipt_pdf_bytes(
+    receipt_no = await _next_receipt_number()
+    pdf = await _generate_receipt_pdf_bytes(
         amount=req.amount,
         currency=req.currency or "EUR",
         purpose=req.purpose,
@@ -1650,6 +2179,52 @@ async def generate_receipt_pdf(req: ReceiptTriggerRequest, _: Dict[str, Any] = D
     return Response(content=pdf, media_type="application/pdf", headers=headers)
 
 
+@app.post("/receipts/batch", response_model=ApiResponse)
+async def start_receipt_batch(req: ReceiptBatchRequest, _: Dict[str, Any] = Depends(verify_jwt_token)) -> ApiResponse:
+    """Start (or resume) the receipt run for a year or date range; progress via GET /receipts/batch/{run_id}."""
+    try:
+        date_from, date_to = batch_range(req.year, req.date_from, req.date_to)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    state, started = await _receipt_batches.start(date_from, date_to)
+    if started:
+        message = "Receipt batch resumed" if state.get("parts") else "Receipt batch started"
+    elif state.get("status") == "completed":
+        message = "Receipt batch already completed"
+    else:
+        message = "Receipt batch already running"
+    return ApiResponse(success=True, data={**state, "run_id": run_id_for(date_from, date_to)}, message=message)
+
+
+@app.get("/receipts/batch", response_model=ApiResponse)
+async def list_receipt_batches(_: Dict[str, Any] = Depends(verify_jwt_token)) -> ApiResponse:
+    runs = await asyncio.to_thread(_receipt_batches.list_runs)
+    return ApiResponse(success=True, data={"runs": runs})
+
+
+@app.get("/receipts/batch/{run_id}", response_model=ApiResponse)
+async def receipt_batch_status(run_id: str, _: Dict[str, Any] = Depends(verify_jwt_token)) -> ApiResponse:
+    state = await asyncio.to_thread(_receipt_batches.status, run_id)
+    if state is None:
+        raise HTTPException(status_code=404, detail="Receipt batch not found")
+    return ApiResponse(success=True, data=state)
+
+
+@app.get("/receipts/batch/{run_id}/zip")
+async def receipt_batch_zip(run_id: str, _: Dict[str, Any] = Depends(verify_jwt_token)):
+    """Stream all receipts of a completed run as one ZIP (PDFs plus manifest/*.csv)."""
+    state = await asyncio.to_thread(_receipt_batches.status, run_id)
+    if state is None:
+        raise HTTPException(status_code=404, detail="Receipt batch not found")
+    if state["status"] != "completed":
+        raise HTTPException(status_code=409, detail=f"Receipt batch is {state['status']}")
+    return StreamingResponse(
+        _receipt_batches.stream_zip(run_id),  # sync iterator: Starlette runs it in the threadpool
+        media_type="application/zip",
+        headers={"Content-Disposition": f"attachment; filename={run_id}.zip"},
+    )
+
+
 @app.post("/payments/eps/init", response_model=ApiResponse)
 async def eps_init(req: PaymentInitRequest, _: Dict[str, Any] = Depends(verify_jwt_token)) -> ApiResponse:
     # Implemented via Stripe payment_method_types=eps
@@ -46,40 +46,17 @@ class ProcessDeletionRequest(BaseModel):
 # ============================================================================
 
 from ..shared import verify_jwt_token, ApiResponse, require_admin
+from ..lib.civicrm_client import CivicrmError, get_civicrm_client
+from ..lib.contact_cache import get_contact_cache
+
 
-# CiviCRM API call - wird lazy importiert um circular import zu vermeiden
 async def civicrm_api_call(entity: str, action: str, params: dict):
-    """Make authenticated call to CiviCRM APIv4"""
-    import httpx
-    
-    CIVI_API_KEY = os.getenv("CIVI_API_KEY", "")
-    CIVI_SITE_KEY = os.getenv("CIVI_SITE_KEY", "")
-    
-    payload = {
-        "params": params,
-        "_authx": {
-            "api_key": CIVI_API_KEY,
-            "key": CIVI_SITE_KEY
-        }
-    }
-    
-    url = f"{CIVI_BASE_URL}/civicrm/ajax/api4/{entity}/{action}"
-    
-    async with httpx.AsyncClient(timeout=30) as client:
-        response = await client.post(url, json=payload)
-        
-    if response.status_code != 200:
-        raise HTTPException(status_code=502, detail="CiviCRM API unavailable")
-    
+    """Make authenticated call to CiviCRM APIv4 via the shared connection pool"""
     try:
-        data = response.json()
-    except Exception:
-        raise HTTPException(status_code=502, detail="Invalid response from CiviCRM")
-    
-    if isinstance(data, dict) and data.get("is_error"):
-        raise HTTPException(status_code=400, detail=data.get("error_message", "CiviCRM error"))
-    
-    return data
+        return await get_civicrm_client().call(entity, action, params)
+    except CivicrmError as exc:
+        raise HTTPException(status_code=exc.status_code, detail=exc.detail) from exc
+
 
 # Environment configuration
 CIVI_BASE_URL = os.getenv("CIVI_BASE_URL", "https://crm.menschlichkeit-oesterreich.at")
@@ -370,6 +347,7 @@ async def _civicrm_anonymize_contact(email: str) -> Dict[str, Any]:
     
     # Update Contact
     result = await civicrm_api_call("Contact", "create", anonymized_data)
+    await get_contact_cache().invalidate(contact_id=contact_id, emails=[email])
     
     if isinstance(result, dict):
         values = result.get("values", [])
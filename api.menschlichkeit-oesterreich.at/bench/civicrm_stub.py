@@ -0,0 +1,246 @@
+"""
+Lokaler CiviCRM-Stand-in für Benchmarks und Entwicklung
+
+Implementiert `/civicrm/ajax/api4/{entity}/{action}` (get/create/delete) für
+Contact, Membership, Contribution, ContributionRecur, SepaMandate und Activity
+mit In-Memory-Daten. Latenz und Fehler sind injizierbar:
+
+    STUB_LATENCY_MS=20 STUB_LATENCY_JITTER_MS=5 STUB_ERROR_RATE=0.0 \\
+    STUB_SEED_CONTACTS=2000 uvicorn bench.civicrm_stub:app --port 8800
+
+Laufzeit-Steuerung:
+- GET  /__stub/stats   – Aufrufe pro Entity/Action (z.B. um N+1 zu erkennen)
+- POST /__stub/config  – {"latency_ms": .., "jitter_ms": .., "error_rate": .., "timeout_rate": ..}
+- POST /__stub/reset   – Zähler zurücksetzen
+"""
+
+from __future__ import annotations
+
+import asyncio
+import os
+import random
+from collections import Counter
+from datetime import datetime, timedelta
+from typing import Any, Dict, Iterable, List, Set
+
+from fastapi import Body, FastAPI
+from fastapi.responses import JSONResponse
+
+ENTITIES = ("Contact", "Membership", "Contribution", "ContributionRecur", "SepaMandate", "Activity")
+
+app = FastAPI(title="CiviCRM APIv4 stand-in", version="1.0.0")
+
+_config: Dict[str, float] = {
+    "latency_ms": float(os.getenv("STUB_LATENCY_MS", "20")),
+    "jitter_ms": float(os.getenv("STUB_LATENCY_JITTER_MS", "5")),
+    "error_rate": float(os.getenv("STUB_ERROR_RATE", "0")),
+    "timeout_rate": float(os.getenv("STUB_TIMEOUT_RATE", "0")),
+    "timeout_seconds": float(os.getenv("STUB_TIMEOUT_SECONDS", "60")),
+}
+_store: Dict[str, Dict[int, Dict[str, Any]]] = {entity: {} for entity in ENTITIES}
+_next_id: Dict[str, int] = {entity: 1 for entity in ENTITIES}
+_calls: Counter = Counter()
+
+# Sekundärindizes, damit der Stub selbst nicht zum Flaschenhals wird
+_INDEXED_FIELDS = ("contact_id", "email")
+_index: Dict[str, Dict[str, Dict[Any, Set[int]]]] = {
+    entity: {field: {} for field in _INDEXED_FIELDS} for entity in ENTITIES
+}
+
+
+def _reindex(entity: str, record: Dict[str, Any], *, remove: bool = False) -> None:
+    for field in _INDEXED_FIELDS:
+        value = record.get(field)
+        if value is None:
+            continue
+        ids = _index[entity][field].setdefault(value, set())
+        if remove:
+            ids.discard(record["id"])
+        else:
+            ids.add(record["id"])
+
+
+def _insert(entity: str, record: Dict[str, Any]) -> Dict[str, Any]:
+    record_id = _next_id[entity]
+    _next_id[entity] += 1
+    record = {"id": record_id, **record}
+    _store[entity][record_id] = record
+    _reindex(entity, record)
+    return record
+
+
+def seed(contacts: int, rng: random.Random) -> None:
+    base = datetime(2024, 1, 1)
+    for i in range(1, contacts + 1):
+        modified = (base + timedelta(minutes=i * 7)).strftime("%Y-%m-%d %H:%M:%S")
+        contact = _insert("Contact", {
+            "contact_type": "Individual",
+            "first_name": f"Vorname{i}",
+            "last_name": f"Nachname{i}",
+            "email": f"contact{i}@example.org",
+            "phone": f"+43 660 {i:07d}",
+            "birth_date": f"19{50 + i % 50:02d}-0{1 + i % 9}-1{i % 9}",
+            "street_address": f"Teststraße {i}",
+            "city": "Wien",
+            "postal_code": f"1{i % 23 + 1:02d}0",
+            "modified_date": modified,
+            "is_deleted": False,
+        })
+        if rng.random() < 0.6:
+            _insert("Membership", {
+                "contact_id": contact["id"],
+                "membership_type_id": 1 + i % 3,
+                "membership_name": ["Ordentlich", "Fördernd", "Ehrenmitglied"][i % 3],
+                "status_id": 1 if rng.random() < 0.85 else 3,
+                "join_date": "2023-01-01",
+                "start_date": "2024-01-01",
+                "end_date": "2024-12-31",
+            })
+        for n in range(rng.randint(0, 3)):
+            _insert("Contribution", {
+                "contact_id": contact["id"],
+                "total_amount": round(rng.uniform(5, 250), 2),
+                "currency": "EUR",
+                "financial_type_id": 1,
+                "payment_instrument_id": 1 + n % 6,
+                "contribution_status_id": 1,
+                "receive_date": (base + timedelta(days=rng.randint(0, 364))).strftime("%Y-%m-%d %H:%M:%S"),
+                "trxn_id": f"stub-{contact['id']}-{n}",
+                "source": "Spende",
+            })
+
+
+def _matches(record: Dict[str, Any], clause: List[Any]) -> bool:
+    field, op, value = clause[0], str(clause[1]).upper(), clause[2] if len(clause) > 2 else None
+    current = record.get(field)
+    if op == "=":
+        return current == value
+    if op == "!=":
+        return current != value
+    if op == "IN":
+        return current in (value or [])
+    if op == "NOT IN":
+        return current not in (value or [])
+    if current is None:
+        return False
+    if op == ">":
+        return current > value
+    if op == ">=":
+        return current >= value
+    if op == "<":
+        return current < value
+    if op == "<=":
+        return current <= value
+    if op == "LIKE":
+        return str(value).strip("%").lower() in str(current).lower()
+    return False
+
+
+def _filter(entity: str, params: Dict[str, Any]) -> List[Dict[str, Any]]:
+    where = list(params.get("where") or [])
+    # legacy-style equality keys as used by parts of app/main.py
+    reserved = {"where", "select", "orderBy", "limit", "offset", "values", "chain", "join", "groupBy"}
+    for key, value in params.items():
+        if key not in reserved and not isinstance(value, (dict, list)):
+            where.append([key, "=", value])
+    rows = _store[entity]
+    candidates: Iterable[Dict[str, Any]] = rows.values()
+    for clause in where:
+        field, op = clause[0], str(clause[1]).upper()
+        values = clause[2] if op == "IN" else [clause[2]] if op == "=" else None
+        if values is None:
+            continue
+        if field == "id":
+            candidates = [rows[i] for i in values if i in rows]
+            break
+        if field in _INDEXED_FIELDS:
+            ids = set().union(*(_index[entity][field].get(v, set()) for v in values)) if values else set()
+            candidates = [rows[i] for i in sorted(ids) if i in rows]
+            break
+    return [r for r in candidates if all(_matches(r, clause) for clause in where)]
+
+
+def _get(entity: str, params: Dict[str, Any]) -> Dict[str, Any]:
+    rows = _filter(entity, params)
+    for field, direction in reversed(list((params.get("orderBy") or {"id": "ASC"}).items())):
+        rows.sort(key=lambda r: (r.get(field) is None, r.get(field)), reverse=str(direction).upper() == "DESC")
+    offset = int(params.get("offset") or 0)
+    limit = int(params.get("limit") or 0)
+    rows = rows[offset: offset + limit] if limit else rows[offset:]
+    select = params.get("select")
+    if select:
+        rows = [{k: r.get(k) for k in ["id", *select]} for r in rows]
+    return {"values": rows, "count": len(rows), "countFetched": len(rows)}
+
+
+def _create(entity: str, params: Dict[str, Any]) -> Dict[str, Any]:
+    values = dict(params.get("values") or params)
+    record_id = values.get("id")
+    if record_id is not None and int(record_id) in _store[entity]:
+        record = _store[entity][int(record_id)]
+        _reindex(entity, record, remove=True)
+        record.update(values)
+        _reindex(entity, record)
+    else:
+        values.pop("id", None)
+        record = _insert(entity, values)
+    if entity == "Contact":
+        record["modified_date"] = datetime.utcnow().strftime("%Y-%m-%d %H:%M:%S")
+    return {"values": [record], "count": 1}
+
+
+def _delete(entity: str, params: Dict[str, Any]) -> Dict[str, Any]:
+    rows = _filter(entity, params)
+    for row in rows:
+        _reindex(entity, row, remove=True)
+        _store[entity].pop(row["id"], None)
+    return {"values": [{"id": r["id"]} for r in rows], "count": len(rows)}
+
+
+@app.post("/civicrm/ajax/api4/{entity}/{action}")
+async def api4(entity: str, action: str, body: Dict[str, Any] = Body(default_factory=dict)):
+    _calls[f"{entity}.{action}"] += 1
+    delay_ms = max(0.0, _config["latency_ms"] + random.uniform(-1, 1) * _config["jitter_ms"])
+    await asyncio.sleep(delay_ms / 1000.0)
+    roll = random.random()
+    if roll < _config["timeout_rate"]:
+        await asyncio.sleep(_config["timeout_seconds"])
+    elif roll < _config["timeout_rate"] + _config["error_rate"]:
+        return JSONResponse({"is_error": 1, "error_message": "Injected failure"}, status_code=500)
+
+    if entity not in _store:
+        return JSONResponse({"is_error": 1, "error_message": f"API entity {entity} not found"}, status_code=404)
+    params = body.get("params") or {}
+    if action == "get":
+        return _get(entity, params)
+    if action == "create":
+        return _create(entity, params)
+    if action == "delete":
+        return _delete(entity, params)
+    return JSONResponse({"is_error": 1, "error_message": f"Action {action} not supported by stub"}, status_code=400)
+
+
+@app.get("/__stub/stats")
+async def stub_stats():
+    return {
+        "calls": dict(sorted(_calls.items())),
+        "records": {entity: len(rows) for entity, rows in _store.items()},
+        "config": _config,
+    }
+
+
+@app.post("/__stub/config")
+async def stub_config(update: Dict[str, float] = Body(...)):
+    for key, value in update.items():
+        if key in _config:
+            _config[key] = float(value)
+    return _config
+
+
+@app.post("/__stub/reset")
+async def stub_reset():
+    _calls.clear()
+    return {"reset": True}
+
+
+seed(int(os.getenv("STUB_SEED_CONTACTS", "2000")), random.Random(int(os.getenv("STUB_SEED", "42"))))
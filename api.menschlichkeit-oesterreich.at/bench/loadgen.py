@@ -0,0 +1,202 @@
+#!/usr/bin/env python3
+"""
+Load-Generator für die FastAPI-App
+
+Führt jedes Szenario nacheinander mit `--concurrency` parallelen Workern für
+`--duration` Sekunden aus und meldet pro Endpoint Requests, Fehler, RPS sowie
+p50/p95/p99-Latenzen. Ergebnisse werden optional als JSON geschrieben und
+können mit `--compare` gegen eine Baseline geprüft werden.
+
+    python bench/loadgen.py --base-url http://127.0.0.1:8000 --duration 10 \\
+        --concurrency 20 --output bench/results/current.json \\
+        --compare bench/results/baseline.json
+"""
+
+from __future__ import annotations
+
+import argparse
+import asyncio
+import json
+import math
+import os
+import platform
+import random
+import sys
+import time
+from datetime import datetime, timezone
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+import httpx
+import jwt
+
+Request = Tuple[str, str, Optional[Dict[str, Any]]]
+
+# Szenario → Funktion, die (method, path, json_body) für einen Request liefert
+SCENARIOS: Dict[str, Callable[[random.Random, int], Request]] = {
+    "health": lambda rng, n: ("GET", "/health", None),
+    "user_profile": lambda rng, n: ("GET", "/user/profile", None),
+    "contact_get": lambda rng, n: ("GET", f"/contacts/{rng.randint(1, n)}", None),
+    "contacts_search": lambda rng, n: ("GET", "/contacts/search?limit=50", None),
+    "memberships_contact": lambda rng, n: ("GET", f"/memberships/contact/{rng.randint(1, n)}", None),
+    "civicrm_passthrough": lambda rng, n: (
+        "POST", "/civicrm", {"entity": "Contact", "action": "get", "params": {"id": rng.randint(1, n), "limit": 1}},
+    ),
+    "civicrm_batch": lambda rng, n: (
+        "POST", "/civicrm/batch",
+        {"calls": [{"entity": "Contact", "action": "get", "params": {"id": rng.randint(1, n), "limit": 1}} for _ in range(10)]},
+    ),
+}
+
+
+def percentile(samples: List[float], q: float) -> Optional[float]:
+    if not samples:
+        return None
+    ordered = sorted(samples)
+    rank = max(1, math.ceil(q / 100.0 * len(ordered)))
+    return ordered[min(rank, len(ordered)) - 1]
+
+
+def make_token(secret: str, subject: str) -> str:
+    now = int(time.time())
+    return jwt.encode({"sub": subject, "type": "access", "iat": now, "exp": now + 3600}, secret, algorithm="HS256")
+
+
+async def run_scenario(
+    client: httpx.AsyncClient,
+    name: str,
+    *,
+    duration: float,
+    concurrency: int,
+    contacts: int,
+    seed: int,
+) -> Dict[str, Any]:
+    build = SCENARIOS[name]
+    latencies: List[float] = []
+    errors: Dict[str, int] = {}
+    deadline = time.perf_counter() + duration
+
+    async def worker(index: int) -> None:
+        rng = random.Random(seed + index)
+        while time.perf_counter() < deadline:
+            method, path, body = build(rng, contacts)
+            started = time.perf_counter()
+            try:
+                response = await client.request(method, path, json=body)
+                status = str(response.status_code)
+            except httpx.HTTPError as exc:
+                status = type(exc).__name__
+            latencies.append((time.perf_counter() - started) * 1000)
+            if not status.startswith("2"):
+                errors[status] = errors.get(status, 0) + 1
+
+    started = time.perf_counter()
+    await asyncio.gather(*(worker(i) for i in range(concurrency)))
+    elapsed = time.perf_counter() - started
+
+    def _ms(value: Optional[float]) -> Optional[float]:
+        return round(value, 2) if value is not None else None
+
+    return {
+        "requests": len(latencies),
+        "errors": errors,
+        "rps": round(len(latencies) / elapsed, 1) if elapsed else 0.0,
+        "p50_ms": _ms(percentile(latencies, 50)),
+        "p95_ms": _ms(percentile(latencies, 95)),
+        "p99_ms": _ms(percentile(latencies, 99)),
+        "max_ms": _ms(max(latencies) if latencies else None),
+    }
+
+
+def compare(current: Dict[str, Any], baseline: Dict[str, Any], tolerance: float) -> List[str]:
+    """Regressions: p95 worse or RPS lower than baseline by more than `tolerance` (relative)."""
+    problems = []
+    for name, result in current["scenarios"].items():
+        base = baseline.get("scenarios", {}).get(name)
+        if not base:
+            continue
+        if base.get("p95_ms") and result.get("p95_ms") and result["p95_ms"] > base["p95_ms"] * (1 + tolerance):
+            problems.append(f"{name}: p95 {result['p95_ms']}ms > baseline {base['p95_ms']}ms (+{tolerance:.0%})")
+        if base.get("rps") and result["rps"] < base["rps"] * (1 - tolerance):
+            problems.append(f"{name}: rps {result['rps']} < baseline {base['rps']} (-{tolerance:.0%})")
+    return problems
+
+
+def print_table(results: Dict[str, Dict[str, Any]]) -> None:
+    header = f"{'scenario':<22}{'requests':>9}{'errors':>8}{'rps':>9}{'p50':>9}{'p95':>9}{'p99':>9}"
+    print(header)
+    print("-" * len(header))
+    for name, r in results.items():
+        print(
+            f"{name:<22}{r['requests']:>9}{sum(r['errors'].values()):>8}{r['rps']:>9}"
+            f"{r['p50_ms'] or '-':>9}{r['p95_ms'] or '-':>9}{r['p99_ms'] or '-':>9}"
+        )
+
+
+async def main_async(args: argparse.Namespace) -> int:
+    secret = args.jwt_secret or os.getenv("JWT_SECRET")
+    if not secret:
+        print("JWT_SECRET (or --jwt-secret) is required", file=sys.stderr)
+        return 2
+    headers = {"Authorization": f"Bearer {make_token(secret, args.subject)}"}
+    limits = httpx.Limits(max_connections=args.concurrency, max_keepalive_connections=args.concurrency)
+    results: Dict[str, Dict[str, Any]] = {}
+    async with httpx.AsyncClient(base_url=args.base_url, headers=headers, limits=limits, timeout=60) as client:
+        for name in args.scenarios:
+            if args.warmup > 0:
+                await run_scenario(client, name, duration=args.warmup, concurrency=args.concurrency,
+                                   contacts=args.contacts, seed=args.seed)
+            results[name] = await run_scenario(client, name, duration=args.duration, concurrency=args.concurrency,
+                                               contacts=args.contacts, seed=args.seed)
+            print(f"{name}: {results[name]['rps']} rps, p95 {results[name]['p95_ms']} ms", file=sys.stderr)
+
+    print_table(results)
+    report = {
+        "generated_at": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+        "settings": {
+            "duration_seconds": args.duration,
+            "concurrency": args.concurrency,
+            "contacts": args.contacts,
+            "python": platform.python_version(),
+            "notes": args.notes,
+        },
+        "scenarios": results,
+    }
+    if args.output:
+        os.makedirs(os.path.dirname(os.path.abspath(args.output)), exist_ok=True)
+        with open(args.output, "w", encoding="utf-8") as handle:
+            json.dump(report, handle, indent=2, ensure_ascii=False)
+            handle.write("\n")
+    if args.compare:
+        with open(args.compare, encoding="utf-8") as handle:
+            problems = compare(report, json.load(handle), args.tolerance)
+        for problem in problems:
+            print(f"REGRESSION {problem}", file=sys.stderr)
+        if problems:
+            return 1
+    return 0
+
+
+def build_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(description="Load generator for the Menschlichkeit Österreich API")
+    parser.add_argument("--base-url", default="http://127.0.0.1:8000")
+    parser.add_argument("--duration", type=float, default=10.0, help="Seconds per scenario")
+    parser.add_argument("--warmup", type=float, default=2.0, help="Warm-up seconds per scenario (not reported)")
+    parser.add_argument("--concurrency", type=int, default=20)
+    parser.add_argument("--contacts", type=int, default=2000, help="Contact ids 1..N seeded in the stub")
+    parser.add_argument("--subject", default="contact1@example.org", help="JWT subject (must exist in the stub)")
+    parser.add_argument("--jwt-secret", help="Defaults to JWT_SECRET env")
+    parser.add_argument("--scenarios", nargs="+", choices=sorted(SCENARIOS), default=list(SCENARIOS))
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--output", help="Write JSON report to this path")
+    parser.add_argument("--compare", help="Baseline JSON; exit 1 on regression")
+    parser.add_argument("--tolerance", type=float, default=0.25, help="Allowed relative regression (default 25%%)")
+    parser.add_argument("--notes", default="", help="Free text stored in the report")
+    return parser
+
+
+def main() -> int:
+    return asyncio.run(main_async(build_parser().parse_args()))
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,164 @@
+#!/usr/bin/env python3
+"""
+Micro-Benchmark der Webhook-Queue-Operationen
+
+Vergleicht die frühere Befehlsfolge (3–6 Round Trips pro Operation) mit den
+Lua-Skripten aus app/lib/redis_queue.py gegen einen echten Redis (beide über
+redis.asyncio) und prüft, ob parallele Promoter IDs doppelt in die Main-Liste
+schieben. Das SQLite-Backend läuft zum Vergleich in einer temporären Datei,
+zusätzlich mit parallelen pushes (Group Commit).
+
+    python bench/queue_bench.py --redis-url redis://127.0.0.1:6379/15 --ops 5000
+"""
+
+from __future__ import annotations
+
+import argparse
+import asyncio
+import json
+import os
+import sys
+import tempfile
+import time
+import uuid
+from typing import Any, Awaitable, Callable, Dict
+
+import redis.asyncio as redis
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from app.lib.redis_queue import RedisQueue  # noqa: E402
+from app.lib.sqlite_queue import SqliteQueue  # noqa: E402
+from app.lib.stream_queue import StreamQueue  # noqa: E402
+
+NS = "bench:queue"
+
+
+class LegacyQueue:
+    """Die ursprüngliche, nicht-atomare Implementierung aus app/main.py."""
+
+    def __init__(self, r: "redis.Redis") -> None:
+        self.r = r
+        self.main, self.dlq, self.delayed, self.msg = f"{NS}:main", f"{NS}:dlq", f"{NS}:delayed", f"{NS}:msg"
+
+    async def push(self, msg_id: str, payload: Dict[str, Any]):
+        now = int(time.time())
+        await self.r.hset(f"{self.msg}:{msg_id}", mapping={
+            "payload": json.dumps(payload), "attempts": "0", "max_attempts": "5",
+            "enqueued_at": str(now), "updated_at": str(now),
+        })
+        await self.r.lpush(self.main, msg_id)
+        return msg_id, False
+
+    async def promote_due(self) -> None:
+        now = int(time.time())
+        due = await self.r.zrangebyscore(self.delayed, "-inf", now)
+        if due:
+            for msg_id in due:
+                await self.r.lpush(self.main, msg_id)
+            await self.r.zremrangebyscore(self.delayed, "-inf", now)
+
+    async def pop(self):
+        await self.promote_due()
+        msg_id = await self.r.rpop(self.main)
+        if not msg_id:
+            return None
+        h = await self.r.hgetall(f"{self.msg}:{msg_id}")
+        await self.r.hset(f"{self.msg}:{msg_id}", mapping={"updated_at": str(int(time.time()))})
+        return msg_id, h
+
+    async def fail(self, msg_id: str, error: str) -> None:
+        h = await self.r.hgetall(f"{self.msg}:{msg_id}")
+        attempts = int(h.get("attempts") or 0) + 1
+        await self.r.hset(f"{self.msg}:{msg_id}", mapping={
+            "attempts": str(attempts), "updated_at": str(int(time.time())), "last_error": error,
+        })
+        if attempts >= int(h.get("max_attempts") or 5):
+            await self.r.lpush(self.dlq, msg_id)
+        else:
+            await self.r.zadd(self.delayed, {msg_id: int(time.time()) + min(300, 2 ** attempts)})
+
+
+async def _rate(ops: int, fn: Callable[[int], Awaitable[Any]]) -> float:
+    started = time.perf_counter()
+    for i in range(ops):
+        await fn(i)
+    return round(ops / (time.perf_counter() - started), 1)
+
+
+async def _reset(r: "redis.Redis") -> None:
+    keys = [key async for key in r.scan_iter(f"{NS}:*", count=1000)]
+    for start in range(0, len(keys), 1000):
+        await r.unlink(*keys[start:start + 1000])
+
+
+async def bench_ops(r: "redis.Redis", ops: int, tmpdir: str) -> Dict[str, Dict[str, float]]:
+    results: Dict[str, Dict[str, float]] = {}
+    variants = (
+        ("legacy", lambda: LegacyQueue(r)),
+        ("lua", lambda: RedisQueue(r, namespace=NS)),
+        ("streams", lambda: StreamQueue(r, namespace=NS, consumer="bench")),
+        ("sqlite", lambda: SqliteQueue(os.path.join(tmpdir, "queue.sqlite3"), namespace=NS)),
+    )
+    for name, make in variants:
+        await _reset(r)
+        q = make()
+        ids = [str(uuid.uuid4()) for _ in range(ops)]
+        results[name] = {
+            "push_ops_s": await _rate(ops, lambda i: q.push(ids[i], {"i": i})),
+            "pop_ops_s": await _rate(ops, lambda i: q.pop()),
+            "fail_ops_s": await _rate(ops, lambda i: q.fail(ids[i], "bench")),
+        }
+        if isinstance(q, SqliteQueue):
+            results[name]["push_concurrent_ops_s"] = await _rate_concurrent(ops, 50, lambda i: q.push(f"c{i}", {"i": i}))
+            await q.close()
+    await _reset(r)
+    return results
+
+
+async def _rate_concurrent(ops: int, concurrency: int, fn: Callable[[int], Awaitable[Any]]) -> float:
+    started = time.perf_counter()
+    for start in range(0, ops, concurrency):
+        await asyncio.gather(*(fn(i) for i in range(start, min(ops, start + concurrency))))
+    return round(ops / (time.perf_counter() - started), 1)
+
+
+async def race_check(r: "redis.Redis", messages: int, promoters: int) -> Dict[str, int]:
+    """Parallel promoters over the same due set; count ids that land in main more than once."""
+    out: Dict[str, int] = {}
+    for name, make in (("legacy", lambda: LegacyQueue(r)), ("lua", lambda: RedisQueue(r, namespace=NS))):
+        await _reset(r)
+        await r.zadd(f"{NS}:delayed", {f"m{i}": 0 for i in range(messages)})
+        await asyncio.gather(*(make().promote_due() for _ in range(promoters)))
+        promoted = await r.lrange(f"{NS}:main", 0, -1)
+        out[f"{name}_duplicates"] = len(promoted) - len(set(promoted))
+    await _reset(r)
+    return out
+
+
+async def main_async(args: argparse.Namespace) -> int:
+    r = redis.Redis.from_url(args.redis_url, decode_responses=True)
+    await r.ping()
+    with tempfile.TemporaryDirectory() as tmpdir:
+        ops = await bench_ops(r, args.ops, tmpdir)
+    report = {"ops": ops, "race": await race_check(r, args.race_messages, args.race_promoters)}
+    await r.aclose()
+    for op in ("push_ops_s", "pop_ops_s", "fail_ops_s"):
+        legacy, lua, streams, sqlite = (ops[name][op] for name in ("legacy", "lua", "streams", "sqlite"))
+        print(f"{op:<12} legacy {legacy:>10} lua {lua:>10}  x{lua / legacy:.2f}  streams {streams:>10}  sqlite {sqlite:>10}")
+    print(f"{'push x50':<12} sqlite {ops['sqlite']['push_concurrent_ops_s']:>10} (concurrent, group commit)")
+    print(json.dumps(report["race"]))
+    return 0
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Webhook queue micro-benchmark")
+    parser.add_argument("--redis-url", default=os.getenv("REDIS_URL", "redis://127.0.0.1:6379/15"))
+    parser.add_argument("--ops", type=int, default=5000)
+    parser.add_argument("--race-messages", type=int, default=2000)
+    parser.add_argument("--race-promoters", type=int, default=8)
+    return asyncio.run(main_async(parser.parse_args()))
+
+
+if __name__ == "__main__":
+    sys.exit(main())
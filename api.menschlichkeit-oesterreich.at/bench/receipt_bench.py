@@ -0,0 +1,149 @@
+#!/usr/bin/env python3
+"""
+Micro-Benchmark der Beleg-PDFs (Belege pro Sekunde)
+
+Vergleicht das frühere Zeichnen jedes Belegs von Grund auf (Logo über
+ImageReader, bei jedem Beleg dekodiert und ASCII85-kodiert) mit dem
+vorkompilierten ReceiptTemplate aus app/lib/receipt_renderer.py, jeweils mit und
+ohne Logo in einem Prozess. Optional zusätzlich über den Prozess-Pool
+(ReceiptRenderer mit --workers Prozessen).
+
+    python bench/receipt_bench.py --logo ../logo.JPG --count 500 --workers 2
+"""
+
+from __future__ import annotations
+
+import argparse
+import asyncio
+import io
+import json
+import os
+import sys
+import time
+from dataclasses import replace
+from typing import Any, Callable, Dict, Optional
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from app.lib.receipt_renderer import ReceiptOrg, ReceiptRenderer, ReceiptTemplate  # noqa: E402
+
+ORG = ReceiptOrg(address_line1="Musterstraße 1", address_zip="1010", address_city="Wien", address_country="Österreich")
+
+
+def _fields(i: int) -> Dict[str, Any]:
+    return {
+        "amount": 10 + i % 90, "currency": "eur", "purpose": "Jahresspende", "provider": "sepa",
+        "trxn_id": f"trx_{i}", "email": f"donor{i}@example.org", "receipt_number": f"MOE-2026-{i:06d}",
+        "issued_at": "2026-12-31 12:00:00Z",
+    }
+
+
+class LegacyRenderer:
+    """Die ursprüngliche Zeichenroutine (vor dem Template): alles pro Beleg neu."""
+
+    def __init__(self, org: ReceiptOrg) -> None:
+        from reportlab.lib.utils import ImageReader
+
+        self.org = org
+        self.logo = ImageReader(org.logo_path) if org.logo_path else None
+
+    def render(self, fields: Dict[str, Any]) -> bytes:
+        from reportlab.lib.pagesizes import A4
+        from reportlab.lib.units import mm
+        from reportlab.pdfgen import canvas
+
+        org = self.org
+        buf = io.BytesIO()
+        c = canvas.Canvas(buf, pagesize=A4)
+        width, height = A4
+        y = height - 30 * mm
+        c.setTitle(f"Spendenbeleg - {org.name}")
+        c.setFont("Helvetica-Bold", 16)
+        c.drawString(20 * mm, y, org.name)
+        y -= 10 * mm
+        c.setFont("Helvetica", 11)
+        c.drawString(20 * mm, y, "Spenden-/Zahlungsbeleg")
+        if self.logo is not None:
+            c.drawImage(self.logo, width - 60 * mm, height - 40 * mm, width=40 * mm,
+                        preserveAspectRatio=True, mask='auto')
+        y -= 12 * mm
+        c.setFont("Helvetica", 9)
+        for line in org.address_lines:
+            c.drawString(20 * mm, y, line)
+            y -= 6 * mm
+        y -= 2 * mm
+        c.setFont("Helvetica", 10)
+        for text in (
+            f"Belegnummer: {fields['receipt_number']}",
+            f"Betrag: {fields['amount']:.2f} {fields['currency'].upper()}",
+            f"Zweck: {fields.get('purpose') or 'Allgemein'}",
+            f"Zahlungsart: {fields.get('provider') or 'unbekannt'}",
+            f"Transaktions-ID: {fields['trxn_id']}",
+            f"E-Mail: {fields['email']}",
+            f"Datum: {fields['issued_at']}",
+        ):
+            c.drawString(20 * mm, y, text)
+            y -= 7 * mm
+        c.setFont("Helvetica-Oblique", 9)
+        c.drawString(20 * mm, y - 7 * mm, "Hinweis: Dieser Beleg wurde automatisch erstellt.")
+        c.showPage()
+        c.save()
+        return buf.getvalue()
+
+
+def _rate(count: int, fn: Callable[[Dict[str, Any]], bytes]) -> Dict[str, float]:
+    size = len(fn(_fields(0)))  # warm-up
+    started = time.perf_counter()
+    for i in range(count):
+        fn(_fields(i))
+    elapsed = time.perf_counter() - started
+    return {"receipts_s": round(count / elapsed, 1), "ms_per_receipt": round(1000 * elapsed / count, 2),
+            "pdf_bytes": size}
+
+
+async def _rate_pool(org: ReceiptOrg, count: int, workers: int) -> Dict[str, float]:
+    renderer = ReceiptRenderer(org, workers=workers)
+    await renderer.start()
+    try:
+        started = time.perf_counter()
+        await asyncio.gather(*(renderer.render(**_fields(i)) for i in range(count)))
+        elapsed = time.perf_counter() - started
+    finally:
+        await renderer.close()
+    return {"receipts_s": round(count / elapsed, 1), "workers": workers}
+
+
+def run(count: int, logo: Optional[str], workers: int) -> Dict[str, Any]:
+    report: Dict[str, Any] = {}
+    variants = [("no_logo", ORG)]
+    if logo:
+        variants.append(("logo", replace(ORG, logo_path=os.path.abspath(logo))))
+    for label, org in variants:
+        template = ReceiptTemplate(org, org.logo_path or None)
+        report[label] = {
+            "legacy": _rate(count, LegacyRenderer(org).render),
+            "template": _rate(count, template.stamp),
+        }
+        if workers:
+            report[label]["template_pool"] = asyncio.run(_rate_pool(org, count, workers))
+    return report
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Receipt PDF micro-benchmark")
+    parser.add_argument("--count", type=int, default=300)
+    parser.add_argument("--logo", default=os.getenv("ORG_LOGO_PATH", ""))
+    parser.add_argument("--workers", type=int, default=0, help="additionally measure the process pool")
+    args = parser.parse_args()
+    report = run(args.count, args.logo or None, args.workers)
+    for label, variants in report.items():
+        legacy, template = variants["legacy"], variants["template"]
+        print(f"{label:<8} legacy {legacy['receipts_s']:>8}/s ({legacy['pdf_bytes']} B)  "
+              f"template {template['receipts_s']:>8}/s ({template['pdf_bytes']} B)  "
+              f"x{template['receipts_s'] / legacy['receipts_s']:.1f}")
+    print(json.dumps(report))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -11,44 +11,29 @@ import json
 import logging
 import os
 import sys
-from dataclasses import dataclass
 from datetime import datetime, timezone
 from pathlib import Path
 from typing import Any, Dict, Iterable, Optional
 
 import httpx
 
-logger = logging.getLogger("moe.privacy.erasure")
+# Shared pooled CiviCRM client lives in the API service (app/lib/civicrm_client.py)
+sys.path.insert(0, str(Path(__file__).resolve().parents[2] / "api.menschlichkeit-oesterreich.at"))
 
+from app.lib.civicrm_client import CivicrmClient as _PooledCivicrmClient  # noqa: E402
+from app.lib.civicrm_client import CivicrmConfig  # noqa: E402
 
-@dataclass
-class CivicrmConfig:
-    base_url: str
-    site_key: str
-    api_key: str
+logger = logging.getLogger("moe.privacy.erasure")
 
 
-class CivicrmClient:
-    """Thin async wrapper around CiviCRM API v4."""
+class CivicrmClient(_PooledCivicrmClient):
+    """Erasure-specific helpers on top of the shared pooled CiviCRM API v4 client.
 
-    def __init__(self, *, config: CivicrmConfig, http_client: httpx.AsyncClient) -> None:
-        self._config = config
-        self._http = http_client
+    Failed calls raise ``CivicrmError`` (a ``RuntimeError``).
+    """
 
     async def call(self, entity: str, action: str, params: Dict[str, Any]) -> Dict[str, Any]:
-        payload = {
-            "params": params,
-            "_authx": {
-                "api_key": self._config.api_key,
-                "key": self._config.site_key,
-            },
-        }
-        url = f"{self._config.base_url.rstrip('/')}/civicrm/ajax/api4/{entity}/{action}"
-        response = await self._http.post(url, json=payload, timeout=30)
-        response.raise_for_status()
-        data = response.json()
-        if isinstance(data, dict) and data.get("is_error"):
-            raise RuntimeError(f"CiviCRM error: {data.get('error_message', 'unknown error')}")
+        data = await super().call(entity, action, params)
         if not isinstance(data, dict):
             raise RuntimeError("Unexpected response from CiviCRM")
         return data
@@ -137,15 +122,14 @@ def resolve_config(args: argparse.Namespace) -> CivicrmConfig:
     if missing:
         raise RuntimeError(f"Missing CiviCRM configuration values: {', '.join(missing)}")
     assert base_url and site_key and api_key  # For type checkers
-    return CivicrmConfig(base_url=base_url, site_key=site_key, api_key=api_key)
+    return CivicrmConfig(base_url=base_url, site_key=site_key, api_key=api_key, timeout=args.timeout)
 
 
 async def perform_erasure(args: argparse.Namespace) -> Dict[str, Any]:
     metadata = json.loads(args.metadata) if args.metadata else {}
     config = resolve_config(args)
 
-    async with httpx.AsyncClient(timeout=args.timeout) as http_client:
-        civicrm = CivicrmClient(config=config, http_client=http_client)
+    async with CivicrmClient(config) as civicrm, httpx.AsyncClient(timeout=args.timeout) as http_client:
         contact = await civicrm.get_contact(contact_id=args.contact_id, email=args.email)
         contact_id = int(contact["id"])
         memberships = list(await civicrm.list_memberships(contact_id))
@@ -0,0 +1,195 @@
+"""Tests for the shared pooled CiviCRM client (app/lib/civicrm_client.py)."""
+
+import asyncio
+import json
+import sys
+from pathlib import Path
+
+import httpx
+import pytest
+
+# Add API directory to path
+api_path = Path(__file__).parent.parent / "api.menschlichkeit-oesterreich.at"
+sys.path.insert(0, str(api_path))
+
+from app.lib.civicrm_client import (  # noqa: E402
+    CallStats,
+    CivicrmClient,
+    CivicrmConfig,
+    CivicrmError,
+    iter_keyset_pages,
+    stats_key,
+)
+
+
+def _config(**overrides) -> CivicrmConfig:
+    options = {"retry_base_delay": 0.0, **overrides}
+    return CivicrmConfig(base_url="https://crm.example.invalid/", site_key="site", api_key="api", **options)
+
+
+def test_call_posts_authx_payload_and_reuses_client():
+    seen = []
+
+    def handler(request: httpx.Request) -> httpx.Response:
+        seen.append((request.url.path, json.loads(request.content)))
+        return httpx.Response(200, json={"values": [{"id": 1}], "count": 1})
+
+    async def run():
+        client = CivicrmClient(_config(), transport=httpx.MockTransport(handler))
+        first_http = client.http
+        await client.call("Contact", "get", {"limit": 1})
+        await client.call("Contact", "get", {"limit": 2})
+        assert client.http is first_http
+        await client.aclose()
+        return client
+
+    client = asyncio.run(run())
+    assert seen[0][0] == "/civicrm/ajax/api4/Contact/get"
+    assert seen[0][1]["_authx"] == {"api_key": "api", "key": "site"}
+    assert seen[1][1]["params"] == {"limit": 2}
+    metrics = client.metrics()["Contact.get"]
+    assert metrics["count"] == 2
+    assert metrics["errors"] == 0
+    assert metrics["p95_ms"] is not None
+
+
+@pytest.mark.parametrize(
+    "response, status",
+    [
+        (httpx.Response(500, text="boom"), 502),
+        (httpx.Response(200, text="not json"), 502),
+        (httpx.Response(200, json={"is_error": 1, "error_message": "bad"}), 400),
+    ],
+)
+def test_call_maps_errors(response: httpx.Response, status: int):
+    async def run():
+        client = CivicrmClient(_config(retry_max_attempts=1), transport=httpx.MockTransport(lambda request: response))
+        try:
+            with pytest.raises(CivicrmError) as exc_info:
+                await client.call("Membership", "get", {})
+        finally:
+            await client.aclose()
+        return client, exc_info.value
+
+    client, error = asyncio.run(run())
+    assert error.status_code == status
+    assert client.metrics()["Membership.get"]["errors"] == 1
+
+
+def test_transport_error_is_502():
+    def handler(request: httpx.Request) -> httpx.Response:
+        raise httpx.ConnectError("refused", request=request)
+
+    async def run():
+        async with CivicrmClient(_config(), transport=httpx.MockTransport(handler)) as client:
+            with pytest.raises(CivicrmError) as exc_info:
+                await client.call("Contact", "get", {})
+        return exc_info.value
+
+    assert asyncio.run(run()).status_code == 502
+
+
+def test_iter_keyset_pages_walks_by_id_cursor():
+    rows = [{"id": i} for i in range(1, 8)]
+    requests = []
+
+    async def call(entity, action, params):
+        requests.append(params)
+        cursor = params["where"][-1][2]
+        page = [r for r in rows if r["id"] > cursor][: params["limit"]]
+        return {"values": page}
+
+    async def run():
+        pages = []
+        async for page in iter_keyset_pages(call, "Contact", {"where": [["is_deleted", "=", False]]}, page_size=3):
+            pages.append([r["id"] for r in page])
+        return pages
+
+    assert asyncio.run(run()) == [[1, 2, 3], [4, 5, 6], [7]]
+    assert [p["where"][-1] for p in requests] == [["id", ">", 0], ["id", ">", 3], ["id", ">", 6]]
+    assert all(p["where"][0] == ["is_deleted", "=", False] for p in requests)
+    assert requests[0]["orderBy"] == {"id": "ASC"}
+
+
+def test_idempotent_get_is_retried_but_create_is_not():
+    attempts = {"Contact/get": 0, "Contact/create": 0}
+
+    def handler(request: httpx.Request) -> httpx.Response:
+        name = request.url.path.rsplit("/", 2)
+        attempts[f"{name[-2]}/{name[-1]}"] += 1
+        if attempts[f"{name[-2]}/{name[-1]}"] < 3:
+            return httpx.Response(503)
+        return httpx.Response(200, json={"values": []})
+
+    async def run():
+        async with CivicrmClient(_config(), transport=httpx.MockTransport(handler)) as client:
+            await client.call("Contact", "get", {})
+            with pytest.raises(CivicrmError):
+                await client.call("Contact", "create", {"email": "a@example.org"})
+            return client.metrics()
+
+    metrics = asyncio.run(run())
+    assert attempts == {"Contact/get": 3, "Contact/create": 1}
+    assert metrics["Contact.get"]["retries"] == 2
+
+
+def test_circuit_opens_and_rejects_without_calling_upstream():
+    calls = []
+
+    def handler(request: httpx.Request) -> httpx.Response:
+        calls.append(1)
+        return httpx.Response(502)
+
+    async def run():
+        config = _config(retry_max_attempts=1, breaker_failure_threshold=2)
+        async with CivicrmClient(config, transport=httpx.MockTransport(handler)) as client:
+            for _ in range(2):
+                with pytest.raises(CivicrmError):
+                    await client.call("Contact", "get", {})
+            with pytest.raises(CivicrmError) as exc_info:
+                await client.call("Contact", "get", {})
+            return client, exc_info.value
+
+    client, error = asyncio.run(run())
+    assert len(calls) == 2
+    assert error.status_code == 503
+    assert client.breaker.snapshot()["state"] == "open"
+
+
+def test_adaptive_timeout_follows_observed_latency():
+    client = CivicrmClient(_config(timeout=30.0, adaptive_timeout_min=0.5, adaptive_timeout_multiplier=3.0))
+    assert client.timeout_for("Contact.get") == 30.0
+    stats = client._stats.setdefault("Contact.get", CallStats())
+    for _ in range(50):
+        stats.record(200.0, True)
+    assert client.timeout_for("Contact.get") == pytest.approx(0.6)
+
+
+def test_stats_key_separates_lookups_from_pages():
+    assert stats_key("Contact", "get", {"where": [["id", "=", 1]], "limit": 1}) == "Contact.get"
+    assert stats_key("Contact", "get", {"limit": 500}) == "Contact.get#page"
+    assert stats_key("Contact", "get", {"limit": 5000}) == "Contact.get#bulk"
+    assert stats_key("Membership", "get", {"where": [["contact_id", "IN", list(range(100))]], "limit": 0}) \
+        == "Membership.get#page"
+
+
+def test_large_page_keeps_full_timeout_after_fast_lookups():
+    timeouts = {}
+
+    def handler(request: httpx.Request) -> httpx.Response:
+        limit = json.loads(request.content)["params"].get("limit")
+        timeouts[limit] = request.extensions["timeout"]["read"]
+        return httpx.Response(200, json={"values": []})
+
+    async def run():
+        config = _config(timeout=30.0, adaptive_timeout_min=0.5)
+        async with CivicrmClient(config, transport=httpx.MockTransport(handler)) as client:
+            for _ in range(25):
+                await client.call("Contact", "get", {"where": [["id", "=", 1]], "limit": 1})
+            await client.call("Contact", "get", {"limit": 5000})
+            return client.resilience_snapshot()["timeouts"]
+
+    learned = asyncio.run(run())
+    assert timeouts[1] == pytest.approx(0.5)  # fast lookups: clamped to the floor
+    assert timeouts[5000] == 30.0  # export page: not cut off by what the lookups taught
+    assert learned == {"Contact.get": 0.5, "Contact.get#bulk": 30.0}
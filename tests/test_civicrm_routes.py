@@ -0,0 +1,218 @@
+"""Route-level tests for the CiviCRM-backed endpoints, with civicrm_api_call replaced by an in-memory fake."""
+
+import asyncio
+import json
+import os
+import sys
+import tempfile
+from pathlib import Path
+
+import pytest
+from fastapi import HTTPException
+from fastapi.testclient import TestClient
+
+# Add API directory to path
+api_path = Path(__file__).parent.parent / "api.menschlichkeit-oesterreich.at"
+sys.path.insert(0, str(api_path))
+
+os.environ.setdefault("CIVI_BASE_URL", "https://example.invalid")
+os.environ.setdefault("CIVI_SITE_KEY", "test_site_key")
+os.environ.setdefault("CIVI_API_KEY", "test_api_key")
+os.environ.setdefault("JWT_SECRET", "unit_test_secret")
+os.environ.setdefault("RATE_LIMIT_ENABLED", "false")
+os.environ.setdefault("QUEUE_SQLITE_PATH", os.path.join(tempfile.mkdtemp(), "queue.sqlite3"))
+
+api = pytest.importorskip("app.main", reason="app.main needs app.lib.refresh_store")
+
+from app.lib import contact_cache  # noqa: E402
+
+
+@pytest.fixture()
+def civicrm(monkeypatch):
+    """Records every CiviCRM call; tests set `handler(entity, action, params)` for the answers."""
+    calls = []
+    state = {"handler": lambda entity, action, params: {"values": []}}
+
+    async def fake_call(entity, action, params):
+        calls.append((entity, action, params))
+        result = state["handler"](entity, action, params)
+        return await result if hasattr(result, "__await__") else result
+
+    monkeypatch.setattr(api, "civicrm_api_call", fake_call)
+    state["calls"] = calls
+    return state
+
+
+@pytest.fixture()
+def cache(monkeypatch):
+    fresh = contact_cache.ContactCache(contact_cache.MemoryCacheBackend(), ttl_seconds=60)
+    monkeypatch.setattr(contact_cache, "_shared_cache", fresh)
+    return fresh
+
+
+@pytest.fixture()
+def client():
+    return TestClient(api.app)
+
+
+def _headers():
+    return {"Authorization": f"Bearer {api._create_token('admin@example.org', 600)}"}
+
+
+def _paged_contacts(fail_after_id):
+    """Contact.get pages of two by id cursor; the page after id `fail_after_id` fails like an open breaker."""
+
+    def handler(entity, action, params):
+        after = next((w[2] for w in params.get("where", []) if w[0] == "id" and w[1] == ">"), 0)
+        if after >= fail_after_id:
+            raise HTTPException(status_code=502, detail="CiviCRM API unavailable")
+        return {"values": [{"id": after + 1, "email": f"c{after + 1}@example.org"},
+                           {"id": after + 2, "email": f"c{after + 2}@example.org"}]}
+
+    return handler
+
+
+@pytest.mark.parametrize("fmt", ["ndjson", "csv"])
+def test_export_aborts_instead_of_ending_cleanly_when_a_later_page_fails(civicrm, client, fmt):
+    # Only the first page is fetched before the response starts; the second fails mid-stream
+    civicrm["handler"] = _paged_contacts(fail_after_id=2)
+    with pytest.raises(Exception):
+        client.get(f"/contacts/export?format={fmt}&page_size=2", headers=_headers())
+
+    async def drain():
+        response = await api.export_contacts({}, format=fmt, page_size=2, after_id=0, modified_since=None)
+        chunks = []
+        with pytest.raises(HTTPException):
+            async for chunk in response.body_iterator:
+                chunks.append(chunk)
+        return "".join(chunks)
+
+    body = asyncio.run(drain())
+    assert "c2@example.org" in body
+    if fmt == "ndjson":
+        assert json.loads(body.splitlines()[-1]) == {"error": "export aborted", "detail": "CiviCRM API unavailable"}
+
+
+def test_export_failure_on_the_first_page_maps_to_a_status_code(civicrm, client):
+    civicrm["handler"] = _paged_contacts(fail_after_id=0)
+    response = client.get("/contacts/export?page_size=2", headers=_headers())
+    assert response.status_code == 502
+
+
+def test_batch_rejects_disallowed_items_without_calling_civicrm(civicrm, client):
+    calls = [{"entity": "Contact", "action": "get", "params": {"id": 1}},
+             {"entity": "Contact", "action": "delete", "params": {"id": 1}},
+             {"entity": "Activity", "action": "get"}]
+    response = client.post("/civicrm/batch", json={"calls": calls}, headers=_headers())
+    assert response.status_code == 200
+    results = response.json()["data"]["results"]
+    assert [(r["success"], r.get("status_code")) for r in results] == [(True, None), (False, 403), (False, 403)]
+    assert [(entity, action) for entity, action, _ in civicrm["calls"]] == [("Contact", "get")]
+
+
+def test_batch_over_the_item_limit_is_413(civicrm, client, monkeypatch):
+    monkeypatch.setattr(api, "CIVICRM_BATCH_MAX_ITEMS", 2)
+    calls = [{"entity": "Contact", "action": "get", "params": {"id": i}} for i in range(3)]
+    response = client.post("/civicrm/batch", json={"calls": calls}, headers=_headers())
+    assert response.status_code == 413
+    assert civicrm["calls"] == []
+
+
+def test_batch_keeps_request_order_and_isolates_failing_items(civicrm, client):
+    finished = []
+
+    async def answer(entity, action, params):
+        await asyncio.sleep(params["delay"])
+        finished.append(params["id"])
+        if params["id"] == 2:
+            raise HTTPException(status_code=502, detail="CiviCRM API unavailable")
+        if params["id"] == 3:
+            raise RuntimeError("boom")
+        return {"values": [{"id": params["id"]}]}
+
+    civicrm["handler"] = answer
+    delays = [0.06, 0.0, 0.03, 0.01]  # finish order 2, 4, 3, 1
+    calls = [{"entity": "Contact", "action": "get", "params": {"id": i + 1, "delay": d}} for i, d in enumerate(delays)]
+    response = client.post("/civicrm/batch", json={"calls": calls}, headers=_headers())
+    assert response.status_code == 200
+    data = response.json()["data"]
+    assert finished == [2, 4, 3, 1]
+    assert [r["index"] for r in data["results"]] == [0, 1, 2, 3]
+    outcomes = [r["data"]["values"][0]["id"] if r["success"] else r["status_code"] for r in data["results"]]
+    assert outcomes == [1, 502, 500, 4]
+    assert (data["total"], data["failed"]) == (4, 2)
+
+
+def test_contact_search_loads_memberships_for_the_page_in_one_call(civicrm, client):
+    memberships = [
+        {"id": 10, "contact_id": 1, "status_id": 3, "membership_name": "Alt", "join_date": "2019-01-01"},
+        {"id": 11, "contact_id": 1, "status_id": 1, "membership_name": "Ordentlich", "join_date": "2024-01-01"},
+        {"id": 12, "contact_id": 3, "status_id": 4, "membership_name": "Förder", "join_date": "2022-05-01"},
+    ]
+
+    def handler(entity, action, params):
+        if entity == "Contact":
+            return {"values": [{"id": cid, "email": f"c{cid}@example.org"} for cid in (1, 2, 3)]}
+        return {"values": memberships}
+
+    civicrm["handler"] = handler
+    response = client.get("/contacts/search?limit=3", headers=_headers())
+    assert response.status_code == 200
+    membership_calls = [params for entity, _, params in civicrm["calls"] if entity == "Membership"]
+    assert membership_calls == [{"where": [["contact_id", "IN", [1, 2, 3]]], "limit": 0}]
+    contacts = {c["id"]: c for c in response.json()["data"]["contacts"]}
+    assert (contacts[1]["membership_type"], contacts[1]["membership_status"]) == ("Ordentlich", "active")
+    assert (contacts[2]["membership_type"], contacts[2]["membership_status"]) == (None, "inactive")
+    assert (contacts[3]["membership_type"], contacts[3]["membership_status"]) == ("Förder", "inactive")
+    assert contacts[3]["join_date"] == "2022-05-01"
+
+
+def _contact_store(*contacts):
+    """Contact.get by id or email over a mutable dict of records."""
+    records = {c["id"]: dict(c) for c in contacts}
+
+    def handler(entity, action, params):
+        if "id" in params:
+            found = [records[params["id"]]] if params["id"] in records else []
+        else:
+            found = [c for c in records.values() if c.get("email") == params.get("email")]
+        return {"values": [dict(c) for c in found]}
+
+    return records, handler
+
+
+@pytest.mark.parametrize("path", ["/contacts/7", "/user/profile"])
+def test_cached_contact_revalidates_with_304_and_no_civicrm_call(civicrm, cache, client, path):
+    records, civicrm["handler"] = _contact_store(
+        {"id": 7, "email": "admin@example.org", "first_name": "Ada", "modified_date": "2026-01-01 10:00:00"}
+    )
+    first = client.get(path, headers=_headers())
+    assert first.status_code == 200 and first.json()["data"]["first_name"] == "Ada"
+    etag = first.headers["ETag"]
+    assert etag.startswith('"') and first.headers["Cache-Control"] == "private, no-cache"
+    calls = len(civicrm["calls"])
+
+    again = client.get(path, headers={**_headers(), "If-None-Match": etag})
+    assert again.status_code == 304 and again.content == b"" and again.headers["ETag"] == etag
+    assert len(civicrm["calls"]) == calls  # served from the warm contact cache
+
+    records[7].update(first_name="Grace", modified_date="2026-01-02 09:00:00")
+    asyncio.run(cache.invalidate(contact_id=7, emails=["admin@example.org"]))
+    changed = client.get(path, headers={**_headers(), "If-None-Match": etag})
+    assert changed.status_code == 200 and changed.json()["data"]["first_name"] == "Grace"
+    assert changed.headers["ETag"] != etag
+
+
+def test_memberships_etag_changes_with_the_memberships(civicrm, client):
+    memberships = [{"id": 1, "contact_id": 7, "membership_type_id": 2, "modified_date": "2026-01-01 10:00:00"}]
+    civicrm["handler"] = lambda entity, action, params: {"values": [dict(m) for m in memberships]}
+    first = client.get("/memberships/contact/7", headers=_headers())
+    assert first.status_code == 200 and len(first.json()["data"]["memberships"]) == 1
+    etag = first.headers["ETag"]
+
+    again = client.get("/memberships/contact/7", headers={**_headers(), "If-None-Match": etag})
+    assert again.status_code == 304 and again.content == b""
+
+    memberships[0]["modified_date"] = "2026-02-01 10:00:00"
+    changed = client.get("/memberships/contact/7", headers={**_headers(), "If-None-Match": etag})
+    assert changed.status_code == 200 and changed.headers["ETag"] not in (None, etag)
@@ -0,0 +1,168 @@
+"""Tests for the read-through contact cache (app/lib/contact_cache.py)."""
+
+import asyncio
+import sys
+from pathlib import Path
+
+import pytest
+
+# Add API directory to path
+api_path = Path(__file__).parent.parent / "api.menschlichkeit-oesterreich.at"
+sys.path.insert(0, str(api_path))
+
+from app.lib.contact_cache import ContactCache, MemoryCacheBackend, RedisCacheBackend  # noqa: E402
+
+
+class FakeClock:
+    def __init__(self) -> None:
+        self.now = 1000.0
+
+    def __call__(self) -> float:
+        return self.now
+
+
+def test_concurrent_misses_are_coalesced():
+    calls = []
+
+    async def loader():
+        calls.append(1)
+        await asyncio.sleep(0.01)
+        return {"id": 7, "email": "Member@Example.org"}
+
+    async def run():
+        cache = ContactCache(MemoryCacheBackend(), ttl_seconds=60)
+        key = cache.key_for_email(" member@example.org ")
+        results = await asyncio.gather(*(cache.get_or_load(key, loader) for _ in range(10)))
+        # alias by id was populated as well
+        by_id = await cache.get_or_load(cache.key_for_id(7), loader)
+        return cache, results, by_id
+
+    cache, results, by_id = asyncio.run(run())
+    assert len(calls) == 1
+    assert all(r["id"] == 7 for r in results)
+    assert by_id["id"] == 7
+    assert cache.stats["coalesced"] == 9
+    assert cache.stats["hits"] == 1
+
+
+def test_ttl_expiry_and_lru_bound():
+    clock = FakeClock()
+
+    async def run():
+        backend = MemoryCacheBackend(max_entries=2, clock=clock)
+        await backend.set("a", {"id": 1}, 10)
+        await backend.set("b", {"id": 2}, 10)
+        assert await backend.get("a") == {"id": 1}  # refresh "a"
+        await backend.set("c", {"id": 3}, 10)  # evicts "b"
+        assert await backend.get("b") is None
+        clock.now += 11
+        assert await backend.get("a") is None
+        return len(backend)
+
+    assert asyncio.run(run()) == 1
+
+
+def test_invalidate_drops_id_and_email_aliases():
+    async def run():
+        cache = ContactCache(MemoryCacheBackend(), ttl_seconds=60)
+
+        async def loader():
+            return {"id": 3, "email": "old@example.org"}
+
+        await cache.get_or_load(cache.key_for_id(3), loader)
+        await cache.invalidate(contact_id=3)
+        return (
+            await cache.peek(cache.key_for_id(3)),
+            await cache.peek(cache.key_for_email("old@example.org")),
+        )
+
+    assert asyncio.run(run()) == (None, None)
+
+
+def test_load_racing_an_invalidation_is_not_stored():
+    async def run():
+        cache = ContactCache(MemoryCacheBackend(), ttl_seconds=60)
+        release = asyncio.Event()
+
+        async def slow_loader():
+            await release.wait()
+            return {"id": 5, "email": "stale@example.org"}
+
+        task = asyncio.ensure_future(cache.get_or_load(cache.key_for_id(5), slow_loader))
+        await asyncio.sleep(0)
+        await cache.invalidate(contact_id=5)
+        release.set()
+        await task
+        return await cache.peek(cache.key_for_id(5))
+
+    assert asyncio.run(run()) is None
+
+
+def test_disabled_cache_always_loads():
+    calls = []
+
+    async def loader():
+        calls.append(1)
+        return {"id": 1}
+
+    async def run():
+        cache = ContactCache(None)
+        await cache.get_or_load("id:1", loader)
+        await cache.get_or_load("id:1", loader)
+
+    asyncio.run(run())
+    assert len(calls) == 2
+
+
+def test_memory_backend_returns_copies():
+    async def run():
+        cache = ContactCache(MemoryCacheBackend(), ttl_seconds=60)
+
+        async def loader():
+            return {"id": 4, "email": "copy@example.org", "tags": ["a"]}
+
+        first = await cache.get_or_load(cache.key_for_id(4), loader)
+        first["email"] = "changed@example.org"
+        first["tags"].append("b")
+        return await cache.get_or_load(cache.key_for_id(4), loader)
+
+    assert asyncio.run(run()) == {"id": 4, "email": "copy@example.org", "tags": ["a"]}
+
+
+def test_invalidation_in_another_worker_rejects_a_racing_load():
+    fakeredis = pytest.importorskip("fakeredis")
+    pytest.importorskip("lupa")  # fakeredis needs lupa for EVAL/EVALSHA
+
+    async def run():
+        server = fakeredis.FakeServer()
+        # two API workers, one Redis
+        reader, writer = (
+            ContactCache(RedisCacheBackend(client=fakeredis.FakeAsyncRedis(server=server, decode_responses=True)))
+            for _ in range(2)
+        )
+        release = asyncio.Event()
+
+        async def slow_loader():
+            await release.wait()
+            return {"id": 8, "email": "stale@example.org"}
+
+        task = asyncio.ensure_future(reader.get_or_load(reader.key_for_id(8), slow_loader))
+        await asyncio.sleep(0.01)
+        await writer.invalidate(contact_id=8)
+        release.set()
+        await task
+
+        async def fresh_loader():
+            return {"id": 8, "email": "fresh@example.org"}
+
+        await reader.get_or_load(reader.key_for_id(8), fresh_loader)  # later loads are cached again
+        return (
+            await writer.peek(writer.key_for_email("stale@example.org")),
+            await writer.peek(writer.key_for_id(8)),
+            reader.stats["stale_loads"],
+        )
+
+    stale, fresh, stale_loads = asyncio.run(run())
+    assert stale is None
+    assert fresh == {"id": 8, "email": "fresh@example.org"}
+    assert stale_loads == 1
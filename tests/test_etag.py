@@ -0,0 +1,27 @@
+"""Tests for ETag helpers used by conditional GETs (app/lib/etag.py)."""
+
+import sys
+from pathlib import Path
+
+# Add API directory to path
+api_path = Path(__file__).parent.parent / "api.menschlichkeit-oesterreich.at"
+sys.path.insert(0, str(api_path))
+
+from app.lib.etag import not_modified, strong_etag  # noqa: E402
+
+
+def test_strong_etag_is_stable_and_content_sensitive():
+    first = strong_etag({"id": 1, "email": "a@example.org"}, "2024-01-01 10:00:00")
+    assert first == strong_etag({"email": "a@example.org", "id": 1}, "2024-01-01 10:00:00")
+    assert first.startswith('"') and first.endswith('"') and not first.startswith("W/")
+    assert first != strong_etag({"id": 1, "email": "b@example.org"}, "2024-01-01 10:00:00")
+    assert first != strong_etag({"id": 1, "email": "a@example.org"}, "2024-01-02 10:00:00")
+
+
+def test_not_modified_matching():
+    etag = strong_etag({"id": 1})
+    assert not not_modified(None, etag)
+    assert not not_modified('"other"', etag)
+    assert not_modified(etag, etag)
+    assert not_modified(f'"other", W/{etag}', etag)
+    assert not_modified("*", etag)
@@ -0,0 +1,123 @@
+"""Tests for the persistent mail queue sender (app/lib/mail_queue.py)."""
+
+import asyncio
+import sys
+from pathlib import Path
+
+# Add API directory to path
+api_path = Path(__file__).parent.parent / "api.menschlichkeit-oesterreich.at"
+sys.path.insert(0, str(api_path))
+
+from app.lib.mail_queue import MailSender, TokenBucket, mail_payload  # noqa: E402
+from app.lib.smtp_pool import SmtpSendError  # noqa: E402
+from app.lib.sqlite_queue import SqliteQueue, SqliteStore  # noqa: E402
+
+
+def _run(tmp_path, send, scenario, **options):
+    async def runner():
+        store = SqliteStore(str(tmp_path / "queue.sqlite3"))
+        queue = SqliteQueue(store, namespace="moe:queue:mail")
+        sender = MailSender(lambda: queue, send, sender="noreply@example.org", **options)
+        try:
+            return await scenario(sender, queue)
+        finally:
+            await sender.stop(grace_seconds=1)
+            await store.close()
+
+    return asyncio.run(runner())
+
+
+async def _until(predicate, timeout=5.0):
+    deadline = asyncio.get_running_loop().time() + timeout
+    while not predicate():
+        assert asyncio.get_running_loop().time() < deadline, "sender did not settle"
+        await asyncio.sleep(0.02)
+
+
+def test_sends_receipts_retries_transient_and_dead_letters_permanent(tmp_path):
+    sent, recorded = [], []
+
+    async def send(msg):
+        if msg["To"].startswith("reject"):
+            raise SmtpSendError("550 no such user", permanent=True, code=550)
+        if msg["To"].startswith("busy"):
+            raise SmtpSendError("421 try again later", code=421)
+        sent.append(msg)
+
+    async def render(**fields):
+        return b"%PDF-" + fields["receipt_number"].encode()
+
+    async def on_sent(payload):
+        recorded.append(payload.get("activity"))
+
+    async def scenario(sender, queue):
+        receipt = {"amount": 5.0, "currency": "EUR", "receipt_number": "MOE-2026-000001"}
+        await queue.push("r", mail_payload(to="donor@example.org", subject="Beleg", text="Danke", receipt=receipt,
+                                           activity={"contact_id": 7}))
+        await queue.push("p", mail_payload(to="reject@example.org", subject="Alert", text="x"), max_attempts=5)
+        await queue.push("t", mail_payload(to="busy@example.org", subject="Alert", text="x"), max_attempts=5)
+        await queue.push("bad", {"text": "no recipient"})
+        sender.start()
+        await _until(lambda: sender.snapshot()["sent"] + sender.snapshot()["dead_lettered"] == 3
+                     and sender.snapshot()["retried"] == 1)
+        dlq = await queue.dlq_list()
+        return sender.snapshot(), {item["id"]: item for item in dlq["items"]}
+
+    snapshot, dead = _run(tmp_path, send, scenario, render=render, on_sent=on_sent)
+    [msg] = sent
+    assert msg["From"] == "noreply@example.org" and msg["Subject"] == "Beleg"
+    [attachment] = list(msg.iter_attachments())
+    assert attachment.get_filename() == "beleg_MOE-2026-000001.pdf"
+    assert attachment.get_content() == b"%PDF-MOE-2026-000001"
+    assert recorded == [{"contact_id": 7}]
+    assert sorted(dead) == ["bad", "p"]  # straight to the DLQ on the first attempt
+    assert dead["p"]["attempts"] == 1 and "550" in dead["p"]["last_error"]
+    assert (snapshot["sent"], snapshot["dead_lettered"], snapshot["permanent"], snapshot["retried"]) == (1, 2, 2, 1)
+
+
+def test_rate_limit_is_shared_between_sender_processes(tmp_path):
+    stamps = []
+
+    async def send(msg):
+        stamps.append(asyncio.get_running_loop().time())
+
+    async def scenario():
+        # Two stores on one file stand in for two API workers
+        stores = [SqliteStore(str(tmp_path / "queue.sqlite3")) for _ in range(2)]
+        queues = [SqliteQueue(store, namespace="moe:queue:mail") for store in stores]
+        for i in range(8):
+            await queues[0].push(f"m{i}", mail_payload(to=f"d{i}@example.org", subject="s", text="t"))
+        senders = [MailSender(lambda q=q: q, send, sender="noreply@example.org", rate_per_second=20, burst=2,
+                              concurrency=4) for q in queues]
+        try:
+            for sender in senders:
+                sender.start()
+            await _until(lambda: sum(s.snapshot()["sent"] for s in senders) == 8)
+            return [s.snapshot() for s in senders]
+        finally:
+            for sender in senders:
+                await sender.stop(grace_seconds=1)
+            for store in stores:
+                await store.close()
+
+    snapshots = asyncio.run(scenario())
+    # 2 from the burst, then one every 50 ms across both senders (not 2 × 20/s)
+    assert stamps[-1] - stamps[0] >= 0.27
+    assert sum(s["throttled_seconds"] for s in snapshots) > 0
+
+
+def test_token_bucket_take_and_refund(tmp_path):
+    async def scenario():
+        queue = SqliteQueue(str(tmp_path / "queue.sqlite3"), namespace="moe:queue:mail")
+        bucket = TokenBucket(lambda: queue, rate=1, burst=3)
+        try:
+            assert (await bucket.take(5))[0] == 3
+            assert (await bucket.take(1))[0] == 0
+            await bucket.refund(2)
+            assert (await bucket.take(5))[0] == 2
+            other = TokenBucket(lambda: SqliteQueue(queue.store, namespace="moe:queue:other"), rate=1, burst=3)
+            assert (await other.take(5))[0] == 3  # one bucket per queue
+        finally:
+            await queue.close()
+
+    asyncio.run(scenario())
@@ -0,0 +1,74 @@
+"""Tests for the in-process queue metrics (app/lib/queue_metrics.py)."""
+
+import asyncio
+import sys
+from pathlib import Path
+
+# Add API directory to path
+api_path = Path(__file__).parent.parent / "api.menschlichkeit-oesterreich.at"
+sys.path.insert(0, str(api_path))
+
+from app.lib.queue_metrics import Histogram, MeteredQueue, QueueMetrics, RateWindow, render_prometheus  # noqa: E402
+from app.lib.sqlite_queue import SqliteQueue  # noqa: E402
+
+
+def test_histogram_quantiles_and_rate_window():
+    histogram = Histogram((0.1, 1, 10))
+    for value in (0.05, 0.05, 0.5, 0.5, 5, 50):
+        histogram.observe(value)
+    assert histogram.counts == [2, 2, 1, 1]
+    assert histogram.quantile(0.5) == 0.55 and histogram.quantile(0.99) == 10
+    assert Histogram((1,)).quantile(0.5) is None
+
+    window = RateWindow(seconds=10)
+    window.add(5, now=100)
+    window.add(5, now=105)
+    assert window.per_second(now=105) == 1.0
+    assert window.per_second(now=112) == 0.5  # second 100 fell out of the window
+    window.add(1, now=110)  # reuses slot 0
+    assert window.per_second(now=110) == 0.6
+
+
+def test_metered_queue_records_lifecycle(tmp_path):
+    async def scenario():
+        metrics = QueueMetrics("webhooks")
+        queue = MeteredQueue(SqliteQueue(str(tmp_path / "q.sqlite3"), namespace="test"), metrics)
+        try:
+            await queue.push("a", {}, idempotency_key="k")
+            await queue.push("b", {}, idempotency_key="k")
+            await queue.push("c", {}, max_attempts=1)
+            await queue.push("d", {}, max_attempts=3)
+            assert len(await queue.pop(3)) == 3
+            await queue.ack("a")
+            await queue.fail("c", "boom")
+            await queue.fail("d", "boom")
+            assert (await queue.stats())["dlq"]["size"] == 1  # passthrough
+        finally:
+            await queue.close()
+        return metrics.snapshot()
+
+    snapshot = asyncio.run(scenario())
+    assert {k: snapshot[k] for k in ("enqueued", "duplicates", "popped", "acked", "retried", "dead_lettered")} == {
+        "enqueued": 3, "duplicates": 1, "popped": 3, "acked": 1, "retried": 1, "dead_lettered": 1,
+    }
+    assert snapshot["wait_seconds"]["count"] == 3 and snapshot["processing_seconds"]["count"] == 1
+    assert snapshot["enqueue_rate_per_second"] == 0.05
+
+
+def test_render_prometheus_text():
+    metrics = QueueMetrics("payments")
+    metrics.pushed(False)
+    metrics.processing.observe(0.2)
+    sizes = {"payments": {"main": {"size": 4, "oldest_age_seconds": 12}, "delayed": {"size": 1},
+                          "inflight": {"size": 2}, "dlq": {"size": 0}}}
+    text = render_prometheus([metrics], sizes)
+    lines = text.splitlines()
+    assert "# TYPE moe_queue_enqueued_total counter" in lines
+    assert 'moe_queue_enqueued_total{queue="payments"} 1' in lines
+    assert 'moe_queue_processing_seconds_bucket{queue="payments",le="0.1"} 0' in lines
+    assert 'moe_queue_processing_seconds_bucket{queue="payments",le="0.25"} 1' in lines
+    assert 'moe_queue_processing_seconds_bucket{queue="payments",le="+Inf"} 1' in lines
+    assert 'moe_queue_processing_seconds_count{queue="payments"} 1' in lines
+    assert 'moe_queue_main_size{queue="payments"} 4' in lines
+    assert 'moe_queue_oldest_age_seconds{queue="payments"} 12' in lines
+    assert "moe_queue_main_size" not in render_prometheus([metrics])
@@ -0,0 +1,47 @@
+"""Tests for named queues, priorities and in-flight caps (app/lib/queue_registry.py)."""
+
+import asyncio
+import sys
+from pathlib import Path
+
+import pytest
+
+# Add API directory to path
+api_path = Path(__file__).parent.parent / "api.menschlichkeit-oesterreich.at"
+sys.path.insert(0, str(api_path))
+
+from app.lib.queue_registry import QueueSpec, by_priority, parse_queue_specs, pop_by_priority  # noqa: E402
+from app.lib.sqlite_queue import SqliteQueue, SqliteStore  # noqa: E402
+
+
+def test_parse_queue_specs():
+    specs = parse_queue_specs(" payments:high , sync:low:20, audit ")
+    assert specs["payments"] == QueueSpec("payments", "high", 0)
+    assert specs["sync"].max_inflight == 20 and specs["audit"].priority == "normal"
+    assert specs["webhooks"].namespace == "moe:queue:webhooks"  # default queue keeps the legacy namespace
+    assert [spec.name for spec in by_priority(specs.values())] == ["payments", "audit", "webhooks", "sync"]
+    for bad in ("Payments", "sync:urgent", "sync:low:many", "a:b:c:d"):
+        with pytest.raises(ValueError):
+            parse_queue_specs(bad)
+
+
+def test_pop_by_priority_drains_high_first_and_respects_caps(tmp_path):
+    async def scenario():
+        store = SqliteStore(str(tmp_path / "queue.sqlite3"))
+        specs = parse_queue_specs("payments:high,sync:low:3")
+        queues = [(specs[name], SqliteQueue(store, namespace=specs[name].namespace)) for name in ("sync", "payments")]
+        sync, payments = queues[0][1], queues[1][1]
+        try:
+            for i in range(10):
+                await sync.push(f"s{i}", {})
+            await payments.push("p0", {})
+            first = await pop_by_priority(queues, 2, visibility_timeout=30)
+            assert [(item["queue"], item["id"]) for item in first] == [("payments", "p0"), ("sync", "s0")]
+            rest = await pop_by_priority(queues, 10, visibility_timeout=30)
+            assert [item["id"] for item in rest] == ["s1", "s2"]  # sync capped at 3 in flight
+            await sync.ack("s0")
+            assert [item["id"] for item in await sync.pop(5, max_inflight=3)] == ["s3"]
+        finally:
+            await store.close()
+
+    asyncio.run(scenario())
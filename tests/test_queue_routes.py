@@ -0,0 +1,53 @@
+"""Route-level tests for the queue API: the internal mail queue is not reachable by external consumers."""
+
+import os
+import sys
+import tempfile
+from pathlib import Path
+
+import pytest
+from fastapi.testclient import TestClient
+
+# Add API directory to path
+api_path = Path(__file__).parent.parent / "api.menschlichkeit-oesterreich.at"
+sys.path.insert(0, str(api_path))
+
+os.environ.setdefault("CIVI_BASE_URL", "https://example.invalid")
+os.environ.setdefault("CIVI_SITE_KEY", "test_site_key")
+os.environ.setdefault("CIVI_API_KEY", "test_api_key")
+os.environ.setdefault("JWT_SECRET", "unit_test_secret")
+os.environ.setdefault("RATE_LIMIT_ENABLED", "false")
+os.environ.setdefault("QUEUE_SQLITE_PATH", os.path.join(tempfile.mkdtemp(), "queue.sqlite3"))
+
+api = pytest.importorskip("app.main", reason="app.main needs app.lib.refresh_store")
+
+
+def _headers():
+    return {"Authorization": f"Bearer {api._create_token('admin@example.org', 600)}"}
+
+
+def test_mail_queue_is_not_exposed_to_consumers(monkeypatch):
+    # app.main may already be imported by another test module; mail is only queued: no lifespan, no sender
+    monkeypatch.setattr(api, "SMTP_HOST", "smtp.example.invalid")
+    client = TestClient(api.app)
+    headers = _headers()
+    assert client.post("/queue/push", json={"payload": {"n": 1}}, headers=headers).status_code == 200
+    queued = client.post("/alerts/email", json={"to": "donor@example.org", "subject": "s", "text": "t"}, headers=headers)
+    mail_id = queued.json()["data"]["mail_id"]
+
+    for route in ("push", "pop", "ack", "fail"):
+        body = {"payload": {}} if route == "push" else {"id": mail_id}
+        response = client.post(f"/queue/mail/{route}", json=body, headers=headers)
+        assert response.status_code == 404, route
+    assert client.post("/queues/pop?names=webhooks,mail", headers=headers).status_code == 404
+
+    popped = client.post("/queues/pop?max=10", headers=headers).json()["data"]["items"]
+    assert [item["queue"] for item in popped] == ["webhooks"]
+    # read-only views stay available for operators
+    assert client.get("/queue/mail/dlq/list", headers=headers).status_code == 200
+    assert client.get("/queue/mail/stats", headers=headers).json()["data"]["main"]["size"] == 1  # still queued
+
+
+def test_requeue_of_an_id_not_in_the_dlq_is_404():
+    response = TestClient(api.app).post("/queue/dlq/requeue", json={"id": "not-dead"}, headers=_headers())
+    assert response.status_code == 404
@@ -0,0 +1,163 @@
+"""Tests for the resumable bulk receipt run (app/lib/receipt_batch.py)."""
+
+import asyncio
+import io
+import os
+import sys
+import threading
+import zipfile
+from datetime import date
+from pathlib import Path
+
+import pytest
+
+# Add API directory to path
+api_path = Path(__file__).parent.parent / "api.menschlichkeit-oesterreich.at"
+sys.path.insert(0, str(api_path))
+
+from app.lib.receipt_batch import ReceiptBatchManager, ReceiptBatchRun, batch_range  # noqa: E402
+
+CONTRIBUTIONS = [
+    {"id": 1, "contact_id": 10, "total_amount": 20, "receive_date": "2025-03-01 10:00:00", "status": 1},
+    {"id": 2, "contact_id": 11, "total_amount": 30.5, "receive_date": "2025-06-01 10:00:00", "status": 1},
+    {"id": 3, "contact_id": 10, "total_amount": 99, "receive_date": "2025-07-01 10:00:00", "status": 2},
+    {"id": 4, "contact_id": 12, "total_amount": 15, "receive_date": "2024-12-31 23:00:00", "status": 1},
+    {"id": 5, "contact_id": 12, "total_amount": 40, "receive_date": "2025-12-31 23:59:00", "status": 1},
+    {"id": 6, "contact_id": 10, "total_amount": 5, "receive_date": "2025-12-01 08:00:00", "status": 1},
+]
+OPS = {"=": lambda a, b: a == b, ">": lambda a, b: a > b, ">=": lambda a, b: a >= b, "<=": lambda a, b: a <= b,
+       "IN": lambda a, b: a in b}
+
+
+async def fake_civicrm(entity, action, params):
+    if entity == "Contact":
+        ids = params["where"][0][2]
+        return {"values": [{"id": i, "email": f"donor{i}@example.org"} for i in ids]}
+    rows = [{**c, "contribution_status_id": c["status"], "currency": "EUR"} for c in CONTRIBUTIONS]
+    rows = [r for r in rows if all(OPS[op](r[field], value) for field, op, value in params["where"])]
+    return {"values": rows[: params["limit"]]}
+
+
+def test_batch_range_validation():
+    assert batch_range(2025) == (date(2025, 1, 1), date(2025, 12, 31))
+    for args in ((None, None, None), (2025, date(2025, 1, 1), None), (None, date(2025, 2, 1), date(2025, 1, 1))):
+        with pytest.raises(ValueError):
+            batch_range(*args)
+
+
+def test_failed_run_resumes_from_checkpoint_and_streams_one_zip(tmp_path):
+    rendered = []
+
+    async def flaky_render(**fields):
+        if fields["receipt_number"].endswith("C000006") and len(rendered) < 10:
+            raise RuntimeError("worker died")
+        rendered.append(fields["receipt_number"])
+        return b"%PDF-" + fields["receipt_number"].encode()
+
+    def run():
+        return ReceiptBatchRun(str(tmp_path), *batch_range(2025), call=fake_civicrm, render=flaky_render,
+                               instrument_names={}, page_size=2)
+
+    first = asyncio.run(run().run())
+    assert (first["status"], first["parts"], first["cursor"], first["receipts"]) == ("failed", 1, 2, 2)
+    assert "worker died" in first["error"]
+    assert sorted(p.name for p in (tmp_path / first["run_id"]).glob("part-*")) == ["part-00001.zip"]
+
+    rendered.extend(["pad"] * 10)  # the renderer is healthy again
+    second = asyncio.run(run().run())
+    assert (second["status"], second["parts"], second["receipts"], second["amount_total"]) == ("completed", 2, 4, 95.5)
+    assert rendered[:2] == ["MOE-2025-C000001", "MOE-2025-C000002"]  # checkpointed page not rendered again
+
+    manager = ReceiptBatchManager(str(tmp_path), call=fake_civicrm, render=flaky_render)
+    assert [r["run_id"] for r in manager.list_runs()] == ["receipts-2025-01-01-2025-12-31"]
+    archive = zipfile.ZipFile(io.BytesIO(b"".join(manager.stream_zip(second["run_id"]))))
+    assert archive.testzip() is None
+    names = archive.namelist()
+    assert [n for n in names if n.endswith(".pdf")] == [
+        f"beleg_MOE-2025-C00000{i}.pdf" for i in (1, 2, 5, 6)
+    ]
+    assert archive.read("beleg_MOE-2025-C000005.pdf") == b"%PDF-MOE-2025-C000005"
+    manifest = archive.read("manifest/part-00002.csv").decode()
+    assert "MOE-2025-C000005,beleg_MOE-2025-C000005.pdf,5,12,donor12@example.org,40.00,EUR" in manifest
+
+
+def test_manager_runs_each_range_once(tmp_path):
+    async def scenario():
+        gate = asyncio.Event()
+
+        async def slow_render(**fields):
+            await gate.wait()
+            return b"%PDF-"
+
+        manager = ReceiptBatchManager(str(tmp_path), call=fake_civicrm, render=slow_render, page_size=10)
+        other = ReceiptBatchManager(str(tmp_path), call=fake_civicrm, render=slow_render)  # e.g. second API worker
+        _, started = await manager.start(date(2025, 1, 1), date(2025, 12, 31))
+        assert started
+        await asyncio.sleep(0.05)
+        assert (await manager.start(date(2025, 1, 1), date(2025, 12, 31)))[1] is False
+        assert (await other.start(date(2025, 1, 1), date(2025, 12, 31)))[1] is False  # flock held
+        assert other.status("receipts-2025-01-01-2025-12-31")["status"] == "running"
+        gate.set()
+        await asyncio.gather(*manager._tasks.values())
+        state = manager.status("receipts-2025-01-01-2025-12-31")
+        assert (state["status"], state["receipts"]) == ("completed", 4)
+        assert await other.start(date(2025, 1, 1), date(2025, 12, 31)) == (state, False)
+        assert manager.status("../etc") is None
+
+    asyncio.run(scenario())
+
+
+def test_renders_at_most_render_ahead_pdfs_of_a_page(tmp_path):
+    async def scenario():
+        gate = asyncio.Event()
+        requested = []
+
+        async def gated_render(**fields):
+            requested.append(fields["receipt_number"])
+            await gate.wait()
+            return b"%PDF-"
+
+        run = ReceiptBatchRun(str(tmp_path), *batch_range(2025), call=fake_civicrm, render=gated_render,
+                              page_size=10, render_ahead=2)
+        task = asyncio.create_task(run.run())
+        await asyncio.sleep(0.05)
+        assert len(requested) == 2  # the page has 4 receipts; the rest wait for the writer
+        gate.set()
+        state = await task
+        assert (state["status"], state["receipts"], len(requested)) == ("completed", 4, 4)
+
+    asyncio.run(scenario())
+
+
+def test_volume_file_io_stays_off_the_event_loop(tmp_path, monkeypatch):
+    on_loop = []
+
+    def watch(owner, name):
+        original = getattr(owner, name)
+
+        def wrapper(*args, **kwargs):
+            # only this run's files, and no ZipFile.__del__ of an archive that is already closed
+            if name == "close" and getattr(args[0], "fp", None) is None:
+                return original(*args, **kwargs)
+            paths = [getattr(a, "filename", a) for a in args[:2]]
+            ours = any(isinstance(p, str) and p.startswith(str(tmp_path)) for p in paths)
+            if ours and threading.current_thread() is threading.main_thread():
+                on_loop.append(name)
+            return original(*args, **kwargs)
+
+        monkeypatch.setattr(owner, name, wrapper)
+
+    for name in ("listdir", "remove", "replace", "makedirs"):
+        watch(os, name)
+    for name in ("__init__", "writestr", "close"):
+        watch(zipfile.ZipFile, name)
+
+    async def failing_render(**fields):
+        if fields["receipt_number"].endswith("C000006"):
+            raise RuntimeError("worker died")  # second volume is abandoned: close + remove
+        return b"%PDF-"
+
+    state = asyncio.run(ReceiptBatchRun(str(tmp_path), *batch_range(2025), call=fake_civicrm,
+                                        render=failing_render, page_size=2).run())
+    assert (state["status"], state["parts"]) == ("failed", 1)
+    assert on_loop == []
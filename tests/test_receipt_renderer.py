@@ -0,0 +1,87 @@
+"""Tests for the process-pool receipt renderer (app/lib/receipt_renderer.py)."""
+
+import asyncio
+import re
+import sys
+import zlib
+from pathlib import Path
+
+import pytest
+
+pytest.importorskip("reportlab")
+
+# Add API directory to path
+api_path = Path(__file__).parent.parent / "api.menschlichkeit-oesterreich.at"
+sys.path.insert(0, str(api_path))
+
+from app.lib.receipt_renderer import ReceiptOrg, ReceiptRenderer, ReceiptTemplate  # noqa: E402
+
+FIELDS = dict(amount=25, currency="eur", purpose=None, provider="stripe", trxn_id="pi_1", email=None,
+              receipt_number="MOE-2026-000001")
+
+
+def test_thread_mode_renders_pdf():
+    async def scenario():
+        renderer = ReceiptRenderer(ReceiptOrg(address_city="Wien"), workers=0)
+        pdf = await renderer.render(**FIELDS, issued_at="2026-10-18 10:00:00Z")
+        assert renderer.snapshot()["rendered"] == 1
+        return pdf
+
+    pdf = asyncio.run(scenario())
+    assert pdf.startswith(b"%PDF-") and pdf.rstrip().endswith(b"%%EOF")
+
+
+def test_process_pool_keeps_event_loop_responsive():
+    async def scenario():
+        renderer = ReceiptRenderer(ReceiptOrg(), workers=1, max_pending=2)
+        await renderer.start()
+        ticks = 0
+
+        async def ticker():
+            nonlocal ticks
+            while True:
+                await asyncio.sleep(0.005)
+                ticks += 1
+
+        task = asyncio.create_task(ticker())
+        try:
+            pdfs = await asyncio.gather(*(renderer.render(**FIELDS) for _ in range(6)))
+        finally:
+            task.cancel()
+            await renderer.close()
+        return pdfs, ticks
+
+    pdfs, ticks = asyncio.run(scenario())
+    assert all(pdf.startswith(b"%PDF-") for pdf in pdfs)
+    assert ticks > 0
+
+
+def _streams(pdf: bytes):
+    from reportlab.lib.rl_accel import asciiBase85Decode
+
+    out = []
+    for match in re.finditer(rb"\nstream\n(.*?)endstream", pdf, re.S):
+        header, body = pdf[pdf.rfind(b" obj", 0, match.start()):match.start()], match.group(1)
+        if b"/ASCII85Decode /FlateDecode" in header:
+            body = zlib.decompress(asciiBase85Decode(body.strip()))
+        out.append(body)
+    return out
+
+
+def test_template_embeds_logo_once_and_stamps_only_dynamic_fields(tmp_path):
+    Image = pytest.importorskip("PIL.Image")
+    logo = tmp_path / "logo.jpg"
+    Image.new("RGB", (64, 32), (200, 20, 20)).save(logo, "JPEG")
+    template = ReceiptTemplate(ReceiptOrg(address_city="Wien"), str(logo))
+    assert template.has_logo
+
+    pdfs = [template.stamp({**FIELDS, "receipt_number": f"MOE-2026-00000{i}", "issued_at": "2026-10-18"})
+            for i in (1, 2)]
+    for i, pdf in enumerate(pdfs, 1):
+        assert pdf.startswith(b"%PDF-") and pdf.count(b"/Subtype /Image") == 1
+        assert logo.read_bytes() in pdf  # binary JPEG passthrough, no ASCII85 per receipt
+        streams = _streams(pdf)
+        static = [s for s in streams if b"Spenden-/Zahlungsbeleg" in s]
+        page = [s for s in streams if b"/FormXob.moeReceiptStatic Do" in s]
+        assert len(static) == 1 and b"Do" in static[0] and b"Belegnummer" not in static[0]
+        assert len(page) == 1 and f"MOE-2026-00000{i}".encode() in page[0] and b"Wien" not in page[0]
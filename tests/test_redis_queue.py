@@ -0,0 +1,245 @@
+"""Tests for the Lua-scripted Redis webhook queue (app/lib/redis_queue.py)."""
+
+import asyncio
+import os
+import sys
+import time
+from pathlib import Path
+
+import pytest
+
+fakeredis = pytest.importorskip("fakeredis")
+pytest.importorskip("lupa")  # fakeredis needs lupa for EVAL/EVALSHA
+
+# Add API directory to path
+api_path = Path(__file__).parent.parent / "api.menschlichkeit-oesterreich.at"
+sys.path.insert(0, str(api_path))
+
+from app.lib.redis_queue import RedisQueue  # noqa: E402
+
+
+# Blocking commands (BLMOVE/XREADGROUP BLOCK) need a real server; fakeredis serializes them
+REDIS_TEST_URL = os.getenv("REDIS_TEST_URL")
+requires_redis = pytest.mark.skipif(not REDIS_TEST_URL, reason="REDIS_TEST_URL not set")
+
+
+def _client(real: bool = False):
+    if real:
+        import redis.asyncio as redis_async
+
+        return redis_async.Redis.from_url(REDIS_TEST_URL, decode_responses=True)
+    return fakeredis.FakeAsyncRedis(decode_responses=True)
+
+
+def _run(scenario, real: bool = False):
+    async def runner():
+        queue = RedisQueue(_client(real), namespace="test:q")
+        await queue.client.unlink(*[k async for k in queue.client.scan_iter("test:q:*")] or ["test:q:none"])
+        try:
+            return await scenario(queue)
+        finally:
+            await queue.client.aclose()
+
+    return asyncio.run(runner())
+
+
+def test_push_pop_ack_roundtrip():
+    async def scenario(queue):
+        await queue.push("a", {"n": 1})
+        await queue.push("b", {"n": 2})
+        [first] = await queue.pop()
+        assert first["id"] == "a" and first["payload"] == {"n": 1} and first["attempts"] == 0
+        assert [item["id"] for item in await queue.pop()] == ["b"]
+        assert await queue.pop() == []
+        assert await queue.ack("a", "b", "unknown") == 2
+        assert not await queue.client.exists(queue.key_msg("a"))
+        assert await queue.client.zcard(queue.key_leases) == 0
+
+    _run(scenario)
+
+
+def test_push_is_idempotent_per_key():
+    async def scenario(queue):
+        assert await queue.push("a", {}, idempotency_key="evt-1") == ("a", False)
+        assert await queue.push("b", {}, idempotency_key="evt-1") == ("a", True)
+        assert (await queue.stats())["main"]["size"] == 1
+        assert not await queue.client.exists(queue.key_msg("b"))
+
+    _run(scenario)
+
+
+def test_fail_backs_off_then_moves_to_dlq():
+    async def scenario(queue):
+        await queue.push("a", {}, max_attempts=2)
+        await queue.pop()
+        assert await queue.client.zscore(queue.key_leases, "a") is not None
+        assert await queue.fail("a", "timeout") == {"dlq": False, "delay": 2}
+        assert await queue.client.zscore(queue.key_leases, "a") is None
+        assert await queue.client.zscore(queue.key_delayed, "a") is not None
+        assert await queue.fail("a", "timeout again") == {"dlq": True, "delay": None}
+        listed = await queue.dlq_list()
+        assert listed["total"] == 1
+        assert listed["items"][0]["last_error"] == "timeout again"
+        assert await queue.fail("missing") is None
+        await queue.push("b", {}, max_attempts=5)
+        await queue.pop()
+        assert await queue.fail("b", "550 no such user", permanent=True) == {"dlq": True, "delay": None}
+        assert (await queue.dlq_list())["total"] == 2
+
+    _run(scenario)
+
+
+def test_dlq_requeue_by_id_moves_a_message_only_once():
+    async def scenario(queue):
+        await queue.push("a", {"n": 1}, max_attempts=1)
+        await queue.pop()
+        await queue.fail("a", "boom")
+        assert await queue.dlq_requeue("a") is True
+        assert await queue.dlq_requeue("a") is False  # already requeued: no second copy
+        assert await queue.dlq_requeue("typo") is False
+        assert await queue.client.lrange(queue.key_main, 0, -1) == ["a"]
+        assert await queue.client.exists(queue.key_msg("typo")) == 0
+        [again] = await queue.pop()
+        assert again["payload"] == {"n": 1}
+
+    _run(scenario)
+
+
+def test_promote_due_moves_each_id_once():
+    async def scenario(queue):
+        for i in range(5):
+            await queue.client.zadd(queue.key_delayed, {f"m{i}": 1_000 - i})
+        await queue.client.zadd(queue.key_delayed, {"future": 2 ** 40})
+        results = await asyncio.gather(queue.promote_due(limit=3), queue.promote_due(), queue.promote_due())
+        assert sum(results) == 5
+        assert sorted(await queue.client.lrange(queue.key_main, 0, -1)) == [f"m{i}" for i in range(5)]
+        assert await queue.client.zcard(queue.key_delayed) == 1
+
+    _run(scenario)
+
+
+def test_pop_leaves_due_messages_to_promoter():
+    async def scenario(queue):
+        for i in range(12):
+            await queue.push(f"m{i}", {}, delay_seconds=60)
+        await queue.client.zadd(queue.key_delayed, {f"m{i}": 0 for i in range(12)})
+        assert await queue.pop() == []
+        assert (await queue.stats())["delayed"] == {"size": 12, "due": 12}
+        assert await queue.promote_due_batches(chunk_size=5, max_chunks=2) == 10
+        assert await queue.promote_due_batches(chunk_size=5) == 2
+        assert (await queue.stats())["delayed"] == {"size": 0, "due": 0}
+        assert len(await queue.pop(20)) == 12
+
+    _run(scenario)
+
+
+def test_pop_respects_max_inflight():
+    async def scenario(queue):
+        for i in range(5):
+            await queue.push(f"m{i}", {})
+        assert len(await queue.pop(5, max_inflight=2)) == 2
+        assert await queue.pop(5, max_inflight=2) == []
+        await queue.ack("m0")
+        assert [item["id"] for item in await queue.pop(5, max_inflight=2)] == ["m2"]
+        assert await queue.inflight() == 2
+
+    _run(scenario)
+
+
+def test_pop_skips_orphaned_ids():
+    async def scenario(queue):
+        await queue.client.lpush(queue.key_main, "orphan")
+        await queue.push("a", {"ok": True})
+        await queue.client.rpush(queue.key_main, "orphan2")  # oldest end
+        assert [item["id"] for item in await queue.pop(5)] == ["a"]
+
+    _run(scenario)
+
+
+def test_batch_pop_leases_and_reaper_requeues_expired():
+    async def scenario(queue):
+        for i in range(5):
+            await queue.push(f"m{i}", {"i": i}, max_attempts=2)
+        batch = await queue.pop(3, visibility_timeout=30)
+        assert [item["id"] for item in batch] == ["m0", "m1", "m2"]
+        assert (await queue.stats())["inflight"]["size"] == 3
+        await queue.ack("m0")
+        await queue.fail("m1", "boom")
+        assert await queue.reap_expired() == {"requeued": 0, "dlq": 0}
+
+        # m2's lease runs out: requeued at the head, attempt counted
+        await queue.client.zadd(queue.key_leases, {"m2": 0})
+        assert await queue.reap_expired() == {"requeued": 1, "dlq": 0}
+        [again] = await queue.pop()
+        assert again["id"] == "m2" and again["attempts"] == 1
+
+        # second expiry exhausts max_attempts
+        await queue.client.zadd(queue.key_leases, {"m2": 0})
+        assert await queue.reap_expired() == {"requeued": 0, "dlq": 1}
+        assert (await queue.dlq_list())["items"][0]["last_error"] == "lease expired"
+
+    _run(scenario)
+
+
+def _dead_letter(queue, msg_id, error, attempts, failed_at):
+    return queue.client.hset(
+        queue.key_msg(msg_id),
+        mapping={"payload": "{}", "attempts": attempts, "max_attempts": 5, "updated_at": failed_at, "last_error": error},
+    )
+
+
+def test_dlq_list_purge_and_requeue_by_filter():
+    async def scenario(queue):
+        now = int(time.time())
+        for i in range(7):
+            error = "n8n: 502 Bad Gateway" if i % 2 == 0 else "validation failed"
+            await _dead_letter(queue, f"d{i}", error, 5, now - 100 * i)
+            await queue.client.lpush(queue.key_dlq, f"d{i}")
+        page = await queue.dlq_list(limit=2, offset=1)
+        assert page["total"] == 7 and [item["id"] for item in page["items"]] == ["d5", "d4"]
+        assert page["items"][0]["last_error"] == "validation failed"
+
+        dry = await queue.dlq_requeue_matching(error_contains="BAD GATEWAY", dry_run=True, chunk_size=3)
+        assert dry == {"matched": 4, "scanned": 7}
+        assert await queue.client.llen(queue.key_dlq) == 7
+
+        # d0 failed just now, d6 600 s ago; chunk_size=2 forces several script calls
+        moved = await queue.dlq_requeue_matching(error_contains="bad gateway", min_age_seconds=150, chunk_size=2)
+        assert moved["matched"] == 3
+        assert sorted(await queue.client.lrange(queue.key_main, 0, -1)) == ["d2", "d4", "d6"]
+        assert await queue.client.lrange(queue.key_dlq, 0, -1) == ["d5", "d3", "d1", "d0"]
+
+        delayed = await queue.dlq_requeue_matching(max_attempts=5, delay_seconds=30, limit=2, chunk_size=1)
+        assert delayed["matched"] == 2 and await queue.client.zcard(queue.key_delayed) == 2
+        assert await queue.dlq_purge() == 2
+        assert not await queue.client.exists(queue.key_dlq, queue.key_msg("d1"), queue.key_msg("d0"))
+
+    _run(scenario)
+
+
+@requires_redis
+def test_pop_wait_returns_when_message_arrives():
+    async def scenario(queue):
+        loop = asyncio.get_running_loop()
+        started = loop.time()
+        waiter = asyncio.create_task(queue.pop_wait(2, wait_seconds=5))
+        await asyncio.sleep(0.2)
+        await queue.push("late", {"x": 1})
+        items = await waiter
+        assert [item["id"] for item in items] == ["late"]
+        assert loop.time() - started < 2
+        assert await queue.pop_wait(wait_seconds=0.3) == []
+        assert (await queue.stats())["main"]["size"] == 0
+
+    _run(scenario, real=True)
+
+
+def test_rate_take_shares_one_bucket_per_queue():
+    async def scenario(queue):
+        assert await queue.rate_take(5, rate=1, burst=3) == (3, 0.0)
+        assert (await queue.rate_take(1, rate=1, burst=3))[0] == 0
+        await queue.rate_take(-2, rate=1, burst=3)
+        assert (await queue.rate_take(5, rate=1, burst=3))[0] == 2
+        assert 0 < await queue.client.ttl(queue.key_rate) <= 63
+
+    _run(scenario)
@@ -0,0 +1,57 @@
+"""Tests for circuit breaker and retry budget (app/lib/resilience.py)."""
+
+import sys
+from pathlib import Path
+
+# Add API directory to path
+api_path = Path(__file__).parent.parent / "api.menschlichkeit-oesterreich.at"
+sys.path.insert(0, str(api_path))
+
+from app.lib.resilience import CircuitBreaker, RetryBudget, backoff_delay  # noqa: E402
+
+
+class FakeClock:
+    def __init__(self) -> None:
+        self.now = 100.0
+
+    def __call__(self) -> float:
+        return self.now
+
+
+def test_breaker_half_open_allows_single_probe():
+    clock = FakeClock()
+    breaker = CircuitBreaker(failure_threshold=2, reset_timeout=10, clock=clock)
+    breaker.record_failure()
+    assert breaker.allow()
+    breaker.record_failure()
+    assert breaker.state == "open"
+    assert not breaker.allow()
+
+    clock.now += 10
+    assert breaker.state == "half_open"
+    assert breaker.allow()
+    assert not breaker.allow()  # probe already in flight
+
+    breaker.record_failure()
+    assert breaker.state == "open"
+
+    clock.now += 10
+    assert breaker.allow()
+    breaker.record_success()
+    assert breaker.state == "closed"
+    assert breaker.allow() and breaker.allow()
+
+
+def test_retry_budget_limits_retries_to_ratio():
+    clock = FakeClock()
+    budget = RetryBudget(ratio=0.5, min_per_second=0.0, max_tokens=1.0, clock=clock)
+    assert budget.try_spend()
+    assert not budget.try_spend()
+    budget.record_request()
+    budget.record_request()
+    assert budget.try_spend()
+    assert budget.snapshot()["denied"] == 1
+
+
+def test_backoff_delay_is_capped():
+    assert all(0.0 <= backoff_delay(10, base=1.0, cap=2.0) <= 2.0 for _ in range(100))
@@ -0,0 +1,126 @@
+"""Tests for the recurring job scheduler (app/lib/scheduler.py)."""
+
+import asyncio
+import sys
+from datetime import datetime
+from pathlib import Path
+from zoneinfo import ZoneInfo
+
+import pytest
+
+# Add API directory to path
+api_path = Path(__file__).parent.parent / "api.menschlichkeit-oesterreich.at"
+sys.path.insert(0, str(api_path))
+
+from app.lib.scheduler import CronExpr, RecurringScheduler, RedisCursorStore, SqliteCursorStore, parse_jobs  # noqa: E402
+from app.lib.sqlite_queue import SqliteQueue, SqliteStore  # noqa: E402
+
+VIENNA = ZoneInfo("Europe/Vienna")
+
+
+def _ts(local: str) -> int:
+    return int(datetime.fromisoformat(local).replace(tzinfo=VIENNA).timestamp())
+
+
+def _local(ts: int) -> str:
+    return datetime.fromtimestamp(ts, VIENNA).strftime("%Y-%m-%d %H:%M")
+
+
+def _runs(expr: str, start: str, n: int = 3):
+    ts, runs = _ts(start), []
+    for _ in range(n):
+        ts = CronExpr(expr).next_after(ts, VIENNA)
+        runs.append(_local(ts))
+    return runs
+
+
+def test_cron_next_after_fields_and_dst():
+    assert _runs("*/20 9-10 * * MON-FRI", "2026-10-16T10:30") == [
+        "2026-10-16 10:40", "2026-10-19 09:00", "2026-10-19 09:20",
+    ]
+    assert _runs("0 0 13 * 5", "2026-01-01T00:00") == ["2026-01-02 00:00", "2026-01-09 00:00", "2026-01-13 00:00"]
+    assert _runs("@monthly", "2026-01-31T10:00", 2) == ["2026-02-01 00:00", "2026-03-01 00:00"]
+    # 02:30 does not exist on 2026-03-29 (Vienna) and exists twice on 2026-10-25: fires once each day
+    assert _runs("30 2 * * *", "2026-03-28T12:00", 2) == ["2026-03-29 03:30", "2026-03-30 02:30"]
+    assert _runs("30 2 * * *", "2026-10-24T12:00", 2) == ["2026-10-25 02:30", "2026-10-26 02:30"]
+
+
+def test_parse_jobs_rejects_bad_entries():
+    jobs = parse_jobs('[{"name": "sync", "cron": "@daily", "queue": "sync", "jitter_seconds": 60}]')
+    assert jobs["sync"].queue == "sync" and jobs["sync"].misfire == "skip"
+    for raw in ('{"name": "x"}', '[{"name": "x"}]', '[{"name": "x", "cron": "61 * * * *"}]',
+                '[{"name": "x", "cron": "0 0 30 2 *"}]', '[{"name": "x", "cron": "@daily", "misfire": "all"}]'):
+        with pytest.raises(ValueError):
+            parse_jobs(raw)
+
+
+def _run(tmp_path, scenario, raw_jobs, **options):
+    async def runner():
+        store = SqliteStore(str(tmp_path / "queue.sqlite3"))
+        queue = SqliteQueue(store, namespace="moe:queue:sync")
+        jobs = parse_jobs(raw_jobs)
+
+        def scheduler():  # one per API worker, sharing queue and cursors
+            return RecurringScheduler(jobs, lambda _: queue, lambda: SqliteCursorStore(store), tz=VIENNA, **options)
+
+        try:
+            return await scenario(scheduler, queue)
+        finally:
+            await store.close()
+
+    return asyncio.run(runner())
+
+
+async def _delays(queue):
+    def op(conn):
+        rows = conn.execute(
+            "SELECT payload, due_at - enqueued_at AS delay FROM queue_messages WHERE queue = ?", (queue.namespace,)
+        )
+        return [(row["delay"], row["payload"]) for row in rows]
+
+    return await queue._read(op)
+
+
+def test_single_fire_across_workers_with_deterministic_jitter(tmp_path):
+    async def scenario(scheduler, queue):
+        a, b = scheduler(), scheduler()
+        now = _ts("2026-10-18T01:57")
+        fired = await asyncio.gather(a.tick(now), b.tick(now), a.tick(now + 10))
+        assert sum(len(f) for f in fired) == 1
+        [(delay, payload)] = await _delays(queue)
+        assert 180 <= delay <= 180 + 600 and '"job": "nightly"' in payload
+        assert await b.tick(now + 60) == []  # cursor moved: nothing until the next night
+        assert len(await a.tick(_ts("2026-10-19T01:58"))) == 1
+        assert [job["last_scheduled_for"] for job in await a.describe()] == [_ts("2026-10-19T02:00")]
+
+    _run(tmp_path, scenario, '[{"name": "nightly", "cron": "0 2 * * *", "jitter_seconds": 600}]')
+
+
+@pytest.mark.parametrize("policy, expected", [("skip", 0), ("once", 1)])
+def test_misfire_policy_after_downtime(tmp_path, policy, expected):
+    async def scenario(scheduler, queue):
+        s = scheduler()
+        assert len(await s.tick(_ts("2026-10-18T09:58"))) == 1  # 10:00 enqueued
+        # API down until 15:30: 11:00 … 15:00 missed
+        fired = await s.tick(_ts("2026-10-18T15:30"))
+        assert [_local(at) for _, at in fired] == ["2026-10-18 11:00"][:expected]
+        assert await s.tick(_ts("2026-10-18T15:31")) == []
+        assert [_local(at) for _, at in await s.tick(_ts("2026-10-18T15:59"))] == ["2026-10-18 16:00"]
+
+    _run(tmp_path, scenario, f'[{{"name": "hourly", "cron": "@hourly", "misfire": "{policy}"}}]', lookahead_seconds=120)
+
+
+def test_redis_cursor_only_moves_forward():
+    fakeredis = pytest.importorskip("fakeredis")
+    pytest.importorskip("lupa")
+
+    async def scenario():
+        client = fakeredis.FakeAsyncRedis(decode_responses=True)
+        cursors = RedisCursorStore(client, key="test:scheduler:cursors")
+        await client.unlink(cursors.key)
+        await cursors.advance("job:abc", 200)
+        await cursors.advance("job:abc", 100)
+        assert await cursors.get(["job:abc", "other"]) == {"job:abc": 200, "other": None}
+        await client.aclose()
+
+    asyncio.run(scenario())
@@ -0,0 +1,126 @@
+"""Tests for the pooled SMTP sender (app/lib/smtp_pool.py) against a minimal in-process SMTP server."""
+
+import asyncio
+import sys
+from email.message import EmailMessage
+from pathlib import Path
+
+import pytest
+
+# Add API directory to path
+api_path = Path(__file__).parent.parent / "api.menschlichkeit-oesterreich.at"
+sys.path.insert(0, str(api_path))
+
+from app.lib.smtp_pool import SmtpConfig, SmtpPool, SmtpSendError  # noqa: E402
+
+
+class FakeSmtpServer:
+    """Speaks just enough SMTP for smtplib; optionally drops a session after N messages."""
+
+    def __init__(self, drop_after=None):
+        self.drop_after = drop_after
+        self.sessions = 0
+        self.messages = []
+        self.server = None
+
+    async def handle(self, reader, writer):
+        self.sessions += 1
+        sent = 0
+        writer.write(b"220 fake ESMTP\r\n")
+        while True:
+            line = await reader.readline()
+            if not line:
+                break
+            cmd = line.decode().strip().upper()
+            if cmd.startswith("EHLO"):
+                writer.write(b"250-fake\r\n250 8BITMIME\r\n")
+            elif cmd.startswith("RCPT") and "REJECT" in cmd:
+                writer.write(b"550 no such user\r\n")
+            elif cmd.startswith(("MAIL", "RCPT", "RSET", "NOOP")):
+                writer.write(b"250 ok\r\n")
+            elif cmd == "DATA":
+                writer.write(b"354 go\r\n")
+                await writer.drain()
+                body = []
+                while (chunk := await reader.readline()) != b".\r\n":
+                    body.append(chunk)
+                self.messages.append(b"".join(body))
+                sent += 1
+                writer.write(b"250 queued\r\n")
+                if self.drop_after and sent >= self.drop_after:
+                    await writer.drain()
+                    break
+            elif cmd == "QUIT":
+                writer.write(b"221 bye\r\n")
+                await writer.drain()
+                break
+            else:
+                writer.write(b"502 unknown\r\n")
+            await writer.drain()
+        writer.close()
+
+    async def __aenter__(self):
+        self.server = await asyncio.start_server(self.handle, "127.0.0.1", 0)
+        return self.server.sockets[0].getsockname()[1]
+
+    async def __aexit__(self, *exc):
+        self.server.close()
+
+
+def _msg(i, to="donor@example.org"):
+    msg = EmailMessage()
+    msg["From"], msg["To"], msg["Subject"] = "noreply@example.org", to, f"Beleg {i}"
+    msg.set_content(f"Danke {i}")
+    return msg
+
+
+def _pool(port, **overrides):
+    return SmtpPool(SmtpConfig(host="127.0.0.1", port=port, use_tls=False, timeout=5, **overrides))
+
+
+def test_connections_are_reused_and_recycled_at_the_cap():
+    async def scenario():
+        server = FakeSmtpServer()
+        async with server as port:
+            pool = _pool(port, pool_size=2, max_messages_per_connection=3)
+            await asyncio.gather(*(pool.send(_msg(i)) for i in range(7)))
+            await pool.close()
+        return server, pool.snapshot()
+
+    server, snapshot = asyncio.run(scenario())
+    assert len(server.messages) == 7
+    assert server.sessions == 3  # 3 + 3 + 1 instead of one handshake per message
+    assert (snapshot["sent"], snapshot["connects"], snapshot["recycled"]) == (7, 3, 2)
+
+
+def test_dropped_connection_is_replaced_transparently():
+    async def scenario():
+        server = FakeSmtpServer(drop_after=2)
+        async with server as port:
+            pool = _pool(port, pool_size=1)
+            for i in range(5):
+                await pool.send(_msg(i))
+            await pool.close()
+        return server, pool.snapshot()
+
+    server, snapshot = asyncio.run(scenario())
+    assert len(server.messages) == 5
+    assert snapshot["reconnects"] == 2 and snapshot["failed"] == 0
+
+
+def test_permanent_rejection_keeps_the_session():
+    async def scenario():
+        server = FakeSmtpServer()
+        async with server as port:
+            pool = _pool(port, pool_size=1)
+            with pytest.raises(SmtpSendError) as err:
+                await pool.send(_msg(0, to="reject@example.org"))
+            await pool.send(_msg(1))
+            await pool.close()
+        return server, err.value
+
+    server, error = asyncio.run(scenario())
+    assert error.permanent and server.sessions == 1 and len(server.messages) == 1
+    with pytest.raises(SmtpSendError) as err:
+        asyncio.run(SmtpPool(SmtpConfig()).send(_msg(2)))
+    assert not err.value.permanent
@@ -0,0 +1,105 @@
+"""Tests for the embedded SQLite webhook queue backend (app/lib/sqlite_queue.py)."""
+
+import asyncio
+import sys
+from pathlib import Path
+
+# Add API directory to path
+api_path = Path(__file__).parent.parent / "api.menschlichkeit-oesterreich.at"
+sys.path.insert(0, str(api_path))
+
+from app.lib.sqlite_queue import SqliteQueue  # noqa: E402
+
+
+def _run(tmp_path, scenario):
+    async def runner():
+        queue = SqliteQueue(str(tmp_path / "queue.sqlite3"), namespace="test")
+        try:
+            return await scenario(queue)
+        finally:
+            await queue.close()
+
+    return asyncio.run(runner())
+
+
+def test_push_pop_ack_and_idempotency(tmp_path):
+    async def scenario(queue):
+        assert await queue.push("a", {"n": 1}, idempotency_key="evt-1") == ("a", False)
+        assert await queue.push("b", {"n": 2}, idempotency_key="evt-1") == ("a", True)
+        await queue.push("c", {"n": 3})
+        await queue.push("later", {}, delay_seconds=60)
+        batch = await queue.pop(5, visibility_timeout=30)
+        assert [item["id"] for item in batch] == ["a", "c"]
+        assert batch[0]["payload"] == {"n": 1} and batch[0]["lease_expires_at"] >= batch[0]["updated_at"] + 30
+        stats = await queue.stats()
+        assert stats["backend"] == "sqlite" and stats["inflight"]["size"] == 2 and stats["delayed"]["size"] == 1
+        assert await queue.ack("a", "c", "unknown") == 2
+        assert (await queue.stats())["inflight"]["size"] == 0
+
+    _run(tmp_path, scenario)
+
+
+def test_concurrent_pops_share_one_commit_without_duplicates(tmp_path):
+    async def scenario(queue):
+        await asyncio.gather(*(queue.push(f"m{i}", {"i": i}) for i in range(200)))
+        batches = await asyncio.gather(*(queue.pop(7) for _ in range(40)))
+        ids = [item["id"] for batch in batches for item in batch]
+        assert len(ids) == len(set(ids)) == 200
+
+    _run(tmp_path, scenario)
+
+
+def test_fail_reaper_dlq_and_requeue(tmp_path):
+    async def scenario(queue):
+        await queue.push("a", {}, max_attempts=2)
+        await queue.push("b", {}, max_attempts=1)
+        await queue.pop(2)
+        assert await queue.fail("a", "timeout") == {"dlq": False, "delay": 2}
+        assert await queue.fail("missing") is None
+        assert await queue.pop() == []  # backoff not yet due
+
+        # b's lease runs out and exhausts max_attempts
+        await queue._write(lambda conn: conn.execute("UPDATE queue_messages SET due_at = 0 WHERE id = 'b'"))
+        assert await queue.reap_expired() == {"requeued": 0, "dlq": 1}
+        listed = await queue.dlq_list()
+        assert listed["total"] == 1 and listed["items"][0]["last_error"] == "lease expired"
+
+        assert await queue.dlq_requeue_matching(error_contains="LEASE", dry_run=True) == {"matched": 1, "scanned": 1}
+        assert (await queue.dlq_requeue_matching(error_contains="lease", chunk_size=1))["matched"] == 1
+        assert [item["id"] for item in await queue.pop()] == ["b"]
+        assert await queue.fail("b", "again") == {"dlq": True, "delay": None}
+        assert await queue.dlq_requeue("b") is True
+        assert await queue.dlq_requeue("b") is False  # already requeued
+        assert await queue.dlq_requeue("typo") is False
+        assert [item["id"] for item in await queue.pop(5)] == ["b"]
+        assert await queue.fail("b", "again") == {"dlq": True, "delay": None}
+        assert await queue.fail("a", "550 rejected", permanent=True) == {"dlq": True, "delay": None}
+        assert await queue.dlq_purge() == 2
+        assert (await queue.stats())["dlq"]["size"] == 0
+
+    _run(tmp_path, scenario)
+
+
+def test_pop_wait_wakes_on_push(tmp_path):
+    async def scenario(queue):
+        loop = asyncio.get_running_loop()
+        started = loop.time()
+        waiter = asyncio.create_task(queue.pop_wait(wait_seconds=5))
+        await asyncio.sleep(0.1)
+        await queue.push("late", {})
+        assert [item["id"] for item in await waiter] == ["late"]
+        assert loop.time() - started < 1
+        assert await queue.pop_wait(wait_seconds=0.3) == []
+
+    _run(tmp_path, scenario)
+
+
+def test_counter_persists_across_instances(tmp_path):
+    async def first(queue):
+        return [await queue.incr("receipts:2026") for _ in range(3)]
+
+    async def second(queue):
+        return await queue.incr("receipts:2026")
+
+    assert _run(tmp_path, first) == [1, 2, 3]
+    assert _run(tmp_path, second) == 4
@@ -0,0 +1,171 @@
+"""Tests for the Redis Streams webhook queue backend (app/lib/stream_queue.py)."""
+
+import asyncio
+import sys
+from pathlib import Path
+
+import pytest
+
+fakeredis = pytest.importorskip("fakeredis")
+pytest.importorskip("lupa")  # fakeredis needs lupa for EVAL/EVALSHA
+
+# Add API directory to path
+api_path = Path(__file__).parent.parent / "api.menschlichkeit-oesterreich.at"
+sys.path.insert(0, str(api_path))
+
+from app.lib.stream_queue import QueueFull, StreamQueue  # noqa: E402
+from test_redis_queue import _client, requires_redis  # noqa: E402
+
+
+def _run(scenario, real: bool = False, **options):
+    async def runner():
+        client = _client(real)
+        await client.unlink(*[k async for k in client.scan_iter("test:s:*")] or ["test:s:none"])
+        queue = StreamQueue(client, namespace="test:s", consumer="c1", **options)
+        try:
+            return await scenario(queue)
+        finally:
+            await client.aclose()
+
+    return asyncio.run(runner())
+
+
+def test_push_pop_ack_across_consumers():
+    async def scenario(queue):
+        other = StreamQueue(queue.client, namespace="test:s", consumer="c2")
+        for i in range(4):
+            await queue.push(f"m{i}", {"i": i})
+        first = await queue.pop(2)
+        second = await other.pop(5)
+        assert [item["id"] for item in first] == ["m0", "m1"]
+        assert [item["id"] for item in second] == ["m2", "m3"]
+        stats = await queue.stats()
+        assert stats["main"]["size"] == 0 and stats["inflight"]["size"] == 4
+        assert {c["name"]: c["pending"] for c in stats["inflight"]["consumers"]} == {"c1": 2, "c2": 2}
+        assert await queue.ack("m0", "m1", "m2", "m3") == 4
+        assert await queue.client.xlen(queue.key_stream) == 0
+        assert (await queue.stats())["inflight"]["size"] == 0
+
+    _run(scenario)
+
+
+def test_pop_respects_max_inflight_across_consumers():
+    async def scenario(queue):
+        other = StreamQueue(queue.client, namespace="test:s", consumer="c2")
+        for i in range(5):
+            await queue.push(f"m{i}", {})
+        assert len(await queue.pop(2, max_inflight=3)) == 2
+        assert [item["id"] for item in await other.pop(5, max_inflight=3)] == ["m2"]
+        assert await other.pop(5, max_inflight=3) == []
+        assert await queue.inflight() == 3
+
+    _run(scenario)
+
+
+def test_idempotency_and_fail_to_dlq():
+    async def scenario(queue):
+        assert await queue.push("a", {}, max_attempts=2, idempotency_key="k") == ("a", False)
+        assert await queue.push("b", {}, idempotency_key="k") == ("a", True)
+        await queue.pop()
+        assert await queue.fail("a", "boom") == {"dlq": False, "delay": 2}
+        assert (await queue.stats())["inflight"]["size"] == 0
+        await queue.client.zadd(queue.key_delayed, {"a": 0})
+        assert await queue.promote_due() == 1
+        [again] = await queue.pop()
+        assert again["id"] == "a" and again["attempts"] == 1
+        assert await queue.fail("a", "boom") == {"dlq": True, "delay": None}
+        assert (await queue.dlq_list())["items"][0]["id"] == "a"
+        assert await queue.dlq_requeue("a") is True
+        assert await queue.dlq_requeue("a") is False
+        assert await queue.dlq_requeue("typo") is False
+        assert await queue.client.exists(queue.key_msg("typo")) == 0
+        assert [item["id"] for item in await queue.pop(5)] == ["a"]
+        assert await queue.fail("a", "550", permanent=True) == {"dlq": True, "delay": None}
+        assert (await queue.stats())["inflight"]["size"] == 0
+
+    _run(scenario)
+
+
+def test_reaper_requeues_only_expired_leases():
+    async def scenario(queue):
+        await queue.push("a", {})
+        await queue.push("b", {})
+        await queue.pop(2, visibility_timeout=600)
+        await queue.client.hset(queue.key_msg("a"), "lease_until", 0)
+        await asyncio.sleep(1.1)  # XPENDING IDLE granularity
+        assert await queue.reap_expired() == {"requeued": 1, "dlq": 0}
+        [again] = await queue.pop()
+        assert again["id"] == "a" and again["attempts"] == 1 and again["last_error"] == "lease expired"
+        assert (await queue.stats())["inflight"]["size"] == 2
+
+    _run(scenario)
+
+
+def test_push_past_maxlen_is_rejected_without_orphans():
+    async def scenario(queue):
+        for i in range(8):
+            await queue.push(f"m{i}", {"i": i})
+        await queue.push("later", {}, delay_seconds=60)
+        await queue.pop(3)  # leased entries still count: they are live work
+        await queue.push("m8", {})
+        for msg_id in ("m9", "m10"):
+            with pytest.raises(QueueFull):
+                await queue.push(msg_id, {}, delay_seconds=5 if msg_id == "m10" else 0)
+        hashes = [k async for k in queue.client.scan_iter(f"{queue.msg_prefix}*")]
+        assert sorted(k[len(queue.msg_prefix):] for k in hashes) == sorted([f"m{i}" for i in range(9)] + ["later"])
+        assert await queue.client.xlen(queue.key_stream) == 9
+        assert await queue.client.hlen(queue.key_entries) == 9
+        await queue.ack("m0")
+        assert await queue.push("m9", {}) == ("m9", False)  # room again after ack
+
+    _run(scenario, maxlen=10)
+
+
+def test_reaper_recovers_leases_whose_entries_were_trimmed():
+    async def scenario(queue):
+        await queue.push("a", {}, max_attempts=1)
+        await queue.push("b", {})
+        await queue.pop(2, visibility_timeout=600)
+        for msg_id in ("a", "b"):
+            await queue.client.hset(queue.key_msg(msg_id), "lease_until", 0)
+        # e.g. an old `XADD MAXLEN ~`: the PEL still lists entries the stream no longer has
+        await queue.client.xtrim(queue.key_stream, maxlen=0, approximate=False)
+        await asyncio.sleep(1.1)  # XPENDING IDLE granularity
+        assert await queue.reap_expired() == {"requeued": 1, "dlq": 1}
+        assert [item["id"] for item in await queue.pop()] == ["b"]
+        assert [item["id"] for item in (await queue.dlq_list())["items"]] == ["a"]
+        assert await queue.client.hlen(queue.key_entries) == 1  # only b's new entry
+
+    _run(scenario)
+
+
+def test_dlq_requeue_by_filter_readds_to_stream():
+    async def scenario(queue):
+        for i in range(4):
+            await queue.push(f"m{i}", {}, max_attempts=1)
+        await queue.pop(4)
+        for i in range(4):
+            await queue.fail(f"m{i}", "HTTP 502" if i < 3 else "schema error")
+        assert await queue.dlq_requeue_matching(error_contains="502", chunk_size=2) == {"matched": 3, "scanned": 4}
+        assert sorted(item["id"] for item in await queue.pop(10)) == ["m0", "m1", "m2"]
+        assert (await queue.dlq_list())["total"] == 1
+
+    _run(scenario)
+
+
+@requires_redis
+def test_pop_wait_blocks_on_group_read():
+    async def scenario(queue):
+        loop = asyncio.get_running_loop()
+        started = loop.time()
+        waiter = asyncio.create_task(queue.pop_wait(2, wait_seconds=5, visibility_timeout=30))
+        await asyncio.sleep(0.2)
+        await queue.push("late", {"x": 1})
+        items = await waiter
+        assert [item["id"] for item in items] == ["late"]
+        assert items[0]["lease_expires_at"] >= items[0]["updated_at"] + 30
+        assert loop.time() - started < 2
+        assert await queue.client.hget(queue.key_msg("late"), "lease_until")
+        assert await queue.pop_wait(wait_seconds=0.3) == []
+
+    _run(scenario, real=True)
@@ -0,0 +1,111 @@
+"""Tests for the in-process webhook dispatcher (app/lib/webhook_dispatcher.py)."""
+
+import asyncio
+import json
+import sys
+from pathlib import Path
+
+import httpx
+
+# Add API directory to path
+api_path = Path(__file__).parent.parent / "api.menschlichkeit-oesterreich.at"
+sys.path.insert(0, str(api_path))
+
+from app.lib.queue_registry import QueueSpec  # noqa: E402
+from app.lib.sqlite_queue import SqliteQueue, SqliteStore  # noqa: E402
+from app.lib.webhook_dispatcher import WebhookDispatcher, sign_body  # noqa: E402
+
+
+def _run(tmp_path, handler, scenario, **options):
+    async def runner():
+        store = SqliteStore(str(tmp_path / "queue.sqlite3"))
+        queues = [
+            (QueueSpec("webhooks"), SqliteQueue(store, namespace="moe:queue:webhooks")),
+            (QueueSpec("payments", "high"), SqliteQueue(store, namespace="moe:queue:payments")),
+        ]
+        client = httpx.AsyncClient(base_url="http://n8n.test", transport=httpx.MockTransport(handler))
+        dispatcher = WebhookDispatcher(lambda: queues, client, **options)
+        try:
+            return await scenario(dispatcher, dict((spec.name, queue) for spec, queue in queues))
+        finally:
+            await dispatcher.stop(grace_seconds=1)
+            await client.aclose()
+            await store.close()
+
+    return asyncio.run(runner())
+
+
+async def _until(predicate, timeout=5.0):
+    deadline = asyncio.get_running_loop().time() + timeout
+    while not predicate():
+        assert asyncio.get_running_loop().time() < deadline, "dispatcher did not settle"
+        await asyncio.sleep(0.02)
+
+
+def test_delivers_signed_payloads_to_target_paths(tmp_path):
+    seen = []
+
+    def handler(request):
+        seen.append(request)
+        return httpx.Response(200, json={"ok": True})
+
+    async def scenario(dispatcher, queues):
+        await queues["webhooks"].push("a", {"webhook": "member", "id": 1})
+        await queues["webhooks"].push("b", {"id": 2})
+        await queues["payments"].push("p", {"amount": 5})
+        dispatcher.start()
+        await _until(lambda: dispatcher.snapshot()["delivered"] == 3)
+        assert {r.url.path for r in seen} == {"/webhook/member-event", "/webhook/api-event", "/webhook/payment-event"}
+        assert seen[0].url.path == "/webhook/payment-event"  # high priority drained first
+        first = seen[0]
+        assert first.headers["X-Webhook-Signature"] == sign_body("s3cret", first.content)
+        assert json.loads(first.content) == {"amount": 5} and first.headers["X-Queue-Message-Id"] == "p"
+        for queue in queues.values():
+            stats = await queue.stats()
+            assert stats["main"]["size"] == 0 and stats["inflight"]["size"] == 0
+
+    _run(tmp_path, handler, scenario, secret="s3cret")
+
+
+def test_failures_use_queue_backoff_and_dlq(tmp_path):
+    def handler(request):
+        if request.url.path == "/webhook/error-alert":
+            raise httpx.ConnectError("refused", request=request)
+        return httpx.Response(502, text="bad gateway")
+
+    async def scenario(dispatcher, queues):
+        await queues["webhooks"].push("retry", {"webhook": "api"}, max_attempts=3)
+        await queues["webhooks"].push("dead", {"webhook": "error"}, max_attempts=1)
+        await queues["webhooks"].push("unknown", {"webhook": "nope"}, max_attempts=1)
+        dispatcher.start()
+        await _until(lambda: dispatcher.snapshot()["failed"] == 3)
+        snapshot = dispatcher.snapshot()
+        assert snapshot["dead_lettered"] == 2 and snapshot["delivered"] == 0
+        stats = await queues["webhooks"].stats()
+        assert stats["delayed"]["size"] == 1 and stats["inflight"]["size"] == 0
+        dlq = {item["id"]: item["last_error"] for item in (await queues["webhooks"].dlq_list())["items"]}
+        assert dlq["dead"].startswith("ConnectError") and "no webhook path" in dlq["unknown"]
+
+    _run(tmp_path, handler, scenario)
+
+
+def test_concurrency_caps_parallel_deliveries(tmp_path):
+    active = {"now": 0, "max": 0}
+
+    async def handler(request):
+        active["now"] += 1
+        active["max"] = max(active["max"], active["now"])
+        await asyncio.sleep(0.05)
+        active["now"] -= 1
+        return httpx.Response(204)
+
+    async def scenario(dispatcher, queues):
+        for i in range(12):
+            await queues["webhooks"].push(f"m{i}", {})
+        dispatcher.start()
+        await _until(lambda: dispatcher.snapshot()["delivered"] == 12)
+        assert active["max"] == 3
+        [target] = dispatcher.snapshot()["targets"]
+        assert target["target"] == "api" and target["count"] == 12 and target["errors"] == 0
+
+    _run(tmp_path, handler, scenario, concurrency=3)